@@ -35,7 +35,19 @@ class Settings(BaseSettings):
     ENV: str = Field(default=os.getenv("ENV", "production"), description="App environment")
     PORT: int = Field(default=int(os.getenv("PORT", 5000)), description="App port")
     MONGODB_URI: str = Field(default=os.getenv("MONGODB_URI", ""), description="MongoDB connection URI")
+    MONGO_MAX_POOL_SIZE: int = Field(default=int(os.getenv("MONGO_MAX_POOL_SIZE", 50)), description="Maximum MongoDB connections per process")
+    MONGO_MIN_POOL_SIZE: int = Field(default=int(os.getenv("MONGO_MIN_POOL_SIZE", 0)), description="MongoDB connections kept open when idle")
+    MONGO_MAX_IDLE_TIME_MS: int = Field(default=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000)), description="Milliseconds an idle MongoDB connection is kept")
+    MONGO_CONNECT_TIMEOUT_MS: int = Field(default=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000)), description="MongoDB connect timeout in milliseconds")
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = Field(default=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)), description="Milliseconds to wait for a usable MongoDB server")
+    MONGO_SOCKET_TIMEOUT_MS: int = Field(default=int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000)), description="MongoDB socket read/write timeout in milliseconds")
+    MONGO_WRITE_BATCH_SIZE: int = Field(default=int(os.getenv("MONGO_WRITE_BATCH_SIZE", 500)), description="Documents per bulk write round trip")
+    MONGO_FIND_BATCH_SIZE: int = Field(default=int(os.getenv("MONGO_FIND_BATCH_SIZE", 500)), description="Documents per find_many round trip")
+    MONGO_SLOW_OP_MS: int = Field(default=int(os.getenv("MONGO_SLOW_OP_MS", 200)), description="Log MongoDB operations slower than this many milliseconds")
+    ANALYTICS_FLUSH_INTERVAL: float = Field(default=float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 2)), description="Seconds between bulk writes of buffered analytics events to MongoDB")
+    ANALYTICS_BUFFER_MAX: int = Field(default=int(os.getenv("ANALYTICS_BUFFER_MAX", 10000)), description="Analytics events buffered before the oldest are dropped")
     REDIS_URL: str = Field(default=os.getenv("REDIS_URL", ""), description="Redis connection URL")
+    DATABASE_URL: str = Field(default=os.getenv("DATABASE_URL", ""), description="SQLAlchemy async database URL")
     JWT_SECRET: str = Field(default=os.getenv("JWT_SECRET", ""), description="JWT secret key")
     AWS_S3_BUCKET: str = Field(default=os.getenv("AWS_S3_BUCKET", ""), description="AWS S3 bucket name")
     AWS_REGION: str = Field(default=os.getenv("AWS_REGION", ""), description="AWS region")
@@ -44,6 +56,78 @@ class Settings(BaseSettings):
     VIDEO_STORAGE_PATH: str = Field(default=os.getenv("VIDEO_STORAGE_PATH", "/opt/render/project/src/nr1-main/videos"), description="Video storage path")
     LOG_FILE_PATH: str = Field(default=os.getenv("LOG_FILE_PATH", ""), description="Log file path")
     CORS_ORIGINS_RAW: str = Field(default=os.getenv("CORS_ORIGINS", "*"), description="Raw CORS origins env var")
+    COMPRESSION_MIN_SIZE: int = Field(default=int(os.getenv("COMPRESSION_MIN_SIZE", 500)), description="Minimum response size in bytes to compress")
+    COMPRESSION_GZIP_LEVEL: int = Field(default=int(os.getenv("COMPRESSION_GZIP_LEVEL", 6)), description="gzip level for dynamic responses")
+    COMPRESSION_BROTLI_QUALITY: int = Field(default=int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4)), description="Brotli quality for dynamic responses")
+    STATIC_IMMUTABLE_MAX_AGE: int = Field(default=int(os.getenv("STATIC_IMMUTABLE_MAX_AGE", 31536000)), description="Max-age for content-hashed static assets")
+    STATIC_DEFAULT_MAX_AGE: int = Field(default=int(os.getenv("STATIC_DEFAULT_MAX_AGE", 0)), description="Max-age for other static assets (0 = revalidate)")
+    SHUTDOWN_DRAIN_TIMEOUT: float = Field(default=float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", 20)), description="Seconds the API waits for in-flight requests and buffer flushes on shutdown")
+    WORKER_DRAIN_TIMEOUT: float = Field(default=float(os.getenv("WORKER_DRAIN_TIMEOUT", 25)), description="Seconds a worker lets the current job finish before checkpointing and re-queuing it")
+    RATE_LIMIT_ENABLED: bool = Field(default=os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true", description="Enable rate limiting of expensive endpoints")
+    RATE_LIMIT_PROCESS_CAPACITY: int = Field(default=int(os.getenv("RATE_LIMIT_PROCESS_CAPACITY", 5)), description="Burst size for video processing requests")
+    RATE_LIMIT_PROCESS_PER_MINUTE: float = Field(default=float(os.getenv("RATE_LIMIT_PROCESS_PER_MINUTE", 10)), description="Sustained video processing requests per minute")
+    RATE_LIMIT_AUTH_CAPACITY: int = Field(default=int(os.getenv("RATE_LIMIT_AUTH_CAPACITY", 10)), description="Burst size for login/signup requests")
+    RATE_LIMIT_AUTH_PER_MINUTE: float = Field(default=float(os.getenv("RATE_LIMIT_AUTH_PER_MINUTE", 20)), description="Sustained login/signup requests per minute")
+    RATE_LIMIT_LEASE_FRACTION: float = Field(default=float(os.getenv("RATE_LIMIT_LEASE_FRACTION", 0.1)), description="Fraction of a bucket leased to one process to skip Redis hops")
+    TRUSTED_PROXY_COUNT: int = Field(default=int(os.getenv("TRUSTED_PROXY_COUNT", 1)), description="Reverse proxies in front of the app that append to X-Forwarded-For; 0 uses the peer address")
+    IDEMPOTENCY_ENABLED: bool = Field(default=os.getenv("IDEMPOTENCY_ENABLED", "true").lower() == "true", description="Honour Idempotency-Key on job and row-creating POST endpoints")
+    IDEMPOTENCY_TTL: int = Field(default=int(os.getenv("IDEMPOTENCY_TTL", 86400)), description="Seconds a response is replayed for retries with the same Idempotency-Key")
+    IDEMPOTENCY_LOCK_TTL: int = Field(default=int(os.getenv("IDEMPOTENCY_LOCK_TTL", 60)), description="Seconds an in-flight Idempotency-Key blocks concurrent duplicates")
+    RESPONSE_CACHE_ENABLED: bool = Field(default=os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true", description="Cache responses of hot read endpoints (video info, sample, translations, user)")
+    RESPONSE_CACHE_LOCAL_SIZE: int = Field(default=int(os.getenv("RESPONSE_CACHE_LOCAL_SIZE", 2048)), description="Responses kept in each process's in-memory cache tier")
+    RESPONSE_CACHE_LOCAL_TTL: float = Field(default=float(os.getenv("RESPONSE_CACHE_LOCAL_TTL", 5)), description="Seconds a response is served from process memory before rechecking Redis")
+    RESPONSE_CACHE_INFO_TTL: int = Field(default=int(os.getenv("RESPONSE_CACHE_INFO_TTL", 60)), description="Seconds video info responses stay fresh")
+    RESPONSE_CACHE_STALE_TTL: int = Field(default=int(os.getenv("RESPONSE_CACHE_STALE_TTL", 300)), description="Seconds an expired response may still be served while it is refreshed")
+    VIDEO_JOB_TIMEOUT: int = Field(default=int(os.getenv("VIDEO_JOB_TIMEOUT", 3600)), description="Max seconds a clip job may run")
+    VIDEO_JOB_RESULT_TTL: int = Field(default=int(os.getenv("VIDEO_JOB_RESULT_TTL", 86400)), description="Seconds finished job results are kept")
+    QUEUE_SHORT_CLIP_SECONDS: float = Field(default=float(os.getenv("QUEUE_SHORT_CLIP_SECONDS", 30)), description="Clips up to this long go to the priority lane")
+    QUEUE_BULK_COST: float = Field(default=float(os.getenv("QUEUE_BULK_COST", 600)), description="Jobs at or above this estimated cost (1080p-seconds) go to the bulk lane")
+    QUEUE_STANDARD_MAX_WAIT: float = Field(default=float(os.getenv("QUEUE_STANDARD_MAX_WAIT", 300)), description="Seconds before waiting standard jobs jump ahead of the priority lane")
+    QUEUE_BULK_MAX_WAIT: float = Field(default=float(os.getenv("QUEUE_BULK_MAX_WAIT", 900)), description="Seconds before waiting bulk jobs jump ahead of higher lanes")
+    FFMPEG_THREADS_PER_JOB: int = Field(default=int(os.getenv("FFMPEG_THREADS_PER_JOB", 2)), description="Preferred ffmpeg threads per encode when planning worker slots")
+    WORKER_MAX_SLOTS: int = Field(default=int(os.getenv("WORKER_MAX_SLOTS", 0)), description="Upper bound on concurrent job slots per machine (0 = one per CPU)")
+    WORKER_ADAPT_INTERVAL: float = Field(default=float(os.getenv("WORKER_ADAPT_INTERVAL", 120)), description="Seconds between throughput measurements that adjust the slot count")
+    ENCODE_DEFAULT_PROFILE: str = Field(default=os.getenv("ENCODE_DEFAULT_PROFILE", "balanced"), description="Encoding profile for 'auto' jobs when the queue is not backed up")
+    ENCODE_FAST_BACKLOG: int = Field(default=int(os.getenv("ENCODE_FAST_BACKLOG", 20)), description="Pending jobs at which 'auto' switches to the fast profile")
+    ENCODE_FAST_WAIT: float = Field(default=float(os.getenv("ENCODE_FAST_WAIT", 300)), description="Oldest wait in seconds at which 'auto' switches to the fast profile")
+    ENCODE_TURBO_BACKLOG: int = Field(default=int(os.getenv("ENCODE_TURBO_BACKLOG", 100)), description="Pending jobs at which 'auto' switches to the turbo profile")
+    ENCODE_TURBO_WAIT: float = Field(default=float(os.getenv("ENCODE_TURBO_WAIT", 1800)), description="Oldest wait in seconds at which 'auto' switches to the turbo profile")
+    SEGMENT_MIN_DURATION: float = Field(default=float(os.getenv("SEGMENT_MIN_DURATION", 120)), description="Clips at least this long (seconds) are encoded as parallel segments")
+    SEGMENT_TARGET_SECONDS: float = Field(default=float(os.getenv("SEGMENT_TARGET_SECONDS", 30)), description="Preferred segment length; cuts happen at the next keyframe")
+    SEGMENT_EXECUTOR: str = Field(default=os.getenv("SEGMENT_EXECUTOR", "local"), description="Segment executor: 'local' process pool or 'rq' sub-jobs (needs shared storage)")
+    HLS_SEGMENT_SECONDS: float = Field(default=float(os.getenv("HLS_SEGMENT_SECONDS", 4)), description="Target HLS segment duration in seconds")
+    PREVIEWS_ENABLED: bool = Field(default=os.getenv("PREVIEWS_ENABLED", "true").lower() == "true", description="Emit poster, storyboard sprite and WebVTT index with every clip")
+    METADATA_CACHE_TTL: int = Field(default=int(os.getenv("METADATA_CACHE_TTL", 86400)), description="Seconds probed video metadata is kept in Redis")
+    METADATA_LOCAL_CACHE_SIZE: int = Field(default=int(os.getenv("METADATA_LOCAL_CACHE_SIZE", 1024)), description="Entries in the per-process metadata LRU")
+    METADATA_LOCAL_CACHE_TTL: float = Field(default=float(os.getenv("METADATA_LOCAL_CACHE_TTL", 300)), description="Seconds metadata stays in the per-process LRU")
+    CACHE_LOCAL_SIZE: int = Field(default=int(os.getenv("CACHE_LOCAL_SIZE", 1024)), description="Default entries in each service cache's per-process LRU")
+    CACHE_LOCAL_TTL: float = Field(default=float(os.getenv("CACHE_LOCAL_TTL", 30)), description="Default maximum seconds a service cache entry stays in the per-process LRU")
+    USER_CACHE_TTL: int = Field(default=int(os.getenv("USER_CACHE_TTL", 300)), description="Seconds user records are cached")
+    TRANSLATIONS_CACHE_TTL: int = Field(default=int(os.getenv("TRANSLATIONS_CACHE_TTL", 3600)), description="Seconds translation tables are cached")
+    SOURCE_URL_TEMPLATE: str = Field(default=os.getenv("SOURCE_URL_TEMPLATE", ""), description="Download URL for source videos, with a {video_id} placeholder; empty uses VIDEO_STORAGE_PATH/sources only")
+    INGEST_PARALLEL_PARTS: int = Field(default=int(os.getenv("INGEST_PARALLEL_PARTS", 8)), description="Parallel HTTP range requests per source download")
+    INGEST_TIMEOUT: float = Field(default=float(os.getenv("INGEST_TIMEOUT", 60)), description="Per-request timeout (seconds) for source downloads")
+    INGEST_CACHE_MAX_BYTES: int = Field(default=int(os.getenv("INGEST_CACHE_MAX_BYTES", 50 * 1024 ** 3)), description="Size the source cache is evicted down to (unreferenced sources, least recently used first)")
+    HIGHLIGHTS_CACHE_TTL: int = Field(default=int(os.getenv("HIGHLIGHTS_CACHE_TTL", 7 * 86400)), description="Seconds analysed highlight signals are kept per video")
+    HIGHLIGHTS_FAILURE_TTL: int = Field(default=int(os.getenv("HIGHLIGHTS_FAILURE_TTL", 600)), description="Seconds a failed highlight analysis is reported before a request may queue it again")
+    HIGHLIGHTS_ON_INGEST: bool = Field(default=os.getenv("HIGHLIGHTS_ON_INGEST", "true").lower() == "true", description="Queue highlight analysis for every source a clip job ingests")
+    CAPTION_FONT: str = Field(default=os.getenv("CAPTION_FONT", "DejaVu Sans"), description="Font family for burned-in captions")
+    CAPTION_FONTS_DIR: str = Field(default=os.getenv("CAPTION_FONTS_DIR", ""), description="Extra directory searched for caption fonts")
+    JOB_EVENTS_HEARTBEAT: float = Field(default=float(os.getenv("JOB_EVENTS_HEARTBEAT", 15)), description="Seconds between keepalives (and status re-checks) on job event streams")
+    JOB_RETRY_MAX_DELAY: float = Field(default=float(os.getenv("JOB_RETRY_MAX_DELAY", 900)), description="Upper bound in seconds for the backoff before a failed job is retried")
+    DEAD_LETTER_TTL: int = Field(default=int(os.getenv("DEAD_LETTER_TTL", 1209600)), description="Seconds a dead-lettered job is kept for inspection and replay")
+    DEAD_LETTER_MAX: int = Field(default=int(os.getenv("DEAD_LETTER_MAX", 1000)), description="Maximum number of dead-lettered jobs kept")
+    ADMIN_TOKEN: str = Field(default=os.getenv("ADMIN_TOKEN", ""), description="Token required in X-Admin-Token for admin endpoints; admin API is disabled when empty")
+    PROFILING_ENABLED: bool = Field(default=os.getenv("PROFILING_ENABLED", "false").lower() == "true", description="Install the request profiling middleware (not in the stack at all when false)")
+    PROFILING_SECRET: str = Field(default=os.getenv("PROFILING_SECRET", ""), description="Key signing X-Profile request headers; header-triggered profiling is off when empty")
+    PROFILING_SAMPLE_RATE: float = Field(default=float(os.getenv("PROFILING_SAMPLE_RATE", 0)), description="Fraction of requests profiled at random")
+    PROFILING_SLOW_MS: float = Field(default=float(os.getenv("PROFILING_SLOW_MS", 500)), description="Randomly sampled profiles are kept only for requests at least this slow")
+    PROFILING_INTERVAL_MS: float = Field(default=float(os.getenv("PROFILING_INTERVAL_MS", 5)), description="Milliseconds between stack samples of a profiled request")
+    PROFILING_DIR: str = Field(default=os.getenv("PROFILING_DIR", ""), description="Directory for profile reports; defaults to a folder in the system temp dir")
+    PROFILING_MAX_REPORTS: int = Field(default=int(os.getenv("PROFILING_MAX_REPORTS", 200)), description="Profile reports kept on disk (oldest removed first)")
+    TRACING_ENABLED: bool = Field(default=os.getenv("TRACING_ENABLED", "false").lower() == "true", description="Record OpenTelemetry spans for clip requests and jobs (needs opentelemetry-sdk)")
+    TRACING_EXPORTER: str = Field(default=os.getenv("TRACING_EXPORTER", "file"), description="Where finished spans go: file (JSON lines in TRACING_FILE) or console")
+    TRACING_FILE: str = Field(default=os.getenv("TRACING_FILE", "traces.jsonl"), description="File spans are appended to with TRACING_EXPORTER=file")
 
     @property
     def CORS_ORIGINS(self) -> List[str]:
@@ -52,9 +136,10 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-# Startup logging for diagnostics
-logging.basicConfig(level=logging.INFO)
-logging.info(f"ENV: {settings.ENV}")
-logging.info(f"PORT: {settings.PORT}")
-logging.info(f"CORS_ORIGINS: {settings.CORS_ORIGINS}")
-logging.info(f"VIDEO_STORAGE_PATH: {settings.VIDEO_STORAGE_PATH}")
+def log_settings_summary() -> None:
+    """Log key settings once at startup for diagnostics."""
+    logger = logging.getLogger("config")
+    logger.info(f"ENV: {settings.ENV}")
+    logger.info(f"PORT: {settings.PORT}")
+    logger.info(f"CORS_ORIGINS: {settings.CORS_ORIGINS}")
+    logger.info(f"VIDEO_STORAGE_PATH: {settings.VIDEO_STORAGE_PATH}")
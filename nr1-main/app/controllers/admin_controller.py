@@ -0,0 +1,51 @@
+from typing import Optional
+from fastapi import HTTPException, status
+from app.schemas import (
+    CacheStatsOut, DeadLetterList, DeadLetterOut, MongoStatsOut, ProfileList, ProfileOut, ProfileTokenOut, VideoProcessOut,
+)
+from ..services.cache_service import cache_stats
+from ..services.mongo_service import mongo_stats
+from ..services.profiling_service import ProfilingServiceError, get_profile_report, list_profiles, sign_profile_token
+from ..services.dead_letter_service import DeadLetterServiceError, list_dead_letters, replay_dead_letter
+from ..services.redis_service import RedisServiceError, get_redis_conn
+
+def _redis():
+    try:
+        return get_redis_conn()
+    except RedisServiceError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+def get_dead_letters(limit: int, error_class: Optional[str] = None) -> DeadLetterList:
+    try:
+        entries = list_dead_letters(_redis(), limit=limit, error_class=error_class)
+    except DeadLetterServiceError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    return DeadLetterList(dead_letters=[DeadLetterOut(**entry) for entry in entries])
+
+def replay_dead_letter_job(job_id: str) -> VideoProcessOut:
+    try:
+        job_id = replay_dead_letter(_redis(), job_id)
+    except DeadLetterServiceError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return VideoProcessOut(job_id=job_id, status="queued", message="Replayed from the dead-letter queue")
+
+def get_cache_stats() -> CacheStatsOut:
+    return CacheStatsOut(caches=cache_stats())
+
+def get_mongo_stats() -> MongoStatsOut:
+    return MongoStatsOut(operations=mongo_stats())
+
+def get_profiles(limit: int) -> ProfileList:
+    return ProfileList(profiles=[ProfileOut(**meta) for meta in list_profiles(limit)])
+
+def get_profile(profile_id: str) -> str:
+    try:
+        return get_profile_report(profile_id)
+    except ProfilingServiceError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+def create_profile_token(ttl: int) -> ProfileTokenOut:
+    try:
+        return ProfileTokenOut(token=sign_profile_token(ttl), expires_in=ttl)
+    except ProfilingServiceError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
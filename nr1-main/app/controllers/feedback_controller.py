@@ -12,18 +12,20 @@ Compliance Note:
 """
 
 from fastapi import HTTPException
-from typing import List
-from app.schemas import FeedbackIn, FeedbackOut
+from typing import List, Optional
+from app.schemas import FeedbackIn, FeedbackOut, FeedbackSearchOut
 from ..services.feedback_service import (
     submit_feedback_service,
     get_feedback_service,
+    search_feedback_service,
+    decode_cursor,
     FeedbackError,
 )
 import logging
 
 logger = logging.getLogger("feedback_audit")
 
-def submit_feedback(feedback: FeedbackIn) -> FeedbackOut:
+async def submit_feedback(feedback: FeedbackIn) -> FeedbackOut:
     """
     Submit user feedback. Raises HTTPException on error.
 
@@ -35,14 +37,14 @@ def submit_feedback(feedback: FeedbackIn) -> FeedbackOut:
         HTTPException: On validation or service error.
     """
     try:
-        result = submit_feedback_service(feedback)
+        result = await submit_feedback_service(feedback)
         logger.info(f"AUDIT: Feedback submitted: {result}")
         return result
     except FeedbackError as e:
         logger.error(f"AUDIT: Feedback submission error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
-def get_feedback() -> List[FeedbackOut]:
+async def get_feedback() -> List[FeedbackOut]:
     """
     Retrieve all feedback entries. Raises HTTPException on error.
 
@@ -52,13 +54,39 @@ def get_feedback() -> List[FeedbackOut]:
         HTTPException: On service error.
     """
     try:
-        result = get_feedback_service()
+        result = await get_feedback_service()
         logger.info(f"AUDIT: Feedback retrieved: count={len(result)}")
         return result
     except FeedbackError as e:
         logger.error(f"AUDIT: Feedback retrieval error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def search_feedback(q: str, limit: int, cursor: Optional[str] = None) -> FeedbackSearchOut:
+    """
+    Full-text search over feedback. Raises HTTPException on error.
+
+    Args:
+        q (str): Search terms.
+        limit (int): Hits per page.
+        cursor (str, optional): Cursor of the previous page.
+    Returns:
+        FeedbackSearchOut: Ranked hits with snippets and the next cursor.
+    Raises:
+        HTTPException: 400 on an invalid cursor, 500 on service error.
+    """
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except FeedbackError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        result = await search_feedback_service(q, limit, cursor)
+        logger.info(f"AUDIT: Feedback searched: hits={len(result.results)}")
+        return result
+    except FeedbackError as e:
+        logger.error(f"AUDIT: Feedback search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Minimal test/assertion to confirm endpoint signature compiles
 if __name__ == "__main__":
     from fastapi.testclient import TestClient
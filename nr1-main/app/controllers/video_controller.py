@@ -1,10 +1,22 @@
-from app.schemas import VideoValidateIn, VideoValidateOut, VideoProcessIn, VideoProcessOut, VideoInfoOut, VideoJobStatusOut, VideoServeOut
-from fastapi import HTTPException, status
+from app.schemas import VideoValidateIn, VideoValidateOut, VideoProcessIn, VideoProcessOut, VideoInfoOut, VideoJobStatusOut, VideoServeOut, VideoHighlightsOut
+import json
+from typing import AsyncIterator
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from ..config import settings
+from ..services.hls_service import (
+    HLSServiceError, JOB_ID_RE, FILENAME_RE, cache_control_for, content_type_for, hls_url_for, resolve_hls_file,
+)
+from ..services.job_events_service import JobEventsServiceError, job_status_stream
 from ..services.video_service import (
+    VIDEO_ID_RE,
+    VideoServiceError,
     validate_youtube_url_service,
     get_video_info_service,
     process_video_job_service,
     check_job_status_service,
+    get_highlights_service,
     serve_processed_video_service,
     serve_sample_video_service,
 )
@@ -15,16 +27,82 @@ def validate_youtube_url(data: VideoValidateIn) -> VideoValidateOut:
     return validate_youtube_url_service(data.url)
 
 def get_video_info(video_id: str) -> VideoInfoOut:
-    return get_video_info_service(video_id)
+    try:
+        return get_video_info_service(video_id)
+    except VideoServiceError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
-def process_video_job(data: VideoProcessIn) -> VideoProcessOut:
-    return process_video_job_service(data)
+def process_video_job(data: VideoProcessIn, user_key: str, plan: str = "free") -> VideoProcessOut:
+    try:
+        return process_video_job_service(data, user_key=user_key, plan=plan)
+    except VideoServiceError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
 
 def check_job_status(job_id: str) -> VideoJobStatusOut:
-    return check_job_status_service(job_id)
+    try:
+        return check_job_status_service(job_id)
+    except VideoServiceError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+async def _sse_events(job_id: str) -> AsyncIterator[bytes]:
+    retry_ms = int(settings.JOB_EVENTS_HEARTBEAT * 1000)
+    yield f"retry: {retry_ms}\n\n".encode()
+    try:
+        async for event in job_status_stream(job_id):
+            if event is None:
+                yield b": keepalive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(event)}\n\n".encode()
+    except JobEventsServiceError as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n".encode()
+
+def stream_job_events(job_id: str) -> StreamingResponse:
+    """Server-Sent Events stream of a job's status; 404 if the job does not exist."""
+    check_job_status(job_id)
+    return StreamingResponse(
+        _sse_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def stream_job_events_ws(websocket: WebSocket, job_id: str) -> None:
+    """WebSocket variant of stream_job_events: {"event": "status", "data": ...} messages."""
+    try:
+        await run_in_threadpool(check_job_status_service, job_id)
+    except VideoServiceError as e:
+        await websocket.close(code=4404, reason=str(e))
+        return
+    await websocket.accept()
+    try:
+        async for event in job_status_stream(job_id):
+            await websocket.send_json({"event": "keepalive"} if event is None else {"event": "status", "data": event})
+    except JobEventsServiceError as e:
+        await websocket.send_json({"event": "error", "data": {"detail": str(e)}})
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+def get_highlights(video_id: str, clip_seconds: float, count: int) -> VideoHighlightsOut:
+    if not VIDEO_ID_RE.match(video_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid video ID")
+    try:
+        return get_highlights_service(video_id, clip_seconds=clip_seconds, count=count)
+    except VideoServiceError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
 
 def serve_processed_video(video_id: str) -> VideoServeOut:
     return serve_processed_video_service(video_id)
 
 def serve_sample_video() -> VideoServeOut:
     return serve_sample_video_service()
+
+def serve_hls_file(job_id: str, filename: str) -> Response:
+    """Serve a playlist/segment from local storage, or redirect to S3 when it was uploaded there."""
+    try:
+        path = resolve_hls_file(job_id, filename)
+    except HLSServiceError as e:
+        if settings.AWS_S3_BUCKET and JOB_ID_RE.match(job_id) and FILENAME_RE.match(filename):
+            return RedirectResponse(hls_url_for(job_id, filename), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return FileResponse(path, media_type=content_type_for(filename),
+                        headers={"Cache-Control": cache_control_for(filename)})
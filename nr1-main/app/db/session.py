@@ -1,24 +1,47 @@
 """
 Async SQLAlchemy session and engine setup for Render.com/PostgreSQL.
+- The engine is created on first use through the resource registry, so
+  importing the app does not require DATABASE_URL to be set.
 """
 import os
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from typing import TYPE_CHECKING, AsyncIterator
 from app.config import settings
+from app.resources import registry
 
-DATABASE_URL = os.getenv("DATABASE_URL") or getattr(settings, "DATABASE_URL", None)
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL environment variable must be set for deployment.")
-
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autoflush=False,
-    autocommit=False,
-)
-
-async def get_async_session() -> AsyncSession:
-    async with AsyncSessionLocal() as session:
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+def _create_engine() -> "AsyncEngine":
+    """Build the async engine (registry factory); sqlalchemy is imported on first use."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    database_url = os.getenv("DATABASE_URL") or settings.DATABASE_URL
+    if not database_url:
+        raise RuntimeError("DATABASE_URL environment variable must be set for deployment.")
+    return create_async_engine(database_url, echo=False, future=True)
+
+registry.register("db_engine", _create_engine, closer=lambda engine: engine.dispose(), eager=bool(settings.DATABASE_URL))
+
+def _create_sessionmaker():
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    return sessionmaker(
+        bind=get_engine(),
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+        autocommit=False,
+    )
+
+registry.register("db_sessionmaker", _create_sessionmaker)
+
+def get_engine() -> "AsyncEngine":
+    """Return the shared async engine, creating it on first use."""
+    return registry.get("db_engine")
+
+def get_sessionmaker():
+    """Return the shared session factory, creating it on first use."""
+    return registry.get("db_sessionmaker")
+
+async def get_async_session() -> AsyncIterator["AsyncSession"]:
+    async with get_sessionmaker()() as session:
         yield session
@@ -8,8 +8,14 @@ import colorlog
 import os
 from .config import settings
 
+_configured = False
+
 def setup_logging() -> None:
-    """Configure logging for the application (console and file if set)."""
+    """Configure logging for the application (console and file if set). Safe to call more than once."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
     log_level = logging.INFO if settings.ENV == "production" else logging.DEBUG
     log_format = "%(log_color)s[%(asctime)s] [%(levelname)s] %(message)s"
     colorlog.basicConfig(
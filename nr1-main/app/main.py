@@ -1,25 +1,114 @@
 """
 Main FastAPI application entrypoint for Viral Clip Generator.
-- Configures CORS, static files, logging, and error handling.
+- Configures CORS, compression, rate limiting, idempotency keys, static files, logging, and error handling.
 - Mounts all API routers and health endpoints.
+- Creates and closes shared clients through the lifespan-managed resource registry.
 """
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-from .config import settings
+from .config import settings, log_settings_summary
 from .logging_config import setup_logging
 from .utils.health import health_check, dependencies_check
+from .utils.static_files import PrecompressedStaticFiles, precompressed_file_response
+from .middleware.compression import CompressionMiddleware
+from .middleware.drain import DrainMiddleware
+from .middleware.idempotency import IdempotencyMiddleware
+from .middleware.profiling import ProfilingMiddleware
+from .middleware.rate_limit import RateLimitMiddleware, RateLimitRule
+from .middleware.response_cache import CacheRule, ResponseCacheMiddleware
+from .services.analytics_service import analytics_buffer
+from .services.feedback_service import ensure_search_schema
+from .services.profiling_service import profile_store, sampler
+from .services.mongo_service import ensure_indexes
+from .services.redis_service import get_async_redis_conn
+from .resources import registry
+from .utils.drain import drain_state
+from .utils.tracing import setup_tracing
 
-# Load environment variables from .env if present
-load_dotenv()
-
-# Setup logging based on environment
+# Setup logging based on environment (.env is loaded by app.config)
 setup_logging()
+setup_tracing("nr1-api")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create eager resources in parallel on startup; drain, flush and close all clients on shutdown."""
+    log_settings_summary()
+    await registry.startup()
+    if settings.MONGODB_URI:
+        await ensure_indexes()
+        analytics_buffer.start()
+    if settings.DATABASE_URL:
+        await ensure_search_schema()
+    yield
+    await drain_state.drain(settings.SHUTDOWN_DRAIN_TIMEOUT)
+    await registry.shutdown()
 
-app = FastAPI(title="Viral Clip Generator", version="1.0.0")
+app = FastAPI(title="Viral Clip Generator", version="1.0.0", lifespan=lifespan)
+
+# Sample stacks of signed (X-Profile) or randomly picked requests. Added first so
+# it is the innermost middleware: reports show route code, not limiter or cache work.
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        sampler=sampler,
+        store=profile_store,
+        secret=settings.PROFILING_SECRET,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        slow_ms=settings.PROFILING_SLOW_MS,
+    )
+
+# Admission control for the costliest routes (ffmpeg jobs, bcrypt). Added before
+# CORS so that CORS wraps it and 429 responses stay readable by the browser.
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        rules=[
+            RateLimitRule("process", "POST", "/api/v1/videos/process",
+                          settings.RATE_LIMIT_PROCESS_CAPACITY, settings.RATE_LIMIT_PROCESS_PER_MINUTE),
+            RateLimitRule("login", "POST", "/api/v1/auth/login",
+                          settings.RATE_LIMIT_AUTH_CAPACITY, settings.RATE_LIMIT_AUTH_PER_MINUTE),
+            RateLimitRule("signup", "POST", "/api/v1/auth/signup",
+                          settings.RATE_LIMIT_AUTH_CAPACITY, settings.RATE_LIMIT_AUTH_PER_MINUTE),
+        ],
+        redis_getter=get_async_redis_conn if settings.REDIS_URL else None,
+        lease_fraction=settings.RATE_LIMIT_LEASE_FRACTION,
+    )
+
+# Replay stored responses for retried POSTs carrying an Idempotency-Key. Outside
+# the rate limiter (a replay costs no work) and inside CORS.
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(
+        IdempotencyMiddleware,
+        routes=[
+            ("POST", "/api/v1/videos/process"),
+            ("POST", "/api/v1/feedback/"),
+            ("POST", "/api/v1/analytics/"),
+        ],
+        redis_getter=get_async_redis_conn if settings.REDIS_URL else None,
+        ttl=settings.IDEMPOTENCY_TTL,
+        lock_ttl=settings.IDEMPOTENCY_LOCK_TTL,
+    )
+
+# Cache hot read endpoints (local LRU in front of Redis, coalesced misses,
+# stale-while-revalidate). Inside compression so bodies are stored uncompressed.
+if settings.RESPONSE_CACHE_ENABLED:
+    app.add_middleware(
+        ResponseCacheMiddleware,
+        rules=[
+            CacheRule("video_info", "/api/v1/videos/info/{video_id}",
+                      settings.RESPONSE_CACHE_INFO_TTL, settings.RESPONSE_CACHE_STALE_TTL),
+            CacheRule("sample", "/api/v1/videos/sample", 3600, 86400),
+            CacheRule("translations", "/api/v1/i18n/translations", 300, settings.RESPONSE_CACHE_STALE_TTL,
+                      vary_headers=("accept-language",), invalidate_on=(("POST", "/api/v1/i18n/set-language"),)),
+            CacheRule("user", "/api/v1/user/{user_id}", 30, 60),
+        ],
+        redis_getter=get_async_redis_conn if settings.REDIS_URL else None,
+        local_size=settings.RESPONSE_CACHE_LOCAL_SIZE,
+        local_ttl=settings.RESPONSE_CACHE_LOCAL_TTL,
+    )
 
 # Configure CORS for frontend/backend integration
 app.add_middleware(
@@ -28,17 +117,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After", "Idempotent-Replayed", "X-Cache", "Age", "X-Profile-Id"],
+)
+
+# Compress dynamic responses (brotli/gzip); precompressed static assets pass through
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
 )
 
-# Serve static files (frontend)
+# Refuse new jobs while draining for shutdown; count in-flight requests
+app.add_middleware(
+    DrainMiddleware,
+    state=drain_state,
+    guarded_routes=[("POST", "/api/v1/videos/process")],
+)
+
+# Serve static files (frontend), preferring build-time .br/.gz siblings
 STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "public")
-app.mount("/public", StaticFiles(directory=STATIC_DIR), name="public")
+app.mount(
+    "/public",
+    PrecompressedStaticFiles(
+        directory=STATIC_DIR,
+        immutable_max_age=settings.STATIC_IMMUTABLE_MAX_AGE,
+        default_max_age=settings.STATIC_DEFAULT_MAX_AGE,
+    ),
+    name="public",
+)
 
 # Health check endpoints
 @app.get("/health", tags=["Health"])
 def health():
-    """Basic health check endpoint."""
-    return health_check()
+    """Basic health check endpoint. Reports 503 while draining so traffic moves away."""
+    result = health_check()
+    if drain_state.draining:
+        result["status"] = "draining"
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=result)
+    return result
 
 @app.get("/health/dependencies", tags=["Health"])
 def health_dependencies():
@@ -56,15 +173,17 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 # Root route serves frontend index.html
 @app.get("/", include_in_schema=False)
-def root():
-    index_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "public", "index.html")
-    return FileResponse(index_path)
+def root(request: Request):
+    index_path = os.path.join(STATIC_DIR, "index.html")
+    # index.html references hashed assets, so it must always be revalidated
+    return precompressed_file_response(index_path, request.headers, "no-cache")
 
 # Import and mount all API routers
-from .routes import video, analytics, feedback, i18n, auth, user
+from .routes import video, analytics, feedback, i18n, auth, user, admin
 app.include_router(video.router)
 app.include_router(analytics.router)
 app.include_router(feedback.router)
 app.include_router(i18n.router)
 app.include_router(auth.router)
 app.include_router(user.router)
+app.include_router(admin.router)
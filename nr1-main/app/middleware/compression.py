@@ -0,0 +1,193 @@
+"""
+Response compression middleware for Viral Clip Generator.
+
+- Negotiates brotli or gzip from the Accept-Encoding header (brotli preferred).
+- Compresses dynamic responses above a configurable size threshold.
+- Leaves responses that already carry a Content-Encoding untouched, so
+  precompressed static assets are never compressed twice.
+- Skips media types that do not benefit from compression (video, images)
+  and streaming event responses that must be flushed unbuffered.
+"""
+
+import zlib
+from typing import List, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional, gzip still works
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/manifest+json",
+    "application/vnd.apple.mpegurl",
+    "image/svg+xml",
+)
+UNCOMPRESSIBLE_TYPES = ("text/event-stream",)
+
+def is_compressible_content_type(content_type: Optional[str]) -> bool:
+    """Return True if a response with this Content-Type is worth compressing."""
+    if not content_type:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in UNCOMPRESSIBLE_TYPES:
+        return False
+    if media_type.endswith("+json") or media_type.endswith("+xml"):
+        return True
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+def parse_accept_encoding(value: str) -> List[Tuple[str, float]]:
+    """Parse an Accept-Encoding header into (coding, q) pairs."""
+    codings: List[Tuple[str, float]] = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        coding, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings.append((coding.strip().lower(), q))
+    return codings
+
+def negotiate_encoding(accept_encoding: str, available: Tuple[str, ...] = ("br", "gzip")) -> Optional[str]:
+    """
+    Pick the best content coding the client accepts.
+
+    Args:
+        accept_encoding (str): Raw Accept-Encoding header value.
+        available (tuple[str, ...]): Codings the server can produce, in preference order.
+
+    Returns:
+        Optional[str]: "br", "gzip" or None if no acceptable coding is available.
+    """
+    accepted = dict(parse_accept_encoding(accept_encoding or ""))
+    wildcard = accepted.get("*", 0.0)
+    for coding in available:
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+class _Compressor:
+    """Incremental compressor producing a single gzip or brotli stream."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes a gzip header and trailer around the deflate stream
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data)
+        return self._gz.compress(data)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gz.flush()
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses responses with brotli or gzip.
+
+    Responses smaller than ``minimum_size`` (when the full body is known up front),
+    non-compressible media types, partial content and responses that already declare
+    a Content-Encoding are passed through unchanged.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+class _CompressionResponder:
+    """Per-request send wrapper that decides whether and how to compress."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self._start: Optional[Message] = None
+        self._compressor: Optional[_Compressor] = None
+        self._passthrough = False
+
+    def _should_compress(self, headers: Headers, status: int) -> bool:
+        if status in (204, 206, 304) or status < 200:
+            return False
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
+        return is_compressible_content_type(headers.get("content-type"))
+
+    def _encoded_start(self) -> Message:
+        headers = MutableHeaders(raw=list(self._start["headers"]))
+        headers["Content-Encoding"] = self.encoding
+        vary = headers.get("vary")
+        if not vary:
+            headers["Vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower():
+            headers["Vary"] = f"{vary}, Accept-Encoding"
+        if "content-length" in headers:
+            del headers["content-length"]
+        return {**self._start, "headers": headers.raw}
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self._start = message
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._compressor is None:
+            headers = Headers(raw=self._start["headers"])
+            if not self._should_compress(headers, self._start["status"]) or (
+                not more_body and len(body) < self.middleware.minimum_size
+            ):
+                self._passthrough = True
+                await self._send(self._start)
+                await self._send(message)
+                return
+            self._compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            start = self._encoded_start()
+            if not more_body:
+                payload = self._compressor.compress(body) + self._compressor.finish()
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Length"] = str(len(payload))
+                await self._send({**start, "headers": headers.raw})
+                await self._send({"type": "http.response.body", "body": payload})
+                return
+            await self._send(start)
+
+        chunk = self._compressor.compress(body)
+        if not more_body:
+            chunk += self._compressor.finish()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,52 @@
+"""
+Drain middleware for graceful shutdown.
+
+- Counts in-flight HTTP requests for app/utils/drain.DrainState.
+- While draining, rejects requests that would start new work (job submission)
+  with 503 + Retry-After so clients retry against a fresh instance; reads and
+  requests already in progress are still served.
+"""
+
+import json
+from typing import Iterable, Tuple
+from starlette.types import ASGIApp, Receive, Scope, Send
+from ..utils.drain import DrainState
+
+class DrainMiddleware:
+    """Track in-flight requests and refuse new jobs while draining."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        state: DrainState,
+        guarded_routes: Iterable[Tuple[str, str]] = (),
+        retry_after: int = 5,
+    ) -> None:
+        self.app = app
+        self.state = state
+        self.guarded_routes = {(method.upper(), path.rstrip("/")) for method, path in guarded_routes}
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.state.draining and (scope["method"], scope["path"].rstrip("/")) in self.guarded_routes:
+            body = json.dumps({"success": False, "error": "Server is shutting down, please retry.", "path": scope["path"]}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.retry_after).encode()),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        self.state.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.state.request_finished()
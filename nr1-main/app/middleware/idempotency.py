@@ -0,0 +1,228 @@
+"""
+Idempotency-Key support for POST endpoints that create work or rows.
+
+- A client sends ``Idempotency-Key: <unique value>`` and may safely retry the
+  same request: the first response (status, headers and body) is stored in
+  Redis for IDEMPOTENCY_TTL and replayed for every retry, marked with
+  ``Idempotent-Replayed: true``, so a flaky network never queues a second job.
+- The key is claimed with SET NX before the request runs. A retry that arrives
+  while the first request is still in flight gets 409 + Retry-After instead of
+  running it again; the claim expires after IDEMPOTENCY_LOCK_TTL in case the
+  process dies mid-request.
+- Keys are scoped per identity (JWT user or client IP) and route, and bound to
+  a fingerprint of the request body: reusing a key for a different body is
+  rejected with 422.
+- Only final answers are stored: 2xx and deterministic 4xx (e.g. 400, 404,
+  422). Server errors (5xx), exceptions and "try again later" answers (408,
+  409, 425, 429) are not: the claim is released so the client's retry runs
+  again. This middleware sits outside the rate limiter, so a stored 429 would
+  otherwise lock a correctly retrying client out for IDEMPOTENCY_TTL.
+- Without Redis (local dev, tests, or a Redis outage) an in-process store gives
+  the same guarantees per process.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..utils.request_identity import get_request_identity
+
+logger = logging.getLogger("idempotency")
+
+MAX_KEY_LENGTH = 255
+MAX_STORED_BODY = 1024 * 1024
+# Per-request or per-client headers that must not be replayed from another response
+UNSTORED_HEADERS = {
+    "content-length", "date", "server", "set-cookie",
+    "ratelimit-limit", "ratelimit-remaining", "ratelimit-reset", "retry-after",
+}
+# 4xx answers that say "not now" rather than "never": the retry must run again
+RETRYABLE_STATUSES = {408, 409, 425, 429}
+
+def is_storable(status: int) -> bool:
+    """Whether a response with ``status`` is final and may be replayed for retries."""
+    return 200 <= status < 300 or (400 <= status < 500 and status not in RETRYABLE_STATUSES)
+
+class LocalIdempotencyStore:
+    """In-process store with the same semantics as the Redis one (bounded, LRU)."""
+
+    def __init__(self, max_keys: int = 10000) -> None:
+        self.max_keys = max_keys
+        self._records: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def claim(self, key: str, record: Dict[str, Any], ttl: float) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        existing = self._records.get(key)
+        if existing and existing[0] > now:
+            self._records.move_to_end(key)
+            return existing[1]
+        self._records[key] = (now + ttl, record)
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_keys:
+            self._records.popitem(last=False)
+        return None
+
+    def save(self, key: str, record: Dict[str, Any], ttl: float) -> None:
+        self._records[key] = (time.monotonic() + ttl, record)
+
+    def release(self, key: str) -> None:
+        self._records.pop(key, None)
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware storing and replaying responses by Idempotency-Key.
+
+    Args:
+        app (ASGIApp): Wrapped application.
+        routes (Iterable[tuple[str, str]]): (method, path) pairs honouring the header; others pass through.
+        redis_getter (Callable[[], Any], optional): Returns an asyncio Redis client; None = local only.
+        ttl (float): Seconds a stored response is replayed for.
+        lock_ttl (float): Seconds an in-flight claim blocks duplicates.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        routes: Iterable[Tuple[str, str]],
+        redis_getter: Optional[Callable[[], Any]] = None,
+        ttl: float = 86400,
+        lock_ttl: float = 60,
+    ) -> None:
+        self.app = app
+        self.routes = {(method.upper(), path.rstrip("/")) for method, path in routes}
+        self.redis_getter = redis_getter
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self._local = LocalIdempotencyStore()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope["method"], scope["path"].rstrip("/")) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = Headers(scope=scope).get("idempotency-key")
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._respond(send, 400, {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters."})
+            return
+
+        body, receive = await self._buffer_body(receive)
+        digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        key = f"idem:{get_request_identity(scope)}:{scope['method']}:{scope['path'].rstrip('/')}:{digest}"
+        fingerprint = hashlib.sha256(body).hexdigest()
+        existing = await self._claim(key, {"state": "pending", "fingerprint": fingerprint})
+        if existing is not None:
+            await self._answer_duplicate(send, existing, fingerprint)
+            return
+
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except Exception:
+            await self._release(key)
+            raise
+        response_body = b"".join(chunks)
+        if not start or not is_storable(start["status"]) or len(response_body) > MAX_STORED_BODY:
+            await self._release(key)
+            return
+        headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in start.get("headers", [])
+                   if name.decode("latin-1").lower() not in UNSTORED_HEADERS]
+        await self._save(key, {
+            "state": "done",
+            "fingerprint": fingerprint,
+            "status": start["status"],
+            "headers": headers,
+            "body": base64.b64encode(response_body).decode(),
+        })
+
+    async def _buffer_body(self, receive: Receive) -> Tuple[bytes, Receive]:
+        """Read the whole request body (to fingerprint it) and return a receive that replays it."""
+        parts: List[bytes] = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            parts.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(parts)
+        replayed = False
+
+        async def replay() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return body, replay
+
+    async def _claim(self, key: str, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Claim the key; returns None if claimed, else the stored record of the earlier request."""
+        if self.redis_getter is not None:
+            try:
+                conn = self.redis_getter()
+                value = json.dumps(record)
+                # Two rounds: the earlier request may release its claim between our SET and GET
+                for _ in range(2):
+                    if await conn.set(key, value, nx=True, px=int(self.lock_ttl * 1000)):
+                        return None
+                    existing = await conn.get(key)
+                    if existing is not None:
+                        return json.loads(existing)
+                return None
+            except Exception as e:
+                logger.warning(f"Idempotency store falling back to local memory: {e}")
+        return self._local.claim(key, record, self.lock_ttl)
+
+    async def _save(self, key: str, record: Dict[str, Any]) -> None:
+        if self.redis_getter is not None:
+            try:
+                await self.redis_getter().set(key, json.dumps(record), ex=int(self.ttl))
+                return
+            except Exception as e:
+                logger.warning(f"Could not store idempotent response in Redis: {e}")
+        self._local.save(key, record, self.ttl)
+
+    async def _release(self, key: str) -> None:
+        if self.redis_getter is not None:
+            try:
+                await self.redis_getter().delete(key)
+            except Exception as e:
+                logger.warning(f"Could not release idempotency key: {e}")
+        self._local.release(key)
+
+    async def _answer_duplicate(self, send: Send, record: Dict[str, Any], fingerprint: str) -> None:
+        if record.get("fingerprint") != fingerprint:
+            await self._respond(send, 422, {"detail": "Idempotency-Key was already used with a different request."})
+        elif record.get("state") != "done":
+            await self._respond(send, 409, {"detail": "A request with this Idempotency-Key is still in progress."},
+                                [(b"retry-after", b"1")])
+        else:
+            body = base64.b64decode(record["body"])
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]]
+            headers += [(b"content-length", str(len(body)).encode()), (b"idempotent-replayed", b"true")]
+            await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+    async def _respond(self, send: Send, status: int, content: Dict[str, Any],
+                       extra_headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+        body = json.dumps(content).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers + (extra_headers or [])})
+        await send({"type": "http.response.body", "body": body})
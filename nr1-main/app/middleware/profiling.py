@@ -0,0 +1,82 @@
+"""
+Request profiling middleware.
+
+- Only installed when PROFILING_ENABLED is set; otherwise it is not in the stack at all.
+- Profiles a request when it carries a valid signed X-Profile header (see
+  profiling_service.sign_profile_token) or is picked at PROFILING_SAMPLE_RATE.
+- Signed requests get an X-Profile-Id response header naming their report;
+  randomly sampled ones are kept only if slower than PROFILING_SLOW_MS.
+- Reports are written off the event loop after the response has been sent.
+"""
+
+import asyncio
+import logging
+import random
+from typing import Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..services.profiling_service import ProfileStore, RequestProfile, Sampler, verify_profile_token
+
+logger = logging.getLogger("profiling")
+
+class ProfilingMiddleware:
+    """Sample the stacks of signed or randomly selected requests into folded-stack reports."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sampler: Sampler,
+        store: ProfileStore,
+        secret: str = "",
+        sample_rate: float = 0.0,
+        slow_ms: float = 0.0,
+        header: str = "x-profile",
+    ) -> None:
+        self.app = app
+        self.sampler = sampler
+        self.store = store
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.header = header.lower().encode()
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        if self.secret:
+            for name, value in scope["headers"]:
+                if name == self.header:
+                    if verify_profile_token(value.decode("latin-1"), self.secret):
+                        return "signed"
+                    logger.warning(f"Rejected profiling token for {scope['method']} {scope['path']}")
+                    break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        task = asyncio.current_task() if trigger else None
+        if task is None:
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile(task, self._profiled.__code__, trigger, scope["method"], scope["path"])
+        await self._profiled(profile, scope, receive, send)
+        if trigger == "signed" or profile.duration_ms >= self.slow_ms:
+            try:
+                await asyncio.to_thread(self.store.save, profile)
+                logger.info(f"Profiled {profile.method} {profile.path} ({trigger}): {profile.id}, "
+                            f"{profile.duration_ms:.1f} ms, {sum(profile.samples.values())} samples")
+            except OSError as e:
+                logger.error(f"Could not store profile {profile.id}: {e}")
+
+    async def _profiled(self, profile: RequestProfile, scope: Scope, receive: Receive, send: Send) -> None:
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if profile.trigger == "signed":
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        self.sampler.start(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.sampler.stop(profile)
@@ -0,0 +1,274 @@
+"""
+Distributed token-bucket rate limiting for expensive endpoints.
+
+- One token bucket per (rule, identity); identity is the JWT user or client IP.
+- Buckets live in Redis and are updated by a single atomic Lua script, so all
+  API instances share the same limits. Redis server time is used for refills.
+- Local pre-filter: when a bucket is far below its limit, Redis grants a small
+  lease of tokens that this process spends without further Redis hops; clients
+  that were just rejected are also refused locally until their retry time.
+- Without Redis (local dev, tests, or a Redis outage) an in-process bucket
+  enforces the same limits per process. After a Redis error the middleware
+  stays on local buckets for a backoff (1s doubling up to 30s) instead of
+  retrying, and logging, on every request of the outage.
+- Responses carry RateLimit-Limit / RateLimit-Remaining / RateLimit-Reset and
+  rejections return 429 with Retry-After.
+"""
+
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..utils.request_identity import get_request_identity
+
+logger = logging.getLogger("rate_limit")
+
+TOKEN_BUCKET_LUA = """
+local key = KEYS[1]
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+  tokens = capacity
+  ts = now
+end
+tokens = math.min(capacity, tokens + (math.max(0, now - ts) / 1000) * rate)
+local granted = 0
+local retry_after = 0
+if tokens >= 1 then
+  if requested > 1 and tokens - requested >= capacity / 2 then
+    granted = requested
+  else
+    granted = 1
+  end
+  tokens = tokens - granted
+else
+  retry_after = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+return {granted, tostring(tokens), retry_after, math.ceil((capacity - tokens) / rate * 1000)}
+"""
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """Token-bucket limit for one route: ``capacity`` burst, refilled at ``per_minute``."""
+    name: str
+    method: str
+    path: str
+    capacity: int
+    per_minute: float
+
+    @property
+    def rate(self) -> float:
+        """Refill rate in tokens per second."""
+        return self.per_minute / 60.0
+
+@dataclass
+class BucketResult:
+    """Outcome of taking tokens from a bucket."""
+    granted: int
+    remaining: float
+    retry_after_ms: int
+    reset_ms: int
+
+class LocalTokenBucket:
+    """In-process token bucket with the same semantics as the Lua script."""
+
+    def __init__(self, capacity: int, rate: float) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.ts = time.monotonic()
+
+    def take(self, requested: int = 1) -> BucketResult:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+        if self.tokens < 1:
+            retry_after = math.ceil((1 - self.tokens) / self.rate * 1000)
+            return BucketResult(0, self.tokens, retry_after, self._reset_ms())
+        granted = requested if requested > 1 and self.tokens - requested >= self.capacity / 2 else 1
+        self.tokens -= granted
+        return BucketResult(granted, self.tokens, 0, self._reset_ms())
+
+    def is_full(self, now: float) -> bool:
+        """True once refilled to capacity, i.e. indistinguishable from a new bucket."""
+        return self.tokens + (now - self.ts) * self.rate >= self.capacity
+
+    def _reset_ms(self) -> int:
+        return math.ceil((self.capacity - self.tokens) / self.rate * 1000)
+
+class _Lease:
+    """Tokens granted by Redis that this process may spend locally until expiry."""
+
+    __slots__ = ("tokens", "expires_at", "remaining", "reset_ms")
+
+    def __init__(self, tokens: int, expires_at: float, remaining: float, reset_ms: int) -> None:
+        self.tokens = tokens
+        self.expires_at = expires_at
+        self.remaining = remaining
+        self.reset_ms = reset_ms
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing token-bucket limits on selected routes.
+
+    Args:
+        app (ASGIApp): Wrapped application.
+        rules (Iterable[RateLimitRule]): Limited routes; other routes pass through.
+        redis_getter (Callable[[], Any], optional): Returns an asyncio Redis client; None = local only.
+        lease_fraction (float): Fraction of capacity Redis may lease to a process at once.
+        lease_ttl (float): Seconds a lease stays valid before unused tokens are dropped.
+        max_local_keys (int): Bound on locally tracked buckets/leases per process.
+        redis_backoff (float): Seconds Redis is skipped after the first error; doubles per failed probe.
+        redis_backoff_max (float): Upper bound of that backoff.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rules: Iterable[RateLimitRule],
+        redis_getter: Optional[Callable[[], Any]] = None,
+        lease_fraction: float = 0.1,
+        lease_ttl: float = 1.0,
+        max_local_keys: int = 10000,
+        redis_backoff: float = 1.0,
+        redis_backoff_max: float = 30.0,
+    ) -> None:
+        self.app = app
+        self.rules: Dict[Tuple[str, str], RateLimitRule] = {
+            (rule.method.upper(), rule.path.rstrip("/")): rule for rule in rules
+        }
+        self.redis_getter = redis_getter
+        self.lease_fraction = lease_fraction
+        self.lease_ttl = lease_ttl
+        self.max_local_keys = max_local_keys
+        self._script = None
+        self._leases: Dict[str, _Lease] = {}
+        self._blocked: Dict[str, Tuple[float, int]] = {}
+        self._local: "OrderedDict[str, LocalTokenBucket]" = OrderedDict()
+        self.redis_backoff = redis_backoff
+        self.redis_backoff_max = redis_backoff_max
+        self._redis_failures = 0
+        self._redis_retry_at = 0.0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self.rules.get((scope["method"], scope["path"].rstrip("/")))
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+        key = f"ratelimit:{rule.name}:{get_request_identity(scope)}"
+        result = await self._take(key, rule)
+        headers = self._headers(rule, result)
+        if not result.granted:
+            await self._reject(send, headers, result)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(raw=list(message["headers"]))
+                for name, value in headers:
+                    response_headers[name] = value
+                message = {**message, "headers": response_headers.raw}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    async def _take(self, key: str, rule: RateLimitRule) -> BucketResult:
+        now = time.monotonic()
+        blocked = self._blocked.get(key)
+        if blocked and blocked[0] > now:
+            if key in self._local:
+                self._local.move_to_end(key)
+            return BucketResult(0, 0.0, math.ceil((blocked[0] - now) * 1000), blocked[1])
+        lease = self._leases.get(key)
+        if lease and lease.tokens > 0 and lease.expires_at > now:
+            lease.tokens -= 1
+            lease.remaining = max(lease.remaining - 1, 0.0)
+            return BucketResult(1, lease.remaining, 0, lease.reset_ms)
+
+        result = await self._take_remote(key, rule)
+        if result is None:
+            result = self._take_local(key, rule)
+        self._prune(now)
+        if result.granted > 1:
+            self._leases[key] = _Lease(result.granted - 1, now + self.lease_ttl, result.remaining, result.reset_ms)
+        elif not result.granted:
+            self._blocked[key] = (now + result.retry_after_ms / 1000, result.reset_ms)
+        return result
+
+    async def _take_remote(self, key: str, rule: RateLimitRule) -> Optional[BucketResult]:
+        if self.redis_getter is None or time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            if self._script is None:
+                self._script = self.redis_getter().register_script(TOKEN_BUCKET_LUA)
+            lease_size = max(1, int(rule.capacity * self.lease_fraction))
+            granted, remaining, retry_after, reset_ms = await self._script(
+                keys=[key], args=[rule.capacity, rule.rate, lease_size]
+            )
+        except Exception as e:
+            # Circuit open: skip Redis until the backoff elapses, then let one request probe it
+            backoff = min(self.redis_backoff * 2 ** self._redis_failures, self.redis_backoff_max)
+            self._redis_failures += 1
+            self._redis_retry_at = time.monotonic() + backoff
+            if self._redis_failures == 1:
+                logger.warning(f"Rate limiter falling back to local buckets for {backoff:.0f}s: {e}")
+            else:
+                logger.debug(f"Rate limiter Redis probe failed, next in {backoff:.0f}s: {e}")
+            return None
+        if self._redis_failures:
+            logger.info(f"Rate limiter back on Redis after {self._redis_failures} failed attempts")
+            self._redis_failures = 0
+        return BucketResult(int(granted), float(remaining), int(retry_after), int(reset_ms))
+
+    def _take_local(self, key: str, rule: RateLimitRule) -> BucketResult:
+        bucket = self._local.get(key)
+        if bucket is None:
+            bucket = self._local[key] = LocalTokenBucket(rule.capacity, rule.rate)
+        else:
+            self._local.move_to_end(key)
+        return bucket.take(1)
+
+    def _prune(self, now: float) -> None:
+        """Keep local state bounded: expired leases/blocks and refilled buckets go first, then the LRU buckets."""
+        if len(self._leases) + len(self._blocked) + len(self._local) < self.max_local_keys:
+            return
+        self._leases = {k: v for k, v in self._leases.items() if v.expires_at > now and v.tokens > 0}
+        self._blocked = {k: v for k, v in self._blocked.items() if v[0] > now}
+        if len(self._local) >= self.max_local_keys // 2:
+            for key in [k for k, bucket in self._local.items() if bucket.is_full(now)]:
+                del self._local[key]
+            while len(self._local) >= self.max_local_keys // 2:
+                self._local.popitem(last=False)
+
+    def _headers(self, rule: RateLimitRule, result: BucketResult) -> List[Tuple[str, str]]:
+        headers = [
+            ("RateLimit-Limit", str(rule.capacity)),
+            ("RateLimit-Remaining", str(max(int(result.remaining), 0))),
+            ("RateLimit-Reset", str(math.ceil(result.reset_ms / 1000))),
+        ]
+        if not result.granted:
+            headers.append(("Retry-After", str(max(math.ceil(result.retry_after_ms / 1000), 1))))
+        return headers
+
+    async def _reject(self, send: Send, headers: List[Tuple[str, str]], result: BucketResult) -> None:
+        body = json.dumps({"detail": "Too many requests, please retry later."}).encode()
+        raw = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        raw += [(name.lower().encode(), value.encode()) for name, value in headers]
+        await send({"type": "http.response.start", "status": 429, "headers": raw})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,342 @@
+"""
+HTTP response cache for hot read endpoints.
+
+- Per-route rules (CacheRule): TTL, stale-while-revalidate window, request
+  headers the response varies by, and whether it varies by caller (JWT user
+  or client IP). Only 200 responses to GET are stored, never ones setting
+  cookies or marked no-store/private.
+- Two tiers: a small in-process LRU (entries kept for at most ``local_ttl``)
+  in front of Redis, so the hottest keys on a viral spike never leave the
+  process and the rest are shared by every API instance.
+- Coalescing: concurrent misses for one key in a process share a single
+  computation, and across processes a short Redis lock lets one instance
+  compute while the others wait for its result.
+- Stale-while-revalidate: within ``stale_ttl`` after expiry the stale response
+  is served at once and one background request refreshes it.
+- Invalidation: a successful request to one of a rule's ``invalidate_on``
+  routes bumps the rule's generation (in Redis, shared by all instances);
+  entries from older generations are ignored. Other instances' local copies
+  may lag by at most ``local_ttl``. Code outside the request path (e.g. a
+  worker that changed a video) drops one path's entry with invalidate_path().
+- Responses carry ``X-Cache: HIT|STALE|MISS`` and ``Age``; counters are
+  reported by cache_service.cache_stats() as ``http:<rule name>``.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..services.cache_service import LocalTTLCache, stats_for
+from ..utils.request_identity import get_request_identity
+
+logger = logging.getLogger("response_cache")
+
+KEY_PREFIX = "respcache"
+MAX_CACHED_BODY = 1024 * 1024
+LOCK_TTL = 5.0
+# Per-request headers that must not be served from another request's response
+UNCACHED_HEADERS = {"content-length", "date", "server", "ratelimit-limit", "ratelimit-remaining", "ratelimit-reset"}
+
+def _path_regex(path: str) -> "re.Pattern[str]":
+    """Compile "/api/v1/videos/info/{video_id}" into a regex matching one path segment per parameter."""
+    parts = re.split(r"(\{[^/}]+\})", path.rstrip("/"))
+    return re.compile("^" + "".join("[^/]+" if p.startswith("{") else re.escape(p) for p in parts) + "/?$")
+
+@dataclass(frozen=True)
+class CacheRule:
+    """Caching policy for one GET route (path parameters written as ``{name}``)."""
+    name: str
+    path: str
+    ttl: float
+    stale_ttl: float = 0.0
+    vary_headers: Tuple[str, ...] = ()
+    vary_user: bool = False
+    invalidate_on: Tuple[Tuple[str, str], ...] = ()
+
+@dataclass
+class CachedResponse:
+    """A stored response with its freshness window (wall-clock times, shared across processes)."""
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    created: float
+    fresh_until: float
+    stale_until: float
+    generation: int = 0
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "status": self.status, "headers": self.headers, "body": base64.b64encode(self.body).decode(),
+            "created": self.created, "fresh_until": self.fresh_until, "stale_until": self.stale_until,
+            "generation": self.generation,
+        })
+
+    @classmethod
+    def from_json(cls, raw: bytes) -> "CachedResponse":
+        data = json.loads(raw)
+        data["body"] = base64.b64decode(data["body"])
+        data["headers"] = [tuple(h) for h in data["headers"]]
+        return cls(**data)
+
+def response_key(rule_name: str, path: str, query_string: str = "", vary_values: Iterable[str] = ()) -> str:
+    """Redis key of the cached response for a path, its query string and its varying header/user values."""
+    parts = [path.rstrip("/"), query_string, *vary_values]
+    digest = hashlib.sha256("\n".join(parts).encode()).hexdigest()
+    return f"{KEY_PREFIX}:{rule_name}:{digest}"
+
+def invalidate_path(connection: Any, rule_name: str, path: str) -> None:
+    """
+    Drop the shared cached response of one path (sync, for workers and scripts).
+
+    Only the entry without query string is dropped, so use it for rules that vary
+    by neither headers nor caller. API instances may serve their local copy for
+    up to ``local_ttl`` longer.
+
+    Args:
+        connection (redis.Redis): Sync Redis client.
+        rule_name (str): CacheRule name, e.g. "video_info".
+        path (str): Request path, e.g. "/api/v1/videos/info/abc".
+    """
+    connection.delete(response_key(rule_name, path))
+
+class ResponseCacheMiddleware:
+    """
+    ASGI middleware caching GET responses per CacheRule.
+
+    Args:
+        app (ASGIApp): Wrapped application.
+        rules (Iterable[CacheRule]): Cached routes; other routes pass through.
+        redis_getter (Callable[[], Any], optional): Returns an asyncio Redis client; None = local only.
+        local_size (int): Entries in the in-process LRU.
+        local_ttl (float): Seconds an entry may be served from the LRU without checking Redis.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rules: Iterable[CacheRule],
+        redis_getter: Optional[Callable[[], Any]] = None,
+        local_size: int = 2048,
+        local_ttl: float = 5.0,
+    ) -> None:
+        self.app = app
+        self.rules = [(rule, _path_regex(rule.path)) for rule in rules]
+        self.invalidations = [
+            (method.upper(), _path_regex(path), rule) for rule in self.rules_by_name().values()
+            for method, path in rule.invalidate_on
+        ]
+        self.redis_getter = redis_getter
+        self._local = LocalTTLCache(local_size, local_ttl)
+        self._stats = {rule.name: stats_for(f"http:{rule.name}") for rule, _ in self.rules}
+        self._generations: Dict[str, int] = {}
+        self._inflight: Dict[str, "asyncio.Future[CachedResponse]"] = {}
+        self._refreshing: Set["asyncio.Task[Any]"] = set()
+
+    def rules_by_name(self) -> Dict[str, CacheRule]:
+        return {rule.name: rule for rule, _ in self.rules}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] != "GET":
+            await self._pass_through_and_invalidate(scope, receive, send)
+            return
+        rule = next((rule for rule, regex in self.rules if regex.match(scope["path"])), None)
+        if rule is None or "no-cache" in Headers(scope=scope).get("cache-control", ""):
+            await self.app(scope, receive, send)
+            return
+        key = self._key(rule, scope)
+        stats = self._stats[rule.name]
+        entry, tier = await self._lookup(rule, key)
+        now = time.time()
+        if entry is not None and now < entry.fresh_until:
+            stats.incr(f"{tier}_hits")
+            await self._send(send, entry, "HIT")
+            return
+        if entry is not None and now < entry.stale_until:
+            stats.incr("stale_hits")
+            await self._send(send, entry, "STALE")
+            if key not in self._inflight:
+                task = asyncio.create_task(self._coalesced_fetch(rule, key, scope))
+                self._refreshing.add(task)
+                task.add_done_callback(self._refresh_done)
+            return
+        stats.incr("misses")
+        await self._send(send, await self._coalesced_fetch(rule, key, scope), "MISS")
+
+    def _key(self, rule: CacheRule, scope: Scope) -> str:
+        headers = Headers(scope=scope)
+        vary = [headers.get(name, "") for name in rule.vary_headers]
+        if rule.vary_user:
+            vary.append(get_request_identity(scope))
+        return response_key(rule.name, scope["path"], scope.get("query_string", b"").decode("latin-1"), vary)
+
+    async def _lookup(self, rule: CacheRule, key: str) -> Tuple[Optional[CachedResponse], str]:
+        """Return (entry or None, tier it came from: "local" or "redis")."""
+        entry = self._local.get(key)
+        if entry is not None and entry.generation >= self._generations.get(rule.name, 0):
+            return entry, "local"
+        if self.redis_getter is None:
+            return None, "local"
+        try:
+            raw, generation = await self.redis_getter().mget(key, f"{KEY_PREFIX}:gen:{rule.name}")
+        except Exception as e:
+            self._stats[rule.name].incr("errors")
+            logger.warning(f"Response cache read failed, using local tier only: {e}")
+            return None, "redis"
+        generation = int(generation or 0)
+        self._generations[rule.name] = max(self._generations.get(rule.name, 0), generation)
+        if raw is None:
+            return None, "redis"
+        entry = CachedResponse.from_json(raw)
+        if entry.generation < generation:
+            return None, "redis"
+        self._local.set(key, entry)
+        return entry, "redis"
+
+    async def _coalesced_fetch(self, rule: CacheRule, key: str, scope: Scope) -> CachedResponse:
+        """Compute the response once per key and process, however many requests are waiting for it."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self._stats[rule.name].incr("coalesced")
+            return await asyncio.shield(future)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            entry = await self._fetch_shared(rule, key, scope)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when no request was waiting on it
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _fetch_shared(self, rule: CacheRule, key: str, scope: Scope) -> CachedResponse:
+        """Compute under a short Redis lock, or wait for the instance holding it to store its result."""
+        conn = None
+        locked = False
+        if self.redis_getter is not None:
+            try:
+                conn = self.redis_getter()
+                locked = bool(await conn.set(f"{key}:lock", 1, nx=True, px=int(LOCK_TTL * 1000)))
+                if not locked:
+                    deadline = time.monotonic() + LOCK_TTL
+                    while time.monotonic() < deadline:
+                        await asyncio.sleep(0.05)
+                        entry, _ = await self._lookup(rule, key)
+                        if entry is not None and time.time() < entry.fresh_until:
+                            return entry
+                        if not await conn.exists(f"{key}:lock"):
+                            break
+            except Exception as e:
+                logger.warning(f"Response cache lock failed: {e}")
+                conn = None
+        try:
+            started = time.perf_counter()
+            entry = await self._render(rule, scope)
+            self._stats[rule.name].record_load(time.perf_counter() - started)
+            if entry.generation >= 0:
+                await self._store(rule, key, entry, conn)
+            return entry
+        finally:
+            if locked:
+                try:
+                    await conn.delete(f"{key}:lock")
+                except Exception as e:
+                    logger.warning(f"Response cache unlock failed: {e}")
+
+    async def _render(self, rule: CacheRule, scope: Scope) -> CachedResponse:
+        """Run the route and capture its response; uncacheable responses get generation -1."""
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+
+        async def receive() -> Message:
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        generation = self._generations.get(rule.name, 0)
+        await self.app(dict(scope), receive, capture)
+        headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in start.get("headers", [])]
+        body = b"".join(chunks)
+        now = time.time()
+        cacheable = start.get("status") == 200 and len(body) <= MAX_CACHED_BODY and not any(
+            name.lower() == "set-cookie"
+            or (name.lower() == "cache-control" and ("no-store" in value or "private" in value))
+            for name, value in headers
+        )
+        return CachedResponse(
+            status=start.get("status", 500),
+            headers=[(k, v) for k, v in headers if k.lower() not in UNCACHED_HEADERS],
+            body=body,
+            created=now,
+            fresh_until=now + rule.ttl if cacheable else now,
+            stale_until=now + rule.ttl + rule.stale_ttl if cacheable else now,
+            generation=generation if cacheable else -1,
+        )
+
+    async def _store(self, rule: CacheRule, key: str, entry: CachedResponse, conn: Any) -> None:
+        self._local.set(key, entry)
+        if conn is None:
+            return
+        try:
+            await conn.set(key, entry.to_json(), px=max(1, int((entry.stale_until - entry.created) * 1000)))
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+    def _refresh_done(self, task: "asyncio.Task[Any]") -> None:
+        self._refreshing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background cache refresh failed: {task.exception()}")
+
+    async def _send(self, send: Send, entry: CachedResponse, state: str) -> None:
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in entry.headers]
+        headers += [
+            (b"content-length", str(len(entry.body)).encode()),
+            (b"x-cache", state.encode()),
+            (b"age", str(max(0, int(time.time() - entry.created))).encode()),
+        ]
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+    async def _pass_through_and_invalidate(self, scope: Scope, receive: Receive, send: Send) -> None:
+        targets = [rule for method, regex, rule in self.invalidations
+                   if method == scope["method"] and regex.match(scope["path"])]
+        if not targets:
+            await self.app(scope, receive, send)
+            return
+        status: List[int] = []
+
+        async def watch(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            await send(message)
+
+        await self.app(scope, receive, watch)
+        if status and 200 <= status[0] < 300:
+            for rule in targets:
+                await self.invalidate(rule.name)
+
+    async def invalidate(self, rule_name: str) -> None:
+        """Drop every cached response of a rule, in this process at once and in the others via Redis."""
+        generation = self._generations.get(rule_name, 0) + 1
+        if self.redis_getter is not None:
+            try:
+                generation = max(generation, int(await self.redis_getter().incr(f"{KEY_PREFIX}:gen:{rule_name}")))
+            except Exception as e:
+                logger.warning(f"Response cache invalidation not shared: {e}")
+        self._generations[rule_name] = generation
+        logger.info(f"Response cache invalidated: {rule_name} (generation {generation})")
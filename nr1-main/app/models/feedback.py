@@ -1,15 +1,24 @@
 """
 SQLAlchemy async model for Feedback.
 """
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Computed, Integer, Index, String, DateTime
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+# Text search configuration of the search_vector column and of search queries
+SEARCH_CONFIG = "english"
+
 class Feedback(Base):
     __tablename__ = "feedback"
     id = Column(Integer, primary_key=True, index=True)
     message = Column(String(1000), nullable=False)
     email = Column(String(255), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Maintained by PostgreSQL from message; deferred so plain reads do not load it
+    search_vector = deferred(Column(TSVECTOR, Computed(f"to_tsvector('{SEARCH_CONFIG}', message)", persisted=True)))
+
+    __table_args__ = (Index("ix_feedback_search_vector", "search_vector", postgresql_using="gin"),)
@@ -0,0 +1,137 @@
+"""
+Retry policy for failed video-processing jobs.
+
+- A failure is classified by the exception the job raised (following its
+  cause chain): "transient" (S3, source download, Redis, network timeouts),
+  "disk" (no space left), "timeout" (job timeout), "crashed" (work horse killed,
+  e.g. out of memory), "ffmpeg" (encoder failure), "invalid" (bad request data,
+  a source the server refuses with 4xx, ingest not configured) or "unknown".
+- Each class has its own retry budget and base delay. Retries back off
+  exponentially with jitter, capped at JOB_RETRY_MAX_DELAY, so a burst of jobs
+  failing on the same outage does not come back all at once.
+- Invalid input is never retried; jobs that run out of retries go to the
+  dead-letter queue (app/services/dead_letter_service.py).
+"""
+
+import errno
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+import httpx
+import redis
+from rq.timeouts import JobTimeoutException
+from ..config import settings
+from ..services.caption_service import CaptionServiceError
+from ..services.ffmpeg_service import FFmpegServiceError
+from ..services.ingest_service import IngestServiceError, SourceUnavailableError
+from ..services.reframe_service import ReframeServiceError
+from ..services.s3_service import S3ServiceError
+
+DISK_ERRNOS = (errno.ENOSPC, errno.EDQUOT)
+DISK_FULL_MESSAGE = "No space left on device"
+ERROR_SUMMARY_CHARS = 500
+STDERR_EXCERPT_LINES = 15
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retry budget for one class of failure."""
+    max_retries: int
+    base_delay: float
+
+POLICIES: Dict[str, RetryPolicy] = {
+    "transient": RetryPolicy(max_retries=4, base_delay=10),
+    # Give cache eviction and other jobs' cleanup time to free space
+    "disk": RetryPolicy(max_retries=3, base_delay=60),
+    "timeout": RetryPolicy(max_retries=1, base_delay=30),
+    "crashed": RetryPolicy(max_retries=1, base_delay=15),
+    "ffmpeg": RetryPolicy(max_retries=1, base_delay=30),
+    "invalid": RetryPolicy(max_retries=0, base_delay=0),
+    "unknown": RetryPolicy(max_retries=1, base_delay=30),
+}
+
+# First match wins, checked from the outermost exception inwards
+ERROR_CLASSES = (
+    ((JobTimeoutException,), "timeout"),
+    ((SourceUnavailableError,), "invalid"),
+    ((S3ServiceError, IngestServiceError, httpx.HTTPError, redis.exceptions.ConnectionError,
+      redis.exceptions.TimeoutError, ConnectionError, TimeoutError), "transient"),
+    ((CaptionServiceError, ReframeServiceError, ValueError, KeyError, TypeError), "invalid"),
+    ((FFmpegServiceError,), "ffmpeg"),
+)
+
+def _chain(exc: Optional[BaseException]) -> Iterator[BaseException]:
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+def _stderr(error: BaseException) -> str:
+    stderr = getattr(error, "stderr", None)
+    return stderr if isinstance(stderr, str) else ""
+
+def classify_failure(exc: Optional[BaseException]) -> str:
+    """
+    Classify why a job failed.
+
+    Args:
+        exc (BaseException, optional): The exception the job raised; None if
+            the work horse died without one.
+
+    Returns:
+        str: A key of POLICIES.
+    """
+    if exc is None:
+        return "crashed"
+    chain = list(_chain(exc))
+    for error in chain:
+        if isinstance(error, OSError) and error.errno in DISK_ERRNOS:
+            return "disk"
+        if DISK_FULL_MESSAGE in _stderr(error):
+            return "disk"
+    for error in chain:
+        for types, error_class in ERROR_CLASSES:
+            if isinstance(error, types):
+                return error_class
+    return "unknown"
+
+def retry_delay(error_class: str, attempt: int, rng: random.Random = random) -> Optional[float]:
+    """
+    Seconds to wait before retrying, or None if the job should be dead-lettered.
+
+    Args:
+        error_class (str): Result of classify_failure().
+        attempt (int): Number of retries already made (0 after the first failure).
+        rng (random.Random): Jitter source.
+    """
+    policy = POLICIES.get(error_class, POLICIES["unknown"])
+    if attempt >= policy.max_retries:
+        return None
+    delay = min(settings.JOB_RETRY_MAX_DELAY, policy.base_delay * 2 ** attempt)
+    # "Equal jitter": at least half the backoff, so retries never bunch up at zero
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+def stderr_excerpt(stderr: str, lines: int = STDERR_EXCERPT_LINES) -> str:
+    """Last meaningful lines of ffmpeg output (progress lines dropped)."""
+    kept = [line for line in stderr.replace("\r", "\n").splitlines()
+            if line.strip() and not line.lstrip().startswith(("frame=", "size="))]
+    return "\n".join(kept[-lines:])
+
+def describe_failure(exc: Optional[BaseException], exc_string: str = "") -> Dict[str, Any]:
+    """
+    Summarise a failure for job.meta and the dead-letter queue.
+
+    Returns:
+        dict[str, Any]: {"error_class", "error" (one-line summary), "stderr" (ffmpeg excerpt or "")}.
+    """
+    error_class = classify_failure(exc)
+    if exc is not None:
+        error = f"{type(exc).__name__}: {exc}"
+    else:
+        error = (exc_string.strip().splitlines() or ["Work horse terminated unexpectedly"])[-1]
+    stderr = next((_stderr(e) for e in _chain(exc) if _stderr(e)), "")
+    return {
+        "error_class": error_class,
+        "error": error.splitlines()[0][:ERROR_SUMMARY_CHARS] if error else "",
+        "stderr": stderr_excerpt(stderr),
+    }
@@ -0,0 +1,228 @@
+"""
+Fair, priority-aware scheduler in front of the RQ video-processing queue.
+
+- Jobs are submitted into priority lanes ("priority", "standard", "bulk") instead of
+  straight onto the FIFO RQ list.
+- Within a lane, users are served by virtual time (weighted fair queuing on
+  estimated cost), so one user's bulk submission cannot starve others.
+- Within a user, the cheapest job (clip duration x resolution) goes first.
+- Lanes are strict priority, except that a lane whose oldest job has waited longer
+  than its max wait is served first (aging), so bulk work is never starved.
+- Dispatch is just-in-time: the RQ list is only topped up to the number of idle
+  workers (after a submit, and before every worker dequeue), so ordering decisions
+  are made as late as possible while no idle worker waits on an empty list.
+  Pick + push happen in one Lua script.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from redis import Redis
+
+logger = logging.getLogger("queue_scheduler")
+
+LANES: Tuple[str, ...] = ("priority", "standard", "bulk")
+REFERENCE_PIXELS = 1080 * 1920
+
+SUBMIT_LUA = """
+local jobs, clock_key, users_key, jobs_key, waiting_key = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5]
+local lane, user, job_id = ARGV[1], ARGV[2], ARGV[3]
+local cost, now = tonumber(ARGV[4]), tonumber(ARGV[5])
+local clock = tonumber(redis.call('GET', clock_key) or '0')
+if not redis.call('ZSCORE', users_key, user) then
+  redis.call('ZADD', users_key, clock, user)
+end
+redis.call('ZADD', jobs_key, cost, job_id)
+redis.call('ZADD', waiting_key, now, job_id)
+redis.call('HSET', jobs, job_id, lane .. '|' .. user)
+return 1
+"""
+
+PICK_LUA = """
+-- KEYS: the RQ list, the pending-jobs hash, then each lane's users, waiting and
+-- clock keys. Per-user job sets are found at run time; they share the keys'
+-- hash slot through the prefix's hash tag.
+local rq_list, jobs = KEYS[1], KEYS[2]
+local prefix, now, slots = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+local lanes, max_waits = {}, {}
+for i = 4, #ARGV, 2 do
+  table.insert(lanes, ARGV[i])
+  table.insert(max_waits, tonumber(ARGV[i + 1]))
+end
+
+local function pick()
+  -- Aging: serve the lane whose oldest job has overstayed its max wait the most
+  local order = {}
+  local starving, worst = nil, 0
+  for i = 1, #lanes do
+    local oldest = redis.call('ZRANGE', KEYS[3 * i + 1], 0, 0, 'WITHSCORES')
+    if #oldest > 0 and max_waits[i] > 0 then
+      local overdue = (now - tonumber(oldest[2])) - max_waits[i]
+      if overdue > worst then
+        starving, worst = i, overdue
+      end
+    end
+  end
+  if starving then
+    table.insert(order, starving)
+  end
+  for i = 1, #lanes do
+    table.insert(order, i)
+  end
+  for _, i in ipairs(order) do
+    local users_key, waiting_key, clock_key = KEYS[3 * i], KEYS[3 * i + 1], KEYS[3 * i + 2]
+    while true do
+      local top = redis.call('ZRANGE', users_key, 0, 0, 'WITHSCORES')
+      if #top == 0 then
+        break
+      end
+      local user, vt = top[1], tonumber(top[2])
+      local jobs_key = prefix .. ':lane:' .. lanes[i] .. ':user:' .. user
+      local cheapest = redis.call('ZRANGE', jobs_key, 0, 0, 'WITHSCORES')
+      if #cheapest == 0 then
+        redis.call('ZREM', users_key, user)
+      else
+        local job_id, cost = cheapest[1], tonumber(cheapest[2])
+        redis.call('ZREM', jobs_key, job_id)
+        redis.call('ZREM', waiting_key, job_id)
+        redis.call('HDEL', jobs, job_id)
+        redis.call('SET', clock_key, vt)
+        if redis.call('ZCARD', jobs_key) == 0 then
+          redis.call('ZREM', users_key, user)
+        else
+          redis.call('ZADD', users_key, vt + cost, user)
+        end
+        redis.call('RPUSH', rq_list, job_id)
+        return {lanes[i], job_id, tostring(cost)}
+      end
+    end
+  end
+  return nil
+end
+
+local picked = {}
+while redis.call('LLEN', rq_list) < slots do
+  local job = pick()
+  if not job then
+    break
+  end
+  for _, value in ipairs(job) do
+    table.insert(picked, value)
+  end
+end
+return picked
+"""
+
+# The RQ worker may already have started a job pushed a moment ago
+MARK_QUEUED_LUA = """
+if redis.call('HGET', KEYS[1], 'status') == 'deferred' then
+  redis.call('HSET', KEYS[1], 'status', 'queued')
+end
+return 1
+"""
+
+def estimate_cost(duration_seconds: float, width: int = 1080, height: int = 1920) -> float:
+    """
+    Estimate encode cost in "1080p-seconds": clip duration x output pixels, normalised.
+
+    Args:
+        duration_seconds (float): Clip duration.
+        width (int): Output width in pixels.
+        height (int): Output height in pixels.
+
+    Returns:
+        float: Relative cost (a 60s 1080x1920 clip costs 60).
+    """
+    return max(duration_seconds, 0.0) * (width * height) / REFERENCE_PIXELS
+
+def choose_lane(duration_seconds: float, cost: float, plan: str = "free",
+                short_clip_seconds: float = 30, bulk_cost: float = 600) -> str:
+    """
+    Pick the priority lane for a job.
+
+    Paid users and short clips go to "priority"; very expensive jobs to "bulk";
+    everything else to "standard".
+    """
+    if plan != "free" or duration_seconds <= short_clip_seconds:
+        return "priority"
+    if cost >= bulk_cost:
+        return "bulk"
+    return "standard"
+
+class FairScheduler:
+    """Redis-backed fair scheduler feeding a single RQ queue."""
+
+    def __init__(self, connection: Redis, queue_name: str, lane_max_wait: Optional[Dict[str, float]] = None) -> None:
+        self.connection = connection
+        self.queue_name = queue_name
+        # Hash tag on the RQ list's own name: every scheduler key lives in the list's
+        # cluster slot, so the pick script can move jobs between them atomically
+        self.prefix = f"sched:{{rq:queue:{queue_name}}}"
+        self.lane_max_wait = lane_max_wait or {}
+        self._submit = connection.register_script(SUBMIT_LUA)
+        self._pick = connection.register_script(PICK_LUA)
+        self._mark_queued = connection.register_script(MARK_QUEUED_LUA)
+
+    def submit(self, job_id: str, user: str, lane: str, cost: float) -> None:
+        """Add a saved (deferred) RQ job to the scheduler."""
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+        lane_key = f"{self.prefix}:lane:{lane}"
+        keys = [f"{self.prefix}:jobs", f"{lane_key}:clock", f"{lane_key}:users", f"{lane_key}:user:{user}",
+                f"{lane_key}:waiting"]
+        self._submit(keys=keys, args=[lane, user, job_id, cost, time.time()])
+        logger.info(f"Scheduled job {job_id} lane={lane} user={user} cost={cost:.1f}")
+
+    def dispatch(self, slots: int = 1) -> List[Tuple[str, str, float]]:
+        """
+        Move the next fair jobs onto the RQ list until it holds ``slots`` jobs.
+
+        Args:
+            slots (int): Jobs to keep on the list, normally the number of idle workers;
+                each of them is blocked on the list and takes one job.
+
+        Returns:
+            list[tuple]: (lane, job_id, cost) of each dispatched job, in order.
+        """
+        keys = [f"rq:queue:{self.queue_name}", f"{self.prefix}:jobs"]
+        args: list = [self.prefix, time.time(), max(slots, 1)]
+        for lane in LANES:
+            keys += [f"{self.prefix}:lane:{lane}:{name}" for name in ("users", "waiting", "clock")]
+            args += [lane, self.lane_max_wait.get(lane, 0)]
+        result = [v.decode() if isinstance(v, bytes) else v for v in self._pick(keys=keys, args=args)]
+        picked = [(lane, job_id, float(cost)) for lane, job_id, cost in zip(result[::3], result[1::3], result[2::3])]
+        if picked:
+            with self.connection.pipeline(transaction=False) as pipe:
+                pipe.sadd("rq:queues", f"rq:queue:{self.queue_name}")
+                for _, job_id, _ in picked:
+                    self._mark_queued(keys=[f"rq:job:{job_id}"], client=pipe)
+                pipe.execute()
+        for lane, job_id, _ in picked:
+            logger.info(f"Dispatched job {job_id} from lane {lane}")
+        return picked
+
+    def backlog(self) -> Dict[str, Any]:
+        """
+        Summarise pending work for load-adaptive decisions.
+
+        Returns:
+            dict[str, Any]: {"pending": int, "oldest_wait_seconds": float, "lanes": {lane: count}}.
+        """
+        now = time.time()
+        lanes: Dict[str, int] = {}
+        oldest = now
+        for lane in LANES:
+            key = f"{self.prefix}:lane:{lane}:waiting"
+            lanes[lane] = self.connection.zcard(key)
+            first = self.connection.zrange(key, 0, 0, withscores=True)
+            if first:
+                oldest = min(oldest, first[0][1])
+        return {"pending": sum(lanes.values()), "oldest_wait_seconds": now - oldest, "lanes": lanes}
+
+    def position(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the lane and user a pending job is waiting in, or None once dispatched."""
+        value = self.connection.hget(f"{self.prefix}:jobs", job_id)
+        if value is None:
+            return None
+        lane, _, user = value.decode().partition("|")
+        return {"lane": lane, "user": user}
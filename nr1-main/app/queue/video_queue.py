@@ -1,9 +1,164 @@
-import redis
+"""
+RQ queue for video-processing jobs.
+- The queue is built on first use from the shared Redis connection, so
+  importing this module does not open a connection.
+- Jobs are not pushed onto the FIFO list directly: they are saved as deferred
+  RQ jobs and handed to the FairScheduler, which dispatches them just in time
+  (see app/queue/scheduler.py). Workers use FairQueue so every dequeue first
+  lets the scheduler top the list up to the number of idle workers.
+- Segment sub-jobs of long clips go to their own queue, which workers listen to
+  first so a parent job's chunks are picked up ahead of new clips.
+- Highlight analysis jobs use a fixed ID per video, so at most one runs for a
+  video at a time. The pending marker lasts until the final outcome (retries
+  included), and a final failure is remembered for HIGHLIGHTS_FAILURE_TTL.
+"""
+import uuid
+from typing import Any, Dict, Optional
 from rq import Queue
+from rq.job import Job, JobStatus
+from rq.worker import WorkerStatus
+from rq.worker_registration import WORKERS_BY_QUEUE_KEY
 from ..config import settings
+from ..services.redis_service import get_redis_conn
+from ..utils.tracing import inject_context, span
+from .scheduler import FairScheduler
 
-redis_conn = redis.Redis.from_url(settings.REDIS_URL)
-video_queue = Queue('video-processing', connection=redis_conn)
+VIDEO_QUEUE_NAME = 'video-processing'
+SEGMENT_QUEUE_NAME = 'video-segments'
+CLIP_JOB_FUNC = 'app.worker.video_jobs.process_clip_job'
+HIGHLIGHTS_JOB_FUNC = 'app.worker.video_jobs.analyze_highlights_job'
 
-# Example enqueue usage:
-# job = video_queue.enqueue(process_video_job, args=(...))
+def _lane_max_wait() -> Dict[str, float]:
+    return {
+        "priority": 0,
+        "standard": settings.QUEUE_STANDARD_MAX_WAIT,
+        "bulk": settings.QUEUE_BULK_MAX_WAIT,
+    }
+
+def get_video_queue() -> Queue:
+    """Return the video-processing queue bound to the shared Redis connection."""
+    return FairQueue(VIDEO_QUEUE_NAME, connection=get_redis_conn())
+
+def get_segment_queue() -> Queue:
+    """Return the queue for segment sub-jobs of long clips."""
+    return FairQueue(SEGMENT_QUEUE_NAME, connection=get_redis_conn())
+
+def get_scheduler(connection=None) -> FairScheduler:
+    """Return the fair scheduler for the video-processing queue."""
+    return FairScheduler(connection or get_redis_conn(), VIDEO_QUEUE_NAME, lane_max_wait=_lane_max_wait())
+
+def idle_workers(connection=None) -> int:
+    """Number of workers on the video-processing queue waiting for a job."""
+    connection = connection or get_redis_conn()
+    keys = connection.smembers(WORKERS_BY_QUEUE_KEY % VIDEO_QUEUE_NAME)
+    if not keys:
+        return 0
+    with connection.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hget(key, "state")
+        return sum(state == WorkerStatus.IDLE.encode() for state in pipe.execute())
+
+class FairQueue(Queue):
+    """RQ Queue that asks the fair scheduler for the next jobs before each dequeue."""
+
+    @classmethod
+    def dequeue_any(cls, queues, timeout, connection=None, **kwargs):
+        for queue in queues:
+            if queue.name == VIDEO_QUEUE_NAME:
+                # The calling worker counts itself: it went idle before dequeueing
+                get_scheduler(queue.connection).dispatch(idle_workers(queue.connection))
+        return super().dequeue_any(queues, timeout, connection=connection, **kwargs)
+
+def submit_job(func: str, payload: Dict[str, Any], user: str, lane: str, cost: float,
+               job_id: Optional[str] = None, meta: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Save a job on the video-processing queue and submit it to the fair scheduler.
+
+    Args:
+        func (str): Dotted path of the job function.
+        payload (dict): Job arguments for ``func``.
+        user (str): Fairness key (JWT user or client IP).
+        lane (str): Priority lane.
+        cost (float): Estimated encode cost (see scheduler.estimate_cost).
+        job_id (str, optional): Job ID; random by default.
+        meta (dict, optional): Extra job.meta entries.
+
+    Returns:
+        str: The RQ job ID.
+    """
+    connection = get_redis_conn()
+    job_id = job_id or uuid.uuid4().hex
+    with span("queue.submit", {"job.id": job_id, "job.func": func, "job.lane": lane, "job.cost": cost}):
+        meta = {"lane": lane, "user": user, "cost": cost, "progress": 0, **(meta or {})}
+        # The worker resumes this trace (app/utils/tracing.job_trace)
+        trace = inject_context()
+        if trace:
+            meta["trace"] = trace
+        job = Job.create(
+            func,
+            kwargs={"payload": payload},
+            connection=connection,
+            id=job_id,
+            origin=VIDEO_QUEUE_NAME,
+            timeout=settings.VIDEO_JOB_TIMEOUT,
+            result_ttl=settings.VIDEO_JOB_RESULT_TTL,
+            status=JobStatus.DEFERRED,
+            meta=meta,
+        )
+        job.save()
+        scheduler = get_scheduler(connection)
+        scheduler.submit(job.id, user, lane, cost)
+        scheduler.dispatch(idle_workers(connection))
+    return job.id
+
+def submit_clip_job(payload: Dict[str, Any], user: str, lane: str, cost: float) -> str:
+    """
+    Save a clip job and submit it to the fair scheduler.
+
+    Args:
+        payload (dict): Job arguments for process_clip_job.
+        user (str): Fairness key (JWT user or client IP).
+        lane (str): Priority lane.
+        cost (float): Estimated encode cost (see scheduler.estimate_cost).
+
+    Returns:
+        str: The RQ job ID.
+    """
+    return submit_job(CLIP_JOB_FUNC, payload, user, lane, cost)
+
+def submit_highlights_job(video_id: str, user: str = "system") -> Optional[str]:
+    """
+    Submit highlight analysis for a video unless one is already pending.
+
+    Analysis decodes at a fraction of an encode's cost and users wait on it
+    interactively, so it goes to the standard lane.
+
+    Returns:
+        Optional[str]: The RQ job ID, or None if an analysis was already pending.
+    """
+    job_id = f"highlights-{video_id}"
+    if not get_redis_conn().set(f"{job_id}:pending", 1, nx=True, ex=settings.VIDEO_JOB_TIMEOUT):
+        return None
+    return submit_job(HIGHLIGHTS_JOB_FUNC, {"video_id": video_id}, user, "standard", 1.0, job_id=job_id)
+
+def finish_highlights_job(video_id: str, error: Optional[str] = None, connection=None) -> None:
+    """
+    Record the final outcome of a video's highlight analysis and clear its pending marker.
+
+    Args:
+        video_id (str): Video ID.
+        error (str, optional): Why the last attempt failed; reported (and the analysis
+            not queued again) for HIGHLIGHTS_FAILURE_TTL seconds.
+        connection (redis.Redis, optional): Redis client; the shared one by default.
+    """
+    connection = connection or get_redis_conn()
+    with connection.pipeline() as pipe:
+        if error is not None:
+            pipe.set(f"highlights-{video_id}:failed", error, ex=settings.HIGHLIGHTS_FAILURE_TTL)
+        pipe.delete(f"highlights-{video_id}:pending")
+        pipe.execute()
+
+def highlights_failure(video_id: str, connection=None) -> Optional[str]:
+    """Error of a recently failed highlight analysis of the video, or None."""
+    error = (connection or get_redis_conn()).get(f"highlights-{video_id}:failed")
+    return error.decode() if isinstance(error, bytes) else error
@@ -0,0 +1,120 @@
+"""
+Resource registry for Viral Clip Generator backend.
+
+- Owns every long-lived client (Redis, MongoDB, S3, SQLAlchemy engine).
+- Clients are created lazily on first use, or in parallel at startup when
+  registered as eager, instead of at import time.
+- The FastAPI lifespan closes everything that was created, in reverse order.
+- Heavy client libraries are imported inside the factories, so importing the
+  app (or collecting tests) does not pay for boto3/motor/sqlalchemy setup.
+"""
+
+import asyncio
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("resources")
+
+class ResourceError(Exception):
+    """Custom exception for resource registry errors."""
+    pass
+
+class _ResourceSpec:
+    """Factory, closer and eagerness of a registered resource."""
+
+    def __init__(self, name: str, factory: Callable[[], Any], closer: Optional[Callable[[Any], Any]], eager: bool) -> None:
+        self.name = name
+        self.factory = factory
+        self.closer = closer
+        self.eager = eager
+        self.lock = threading.Lock()
+
+class ResourceRegistry:
+    """Lazily creates, caches and closes named resources."""
+
+    def __init__(self) -> None:
+        self._specs: Dict[str, _ResourceSpec] = {}
+        self._instances: Dict[str, Any] = {}
+        self._created_order: List[str] = []
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        closer: Optional[Callable[[Any], Any]] = None,
+        eager: bool = False,
+    ) -> None:
+        """
+        Register a resource factory.
+
+        Args:
+            name (str): Unique resource name.
+            factory (Callable[[], Any]): Builds the resource; called at most once until closed.
+            closer (Callable[[Any], Any], optional): Releases the resource; may return an awaitable.
+            eager (bool): Create the resource during application startup.
+        """
+        self._specs[name] = _ResourceSpec(name, factory, closer, eager)
+
+    def get(self, name: str) -> Any:
+        """
+        Return the resource, creating it on first use.
+
+        Raises:
+            ResourceError: If the resource is not registered.
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        spec = self._specs.get(name)
+        if spec is None:
+            raise ResourceError(f"Resource '{name}' is not registered")
+        with spec.lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = spec.factory()
+                self._instances[name] = instance
+                self._created_order.append(name)
+                logger.info(f"Resource created: {name}")
+        return instance
+
+    def is_created(self, name: str) -> bool:
+        """Return True if the resource has been created and not closed."""
+        return name in self._instances
+
+    async def startup(self) -> None:
+        """Create all eager resources in parallel; failures are logged, not fatal."""
+        eager = [name for name, spec in self._specs.items() if spec.eager]
+        if not eager:
+            return
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.get, name) for name in eager), return_exceptions=True
+        )
+        for name, result in zip(eager, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Resource {name} unavailable at startup, will retry on first use: {result}")
+
+    async def close(self, name: str) -> None:
+        """Close a single resource if it was created."""
+        instance = self._instances.pop(name, None)
+        if instance is None:
+            return
+        self._created_order.remove(name)
+        spec = self._specs[name]
+        if spec.closer is None:
+            return
+        try:
+            result = spec.closer(instance)
+            if inspect.isawaitable(result):
+                await result
+            logger.info(f"Resource closed: {name}")
+        except Exception as e:
+            logger.error(f"Error closing resource {name}: {e}")
+
+    async def shutdown(self) -> None:
+        """Close every created resource in reverse creation order."""
+        for name in reversed(list(self._created_order)):
+            await self.close(name)
+
+registry = ResourceRegistry()
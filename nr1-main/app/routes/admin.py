@@ -0,0 +1,39 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+from app.schemas import CacheStatsOut, DeadLetterList, MongoStatsOut, ProfileList, ProfileTokenOut, VideoProcessOut
+from ..controllers.admin_controller import (
+    create_profile_token, get_cache_stats, get_dead_letters, get_mongo_stats, get_profile, get_profiles, replay_dead_letter_job,
+)
+from ..utils.admin_auth import require_admin
+
+router = APIRouter(prefix="/api/v1/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/dead-letters", response_model=DeadLetterList)
+def dead_letters(limit: int = Query(50, ge=1, le=500), error_class: Optional[str] = None):
+    return get_dead_letters(limit, error_class)
+
+@router.post("/dead-letters/{job_id}/replay", response_model=VideoProcessOut)
+def replay(job_id: str):
+    return replay_dead_letter_job(job_id)
+
+@router.get("/cache-stats", response_model=CacheStatsOut)
+def cache_stats():
+    return get_cache_stats()
+
+@router.get("/mongo-stats", response_model=MongoStatsOut)
+def mongo_stats():
+    return get_mongo_stats()
+
+@router.get("/profiles", response_model=ProfileList)
+def profiles(limit: int = Query(50, ge=1, le=500)):
+    return get_profiles(limit)
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def profile(profile_id: str):
+    """Folded stacks ("frame;frame count" lines) for flamegraph.pl, speedscope or inferno."""
+    return get_profile(profile_id)
+
+@router.post("/profiles/token", response_model=ProfileTokenOut)
+def profile_token(ttl: int = Query(300, ge=1, le=86400)):
+    return create_profile_token(ttl)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter
 from app.schemas import AnalyticsIn, AnalyticsOut, AnalyticsList, Message
 from ..controllers.analytics_controller import submit_analytics, get_analytics
 
@@ -6,10 +6,8 @@ router = APIRouter(prefix="/api/v1/analytics", tags=["Analytics"])
 
 @router.post("/", response_model=Message)
 def submit(analytics: AnalyticsIn):
-    result = submit_analytics(analytics)
-    if isinstance(result, dict) and "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    return Message(message=result["message"])
+    submit_analytics(analytics)
+    return Message(message="Analytics submitted")
 
 @router.get("/", response_model=AnalyticsList)
 def get():
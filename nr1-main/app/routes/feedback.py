@@ -1,17 +1,25 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas import FeedbackIn, FeedbackOut, FeedbackList, Message
-from ..controllers.feedback_controller import submit_feedback, get_feedback
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from app.schemas import FeedbackIn, FeedbackList, FeedbackSearchOut, Message
+from app.utils.admin_auth import require_admin
+from ..controllers.feedback_controller import submit_feedback, get_feedback, search_feedback
 
 router = APIRouter(prefix="/api/v1/feedback", tags=["Feedback"])
 
 @router.post("/", response_model=Message)
-def submit(feedback: FeedbackIn):
-    result = submit_feedback(feedback)
-    if isinstance(result, dict) and "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    return Message(message=result["message"])
+async def submit(feedback: FeedbackIn):
+    await submit_feedback(feedback)
+    return Message(message="Feedback submitted")
 
 @router.get("/", response_model=FeedbackList)
-def get():
-    feedback_list = get_feedback()
+async def get():
+    feedback_list = await get_feedback()
     return FeedbackList(feedback=feedback_list)
+
+@router.get("/search", response_model=FeedbackSearchOut, dependencies=[Depends(require_admin)])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description='Terms; supports "phrases", or, -exclude'),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, max_length=200, description="next_cursor of the previous page"),
+):
+    return await search_feedback(q, limit, cursor)
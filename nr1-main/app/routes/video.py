@@ -1,14 +1,22 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request, WebSocket
 from app.schemas import (
-    VideoValidateIn, VideoValidateOut, VideoInfoOut, VideoProcessIn, VideoProcessOut, VideoJobStatusOut, VideoServeOut
+    VideoValidateIn, VideoValidateOut, VideoInfoOut, VideoProcessIn, VideoProcessOut, VideoJobStatusOut, VideoServeOut,
+    VideoHighlightsOut,
 )
+from ..services.user_service import get_user_plan
+from ..utils.request_identity import get_request_identity
+from ..utils.tracing import span
 from ..controllers.video_controller import (
     validate_youtube_url,
     get_video_info,
     process_video_job,
     check_job_status,
+    stream_job_events,
+    stream_job_events_ws,
+    get_highlights,
     serve_processed_video,
     serve_sample_video,
+    serve_hls_file,
 )
 
 router = APIRouter(prefix="/api/v1/videos", tags=["Videos"])
@@ -22,13 +30,30 @@ def info(video_id: str):
     return get_video_info(video_id)
 
 @router.post("/process", response_model=VideoProcessOut)
-def process(data: VideoProcessIn):
-    return process_video_job(data)
+def process(data: VideoProcessIn, request: Request):
+    # Root of the clip's trace (continues a client traceparent); a no-op unless TRACING_ENABLED
+    with span("clip.request", {"video.id": data.video_id}, carrier=request.headers):
+        user_key = get_request_identity(request.scope)
+        plan = get_user_plan(user_key.split(":", 1)[1]) if user_key.startswith("user:") else "free"
+        return process_video_job(data, user_key=user_key, plan=plan)
 
 @router.get("/job/{job_id}", response_model=VideoJobStatusOut)
 def job_status(job_id: str):
     return check_job_status(job_id)
 
+@router.get("/job/{job_id}/events")
+def job_events(job_id: str):
+    """Push the job's status as Server-Sent Events until it completes or fails."""
+    return stream_job_events(job_id)
+
+@router.websocket("/job/{job_id}/ws")
+async def job_events_ws(websocket: WebSocket, job_id: str):
+    await stream_job_events_ws(websocket, job_id)
+
+@router.get("/highlights/{video_id}", response_model=VideoHighlightsOut)
+def highlights(video_id: str, clip_seconds: float = Query(30, ge=5, le=600), count: int = Query(5, ge=1, le=20)):
+    return get_highlights(video_id, clip_seconds, count)
+
 @router.get("/serve/{video_id}", response_model=VideoServeOut)
 def serve(video_id: str):
     return serve_processed_video(video_id)
@@ -36,3 +61,7 @@ def serve(video_id: str):
 @router.get("/sample", response_model=VideoServeOut)
 def sample():
     return serve_sample_video()
+
+@router.get("/hls/{job_id}/{filename}")
+def hls(job_id: str, filename: str):
+    return serve_hls_file(job_id, filename)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import Dict, List, Literal, Optional
 
 # User schemas
 class UserBase(BaseModel):
@@ -43,6 +43,14 @@ class FeedbackOut(BaseModel):
 class FeedbackList(BaseModel):
     feedback: list[FeedbackOut]
 
+class FeedbackSearchHit(FeedbackOut):
+    rank: float
+    snippet: str
+
+class FeedbackSearchOut(BaseModel):
+    results: List[FeedbackSearchHit]
+    next_cursor: Optional[str] = None
+
 # Video schemas
 class VideoValidateIn(BaseModel):
     url: str = Field(..., min_length=10)
@@ -57,13 +65,50 @@ class VideoInfoOut(BaseModel):
     title: str
     duration: int
     thumbnail_url: Optional[str] = None
+    duration_seconds: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    audio_channels: Optional[int] = None
+    audio_layout: Optional[str] = None
+    sample_rate: Optional[int] = None
+    bit_rate: Optional[int] = None
+    keyframe_interval: Optional[float] = None
+
+class Rendition(BaseModel):
+    name: str = Field(..., pattern=r"^[a-z0-9_-]{1,32}$")
+    width: int = Field(..., ge=16, le=3840, multiple_of=2)
+    height: int = Field(..., ge=16, le=3840, multiple_of=2)
 
 class VideoProcessIn(BaseModel):
     video_id: str
-    start_time: int
+    start_time: int = Field(..., ge=0)
     end_time: int
-    aspect_ratio: Optional[str] = None
-    captions: Optional[str] = None
+    aspect_ratio: Optional[str] = Field(
+        default=None, pattern=r"^[1-9]\d?:[1-9]\d?$",
+        description="Output aspect ratio as W:H (e.g. 9:16); the crop follows the action",
+    )
+    captions: Optional[str] = Field(
+        default=None, max_length=100_000,
+        description="SRT, WebVTT or plain text burned into the clip; cue times are relative to start_time",
+    )
+    encoding_profile: Literal["auto", "quality", "balanced", "fast", "turbo"] = "auto"
+    output_format: Literal["mp4", "hls"] = "mp4"
+    renditions: Optional[List[Rendition]] = Field(default=None, min_length=1, max_length=5)
+    animated_preview: bool = False
+
+    @model_validator(mode="after")
+    def check_window(self):
+        if self.end_time <= self.start_time:
+            raise ValueError("end_time must be greater than start_time")
+        if self.renditions:
+            if len({r.name for r in self.renditions}) != len(self.renditions):
+                raise ValueError("rendition names must be unique")
+            if self.output_format != "mp4":
+                raise ValueError("renditions are only supported for mp4 output")
+        return self
 
 class VideoProcessOut(BaseModel):
     job_id: str
@@ -75,11 +120,73 @@ class VideoJobStatusOut(BaseModel):
     status: str
     progress: Optional[int] = None
     result_url: Optional[str] = None
+    encoding_profile: Optional[str] = None
+    renditions: Optional[Dict[str, str]] = None
+    thumbnail_url: Optional[str] = None
+    previews: Optional[Dict[str, str]] = None
+    attempts: Optional[int] = None
+    error: Optional[str] = None
+
+class Highlight(BaseModel):
+    start_time: float
+    end_time: float
+    score: float
+    loudness_db: float
+    motion: float
+    scene_changes: int
+
+class VideoHighlightsOut(BaseModel):
+    video_id: str
+    status: str
+    clip_seconds: float
+    highlights: List[Highlight] = []
+    error: Optional[str] = None
 
 class VideoServeOut(BaseModel):
     video_url: str
     message: Optional[str] = None
 
+# Admin schemas
+class DeadLetterOut(BaseModel):
+    job_id: str
+    func: str
+    payload: Dict = {}
+    user: str
+    lane: str
+    error_class: str
+    error: str
+    stderr: str = ""
+    attempts: int
+    replays: int = 0
+    failed_at: float
+
+class DeadLetterList(BaseModel):
+    dead_letters: List[DeadLetterOut]
+
+class CacheStatsOut(BaseModel):
+    caches: Dict[str, Dict[str, float]]
+
+class MongoStatsOut(BaseModel):
+    operations: Dict[str, Dict[str, float]]
+
+class ProfileOut(BaseModel):
+    id: str
+    method: str
+    path: str
+    status: Optional[int] = None
+    trigger: str
+    duration_ms: float
+    samples: int
+    created_at: float
+
+class ProfileList(BaseModel):
+    profiles: List[ProfileOut]
+
+class ProfileTokenOut(BaseModel):
+    header: str = "X-Profile"
+    token: str
+    expires_in: int
+
 # Analytics schemas
 class AnalyticsIn(BaseModel):
     event: str = Field(..., min_length=1, max_length=100)
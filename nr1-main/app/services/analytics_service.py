@@ -6,22 +6,124 @@ Analytics Service Layer (Refactored)
 - Designed for auditability, security, and testability (Stripe/Netflix standards).
 - All functions are stateless and side-effect free except for analytics submission.
 - Implements audit logging and custom exceptions for compliance.
+- With MONGODB_URI set, events are also buffered and written to MongoDB in
+  bulk (one insert per ANALYTICS_FLUSH_INTERVAL or MONGO_WRITE_BATCH_SIZE
+  events); the buffer is flushed when the API drains for shutdown.
 - TODO: Replace in-memory store with persistent database for production.
 """
 
+import asyncio
 import logging
-from typing import List
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from app.config import settings
 from app.schemas import AnalyticsIn, AnalyticsOut
+from app.services.mongo_service import MongoIndex, MongoServiceError, declare_indexes, insert_many
+from app.utils.drain import drain_state
 from datetime import datetime, timezone
 
 logger = logging.getLogger("analytics_service")
 
+ANALYTICS_COLLECTION = "analytics_events"
+
 class AnalyticsError(Exception):
     """Custom exception for analytics service errors."""
     pass
 
 _fake_analytics_db: List[AnalyticsOut] = []
 
+declare_indexes(
+    ANALYTICS_COLLECTION,
+    MongoIndex((("event", 1), ("timestamp", -1)), "event_timestamp"),
+    MongoIndex((("user_id", 1), ("timestamp", -1)), "user_timestamp", sparse=True),
+)
+
+class AnalyticsBuffer:
+    """
+    Thread-safe buffer turning per-request analytics events into bulk MongoDB inserts.
+
+    Failed batches are kept for the next flush; documents carry their ``_id``
+    from the first attempt, so a retried batch never stores an event twice.
+    When the buffer is full the oldest events are dropped (counted in ``dropped``).
+    """
+
+    def __init__(self, max_events: int, interval: float) -> None:
+        self.max_events = max_events
+        self.interval = interval
+        self.dropped = 0
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def add(self, document: Dict[str, Any]) -> None:
+        """Buffer one event (callable from any thread)."""
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                self._events.popleft()
+                self.dropped += 1
+            self._events.append(document)
+            full = len(self._events) >= settings.MONGO_WRITE_BATCH_SIZE
+        if full and self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def flush(self) -> int:
+        """Write everything buffered in bulk; returns the number of events written."""
+        async with self._flush_lock:
+            with self._lock:
+                batch = list(self._events)
+                self._events.clear()
+            if not batch:
+                return 0
+            try:
+                written = await insert_many(ANALYTICS_COLLECTION, batch, ignore_duplicates=True)
+            except MongoServiceError as e:
+                logger.warning(f"Analytics flush failed, keeping {len(batch)} events for retry: {e}")
+                with self._lock:
+                    overflow = len(batch) + len(self._events) - self.max_events
+                    if overflow > 0:
+                        self.dropped += overflow
+                    self._events = deque((batch + list(self._events))[max(overflow, 0):])
+                return 0
+            logger.debug(f"Flushed {written} analytics events")
+            return written
+
+    def start(self) -> None:
+        """Start the periodic flusher on the running event loop (API startup)."""
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def close(self) -> None:
+        """Stop the periodic flusher and write what is left (drain flusher)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = self._loop = self._wake = None
+        await self.flush()
+
+analytics_buffer = AnalyticsBuffer(settings.ANALYTICS_BUFFER_MAX, settings.ANALYTICS_FLUSH_INTERVAL)
+drain_state.register_flush("analytics", analytics_buffer.close)
+
 def submit_analytics_service(analytics: AnalyticsIn) -> AnalyticsOut:
     """
     Submit an analytics event.
@@ -47,6 +149,11 @@ def submit_analytics_service(analytics: AnalyticsIn) -> AnalyticsOut:
         timestamp=datetime.now(timezone.utc).isoformat()
     )
     _fake_analytics_db.append(analytics_obj)
+    if settings.MONGODB_URI:
+        analytics_buffer.add({
+            **analytics_obj.model_dump(exclude={"timestamp"}),
+            "timestamp": datetime.fromisoformat(analytics_obj.timestamp),
+        })
     logger.info(f"AUDIT: Analytics event submitted: {analytics_obj}")
     return analytics_obj
 
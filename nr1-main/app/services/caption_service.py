@@ -0,0 +1,230 @@
+"""
+Caption Service Layer
+
+- Turns the ``captions`` field of a clip request (SRT, WebVTT or plain text)
+  into a styled ASS subtitle file sized for the output frame.
+- Cue times are relative to the clip (0 = start_time). Plain text is split
+  into short phrases spread over the clip in proportion to their length.
+- Compiled files are content-addressed under the storage cache, so a caption
+  track reused across clips and renditions is compiled once, and font lookups
+  are memoised per process.
+- The ASS file is burned in by ffmpeg_service with the ``ass`` filter inside
+  the clip's own filter graph, never as a second encode.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from ..config import settings
+from ..utils.storage_paths import cache_dir
+
+logger = logging.getLogger("caption_service")
+
+STYLE_VERSION = 1
+MAX_WORDS_PER_CUE = 6
+MIN_CUE_SECONDS = 0.8
+FONT_DIRS = ("/usr/share/fonts", "/usr/local/share/fonts", os.path.expanduser("~/.fonts"))
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+TIMESTAMP_RE = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})")
+CUE_TIMING_RE = re.compile(rf"({TIMESTAMP_RE.pattern})\s*-->\s*({TIMESTAMP_RE.pattern})")
+TAG_RE = re.compile(r"<[^>]+>")
+
+class CaptionServiceError(Exception):
+    """Custom exception for CaptionService errors."""
+    pass
+
+@dataclass(frozen=True)
+class Cue:
+    """One caption shown from ``start`` to ``end`` seconds (clip time)."""
+    start: float
+    end: float
+    text: str
+
+def _seconds(match: Tuple[str, ...]) -> float:
+    hours, minutes, seconds, fraction = match
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(fraction.ljust(3, "0")) / 1000
+
+def _parse_timed(text: str) -> List[Cue]:
+    """Parse SRT or WebVTT cues (numeric identifiers, NOTE blocks and markup are ignored)."""
+    cues = []
+    for block in re.split(r"\n\s*\n", text.replace("\r\n", "\n").strip()):
+        lines = block.strip().split("\n")
+        for i, line in enumerate(lines):
+            timing = CUE_TIMING_RE.search(line)
+            if timing:
+                groups = timing.groups()
+                start, end = _seconds(groups[1:5]), _seconds(groups[6:10])
+                body = TAG_RE.sub("", "\n".join(lines[i + 1:])).strip()
+                if body and end > start:
+                    cues.append(Cue(start, end, body))
+                break
+    return sorted(cues, key=lambda cue: cue.start)
+
+def _split_plain(text: str, duration: float) -> List[Cue]:
+    """Spread plain text over the clip as short phrases, timed by character count."""
+    words = text.split()
+    if not words or duration <= 0:
+        return []
+    phrases = [" ".join(words[i:i + MAX_WORDS_PER_CUE]) for i in range(0, len(words), MAX_WORDS_PER_CUE)]
+    # Never flash phrases faster than MIN_CUE_SECONDS; drop the tail instead
+    phrases = phrases[:max(1, int(duration / MIN_CUE_SECONDS))]
+    total = sum(len(p) for p in phrases)
+    cues, start = [], 0.0
+    for phrase in phrases:
+        end = start + duration * len(phrase) / total
+        cues.append(Cue(round(start, 3), round(end, 3), phrase))
+        start = end
+    return cues
+
+def parse_captions(text: str, duration: float) -> List[Cue]:
+    """
+    Parse SRT, WebVTT or plain-text captions into cues within the clip.
+
+    Args:
+        text (str): Caption source.
+        duration (float): Clip duration in seconds; cues are clipped to it.
+
+    Returns:
+        list[Cue]: Cues in display order.
+    """
+    if "-->" in text:
+        cues = _parse_timed(text)
+    else:
+        cues = _split_plain(text, duration)
+    return [Cue(c.start, min(c.end, duration), c.text) for c in cues if c.start < duration]
+
+@lru_cache(maxsize=32)
+def resolve_font(family: str) -> Tuple[str, Optional[str]]:
+    """
+    Find a font file for a family and return (family, directory holding it).
+
+    Uses fc-match when available, else a scan of the usual font directories.
+    Memoised, since both are far slower than the encode setup they precede.
+    The directory is None if nothing matched (libass then falls back on its own).
+    """
+    if shutil.which("fc-match"):
+        try:
+            result = subprocess.run(["fc-match", "-f", "%{family[0]}|%{file}", family],
+                                    capture_output=True, text=True, timeout=5, check=True)
+            matched, _, path = result.stdout.partition("|")
+            if path:
+                return matched or family, os.path.dirname(path)
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.warning(f"fc-match failed for {family}: {e}")
+    wanted = family.replace(" ", "").lower()
+    for root_dir in filter(None, (settings.CAPTION_FONTS_DIR, *FONT_DIRS)):
+        for root, _, files in os.walk(root_dir):
+            for name in sorted(files):
+                if name.lower().endswith(FONT_EXTENSIONS) and name.replace(" ", "").lower().startswith(wanted):
+                    return family, root
+    logger.warning(f"No font file found for {family}")
+    return family, None
+
+def _ass_time(seconds: float) -> str:
+    centis = int(round(seconds * 100))
+    hours, centis = divmod(centis, 360000)
+    minutes, centis = divmod(centis, 6000)
+    secs, centis = divmod(centis, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centis:02d}"
+
+def _ass_text(text: str) -> str:
+    text = text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}")
+    return text.replace("\n", "\\N")
+
+def build_ass(cues: List[Cue], width: int, height: int, font: str) -> str:
+    """
+    Render cues as an ASS document styled for a ``width`` x ``height`` frame.
+
+    Text is bold white with a black outline, bottom-centred, with a font size
+    and margins proportional to the frame so portrait and landscape clips match.
+    """
+    font_size = round(min(width, height) * 0.075)
+    outline = max(2, round(font_size * 0.08))
+    margin_h = round(width * 0.06)
+    margin_v = round(height * (0.14 if height > width else 0.08))
+    header = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+        "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{font},{font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H80000000,"
+        f"-1,0,0,0,100,100,0,0,1,{outline},0,2,{margin_h},{margin_h},{margin_v},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    events = [f"Dialogue: 0,{_ass_time(c.start)},{_ass_time(c.end)},Default,,0,0,0,,{_ass_text(c.text)}"
+              for c in cues]
+    return "\n".join(header + events) + "\n"
+
+def compile_captions(text: str, duration: float, width: int, height: int) -> Optional[str]:
+    """
+    Compile captions to an ASS file for one output size, reusing a cached compile.
+
+    Args:
+        text (str): Caption source (SRT, WebVTT or plain text).
+        duration (float): Clip duration in seconds.
+        width (int): Output frame width.
+        height (int): Output frame height.
+
+    Returns:
+        Optional[str]: Path of the ASS file, or None if there is nothing to show.
+
+    Raises:
+        CaptionServiceError: If the file cannot be written.
+    """
+    font, _ = resolve_font(settings.CAPTION_FONT)
+    key = hashlib.sha256(
+        f"{STYLE_VERSION}|{font}|{width}x{height}|{duration:.3f}|{text}".encode()
+    ).hexdigest()
+    path = cache_dir("captions", f"{key}.ass")
+    if os.path.exists(path):
+        return path
+    cues = parse_captions(text, duration)
+    if not cues:
+        return None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(build_ass(cues, width, height, font))
+        os.replace(tmp, path)
+    except OSError as e:
+        raise CaptionServiceError(f"Could not write captions: {e}")
+    logger.info(f"Compiled {len(cues)} caption cues for {width}x{height}: {path}")
+    return path
+
+def burn_in(stream, ass_path: str):
+    """
+    Add the ``ass`` filter to an ffmpeg-python video stream whose timestamps start at the clip start.
+
+    Args:
+        stream: Video stream.
+        ass_path (str): Compiled ASS file.
+    """
+    _, fonts_dir = resolve_font(settings.CAPTION_FONT)
+    options = {"fontsdir": fonts_dir} if fonts_dir else {}
+    return stream.filter('ass', ass_path, **options)
+
+# Test block for service sanity (not for production)
+if __name__ == "__main__":
+    import sys
+    try:
+        print(build_ass(parse_captions(sys.argv[1] if len(sys.argv) > 1 else "Hello world", 10), 1080, 1920,
+                        resolve_font(settings.CAPTION_FONT)[0]))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
@@ -0,0 +1,148 @@
+"""
+Dead Letter Service Layer
+
+- Records video-processing jobs that failed for good (retries exhausted or
+  not retryable, see app/queue/retry_policy.py) with their failure class,
+  error, ffmpeg stderr excerpt, attempts and the original payload.
+- Entries live in Redis for DEAD_LETTER_TTL; the index keeps at most
+  DEAD_LETTER_MAX of the newest.
+- Replay resubmits a job under its original ID through the fair scheduler, so
+  clients polling or streaming that job see it come back to life.
+"""
+
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from app.config import settings
+
+logger = logging.getLogger("dead_letter_service")
+
+INDEX_KEY = "dlq:index"
+ENTRY_PREFIX = "dlq:entry:"
+
+class DeadLetterServiceError(Exception):
+    """Custom exception for DeadLetterService errors."""
+    pass
+
+def _entry_key(job_id: str) -> str:
+    return f"{ENTRY_PREFIX}{job_id}"
+
+def record_dead_letter(conn: Any, job: Any, failure: Dict[str, Any]) -> None:
+    """
+    Store a permanently failed job (best effort; the job stays in RQ's failed registry either way).
+
+    Args:
+        conn: Sync Redis connection.
+        job (rq.job.Job): The failed job.
+        failure (dict): retry_policy.describe_failure() output.
+    """
+    now = time.time()
+    entry = {
+        "job_id": job.id,
+        "func": job.func_name,
+        "payload": job.kwargs.get("payload", {}),
+        "user": job.meta.get("user", "anonymous"),
+        "lane": job.meta.get("lane", "standard"),
+        "cost": job.meta.get("cost", 1.0),
+        "attempts": job.meta.get("attempts", 1),
+        "replays": job.meta.get("replays", 0),
+        "failed_at": now,
+        **failure,
+    }
+    try:
+        with conn.pipeline() as pipe:
+            pipe.set(_entry_key(job.id), json.dumps(entry), ex=settings.DEAD_LETTER_TTL)
+            pipe.zadd(INDEX_KEY, {job.id: now})
+            pipe.zremrangebyscore(INDEX_KEY, "-inf", now - settings.DEAD_LETTER_TTL)
+            pipe.zremrangebyrank(INDEX_KEY, 0, -settings.DEAD_LETTER_MAX - 1)
+            pipe.execute()
+        logger.warning(f"Job {job.id} dead-lettered ({failure['error_class']}): {failure['error']}")
+    except Exception as e:
+        logger.error(f"Could not dead-letter job {job.id}: {e}")
+
+def list_dead_letters(conn: Any, limit: int = 50, error_class: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Return dead-lettered jobs, newest first.
+
+    Args:
+        conn: Sync Redis connection.
+        limit (int): Maximum number of entries.
+        error_class (str, optional): Only entries of this failure class.
+
+    Raises:
+        DeadLetterServiceError: If Redis cannot be read.
+    """
+    try:
+        entries: List[Dict[str, Any]] = []
+        offset = 0
+        # Filtering happens client-side, so page through the index until enough match
+        while len(entries) < limit:
+            job_ids = conn.zrevrange(INDEX_KEY, offset, offset + limit - 1)
+            if not job_ids:
+                break
+            offset += len(job_ids)
+            values = conn.mget([_entry_key(job_id.decode()) for job_id in job_ids])
+            expired = [job_id for job_id, value in zip(job_ids, values) if value is None]
+            if expired:
+                conn.zrem(INDEX_KEY, *expired)
+                offset -= len(expired)
+            for value in values:
+                if value is None:
+                    continue
+                entry = json.loads(value)
+                if error_class is None or entry["error_class"] == error_class:
+                    entries.append(entry)
+    except Exception as e:
+        logger.error(f"Failed to list dead letters: {e}")
+        raise DeadLetterServiceError(f"Could not list dead-lettered jobs: {e}")
+    return entries[:limit]
+
+def replay_dead_letter(conn: Any, job_id: str) -> str:
+    """
+    Resubmit a dead-lettered job under its original ID.
+
+    Args:
+        conn: Sync Redis connection.
+        job_id (str): Dead-lettered job ID.
+
+    Returns:
+        str: The job ID (unchanged).
+
+    Raises:
+        DeadLetterServiceError: If the job is not in the dead-letter queue or cannot be queued.
+    """
+    from rq.exceptions import NoSuchJobError
+    from rq.job import Job
+    from app.queue.video_queue import submit_job
+
+    # GETDEL claims the entry, so concurrent replays of one job submit it once
+    value = conn.getdel(_entry_key(job_id))
+    if value is None:
+        raise DeadLetterServiceError(f"Job {job_id} is not in the dead-letter queue")
+    entry = json.loads(value)
+    try:
+        try:
+            # Drop the failed job (and its failed-registry entry) before reusing its ID
+            Job.fetch(job_id, connection=conn).delete()
+        except NoSuchJobError:
+            pass
+        submit_job(entry["func"], entry["payload"], entry["user"], entry["lane"], entry["cost"], job_id=job_id,
+                   meta={"replays": entry.get("replays", 0) + 1})
+    except Exception as e:
+        conn.set(_entry_key(job_id), value, ex=settings.DEAD_LETTER_TTL)
+        logger.error(f"Failed to replay job {job_id}: {e}")
+        raise DeadLetterServiceError(f"Could not replay job {job_id}: {e}")
+    conn.zrem(INDEX_KEY, job_id)
+    logger.info(f"Replayed dead-lettered job {job_id} ({entry['error_class']})")
+    return job_id
+
+# Test block for service sanity (not for production)
+if __name__ == "__main__":
+    import sys
+    try:
+        from app.services.redis_service import get_redis_conn
+        for dead in list_dead_letters(get_redis_conn(), limit=10):
+            print(dead["job_id"], dead["error_class"], dead["error"])
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
@@ -4,24 +4,54 @@ Feedback Service Layer (Production, Async, SQLAlchemy, Render.com Ready)
 - All DB access is async and uses SQLAlchemy async ORM.
 - No dev-only logic; all file paths/envs are from environment variables.
 - Production-safe, deploy-ready, PostgreSQL assumed.
+- Full-text search: a generated ``tsvector`` column on the message with a GIN
+  index, queried with websearch_to_tsquery (quoted phrases, ``or``, ``-term``),
+  ranked with ts_rank_cd, highlighted with ts_headline and paginated by an
+  opaque keyset cursor over (rank, id).
+- Without DATABASE_URL (tests, local runs) feedback is kept in process memory
+  and search uses an approximation of the same query syntax and ranking.
 - Only exports functions used by controllers.
 """
 
+import base64
+import binascii
+import html
+import json
 import logging
-from typing import List
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, select, text, tuple_
 from sqlalchemy.exc import SQLAlchemyError
-from app.models.feedback import Feedback
-from app.schemas import FeedbackIn, FeedbackOut
-from app.db.session import get_async_session
+from app.config import settings
+from app.models.feedback import Feedback, SEARCH_CONFIG
+from app.schemas import FeedbackIn, FeedbackOut, FeedbackSearchHit, FeedbackSearchOut
+from app.db.session import get_async_session, get_engine
 
 logger = logging.getLogger("feedback_service")
 
+# ts_headline copies the message verbatim, so it marks matches with control characters
+# and mark_snippet() escapes the text before turning those into <mark> tags
+HEADLINE_START, HEADLINE_STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = (f"StartSel={HEADLINE_START}, StopSel={HEADLINE_STOP}, MaxWords=35, MinWords=15, "
+                    "MaxFragments=2, FragmentDelimiter= … ")
+# Idempotent DDL for databases created before search existed (PostgreSQL 12+).
+# The column add rewrites the table once; the index is built without blocking writes.
+SEARCH_SCHEMA_DDL = (
+    f"ALTER TABLE feedback ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', message)) STORED",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedback_search_vector ON feedback USING GIN (search_vector)",
+)
+
 class FeedbackError(Exception):
     """Custom exception for feedback service errors."""
     pass
 
+def _use_database() -> bool:
+    return bool(os.getenv("DATABASE_URL") or settings.DATABASE_URL)
+
 def _feedback_to_out(fb: Feedback) -> FeedbackOut:
     """Convert Feedback ORM to FeedbackOut schema."""
     return FeedbackOut(
@@ -31,6 +61,144 @@ def _feedback_to_out(fb: Feedback) -> FeedbackOut:
         created_at=fb.created_at.isoformat() if getattr(fb, 'created_at', None) else None
     )
 
+def encode_cursor(rank: float, feedback_id: int) -> str:
+    """Opaque keyset cursor pointing just after the hit (rank, id)."""
+    return base64.urlsafe_b64encode(json.dumps([rank, feedback_id]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """
+    Decode a cursor from encode_cursor().
+
+    Raises:
+        FeedbackError: If the cursor is malformed.
+    """
+    try:
+        rank, feedback_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(rank), int(feedback_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise FeedbackError(f"Invalid search cursor: {e}")
+
+_WORD_RE = re.compile(r"\w+")
+_QUERY_TOKEN_RE = re.compile(r'(-?)"([^"]*)"?|(-?)(\S+)')
+_STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it",
+              "no", "not", "of", "on", "or", "such", "that", "the", "their", "then", "there", "these",
+              "they", "this", "to", "was", "will", "with"}
+
+def _lexeme(word: str) -> str:
+    """Crude stand-in for the english stemmer: lowercase and drop a plural "s"."""
+    word = word.lower()
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+def _parse_websearch(query: str) -> Tuple[List[List[List[str]]], List[List[str]]]:
+    """
+    Parse websearch_to_tsquery syntax into (clauses, excluded phrases).
+
+    Every clause (ANDed) is a list of alternatives (ORed); an alternative is a
+    phrase, i.e. a list of lexemes that must appear next to each other.
+    """
+    clauses: List[List[List[str]]] = []
+    excluded: List[List[str]] = []
+    pending_or = False
+    for match in _QUERY_TOKEN_RE.finditer(query):
+        negated = bool(match.group(1) or match.group(3))
+        raw = match.group(2) if match.group(2) is not None else match.group(4)
+        if match.group(4) is not None and raw.lower() == "or" and not negated:
+            pending_or = bool(clauses)
+            continue
+        phrase = [_lexeme(w) for w in _WORD_RE.findall(raw) if w.lower() not in _STOPWORDS]
+        if not phrase:
+            continue
+        if negated:
+            excluded.append(phrase)
+        elif pending_or:
+            clauses[-1].append(phrase)
+        else:
+            clauses.append([phrase])
+        pending_or = False
+    return clauses, excluded
+
+def _phrase_positions(tokens: List[str], phrase: List[str]) -> List[int]:
+    n = len(phrase)
+    return [i for i in range(len(tokens) - n + 1) if tokens[i:i + n] == phrase]
+
+class InMemoryFeedbackStore:
+    """Process-local feedback store with search semantics close to the PostgreSQL implementation."""
+
+    def __init__(self) -> None:
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, message: str, email: Optional[str]) -> FeedbackOut:
+        with self._lock:
+            row = {"id": len(self._rows) + 1, "message": message, "email": email,
+                   "created_at": datetime.now(timezone.utc)}
+            self._rows.append(row)
+        return self._to_out(row)
+
+    def all(self) -> List[FeedbackOut]:
+        with self._lock:
+            rows = list(self._rows)
+        return [self._to_out(row) for row in sorted(rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)]
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, int]]) -> List[FeedbackSearchHit]:
+        clauses, excluded = _parse_websearch(query)
+        if not clauses:
+            return []
+        hits: List[Tuple[float, int, Dict[str, Any], set]] = []
+        with self._lock:
+            rows = list(self._rows)
+        for row in rows:
+            words = _WORD_RE.findall(row["message"])
+            tokens = [_lexeme(w) for w in words]
+            if any(_phrase_positions(tokens, phrase) for phrase in excluded):
+                continue
+            marked: set = set()
+            covers = 0
+            for alternatives in clauses:
+                found = False
+                for phrase in alternatives:
+                    for start in _phrase_positions(tokens, phrase):
+                        found = True
+                        covers += 1
+                        marked.update(range(start, start + len(phrase)))
+                if not found:
+                    break
+            else:
+                # ts_rank_cd without normalization: 0.1 per matching cover (default weight D)
+                hits.append((round(covers * 0.1, 6), row["id"], row, marked))
+        hits.sort(key=lambda hit: (hit[0], hit[1]), reverse=True)
+        if after is not None:
+            hits = [hit for hit in hits if (hit[0], hit[1]) < after]
+        return [
+            FeedbackSearchHit(**self._to_out(row).model_dump(), rank=rank, snippet=self._headline(row["message"], marked))
+            for rank, _, row, marked in hits[:limit]
+        ]
+
+    @staticmethod
+    def _headline(message: str, marked: set, max_words: int = 35) -> str:
+        spans = list(_WORD_RE.finditer(message))
+        first = min(marked) if marked else 0
+        start = max(0, min(first - max_words // 3, len(spans) - max_words))
+        window = spans[start:start + max_words]
+        if not window:
+            return html.escape(message)
+        parts: List[str] = []
+        cursor = window[0].start()
+        for index, span in enumerate(window, start):
+            parts.append(html.escape(message[cursor:span.start()]))
+            word = html.escape(span.group())
+            parts.append(f"<mark>{word}</mark>" if index in marked else word)
+            cursor = span.end()
+        snippet = "".join(parts)
+        return ("… " if start > 0 else "") + snippet + (" …" if start + max_words < len(spans) else "")
+
+    @staticmethod
+    def _to_out(row: Dict[str, Any]) -> FeedbackOut:
+        return FeedbackOut(id=str(row["id"]), message=row["message"], email=row["email"],
+                           created_at=row["created_at"].isoformat())
+
+_memory_store = InMemoryFeedbackStore()
+
 async def submit_feedback_service(feedback: FeedbackIn) -> FeedbackOut:
     """
     Submit user feedback (async, production-safe).
@@ -47,6 +215,10 @@ async def submit_feedback_service(feedback: FeedbackIn) -> FeedbackOut:
     if not feedback.message or len(feedback.message.strip()) == 0:
         logger.warning("Feedback message cannot be empty.")
         raise FeedbackError("Feedback message cannot be empty.")
+    if not _use_database():
+        out = _memory_store.add(feedback.message, feedback.email)
+        logger.info(f"AUDIT: Feedback submitted (in-memory): {out.id}")
+        return out
     session_gen = get_async_session()
     session = await session_gen.__anext__()
     try:
@@ -73,6 +245,8 @@ async def get_feedback_service() -> List[FeedbackOut]:
     Raises:
         FeedbackError: On DB error.
     """
+    if not _use_database():
+        return _memory_store.all()
     session_gen = get_async_session()
     session = await session_gen.__anext__()
     try:
@@ -86,5 +260,87 @@ async def get_feedback_service() -> List[FeedbackOut]:
     finally:
         await session_gen.aclose()
 
+def build_search_statement(query: str, limit: int, after: Optional[Tuple[float, int]] = None):
+    """
+    Build the ranked full-text search over feedback.
+
+    The inner query finds and orders matches through the GIN index; highlights
+    (the costly part) are only computed for the rows of the requested page.
+
+    Args:
+        query (str): websearch_to_tsquery syntax.
+        limit (int): Rows to return.
+        after (tuple[float, int], optional): Keyset position (rank, id) from the previous page.
+
+    Returns:
+        Select: Rows of (Feedback, rank, snippet), best match first.
+    """
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(Feedback.search_vector, tsquery)
+    ranked = select(Feedback.id.label("id"), rank.label("rank")).where(Feedback.search_vector.op("@@")(tsquery))
+    if after is not None:
+        ranked = ranked.where(tuple_(rank, Feedback.id) < tuple_(*after))
+    ranked = ranked.order_by(rank.desc(), Feedback.id.desc()).limit(limit).subquery()
+    snippet = func.ts_headline(SEARCH_CONFIG, Feedback.message, tsquery, HEADLINE_OPTIONS)
+    return (
+        select(Feedback, ranked.c.rank, snippet.label("snippet"))
+        .join(ranked, ranked.c.id == Feedback.id)
+        .order_by(ranked.c.rank.desc(), Feedback.id.desc())
+    )
+
+def mark_snippet(headline: str) -> str:
+    """HTML-escape a ts_headline() result and wrap its matches in <mark> tags."""
+    return html.escape(headline).replace(HEADLINE_START, "<mark>").replace(HEADLINE_STOP, "</mark>")
+
+async def search_feedback_service(query: str, limit: int = 20, cursor: Optional[str] = None) -> FeedbackSearchOut:
+    """
+    Full-text search over feedback messages, best match first.
+
+    Args:
+        query (str): Search terms; supports "quoted phrases", ``or`` and ``-excluded`` words.
+        limit (int): Hits per page.
+        cursor (str, optional): ``next_cursor`` of the previous page.
+
+    Returns:
+        FeedbackSearchOut: Hits with rank and an HTML snippet (escaped message, matches in <mark>),
+            and the cursor of the next page (if any).
+
+    Raises:
+        FeedbackError: On an invalid cursor or DB error.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    if not _use_database():
+        hits = _memory_store.search(query, limit + 1, after)
+    else:
+        session_gen = get_async_session()
+        session = await session_gen.__anext__()
+        try:
+            result = await session.execute(build_search_statement(query, limit + 1, after))
+            hits = [
+                FeedbackSearchHit(**_feedback_to_out(fb).model_dump(), rank=rank, snippet=mark_snippet(snippet))
+                for fb, rank, snippet in result.all()
+            ]
+        except SQLAlchemyError as e:
+            logger.error(f"AUDIT: Feedback search DB error: {e}")
+            raise FeedbackError("Database error while searching feedback.")
+        finally:
+            await session_gen.aclose()
+    next_cursor = encode_cursor(hits[limit - 1].rank, int(hits[limit - 1].id)) if len(hits) > limit else None
+    logger.info(f"AUDIT: Feedback searched: hits={min(len(hits), limit)} more={next_cursor is not None}")
+    return FeedbackSearchOut(results=hits[:limit], next_cursor=next_cursor)
+
+async def ensure_search_schema() -> None:
+    """Add the search column and GIN index to an existing feedback table (startup; errors are logged)."""
+    try:
+        engine = get_engine()
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for statement in SEARCH_SCHEMA_DDL:
+                await conn.execute(text(statement))
+        logger.info("Feedback search column and index ensured")
+    except Exception as e:
+        logger.error(f"Could not ensure feedback search schema: {e}")
+
 # Export only the functions used by controllers
-__all__ = ["submit_feedback_service", "get_feedback_service", "FeedbackError"]
+__all__ = ["submit_feedback_service", "get_feedback_service", "search_feedback_service", "ensure_search_schema",
+           "FeedbackError"]
@@ -9,17 +9,112 @@ FFmpeg Service Layer (Refactored)
 """
 
 import logging
-from typing import Dict, Any
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import ffmpeg
 import os
+import shutil
+from .encoding_profiles import EncodingProfile, PROFILES
+from .caption_service import burn_in
+from .reframe_service import apply_reframe
+from .preview_service import PreviewSpec, attach_previews, preview_branch_count, write_sprite_vtt
+from ..utils.tracing import span
 
 logger = logging.getLogger("ffmpeg_service")
 
+STDERR_TAIL = 2000
+
 class FFmpegServiceError(Exception):
-    """Custom exception for FFmpegService errors."""
-    pass
+    """Custom exception for FFmpegService errors; ``stderr`` holds the tail of ffmpeg's output."""
+
+    def __init__(self, message: str, stderr: str = "") -> None:
+        super().__init__(message)
+        self.stderr = stderr
+
+    def __reduce__(self):
+        # Keep stderr when raised in a ProcessPoolExecutor worker (segment encodes)
+        return type(self), (str(self), self.stderr)
+
+def _stderr_of(error: Exception) -> str:
+    return (getattr(error, "stderr", None) or b"").decode(errors="replace")[-STDERR_TAIL:]
+
+def partial_output_path(output_path: str) -> str:
+    """Return the in-progress path for an output file (keeps the extension for format detection)."""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.part{ext}"
+
+def _remove_partials(*paths: str) -> None:
+    """Delete in-progress outputs left by a failed encode."""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def ffmpeg_thread_budget() -> Optional[int]:
+    """
+    Return the ffmpeg thread budget for this process.
+
+    The worker supervisor exports FFMPEG_THREADS per job slot; None leaves
+    ffmpeg's default (one thread per core).
+    """
+    threads = int(os.environ.get("FFMPEG_THREADS") or 0)
+    return threads or None
+
+def probe_dimensions(input_path: str) -> Tuple[int, int]:
+    """
+    Return (width, height) of the first video stream.
+
+    Raises:
+        FFmpegServiceError: If probing fails or there is no video stream.
+    """
+    try:
+        with span("probe", {"probe.file": os.path.basename(input_path)}):
+            probe = ffmpeg.probe(input_path, select_streams='v:0', show_entries='stream=width,height')
+        stream = probe["streams"][0]
+        return int(stream["width"]), int(stream["height"])
+    except (ffmpeg.Error, KeyError, IndexError) as e:
+        raise FFmpegServiceError(f"FFprobe error: {e}", _stderr_of(e))
+
+def _clip_video(video: Any, reframe: Optional[Dict[str, Any]] = None, captions: Optional[str] = None,
+                offset: float = 0) -> Any:
+    """
+    Apply the per-clip video stages (reframe crop, then caption burn-in).
+
+    Both are timed in clip time; ``offset`` is the clip time of the stream's
+    first frame (segment encodes), applied by shifting timestamps around them.
+    """
+    if not (reframe or captions):
+        return video
+    if offset:
+        video = video.filter('setpts', f"PTS+{offset}/TB")
+    if reframe:
+        video = apply_reframe(video, reframe)
+    if captions:
+        video = burn_in(video, captions)
+    if offset:
+        video = video.filter('setpts', f"PTS-{offset}/TB")
+    return video
+
+def _split_video(video: Any, branches: int, previews: Optional[PreviewSpec]) -> Tuple[List[Any], List[Any]]:
+    """
+    Split the decoded video into ``branches`` streams for encoded outputs, plus
+    preview outputs fed from the same decode.
+
+    Returns:
+        tuple[list, list]: (video branches for the caller, preview output nodes).
+    """
+    extra = preview_branch_count(previews) if previews else 0
+    if branches == 1 and not extra:
+        return [video], []
+    split = video.filter_multi_output('split', branches + extra)
+    streams = [split[i] for i in range(branches + extra)]
+    outputs = attach_previews(streams[branches:], previews) if previews else []
+    return streams[:branches], outputs
 
-def process_video(input_path: str, output_path: str, start: int = 0, duration: int = 60) -> Dict[str, Any]:
+def process_video(input_path: str, output_path: str, start: int = 0, duration: int = 60,
+                  threads: Optional[int] = None, profile: Optional[EncodingProfile] = None,
+                  previews: Optional[PreviewSpec] = None, captions: Optional[str] = None,
+                  reframe: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Process a video file using FFmpeg.
 
@@ -28,6 +123,184 @@ def process_video(input_path: str, output_path: str, start: int = 0, duration: i
         output_path (str): Path to the output video file.
         start (int): Start time in seconds.
         duration (int): Duration in seconds.
+        threads (int, optional): ffmpeg thread budget; defaults to ffmpeg_thread_budget().
+        profile (EncodingProfile, optional): x264 preset/CRF; defaults to "balanced".
+        previews (PreviewSpec, optional): Poster/sprite/WebP outputs from the same decode.
+        captions (str, optional): Compiled ASS file burned into the clip (not the previews).
+        reframe (dict, optional): ReframePlan.to_dict(); the crop also applies to the previews.
+
+    Returns:
+        dict[str, Any]: On success: {"success": True, "output": str, "profile": str}.
+
+    Raises:
+        FFmpegServiceError: If FFmpeg processing fails.
+    """
+    # Encode to a partial file and rename on success, so an encode interrupted by a
+    # worker drain never leaves a truncated file at the final path.
+    partial_path = partial_output_path(output_path)
+    threads = threads or ffmpeg_thread_budget()
+    thread_args = {"threads": threads} if threads else {}
+    profile = profile or PROFILES["balanced"]
+    try:
+        logger.info(f"Processing video: {input_path} -> {output_path}, start={start}, duration={duration}, threads={threads or 'auto'}, profile={profile.name}")
+        source = ffmpeg.input(input_path, ss=start, t=duration)
+        (video,), preview_outputs = _split_video(_clip_video(source.video, reframe=reframe), 1, previews)
+        video = _clip_video(video, captions=captions)
+        main = ffmpeg.output(video, source['a?'], partial_path, strict='experimental', movflags='+faststart',
+                             **profile.output_args(), **thread_args)
+        ffmpeg.merge_outputs(main, *preview_outputs).overwrite_output().run(capture_stderr=True)
+        os.replace(partial_path, output_path)
+        if previews:
+            write_sprite_vtt(previews)
+        logger.info(f"Video processed successfully: {output_path}")
+        return {"success": True, "output": output_path, "profile": profile.name}
+    except ffmpeg.Error as e:
+        _remove_partials(partial_path)
+        stderr = _stderr_of(e)
+        logger.error(f"FFmpeg error: {stderr}")
+        raise FFmpegServiceError(f"FFmpeg error: {e}", stderr)
+
+def process_video_renditions(input_path: str, renditions: List[Dict[str, Any]], start: float = 0,
+                             duration: float = 60, threads: Optional[int] = None,
+                             profile: Optional[EncodingProfile] = None,
+                             previews: Optional[PreviewSpec] = None,
+                             reframe: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Encode several sizes of one clip from a single decode (split + scale/crop filter graph).
+
+    Args:
+        input_path (str): Path to the input video file.
+        renditions (list[dict]): [{"name": str, "width": int, "height": int, "output": str}, ...].
+            Each rendition is scaled to cover the frame and center-cropped to the exact size.
+            An optional "captions" entry (ASS file compiled for that size) is burned in after scaling.
+        start (float): Start time in seconds.
+        duration (float): Duration in seconds.
+        threads (int, optional): ffmpeg thread budget; defaults to ffmpeg_thread_budget().
+        profile (EncodingProfile, optional): x264 preset/CRF for every rendition; defaults to "balanced".
+        previews (PreviewSpec, optional): Poster/sprite/WebP outputs from the same decode.
+        reframe (dict, optional): ReframePlan.to_dict(), applied once before the split.
+
+    Returns:
+        dict[str, Any]: On success: {"success": True, "outputs": {name: path}, "profile": str}.
+
+    Raises:
+        FFmpegServiceError: If FFmpeg processing fails.
+    """
+    threads = threads or ffmpeg_thread_budget()
+    thread_args = {"threads": threads} if threads else {}
+    profile = profile or PROFILES["balanced"]
+    source = ffmpeg.input(input_path, ss=start, t=duration)
+    branches, outputs = _split_video(_clip_video(source.video, reframe=reframe), len(renditions), previews)
+    for i, rendition in enumerate(renditions):
+        width, height = rendition["width"], rendition["height"]
+        video = (
+            branches[i]
+            .filter('scale', width, height, force_original_aspect_ratio='increase')
+            .filter('crop', width, height)
+            .filter('setsar', 1)
+        )
+        video = _clip_video(video, captions=rendition.get("captions"))
+        outputs.append(ffmpeg.output(video, source['a?'], partial_output_path(rendition["output"]),
+                                     strict='experimental', movflags='+faststart',
+                                     **profile.output_args(), **thread_args))
+    try:
+        logger.info(f"Processing {len(renditions)} renditions: {input_path}, start={start}, duration={duration}, profile={profile.name}")
+        ffmpeg.merge_outputs(*outputs).overwrite_output().run(quiet=True)
+    except ffmpeg.Error as e:
+        _remove_partials(*(partial_output_path(r["output"]) for r in renditions))
+        stderr = _stderr_of(e)
+        logger.error(f"FFmpeg renditions error: {stderr}")
+        raise FFmpegServiceError(f"FFmpeg renditions error: {stderr}", stderr)
+    for rendition in renditions:
+        os.replace(partial_output_path(rendition["output"]), rendition["output"])
+    if previews:
+        write_sprite_vtt(previews)
+    return {"success": True, "outputs": {r["name"]: r["output"] for r in renditions}, "profile": profile.name}
+
+def list_keyframes(input_path: str, start: float, end: float) -> List[float]:
+    """
+    List video keyframe timestamps in [start, end] using ffprobe (keyframes only are decoded).
+
+    Args:
+        input_path (str): Path to the input video file.
+        start (float): Window start in seconds.
+        end (float): Window end in seconds.
+
+    Returns:
+        list[float]: Sorted keyframe times.
+
+    Raises:
+        FFmpegServiceError: If probing fails.
+    """
+    try:
+        probe = ffmpeg.probe(
+            input_path, select_streams='v:0', skip_frame='nokey',
+            show_entries='frame=pts_time,best_effort_timestamp_time', read_intervals=f"{start}%{end}",
+        )
+    except ffmpeg.Error as e:
+        logger.error(f"FFprobe error: {e}")
+        raise FFmpegServiceError(f"FFprobe error: {e}", _stderr_of(e))
+    times = []
+    for frame in probe.get("frames", []):
+        value = frame.get("pts_time", frame.get("best_effort_timestamp_time"))
+        if value not in (None, "N/A") and start <= float(value) <= end:
+            times.append(float(value))
+    return sorted(set(times))
+
+def encode_video_segment(input_path: str, output_path: str, start: float, duration: float,
+                         threads: Optional[int] = None, profile: Optional[EncodingProfile] = None,
+                         captions: Optional[str] = None, clip_offset: float = 0,
+                         reframe: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Encode the video stream of one segment (no audio) for later concatenation.
+
+    Args:
+        input_path (str): Path to the input video file.
+        output_path (str): Path to the segment file.
+        start (float): Segment start in seconds.
+        duration (float): Segment duration in seconds.
+        threads (int, optional): ffmpeg thread budget.
+        profile (EncodingProfile, optional): x264 preset/CRF; defaults to "balanced".
+        captions (str, optional): Compiled ASS file for the whole clip.
+        reframe (dict, optional): ReframePlan.to_dict() for the whole clip.
+        clip_offset (float): Position of this segment within the clip, to line captions and crop path up.
+
+    Returns:
+        dict[str, Any]: On success: {"success": True, "output": str}.
+
+    Raises:
+        FFmpegServiceError: If FFmpeg processing fails.
+    """
+    partial_path = partial_output_path(output_path)
+    profile = profile or PROFILES["balanced"]
+    video_args = {k: v for k, v in profile.output_args().items() if k in ("vcodec", "preset", "crf")}
+    if threads:
+        video_args["threads"] = threads
+    try:
+        video = ffmpeg.input(input_path, ss=start, t=duration).video
+        video = _clip_video(video, reframe=reframe, captions=captions, offset=clip_offset)
+        ffmpeg.output(video, partial_path, **video_args).overwrite_output().run(quiet=True)
+        os.replace(partial_path, output_path)
+        return {"success": True, "output": output_path}
+    except ffmpeg.Error as e:
+        logger.error(f"FFmpeg segment error: {e}")
+        raise FFmpegServiceError(f"FFmpeg segment error: {e}", _stderr_of(e))
+
+def concat_segments(segment_paths: List[str], audio_source: str, output_path: str, start: float, duration: float,
+                    profile: Optional[EncodingProfile] = None) -> Dict[str, Any]:
+    """
+    Losslessly join encoded video segments with the concat demuxer and add the window's audio.
+
+    Audio is encoded once for the whole window rather than per segment, so there
+    are no AAC priming gaps at segment boundaries.
+
+    Args:
+        segment_paths (list[str]): Segment files in order.
+        audio_source (str): Original input file to take audio from.
+        output_path (str): Path to the output video file.
+        start (float): Window start in the source, in seconds.
+        duration (float): Window duration in seconds.
+        profile (EncodingProfile, optional): Supplies the audio bitrate.
 
     Returns:
         dict[str, Any]: On success: {"success": True, "output": str}.
@@ -35,20 +308,110 @@ def process_video(input_path: str, output_path: str, start: int = 0, duration: i
     Raises:
         FFmpegServiceError: If FFmpeg processing fails.
     """
+    profile = profile or PROFILES["balanced"]
+    list_path = f"{output_path}.concat.txt"
+    partial_path = partial_output_path(output_path)
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
     try:
-        logger.info(f"Processing video: {input_path} -> {output_path}, start={start}, duration={duration}")
+        video = ffmpeg.input(list_path, f='concat', safe=0)
+        audio = ffmpeg.input(audio_source, ss=start, t=duration)
         (
             ffmpeg
-            .input(input_path, ss=start, t=duration)
-            .output(output_path, vcodec='libx264', acodec='aac', strict='experimental')
+            .output(video.video, audio['a?'], partial_path, vcodec='copy', acodec='aac',
+                    audio_bitrate=profile.audio_bitrate, movflags='+faststart', shortest=None)
             .overwrite_output()
-            .run()
+            .run(quiet=True)
         )
-        logger.info(f"Video processed successfully: {output_path}")
+        os.replace(partial_path, output_path)
         return {"success": True, "output": output_path}
     except ffmpeg.Error as e:
-        logger.error(f"FFmpeg error: {e}")
-        raise FFmpegServiceError(f"FFmpeg error: {e}")
+        logger.error(f"FFmpeg concat error: {e}")
+        raise FFmpegServiceError(f"FFmpeg concat error: {e}", _stderr_of(e))
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+def process_video_hls(input_path: str, output_dir: str, start: float = 0, duration: float = 60,
+                      segment_seconds: float = 4, threads: Optional[int] = None,
+                      profile: Optional[EncodingProfile] = None,
+                      on_segment: Optional[Callable[[str], None]] = None,
+                      previews: Optional[PreviewSpec] = None, captions: Optional[str] = None,
+                      reframe: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Encode a clip as HLS: fMP4 segments plus an EVENT playlist that grows as segments finish.
+
+    Segments and the playlist are written to temporary names and renamed when
+    complete, so readers only ever see whole files and playback can start after
+    the first segment.
+
+    Args:
+        input_path (str): Path to the input video file.
+        output_dir (str): Directory for index.m3u8, init.mp4 and seg_NNNNN.m4s.
+        start (float): Start time in seconds.
+        duration (float): Duration in seconds.
+        segment_seconds (float): Target segment duration (keyframes are forced at this interval).
+        threads (int, optional): ffmpeg thread budget; defaults to ffmpeg_thread_budget().
+        profile (EncodingProfile, optional): x264 preset/CRF; defaults to "balanced".
+        on_segment (Callable[[str], None], optional): Called with each finished segment file name, in order.
+        previews (PreviewSpec, optional): Poster/sprite/WebP outputs from the same decode.
+        captions (str, optional): Compiled ASS file burned into the clip (not the previews).
+        reframe (dict, optional): ReframePlan.to_dict(); the crop also applies to the previews.
+
+    Returns:
+        dict[str, Any]: On success: {"success": True, "output": playlist path, "segments": list[str]}.
+
+    Raises:
+        FFmpegServiceError: If FFmpeg processing fails.
+    """
+    # Start clean: a re-queued job must not republish segments from an earlier attempt
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir, exist_ok=True)
+    threads = threads or ffmpeg_thread_budget()
+    thread_args = {"threads": threads} if threads else {}
+    profile = profile or PROFILES["balanced"]
+    playlist = os.path.join(output_dir, "index.m3u8")
+    logger.info(f"Processing video to HLS: {input_path} -> {output_dir}, start={start}, duration={duration}, profile={profile.name}")
+    source = ffmpeg.input(input_path, ss=start, t=duration)
+    (video,), preview_outputs = _split_video(_clip_video(source.video, reframe=reframe), 1, previews)
+    video = _clip_video(video, captions=captions)
+    main = ffmpeg.output(
+        video, source['a?'], playlist, format='hls', hls_time=segment_seconds, hls_playlist_type='event',
+        hls_segment_type='fmp4', hls_fmp4_init_filename='init.mp4',
+        hls_segment_filename=os.path.join(output_dir, 'seg_%05d.m4s'),
+        hls_flags='independent_segments+temp_file',
+        force_key_frames=f"expr:gte(t,n_forced*{segment_seconds})",
+        **profile.output_args(), **thread_args,
+    )
+    process = ffmpeg.merge_outputs(main, *preview_outputs).overwrite_output().run_async(pipe_stderr=True)
+    seen: List[str] = []
+
+    def publish_new_segments() -> None:
+        finished = sorted(name for name in os.listdir(output_dir) if name.startswith("seg_") and name.endswith(".m4s"))
+        for name in finished[len(seen):]:
+            seen.append(name)
+            if on_segment:
+                on_segment(name)
+
+    # Drain stderr in the background so a chatty ffmpeg never blocks on a full pipe
+    stderr_chunks: List[bytes] = []
+    reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    reader.start()
+    while process.poll() is None:
+        publish_new_segments()
+        time.sleep(0.25)
+    reader.join()
+    if process.returncode != 0:
+        stderr = b"".join(stderr_chunks).decode(errors="replace")[-STDERR_TAIL:]
+        logger.error(f"FFmpeg HLS error: {stderr}")
+        raise FFmpegServiceError(f"FFmpeg HLS error: {stderr}", stderr)
+    publish_new_segments()
+    if previews:
+        write_sprite_vtt(previews)
+    logger.info(f"HLS output ready: {playlist} ({len(seen)} segments)")
+    return {"success": True, "output": playlist, "segments": seen}
 
 # Test block for service sanity (not for production)
 if __name__ == "__main__":
@@ -0,0 +1,260 @@
+"""
+Highlight Service Layer
+
+- Finds the most "clip-worthy" windows of a source video so users do not have
+  to pick start_time/end_time by hand.
+- Two ffmpeg processes stream decoded media into NumPy at the same time: mono
+  16 kHz PCM and tiny grayscale frames at ANALYSIS_FPS. Both are consumed in
+  fixed-size chunks, so memory stays bounded whatever the source length.
+- Per ANALYSIS_STEP we compute a loudness envelope (RMS dBFS), motion energy
+  (mean absolute frame difference) and a scene-change score (histogram
+  distance between consecutive frames), all vectorized per chunk.
+- The signals are stored per video (float16, Redis); ranking windows of any
+  length from them is a cumulative-sum pass plus greedy non-maximum
+  suppression, cheap enough to run on every request.
+"""
+
+import io
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+import ffmpeg
+import numpy as np
+from ..config import settings
+
+logger = logging.getLogger("highlight_service")
+
+ANALYSIS_FPS = 4
+ANALYSIS_STEP = 1 / ANALYSIS_FPS
+AUDIO_RATE = 16000
+FRAME_WIDTH = 64
+FRAME_HEIGHT = 36
+HISTOGRAM_BINS = 32
+CHUNK_STEPS = 256
+SCENE_SMOOTH_SECONDS = 2
+WEIGHTS = {"loudness": 0.5, "motion": 0.3, "scene": 0.2}
+SIGNALS = tuple(WEIGHTS)
+
+class HighlightServiceError(Exception):
+    """Custom exception for HighlightService errors."""
+    pass
+
+def _stream(path: str, output_kwargs: Dict[str, Any], frame_bytes: int,
+            consume: Callable[[bytes], None]) -> None:
+    """Run ffmpeg to a pipe and hand ``consume`` chunks of CHUNK_STEPS * frame_bytes bytes."""
+    process = (
+        ffmpeg.input(path)
+        .output('pipe:', **output_kwargs)
+        .global_args('-loglevel', 'error', '-nostdin')
+        .run_async(pipe_stdout=True)
+    )
+    try:
+        while True:
+            data = process.stdout.read(CHUNK_STEPS * frame_bytes)
+            if not data:
+                break
+            consume(data)
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise HighlightServiceError(f"ffmpeg exited with code {process.returncode} while analysing {path}")
+
+def loudness_envelope(path: str) -> np.ndarray:
+    """
+    RMS loudness (dBFS) of a file's audio per ANALYSIS_STEP.
+
+    Returns:
+        np.ndarray: float32 array, one value per step (empty if the file has no audio).
+    """
+    hop = int(AUDIO_RATE * ANALYSIS_STEP)
+    parts: List[np.ndarray] = []
+    tail = b""
+
+    def consume(data: bytes) -> None:
+        nonlocal tail
+        data = tail + data
+        usable = len(data) // (hop * 2) * hop * 2
+        tail = data[usable:]
+        if usable:
+            blocks = np.frombuffer(data[:usable], dtype="<i2").reshape(-1, hop).astype(np.float32) / 32768
+            parts.append(10 * np.log10(np.mean(blocks * blocks, axis=1) + 1e-10))
+
+    _stream(path, {"format": "s16le", "ac": 1, "ar": AUDIO_RATE, "vn": None, "sn": None}, hop * 2, consume)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+def frame_activity(path: str) -> Dict[str, np.ndarray]:
+    """
+    Motion energy and scene-change score per ANALYSIS_STEP from downscaled grayscale frames.
+
+    Returns:
+        dict[str, np.ndarray]: {"motion": float32 array, "scene": float32 array}, both in [0, 1].
+    """
+    pixels = FRAME_WIDTH * FRAME_HEIGHT
+    motion: List[np.ndarray] = []
+    scene: List[np.ndarray] = []
+    previous: Dict[str, Optional[np.ndarray]] = {"frame": None, "hist": None}
+    tail = b""
+
+    def consume(data: bytes) -> None:
+        nonlocal tail
+        data = tail + data
+        usable = len(data) // pixels * pixels
+        tail = data[usable:]
+        if not usable:
+            return
+        frames = np.frombuffer(data[:usable], dtype=np.uint8).reshape(-1, pixels)
+        count = len(frames)
+        bins = (frames >> (8 - int(np.log2(HISTOGRAM_BINS)))).astype(np.int64)
+        bins += (np.arange(count) * HISTOGRAM_BINS)[:, None]
+        hists = np.bincount(bins.ravel(), minlength=count * HISTOGRAM_BINS)
+        hists = hists.reshape(count, HISTOGRAM_BINS).astype(np.float32) / pixels
+        # Prepend the last frame of the previous chunk so differences span chunk borders
+        frames_i = frames.astype(np.int16)
+        if previous["frame"] is None:
+            prev_frames, prev_hists = frames_i[:1], hists[:1]
+        else:
+            prev_frames, prev_hists = previous["frame"], previous["hist"]
+        frames_i = np.concatenate([prev_frames, frames_i])
+        hists_all = np.concatenate([prev_hists, hists])
+        motion.append(np.abs(np.diff(frames_i, axis=0)).mean(axis=1).astype(np.float32) / 255)
+        scene.append(0.5 * np.abs(np.diff(hists_all, axis=0)).sum(axis=1))
+        previous["frame"], previous["hist"] = frames_i[-1:], hists[-1:]
+
+    _stream(path, {"format": "rawvideo", "pix_fmt": "gray", "an": None, "sn": None,
+                   "vf": f"fps={ANALYSIS_FPS},scale={FRAME_WIDTH}:{FRAME_HEIGHT}"}, pixels, consume)
+    empty = np.zeros(0, dtype=np.float32)
+    return {"motion": np.concatenate(motion) if motion else empty,
+            "scene": np.concatenate(scene) if scene else empty}
+
+def analyze_signals(path: str) -> np.ndarray:
+    """
+    Decode audio and video concurrently and return the aligned signals.
+
+    Args:
+        path (str): Source video.
+
+    Returns:
+        np.ndarray: float32 array of shape (len(SIGNALS), steps); a missing
+        stream's rows are filled with silence / no motion.
+
+    Raises:
+        HighlightServiceError: If decoding fails.
+    """
+    try:
+        streams = {s.get("codec_type") for s in ffmpeg.probe(path).get("streams", [])}
+    except ffmpeg.Error as e:
+        raise HighlightServiceError(f"FFprobe error: {e}")
+    empty = np.zeros(0, dtype=np.float32)
+    results: Dict[str, Any] = {"loudness": empty, "motion": empty, "scene": empty}
+
+    def run_audio() -> None:
+        try:
+            results["loudness"] = loudness_envelope(path)
+        except Exception as e:
+            results["audio_error"] = e
+
+    audio_thread = threading.Thread(target=run_audio, daemon=True)
+    if "audio" in streams:
+        audio_thread.start()
+    if "video" in streams:
+        results.update(frame_activity(path))
+    if audio_thread.is_alive():
+        audio_thread.join()
+    if "audio_error" in results:
+        raise HighlightServiceError(f"Audio analysis failed: {results['audio_error']}")
+    steps = max(len(results[name]) for name in SIGNALS)
+    if steps == 0:
+        raise HighlightServiceError(f"No audio or video decoded from {path}")
+    aligned = np.empty((len(SIGNALS), steps), dtype=np.float32)
+    for row, name in enumerate(SIGNALS):
+        values = results[name][:steps]
+        fill = values.min() if len(values) else (-100.0 if name == "loudness" else 0.0)
+        aligned[row, :len(values)] = values
+        aligned[row, len(values):] = fill
+    return aligned
+
+def _robust_z(values: np.ndarray) -> np.ndarray:
+    median = np.median(values)
+    spread = 1.4826 * np.median(np.abs(values - median))
+    if spread < 1e-6:
+        spread = values.std() or 1.0
+    return np.clip((values - median) / spread, -3, 5)
+
+def rank_windows(signals: np.ndarray, clip_seconds: float, count: int = 5,
+                 max_overlap: float = 0.25) -> List[Dict[str, float]]:
+    """
+    Rank candidate clip windows by their mean combined score.
+
+    Args:
+        signals (np.ndarray): Output of analyze_signals (or load_signals).
+        clip_seconds (float): Window length.
+        count (int): Number of windows to return.
+        max_overlap (float): Largest allowed overlap between returned windows, as a fraction of clip_seconds.
+
+    Returns:
+        list[dict]: Best first: start_time, end_time, score, loudness_db, motion, scene_changes.
+    """
+    steps = signals.shape[1]
+    width = max(1, min(steps, int(round(clip_seconds / ANALYSIS_STEP))))
+    loudness, motion, scene = (signals[SIGNALS.index(name)].astype(np.float64) for name in SIGNALS)
+    smooth = max(1, int(SCENE_SMOOTH_SECONDS / ANALYSIS_STEP))
+    scene_density = np.convolve(scene, np.ones(smooth), mode="same")
+    combined = (WEIGHTS["loudness"] * _robust_z(loudness) + WEIGHTS["motion"] * _robust_z(motion)
+                + WEIGHTS["scene"] * _robust_z(scene_density))
+
+    def window_sums(values: np.ndarray) -> np.ndarray:
+        cumsum = np.concatenate([[0.0], np.cumsum(values)])
+        return cumsum[width:] - cumsum[:-width]
+
+    scores = window_sums(combined) / width
+    loud_mean = window_sums(loudness) / width
+    motion_mean = window_sums(motion) / width
+    cuts = window_sums((scene > 0.3).astype(np.float64))
+    min_distance = width * (1 - max_overlap)
+    chosen: List[int] = []
+    for start in np.argsort(-scores, kind="stable"):
+        if all(abs(int(start) - other) >= min_distance for other in chosen):
+            chosen.append(int(start))
+            if len(chosen) == count:
+                break
+    return [
+        {
+            "start_time": round(start * ANALYSIS_STEP, 2),
+            "end_time": round((start + width) * ANALYSIS_STEP, 2),
+            "score": round(float(scores[start]), 3),
+            "loudness_db": round(float(loud_mean[start]), 1),
+            "motion": round(float(motion_mean[start]), 4),
+            "scene_changes": int(cuts[start]),
+        }
+        for start in chosen
+    ]
+
+def signals_key(video_id: str) -> str:
+    """Redis key holding a video's analysed signals."""
+    return f"video:highlights:{video_id}"
+
+def store_signals(conn, video_id: str, signals: np.ndarray) -> None:
+    """Store signals as a compact float16 .npy blob."""
+    buffer = io.BytesIO()
+    np.save(buffer, signals.astype(np.float16), allow_pickle=False)
+    conn.set(signals_key(video_id), buffer.getvalue(), ex=settings.HIGHLIGHTS_CACHE_TTL)
+
+def load_signals(conn, video_id: str) -> Optional[np.ndarray]:
+    """Return stored signals for a video, or None if it has not been analysed."""
+    raw = conn.get(signals_key(video_id))
+    if not raw:
+        return None
+    return np.load(io.BytesIO(raw), allow_pickle=False).astype(np.float32)
+
+# Test block for service sanity (not for production)
+if __name__ == "__main__":
+    import sys
+    import time
+    try:
+        started = time.monotonic()
+        data = analyze_signals(sys.argv[1])
+        print(f"{data.shape[1] * ANALYSIS_STEP:.0f}s analysed in {time.monotonic() - started:.1f}s")
+        for window in rank_windows(data, 30):
+            print(window)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
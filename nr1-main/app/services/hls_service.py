@@ -0,0 +1,159 @@
+"""
+HLS Service Layer
+
+- Locates and validates HLS output (index.m3u8, init.mp4, seg_NNNNN.m4s) for a job.
+- Only known file names inside a job's own directory can be served, so requests
+  cannot escape VIDEO_STORAGE_PATH.
+- Publishes segments as they finish: to S3 when a bucket is configured
+  (segment first, then a playlist trimmed to the segments already uploaded),
+  otherwise they are served from local storage by the /hls route.
+"""
+
+import logging
+import os
+import re
+import tempfile
+from typing import List, Optional
+from ..config import settings
+from .s3_service import get_public_url, upload_file_to_s3
+
+logger = logging.getLogger("hls_service")
+
+PLAYLIST_NAME = "index.m3u8"
+INIT_NAME = "init.mp4"
+JOB_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+FILENAME_RE = re.compile(r"^(index\.m3u8|init\.mp4|seg_\d{5}\.m4s)$")
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+}
+SEGMENT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PLAYLIST_CACHE_CONTROL = "no-cache"
+
+class HLSServiceError(Exception):
+    """Custom exception for HLSService errors."""
+    pass
+
+def hls_dir_for(job_id: str) -> str:
+    """Local directory holding a job's HLS output."""
+    return os.path.join(settings.VIDEO_STORAGE_PATH, "hls", job_id)
+
+def hls_key_for(job_id: str, filename: str) -> str:
+    """S3 key of one HLS file."""
+    return f"hls/{job_id}/{filename}"
+
+def hls_url_for(job_id: str, filename: str = PLAYLIST_NAME) -> str:
+    """Public URL of one HLS file (S3 when configured, else the API route)."""
+    if settings.AWS_S3_BUCKET:
+        return get_public_url(hls_key_for(job_id, filename))
+    return f"/api/v1/videos/hls/{job_id}/{filename}"
+
+def content_type_for(filename: str) -> str:
+    """Content-Type for an HLS file name."""
+    return CONTENT_TYPES[os.path.splitext(filename)[1]]
+
+def cache_control_for(filename: str) -> str:
+    """Segments never change; the EVENT playlist grows while encoding, so it is revalidated."""
+    return PLAYLIST_CACHE_CONTROL if filename == PLAYLIST_NAME else SEGMENT_CACHE_CONTROL
+
+def resolve_hls_file(job_id: str, filename: str) -> str:
+    """
+    Return the local path of an HLS file after validating both path components.
+
+    Args:
+        job_id (str): Job ID.
+        filename (str): HLS file name.
+
+    Returns:
+        str: Existing file path.
+
+    Raises:
+        HLSServiceError: If the name is invalid or the file does not exist (yet).
+    """
+    if not JOB_ID_RE.match(job_id) or not FILENAME_RE.match(filename):
+        raise HLSServiceError("Invalid HLS path")
+    path = os.path.join(hls_dir_for(job_id), filename)
+    if not os.path.isfile(path):
+        raise HLSServiceError(f"HLS file not found: {job_id}/{filename}")
+    return path
+
+def trim_playlist(text: str, segments: List[str]) -> str:
+    """
+    Cut a media playlist before the first segment not in ``segments``.
+
+    Args:
+        text (str): Playlist text.
+        segments (list[str]): Segment file names that may be listed.
+
+    Returns:
+        str: The playlist listing only those segments; EXT-X-ENDLIST is kept only if nothing was cut.
+    """
+    allowed = set(segments)
+    kept: List[str] = []
+    pending: List[str] = []
+    for line in text.splitlines():
+        if not line.startswith("#") and line.strip():
+            if line.strip() not in allowed:
+                return "\n".join(kept) + "\n"
+            kept.extend(pending)
+            kept.append(line)
+            pending = []
+        elif line.startswith("#EXTINF") or pending:
+            # Tags from EXTINF up to the URI belong to that segment
+            pending.append(line)
+        else:
+            kept.append(line)
+    return "\n".join(kept + pending) + "\n"
+
+class HLSPublisher:
+    """
+    Publish HLS files for one job as segments complete.
+
+    Args:
+        job_id (str): Job ID.
+        upload (bool, optional): Upload to S3; defaults to whether a bucket is configured.
+    """
+
+    def __init__(self, job_id: str, upload: Optional[bool] = None) -> None:
+        self.job_id = job_id
+        self.directory = hls_dir_for(job_id)
+        self.upload = bool(settings.AWS_S3_BUCKET) if upload is None else upload
+        self.published = 0
+        self.uploaded: List[str] = []
+
+    def _upload(self, filename: str, path: Optional[str] = None) -> None:
+        upload_file_to_s3(
+            path or os.path.join(self.directory, filename), hls_key_for(self.job_id, filename),
+            content_type=content_type_for(filename), cache_control=cache_control_for(filename),
+        )
+
+    def _upload_playlist(self) -> None:
+        """Upload ffmpeg's playlist trimmed to the segments already uploaded."""
+        # ffmpeg may list a segment before the poll loop has seen (and uploaded) it
+        with open(os.path.join(self.directory, PLAYLIST_NAME)) as f:
+            text = trim_playlist(f.read(), self.uploaded)
+        fd, path = tempfile.mkstemp(prefix=".playlist-", dir=self.directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            self._upload(PLAYLIST_NAME, path)
+        finally:
+            os.remove(path)
+
+    def on_segment(self, filename: str) -> None:
+        """Publish a finished segment (and the init segment before the first one)."""
+        if self.upload:
+            if self.published == 0:
+                self._upload(INIT_NAME)
+            self._upload(filename)
+            self.uploaded.append(filename)
+            self._upload_playlist()
+        self.published += 1
+
+    def finish(self) -> str:
+        """Publish the final playlist (with EXT-X-ENDLIST) and return its URL."""
+        if self.upload:
+            self._upload_playlist()
+        logger.info(f"HLS for job {self.job_id} published: {self.published} segments")
+        return hls_url_for(self.job_id)
@@ -8,9 +8,11 @@ I18n Service Layer
 - TODO: Replace in-memory store with persistent database for production.
 """
 
-from typing import Dict
+from typing import Dict, Optional
 
+from app.config import settings
 from app.schemas import SetLanguageIn, SetLanguageOut, TranslationsOut
+from app.services.cache_service import cached
 
 class I18nError(Exception):
     """Custom exception for i18n service errors."""
@@ -20,6 +22,19 @@ class I18nError(Exception):
 _fake_language = "en"
 _fake_translations = {"en": {"hello": "Hello", "bye": "Goodbye"}, "es": {"hello": "Hola", "bye": "Adiós"}}
 
+@cached("translations", settings.TRANSLATIONS_CACHE_TTL)
+def get_translations_for(language: str) -> Optional[Dict[str, str]]:
+    """
+    Look up the translation table of a language (cached for TRANSLATIONS_CACHE_TTL).
+
+    Args:
+        language (str): Language code, e.g. "en".
+
+    Returns:
+        dict[str, str] | None: Translations, or None if the language is unknown.
+    """
+    return _fake_translations.get(language)
+
 def get_translations_service() -> TranslationsOut:
     """
     Retrieve current translations for the active language.
@@ -30,7 +45,7 @@ def get_translations_service() -> TranslationsOut:
     Raises:
         I18nError: If translations are not found.
     """
-    translations = _fake_translations.get(_fake_language)
+    translations = get_translations_for(_fake_language)
     if not translations:
         raise I18nError("No translations found for current language.")
     return TranslationsOut(translations=translations)
@@ -0,0 +1,352 @@
+"""
+Ingest Service Layer
+
+- Downloads each source video once into a content-addressed cache shared by all
+  workers on the machine (VIDEO_STORAGE_PATH/cache, see utils/storage_paths.py).
+- Large sources are fetched with parallel HTTP range requests into a
+  preallocated file; servers without range support get a single streamed GET.
+- Concurrent jobs for the same video wait on one download: an flock per video
+  ID serialises downloaders across processes and threads, and whoever gets the
+  lock second finds the finished object.
+- Jobs hold a reference file while they use an object; eviction (LRU by last
+  use as recorded in atime, down to INGEST_CACHE_MAX_BYTES) never removes referenced objects.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
+import httpx
+from ..config import settings
+from ..utils.storage_paths import (
+    cache_dir, cached_digest_for, index_path_for, local_source_path_for, object_path_for,
+)
+from ..utils.tracing import span
+
+logger = logging.getLogger("ingest_service")
+
+MIN_PART_SIZE = 4 * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+PART_RETRIES = 3
+# Client errors that may succeed later (timeout, too early, rate limited)
+RETRYABLE_STATUSES = {408, 425, 429}
+
+class IngestServiceError(Exception):
+    """Custom exception for IngestService errors."""
+    pass
+
+class SourceUnavailableError(IngestServiceError):
+    """The source cannot be fetched as requested (ingest not configured, or the server answered 4xx)."""
+    pass
+
+def source_url_for(video_id: str) -> str:
+    """
+    Build the download URL of a source video from SOURCE_URL_TEMPLATE.
+
+    Raises:
+        SourceUnavailableError: If no template is configured.
+    """
+    if not settings.SOURCE_URL_TEMPLATE:
+        raise SourceUnavailableError("SOURCE_URL_TEMPLATE is not configured")
+    return settings.SOURCE_URL_TEMPLATE.format(video_id=video_id)
+
+def plan_ranges(size: int, parts: int, min_part_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Split ``size`` bytes into at most ``parts`` inclusive byte ranges of at least
+    ``min_part_size`` (default MIN_PART_SIZE).
+
+    Returns:
+        list[tuple[int, int]]: (first byte, last byte) pairs.
+    """
+    min_part_size = min_part_size or MIN_PART_SIZE
+    parts = max(1, min(parts, size // min_part_size))
+    step = -(-size // parts)
+    return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+def _probe_remote(response: httpx.Response) -> Tuple[Optional[int], bool, Optional[str]]:
+    """Return (size, accepts ranges, etag) from the headers of a one-byte range request."""
+    etag = response.headers.get("etag")
+    if response.status_code == 206 and "content-range" in response.headers:
+        total = response.headers["content-range"].rpartition("/")[2]
+        return (int(total) if total.isdigit() else None), True, etag
+    length = response.headers.get("content-length")
+    return (int(length) if length else None), False, etag
+
+def _download_part(client: httpx.Client, url: str, fd: int, first: int, last: int, etag: Optional[str]) -> None:
+    headers = {"Range": f"bytes={first}-{last}"}
+    if etag:
+        headers["If-Range"] = etag
+    for attempt in range(1, PART_RETRIES + 1):
+        offset = first
+        try:
+            with client.stream("GET", url, headers=headers) as response:
+                if response.status_code != 206:
+                    raise IngestServiceError(f"Range request returned {response.status_code}")
+                for chunk in response.iter_bytes(READ_CHUNK):
+                    os.pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+            if offset != last + 1:
+                raise IngestServiceError(f"Short range read {first}-{last}: got {offset - first} bytes")
+            return
+        except (httpx.HTTPError, IngestServiceError) as e:
+            if attempt == PART_RETRIES:
+                raise IngestServiceError(f"Failed to download bytes {first}-{last}: {e}")
+            logger.warning(f"Retrying bytes {first}-{last} after error: {e}")
+            time.sleep(0.2 * attempt)
+
+def download_file(url: str, dest: str, parts: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Download ``url`` to ``dest``, in parallel ranges when the server allows it.
+
+    Args:
+        url (str): Source URL.
+        dest (str): Destination path (overwritten).
+        parts (int, optional): Max parallel ranges; defaults to INGEST_PARALLEL_PARTS.
+
+    Returns:
+        dict[str, Any]: {"size": int, "sha256": str, "parts": int, "etag": Optional[str]}.
+
+    Raises:
+        SourceUnavailableError: If the server refuses the request (4xx other than 408/425/429).
+        IngestServiceError: If the download fails otherwise.
+    """
+    parts = parts or settings.INGEST_PARALLEL_PARTS
+    try:
+        with httpx.Client(timeout=settings.INGEST_TIMEOUT, follow_redirects=True) as client:
+            # Streamed so only the headers are read: a server that ignores Range answers
+            # 200 with the whole file, and that response becomes the single-stream download.
+            with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+                response.raise_for_status()
+                size, ranged, etag = _probe_remote(response)
+                if not ranged:
+                    ranges = [(0, (size or 1) - 1)]
+                    with open(dest, "wb") as f:
+                        for chunk in response.iter_bytes(READ_CHUNK):
+                            f.write(chunk)
+            if ranged and size:
+                ranges = plan_ranges(size, parts)
+                fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    os.ftruncate(fd, size)
+                    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                        futures = [pool.submit(_download_part, client, url, fd, first, last, etag)
+                                   for first, last in ranges]
+                        for future in futures:
+                            future.result()
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            elif ranged:
+                ranges = [(0, (size or 1) - 1)]
+                with client.stream("GET", url) as response, open(dest, "wb") as f:
+                    response.raise_for_status()
+                    for chunk in response.iter_bytes(READ_CHUNK):
+                        f.write(chunk)
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code
+        if 400 <= status < 500 and status not in RETRYABLE_STATUSES:
+            raise SourceUnavailableError(f"Download failed for {url}: {e}")
+        raise IngestServiceError(f"Download failed for {url}: {e}")
+    except httpx.HTTPError as e:
+        raise IngestServiceError(f"Download failed for {url}: {e}")
+    digest = hashlib.sha256()
+    with open(dest, "rb") as f:
+        for block in iter(lambda: f.read(READ_CHUNK), b""):
+            digest.update(block)
+    actual = os.path.getsize(dest)
+    if size is not None and actual != size:
+        raise IngestServiceError(f"Downloaded {actual} bytes, expected {size}")
+    return {"size": actual, "sha256": digest.hexdigest(), "parts": len(ranges), "etag": etag}
+
+@contextmanager
+def _flock(name: str) -> Iterator[None]:
+    """Exclusive flock on ``locks/{name}.lock`` (blocks other processes and threads)."""
+    os.makedirs(cache_dir("locks"), exist_ok=True)
+    with open(cache_dir("locks", f"{name}.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _video_lock(video_id: str) -> ContextManager[None]:
+    """Exclusive lock per video ID, held while its source is downloaded."""
+    return _flock(video_id)
+
+def _cache_lock() -> ContextManager[None]:
+    """Cache-wide lock serialising eviction against taking a reference to an object."""
+    return _flock("_cache")
+
+def _write_index(video_id: str, entry: Dict[str, Any]) -> None:
+    path = index_path_for(video_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp, path)
+
+def _ref_dir(digest: str) -> str:
+    return cache_dir("refs", digest)
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _is_referenced(digest: str) -> bool:
+    """True if a live process holds a reference; refs of dead processes are removed."""
+    directory = _ref_dir(digest)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return False
+    alive = False
+    for name in names:
+        pid = name.split("-", 1)[0]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            os.remove(os.path.join(directory, name))
+        else:
+            alive = True
+    return alive
+
+def evict(max_bytes: Optional[int] = None) -> List[str]:
+    """
+    Evict least recently used, unreferenced objects until the cache fits ``max_bytes``.
+
+    Returns:
+        list[str]: Digests that were evicted.
+    """
+    max_bytes = settings.INGEST_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    objects = []
+    for root, _, files in os.walk(cache_dir("objects")):
+        for name in files:
+            if name.endswith(".mp4"):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                objects.append((stat.st_atime, stat.st_size, name[:-4], path))
+    total = sum(size for _, size, _, _ in objects)
+    evicted = []
+    if total <= max_bytes:
+        return evicted
+    with _cache_lock():
+        for _, size, digest, path in sorted(objects):
+            if total <= max_bytes:
+                break
+            if _is_referenced(digest):
+                continue
+            os.remove(path)
+            total -= size
+            evicted.append(digest)
+            logger.info(f"Evicted cached source {digest} ({size} bytes)")
+    return evicted
+
+def _ensure_cached(video_id: str, url: Optional[str]) -> str:
+    """Return the digest of a cached object for ``video_id``, downloading it if needed."""
+    digest = cached_digest_for(video_id)
+    if digest and os.path.exists(object_path_for(digest)):
+        return digest
+    with _video_lock(video_id):
+        # Another process may have finished the download while we waited for the lock
+        digest = cached_digest_for(video_id)
+        if digest and os.path.exists(object_path_for(digest)):
+            return digest
+        url = url or source_url_for(video_id)
+        os.makedirs(cache_dir("tmp"), exist_ok=True)
+        tmp = cache_dir("tmp", f"{video_id}.{uuid.uuid4().hex}.part")
+        started = time.monotonic()
+        try:
+            with span("download", {"video.id": video_id}) as current:
+                result = download_file(url, tmp)
+                if current is not None:
+                    current.set_attributes({"download.bytes": result["size"], "download.parts": result["parts"]})
+            digest = result["sha256"]
+            final = object_path_for(digest)
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            if os.path.exists(final):
+                os.remove(tmp)  # Same bytes already cached under another video ID
+            else:
+                os.replace(tmp, final)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        _write_index(video_id, {"sha256": digest, "size": result["size"], "url": url, "etag": result["etag"]})
+        logger.info(f"Ingested {video_id}: {result['size']} bytes in {result['parts']} parts "
+                    f"({time.monotonic() - started:.1f}s)")
+    return digest
+
+@contextmanager
+def acquire_source(video_id: str, holder: Optional[str] = None, url: Optional[str] = None) -> Iterator[str]:
+    """
+    Make a source available locally and hold a reference to it while in use.
+
+    Sources placed directly in VIDEO_STORAGE_PATH/sources are used as they are;
+    otherwise the source is downloaded once into the shared cache.
+
+    Args:
+        video_id (str): Video ID.
+        holder (str, optional): Reference name (e.g. the job ID).
+        url (str, optional): Download URL; defaults to SOURCE_URL_TEMPLATE.
+
+    Yields:
+        str: Local path of the source file.
+
+    Raises:
+        IngestServiceError: If the source cannot be downloaded.
+    """
+    local = local_source_path_for(video_id)
+    if not url and not settings.SOURCE_URL_TEMPLATE and os.path.exists(local):
+        yield local
+        return
+    for _ in range(3):
+        digest = _ensure_cached(video_id, url)
+        path = object_path_for(digest)
+        # Under the cache lock, so eviction cannot remove the object between the check and the reference
+        with _cache_lock():
+            if os.path.exists(path):
+                ref_dir = _ref_dir(digest)
+                os.makedirs(ref_dir, exist_ok=True)
+                ref = os.path.join(ref_dir, f"{os.getpid()}-{holder or uuid.uuid4().hex}")
+                open(ref, "w").close()
+                break
+        # Evicted between download and reference; fetch again
+    else:
+        raise IngestServiceError(f"Source {video_id} was evicted repeatedly")
+    # Record the use in atime only: mtime stays put so metadata cache keys remain valid
+    os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+    try:
+        yield path
+    finally:
+        if os.path.exists(ref):
+            os.remove(ref)
+        try:
+            evict()
+        except OSError as e:
+            logger.warning(f"Cache eviction failed: {e}")
+
+def cache_stats() -> Dict[str, Any]:
+    """Return {"objects": int, "bytes": int} for the source cache."""
+    count = total = 0
+    for root, _, files in os.walk(cache_dir("objects")):
+        for name in files:
+            count += 1
+            total += os.path.getsize(os.path.join(root, name))
+    return {"objects": count, "bytes": total}
+
+# Test block for service sanity (not for production)
+if __name__ == "__main__":
+    import sys
+    try:
+        with acquire_source(sys.argv[1] if len(sys.argv) > 1 else "sampleid", holder="cli") as source:
+            print(source, cache_stats())
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
@@ -0,0 +1,271 @@
+"""
+Job Events Service Layer
+
+- Pushes job status changes to clients instead of making them poll
+  GET /api/v1/videos/job/{job_id}.
+- Workers publish every status change (progress, result_url, final status) on
+  the Redis channel ``job:events:{job_id}``, with the same payload as the
+  status endpoint.
+- Each API process holds ONE Redis pub/sub connection (JobEventBroker). It
+  subscribes to a job's channel while at least one local client watches that
+  job and fans each message out to the clients' bounded queues, so a thousand
+  open tabs cost one subscription, not a thousand connections.
+- job_status_stream() turns that into a stream for the SSE and WebSocket
+  endpoints: a snapshot first, then events, with keepalives; it re-reads the
+  status on every keepalive and after a reconnect, so a missed message only
+  delays an update. Streams end at a terminal status or when the API drains.
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.resources import registry
+from app.utils.drain import drain_state
+
+logger = logging.getLogger("job_events_service")
+
+CHANNEL_PREFIX = "job:events:"
+QUEUE_SIZE = 32
+RECONNECT_DELAY = 1.0
+READ_TIMEOUT = 1.0
+
+# Queue items that are not events: re-read the status / end the stream
+RESYNC = object()
+CLOSED = object()
+
+class JobEventsServiceError(Exception):
+    """Custom exception for JobEventsService errors."""
+    pass
+
+def channel_for(job_id: str) -> str:
+    """Redis pub/sub channel carrying a job's events."""
+    return f"{CHANNEL_PREFIX}{job_id}"
+
+def publish_job_event(conn: Any, job_id: str, payload: Dict[str, Any]) -> None:
+    """
+    Publish a job status payload (best effort; polling still works without it).
+
+    Args:
+        conn: Sync Redis connection.
+        job_id (str): Job ID.
+        payload (dict): VideoJobStatusOut fields.
+    """
+    try:
+        conn.publish(channel_for(job_id), json.dumps(payload))
+    except Exception as e:
+        logger.warning(f"Could not publish event for job {job_id}: {e}")
+
+def publish_job_status(job: Any) -> None:
+    """Publish an RQ job's current public status (worker side, best effort)."""
+    from app.services.video_service import job_status_from
+    publish_job_event(job.connection, job.id, job_status_from(job).model_dump())
+
+class JobEventBroker:
+    """One shared pub/sub subscription per process, fanned out to per-client queues."""
+
+    def __init__(self, conn: Any, queue_size: int = QUEUE_SIZE) -> None:
+        self._conn = conn
+        self._queue_size = queue_size
+        self._pubsub: Any = None
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+        self._active = asyncio.Event()
+        self._reader: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    @property
+    def watched_jobs(self) -> int:
+        return len(self._subscribers)
+
+    @asynccontextmanager
+    async def listen(self, job_id: str) -> AsyncIterator[asyncio.Queue]:
+        """
+        Receive a job's events for the duration of the block.
+
+        Yields:
+            asyncio.Queue: Event payloads (dicts), RESYNC after a reconnect, CLOSED on shutdown.
+
+        Raises:
+            JobEventsServiceError: If the subscription cannot be made.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        await self._add(job_id, queue)
+        try:
+            yield queue
+        finally:
+            await self._remove(job_id, queue)
+
+    async def _add(self, job_id: str, queue: asyncio.Queue) -> None:
+        async with self._lock:
+            queues = self._subscribers.get(job_id)
+            if queues is None:
+                try:
+                    if self._pubsub is None:
+                        self._pubsub = self._conn.pubsub()
+                    await self._pubsub.subscribe(channel_for(job_id))
+                except Exception as e:
+                    raise JobEventsServiceError(f"Could not subscribe to job {job_id}: {e}")
+                queues = self._subscribers[job_id] = set()
+            queues.add(queue)
+            self._active.set()
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read_loop())
+
+    async def _remove(self, job_id: str, queue: asyncio.Queue) -> None:
+        async with self._lock:
+            queues = self._subscribers.get(job_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if queues:
+                return
+            del self._subscribers[job_id]
+            if not self._subscribers:
+                self._active.clear()
+            try:
+                await self._pubsub.unsubscribe(channel_for(job_id))
+            except Exception as e:
+                # The channel is re-subscribed on reconnect only if still wanted
+                logger.warning(f"Could not unsubscribe from job {job_id}: {e}")
+
+    async def _read_loop(self) -> None:
+        """Read the shared subscription and hand messages to the watching clients."""
+        while True:
+            await self._active.wait()
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=READ_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The next read reconnects and re-subscribes every channel
+                logger.warning(f"Job event subscription lost, reconnecting: {e}")
+                self._broadcast(RESYNC)
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            channel = message["channel"].decode()
+            try:
+                payload = json.loads(message["data"])
+            except ValueError:
+                logger.warning(f"Ignoring malformed job event on {channel}")
+                continue
+            for queue in self._subscribers.get(channel[len(CHANNEL_PREFIX):], ()):
+                self._offer(queue, payload)
+
+    def _offer(self, queue: asyncio.Queue, item: Any) -> None:
+        """Queue an item for one client, dropping its oldest item if it is not keeping up."""
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(item)
+
+    def _broadcast(self, item: Any) -> None:
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._offer(queue, item)
+
+    def end_streams(self) -> None:
+        """Tell every open stream to finish (drain start hook)."""
+        self._broadcast(CLOSED)
+
+    async def close(self) -> None:
+        """Stop the reader and close the subscription."""
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+
+def _create_broker() -> JobEventBroker:
+    """Build the process-wide broker on the shared asyncio Redis client (registry factory)."""
+    from app.services.redis_service import get_async_redis_conn
+    return JobEventBroker(get_async_redis_conn())
+
+registry.register("job_events", _create_broker, closer=lambda broker: broker.close())
+
+def get_job_event_broker() -> JobEventBroker:
+    """
+    Get the process-wide job event broker.
+
+    Raises:
+        JobEventsServiceError: If Redis is not configured.
+    """
+    try:
+        return registry.get("job_events")
+    except Exception as e:
+        raise JobEventsServiceError(f"Job events unavailable: {e}")
+
+def _end_streams() -> None:
+    if registry.is_created("job_events"):
+        registry.get("job_events").end_streams()
+
+drain_state.register_start_hook("job_events", _end_streams)
+
+async def job_status_stream(job_id: str, heartbeat: Optional[float] = None,
+                            broker: Optional[JobEventBroker] = None,
+                            fetch_status: Optional[Callable[[str], Any]] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Stream a job's status: the current status first, then each change.
+
+    Args:
+        job_id (str): Job ID.
+        heartbeat (float, optional): Keepalive interval; defaults to JOB_EVENTS_HEARTBEAT.
+        broker (JobEventBroker, optional): Defaults to the process-wide broker.
+        fetch_status (Callable, optional): Snapshot reader; defaults to check_job_status_service.
+
+    Yields:
+        Optional[dict]: VideoJobStatusOut fields when the status changes, None as a keepalive.
+        Ends after a terminal status, when the job disappears or when the API drains.
+
+    Raises:
+        JobEventsServiceError: If the subscription cannot be made.
+    """
+    from app.services.video_service import TERMINAL_JOB_STATUSES, VideoServiceError, check_job_status_service
+
+    heartbeat = heartbeat or settings.JOB_EVENTS_HEARTBEAT
+    broker = broker or get_job_event_broker()
+    fetch_status = fetch_status or check_job_status_service
+    # Subscribe before reading the snapshot so no change can fall in between
+    async with broker.listen(job_id) as events:
+        last = None
+        item: Any = RESYNC
+        while True:
+            if item is CLOSED:
+                return
+            if item is RESYNC:
+                try:
+                    item = (await run_in_threadpool(fetch_status, job_id)).model_dump()
+                except VideoServiceError as e:
+                    logger.info(f"Job event stream for {job_id} ended: {e}")
+                    return
+            if item is not None and item != last:
+                last = item
+                yield item
+            if (last is not None and last["status"] in TERMINAL_JOB_STATUSES) or drain_state.draining:
+                return
+            try:
+                item = await asyncio.wait_for(events.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                item = RESYNC
+
+# Test block for service sanity (not for production)
+if __name__ == "__main__":
+    import sys
+
+    async def _watch(job_id: str) -> None:
+        async for event in job_status_stream(job_id):
+            print(event)
+
+    try:
+        asyncio.run(_watch(sys.argv[1]))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
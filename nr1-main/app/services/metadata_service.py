@@ -0,0 +1,125 @@
+"""
+Metadata Service Layer
+
+- Reads real video metadata (duration, resolution, fps, codecs, keyframe
+  interval, audio layout) from the source file with ffprobe.
+- Cached with cache_service (in-process LRU in front of Redis,
+  METADATA_CACHE_TTL). Cache keys include the source file's size and mtime, so
+  a re-ingested source is never served stale metadata.
+- Coalesced: concurrent requests for the same video in one process wait for a
+  single probe, and across processes a short Redis lock lets one instance probe
+  while the others wait for its result.
+"""
+
+import logging
+import os
+from fractions import Fraction
+from typing import Any, Dict, Optional
+import ffmpeg
+from ..config import settings
+from ..utils.storage_paths import source_path_for
+from .cache_service import cached
+from .ffmpeg_service import FFmpegServiceError, list_keyframes
+
+logger = logging.getLogger("metadata_service")
+
+KEYFRAME_SAMPLE_SECONDS = 30
+LOCK_TTL_SECONDS = 30
+
+class MetadataServiceError(Exception):
+    """Custom exception for MetadataService errors."""
+    pass
+
+def _parse_rate(rate: Optional[str]) -> Optional[float]:
+    try:
+        value = float(Fraction(rate)) if rate else 0.0
+    except (ValueError, ZeroDivisionError):
+        return None
+    return round(value, 3) or None
+
+def probe_metadata(path: str) -> Dict[str, Any]:
+    """
+    Probe a video file.
+
+    Args:
+        path (str): Path to the video file.
+
+    Returns:
+        dict[str, Any]: duration, width, height, fps, video_codec, audio_codec,
+        audio_channels, audio_layout, sample_rate, bit_rate, keyframe_interval, title.
+
+    Raises:
+        MetadataServiceError: If ffprobe fails.
+    """
+    try:
+        probe = ffmpeg.probe(path)
+    except ffmpeg.Error as e:
+        raise MetadataServiceError(f"FFprobe error: {e}")
+    fmt = probe.get("format", {})
+    video = next((s for s in probe.get("streams", []) if s.get("codec_type") == "video"), {})
+    audio = next((s for s in probe.get("streams", []) if s.get("codec_type") == "audio"), {})
+    duration = float(fmt.get("duration") or video.get("duration") or 0)
+    keyframe_interval = None
+    if video:
+        try:
+            keyframes = list_keyframes(path, 0, min(duration, KEYFRAME_SAMPLE_SECONDS))
+            if len(keyframes) > 1:
+                keyframe_interval = round((keyframes[-1] - keyframes[0]) / (len(keyframes) - 1), 3)
+        except FFmpegServiceError as e:
+            logger.warning(f"Keyframe probe failed for {path}: {e}")
+    return {
+        "duration": duration,
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": _parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate")),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "audio_channels": audio.get("channels"),
+        "audio_layout": audio.get("channel_layout"),
+        "sample_rate": int(audio["sample_rate"]) if audio.get("sample_rate") else None,
+        "bit_rate": int(fmt["bit_rate"]) if fmt.get("bit_rate") else None,
+        "keyframe_interval": keyframe_interval,
+        "title": fmt.get("tags", {}).get("title"),
+    }
+
+@cached(
+    "video_meta",
+    settings.METADATA_CACHE_TTL,
+    key=lambda video_id, path, stat: f"{video_id}:{stat.st_size}:{stat.st_mtime_ns}",
+    local_size=settings.METADATA_LOCAL_CACHE_SIZE,
+    local_ttl=settings.METADATA_LOCAL_CACHE_TTL,
+    lock_ttl=LOCK_TTL_SECONDS,
+)
+def _cached_metadata(video_id: str, path: str, stat: os.stat_result) -> Dict[str, Any]:
+    return probe_metadata(path)
+
+def get_video_metadata(video_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Return cached or freshly probed metadata for a video's source file.
+
+    Args:
+        video_id (str): Video ID.
+
+    Returns:
+        Optional[dict]: Metadata (see probe_metadata; a copy, callers may modify it),
+        or None if the source is not on disk.
+
+    Raises:
+        MetadataServiceError: If probing fails.
+    """
+    path = source_path_for(video_id)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    metadata = _cached_metadata(video_id, path, stat)
+    # The cached dict is shared by every caller in the process
+    return dict(metadata) if metadata is not None else None
+
+# Test block for service sanity (not for production)
+if __name__ == "__main__":
+    import sys
+    try:
+        print(get_video_metadata(sys.argv[1] if len(sys.argv) > 1 else "sampleid"))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
@@ -2,24 +2,70 @@
 MongoDB Service Layer (Refactored)
 
 - Handles MongoDB client and database connection logic.
-- Designed for auditability, security, and testability (Stripe/Netflix standards).
+- Pool size and timeouts come from settings (MONGO_*); the client is built by
+  the resource registry on first use or at startup, never at import.
+- CRUD wrappers plus chunked, unordered bulk insert/upsert and streaming
+  find_many with projection and batch size, so bulk writers (e.g. the
+  analytics buffer) pay one round trip per batch instead of per document.
+- Indexes are declared next to the code that queries a collection
+  (declare_indexes) and created at startup by ensure_indexes().
+- Per-operation latency, document and error counters (mongo_stats()). Queries
+  are logged at DEBUG; operations slower than MONGO_SLOW_OP_MS at WARNING.
 - Implements audit logging and custom exceptions for compliance.
-- Provides CRUD wrappers for testability and modularity.
 """
 
 import logging
-from typing import Any, Dict, Optional
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TYPE_CHECKING
 from app.config import settings
+from app.resources import registry
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
 logger = logging.getLogger("mongo_service")
 
+DUPLICATE_KEY = 11000
+
 class MongoServiceError(Exception):
     """Custom exception for MongoService errors."""
     pass
 
-mongo_client: AsyncIOMotorClient = AsyncIOMotorClient(settings.MONGODB_URI)
-db: AsyncIOMotorDatabase = mongo_client.get_default_database()
+def _create_mongo_client() -> "AsyncIOMotorClient":
+    """Build the Motor client (registry factory); motor is imported on first use."""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(
+        settings.MONGODB_URI,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        retryWrites=True,
+        appname="viral-clip-generator",
+    )
+
+registry.register("mongo", _create_mongo_client, closer=lambda client: client.close(), eager=bool(settings.MONGODB_URI))
+
+def get_mongo_client() -> "AsyncIOMotorClient":
+    """Return the shared Motor client, creating it on first use."""
+    return registry.get("mongo")
+
+def get_db() -> "AsyncIOMotorDatabase":
+    """
+    Get the default database from MONGODB_URI.
+    Raises:
+        MongoServiceError: If the client cannot be created or the URI has no database.
+    """
+    try:
+        return get_mongo_client().get_default_database()
+    except Exception as e:
+        logger.error(f"Mongo connection error: {e}")
+        raise MongoServiceError(f"Mongo connection error: {e}")
 
 def get_collection(name: str):
     """
@@ -29,7 +75,66 @@ def get_collection(name: str):
     Returns:
         Collection: MongoDB collection object.
     """
-    return db[name]
+    return get_db()[name]
+
+class _OperationStats:
+    """Counters of one collection/operation pair."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.docs = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+_op_stats: Dict[str, _OperationStats] = {}
+_op_stats_lock = threading.Lock()
+
+@contextmanager
+def _track(collection: str, op: str) -> Iterator[Dict[str, int]]:
+    """Time one operation; the caller sets ``record["docs"]`` to the documents it touched."""
+    record = {"docs": 0}
+    failed = False
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        with _op_stats_lock:
+            stats = _op_stats.setdefault(f"{collection}.{op}", _OperationStats())
+            stats.count += 1
+            stats.errors += failed
+            stats.docs += record["docs"]
+            stats.seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+        if elapsed * 1000 >= settings.MONGO_SLOW_OP_MS:
+            logger.warning(f"Slow Mongo {op} on {collection}: {elapsed * 1000:.0f}ms ({record['docs']} docs)")
+
+def mongo_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Snapshot per-operation counters of this process.
+
+    Returns:
+        dict[str, dict[str, float]]: {"<collection>.<op>": {count, errors, docs, avg_ms, max_ms}}.
+    """
+    with _op_stats_lock:
+        return {
+            name: {
+                "count": stats.count,
+                "errors": stats.errors,
+                "docs": stats.docs,
+                "avg_ms": round(stats.seconds / stats.count * 1000, 3) if stats.count else 0.0,
+                "max_ms": round(stats.max_seconds * 1000, 3),
+            }
+            for name, stats in sorted(_op_stats.items())
+        }
+
+def _chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
 async def insert_document(collection: str, document: Dict[str, Any]) -> str:
     """
@@ -43,33 +148,221 @@ async def insert_document(collection: str, document: Dict[str, Any]) -> str:
         MongoServiceError: If insertion fails.
     """
     try:
-        logger.info(f"Inserting document into {collection}")
-        result = await get_collection(collection).insert_one(document)
-        logger.info(f"Inserted document with id: {result.inserted_id}")
+        with _track(collection, "insert_one") as record:
+            result = await get_collection(collection).insert_one(document)
+            record["docs"] = 1
+        logger.debug(f"Inserted document into {collection} with id: {result.inserted_id}")
         return str(result.inserted_id)
     except Exception as e:
         logger.error(f"Mongo insert error: {e}")
         raise MongoServiceError(f"Mongo insert error: {e}")
 
-async def find_document(collection: str, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+async def find_document(collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
     """
     Find a single document in a MongoDB collection.
     Args:
         collection (str): Collection name.
         query (dict): Query filter.
+        projection (dict, optional): Fields to return.
     Returns:
         Optional[dict]: Document if found, else None.
     Raises:
         MongoServiceError: If query fails.
     """
     try:
-        logger.info(f"Finding document in {collection} with query: {query}")
-        doc = await get_collection(collection).find_one(query)
+        logger.debug(f"Finding document in {collection} with query: {query}")
+        with _track(collection, "find_one") as record:
+            doc = await get_collection(collection).find_one(query, projection)
+            record["docs"] = int(doc is not None)
         return doc
     except Exception as e:
         logger.error(f"Mongo find error: {e}")
         raise MongoServiceError(f"Mongo find error: {e}")
 
+async def insert_many(collection: str, documents: Iterable[Dict[str, Any]], ordered: bool = False,
+                      ignore_duplicates: bool = False) -> int:
+    """
+    Insert documents in batches of MONGO_WRITE_BATCH_SIZE (one round trip per batch).
+
+    Documents without ``_id`` get one assigned in place, so retrying the same
+    documents with ``ignore_duplicates`` never stores them twice.
+
+    Args:
+        collection (str): Collection name.
+        documents (Iterable[dict]): Documents to insert.
+        ordered (bool): Stop at the first failed document (unordered inserts the rest and is faster).
+        ignore_duplicates (bool): Count duplicate-key failures as already inserted (unordered only).
+    Returns:
+        int: Documents inserted (including ignored duplicates).
+    Raises:
+        MongoServiceError: If any document could not be inserted.
+    """
+    from pymongo.errors import BulkWriteError
+
+    docs = list(documents)
+    if not docs:
+        return 0
+    coll = get_collection(collection)
+    inserted = 0
+    failures: List[Dict[str, Any]] = []
+    try:
+        with _track(collection, "insert_many") as record:
+            for chunk in _chunks(docs, settings.MONGO_WRITE_BATCH_SIZE):
+                try:
+                    result = await coll.insert_many(chunk, ordered=ordered)
+                    inserted += len(result.inserted_ids)
+                except BulkWriteError as e:
+                    errors = e.details.get("writeErrors", [])
+                    if ordered:
+                        # The batch stopped at the first error: the documents after it were not written
+                        inserted += e.details.get("nInserted", 0)
+                        failures += errors
+                        break
+                    duplicates = [err for err in errors if err.get("code") == DUPLICATE_KEY] if ignore_duplicates else []
+                    inserted += e.details.get("nInserted", 0) + len(duplicates)
+                    failures += [err for err in errors if err not in duplicates]
+            record["docs"] = inserted
+            if failures:
+                logger.error(f"Mongo bulk insert on {collection}: {len(failures)} of {len(docs)} documents failed: "
+                             f"{failures[0].get('errmsg')}")
+                raise MongoServiceError(f"Mongo bulk insert error: {inserted} of {len(docs)} documents inserted, "
+                                        f"{len(failures)} failed")
+    except MongoServiceError:
+        raise
+    except Exception as e:
+        logger.error(f"Mongo bulk insert error on {collection}: {e}")
+        raise MongoServiceError(f"Mongo bulk insert error: {e}")
+    return inserted
+
+async def bulk_upsert(collection: str, documents: Iterable[Dict[str, Any]], key: Sequence[str] = ("_id",)) -> Dict[str, int]:
+    """
+    Insert or update documents matched on ``key`` fields, in unordered batches.
+
+    Args:
+        collection (str): Collection name.
+        documents (Iterable[dict]): Full documents; every one must contain the key fields.
+        key (Sequence[str]): Fields identifying a document.
+    Returns:
+        dict[str, int]: {"matched": int, "modified": int, "upserted": int}.
+    Raises:
+        MongoServiceError: If a key field is missing or the write fails.
+    """
+    from pymongo import UpdateOne
+
+    docs = list(documents)
+    totals = {"matched": 0, "modified": 0, "upserted": 0}
+    if not docs:
+        return totals
+    try:
+        requests = [
+            UpdateOne({field: doc[field] for field in key},
+                      {"$set": {field: value for field, value in doc.items() if field not in key}}, upsert=True)
+            for doc in docs
+        ]
+    except KeyError as e:
+        raise MongoServiceError(f"Mongo upsert error: document without key field {e}")
+    coll = get_collection(collection)
+    try:
+        with _track(collection, "bulk_upsert") as record:
+            for chunk in _chunks(requests, settings.MONGO_WRITE_BATCH_SIZE):
+                result = await coll.bulk_write(list(chunk), ordered=False)
+                totals["matched"] += result.matched_count
+                totals["modified"] += result.modified_count
+                totals["upserted"] += result.upserted_count
+            record["docs"] = len(docs)
+    except Exception as e:
+        logger.error(f"Mongo bulk upsert error on {collection}: {e}")
+        raise MongoServiceError(f"Mongo bulk upsert error: {e}")
+    return totals
+
+async def find_many(
+    collection: str,
+    query: Dict[str, Any],
+    projection: Optional[Dict[str, Any]] = None,
+    sort: Optional[List[Tuple[str, int]]] = None,
+    limit: int = 0,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream matching documents without loading the whole result set.
+
+    Args:
+        collection (str): Collection name.
+        query (dict): Query filter.
+        projection (dict, optional): Fields to return; project what you need.
+        sort (list[tuple[str, int]], optional): Sort specification.
+        limit (int): Maximum documents (0 = no limit).
+        batch_size (int, optional): Documents per server round trip (default MONGO_FIND_BATCH_SIZE).
+    Yields:
+        dict: Documents.
+    Raises:
+        MongoServiceError: If the query fails.
+    """
+    logger.debug(f"Finding documents in {collection} with query: {query}")
+    cursor = get_collection(collection).find(query, projection, limit=limit)
+    if sort:
+        cursor = cursor.sort(sort)
+    cursor = cursor.batch_size(batch_size or settings.MONGO_FIND_BATCH_SIZE)
+    try:
+        with _track(collection, "find_many") as record:
+            async for doc in cursor:
+                record["docs"] += 1
+                yield doc
+    except Exception as e:
+        logger.error(f"Mongo find error: {e}")
+        raise MongoServiceError(f"Mongo find error: {e}")
+    finally:
+        await cursor.close()
+
+@dataclass(frozen=True)
+class MongoIndex:
+    """Declarative index specification (see declare_indexes)."""
+    keys: Tuple[Tuple[str, int], ...]
+    name: str
+    unique: bool = False
+    sparse: bool = False
+    expire_after_seconds: Optional[int] = None
+
+    def model(self) -> Any:
+        from pymongo import IndexModel
+        options: Dict[str, Any] = {"name": self.name, "unique": self.unique, "sparse": self.sparse}
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return IndexModel(list(self.keys), **options)
+
+INDEX_SPECS: Dict[str, Dict[str, MongoIndex]] = {}
+
+def declare_indexes(collection: str, *indexes: MongoIndex) -> None:
+    """
+    Declare indexes a collection needs; ensure_indexes() creates them at startup.
+
+    Args:
+        collection (str): Collection name.
+        *indexes (MongoIndex): Index specifications (a later spec with the same name replaces the earlier one).
+    """
+    specs = INDEX_SPECS.setdefault(collection, {})
+    for index in indexes:
+        specs[index.name] = index
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """
+    Create every declared index (idempotent). Failures are logged per collection, not fatal.
+
+    Returns:
+        dict[str, list[str]]: Index names confirmed per collection.
+    """
+    created: Dict[str, List[str]] = {}
+    for collection, specs in INDEX_SPECS.items():
+        try:
+            with _track(collection, "create_indexes") as record:
+                created[collection] = await get_collection(collection).create_indexes(
+                    [spec.model() for spec in specs.values()])
+                record["docs"] = len(specs)
+            logger.info(f"Mongo indexes ensured on {collection}: {', '.join(created[collection])}")
+        except Exception as e:
+            logger.error(f"Could not create indexes on {collection}: {e}")
+    return created
+
 # Test block for service sanity (not for production)
 if __name__ == "__main__":
     import asyncio
@@ -79,6 +372,9 @@ if __name__ == "__main__":
             print(f"Inserted: {doc_id}")
             doc = await find_document("test_collection", {"_id": doc_id})
             print(f"Found: {doc}")
+            print(await insert_many("test_collection", [{"n": n} for n in range(10)]))
+            print([doc["n"] async for doc in find_many("test_collection", {"n": {"$gte": 5}}, {"n": 1, "_id": 0})])
+            print(mongo_stats())
         except Exception as e:
             print(f"Error: {e}")
     asyncio.run(test())
@@ -0,0 +1,182 @@
+"""
+Preview Service Layer
+
+- Plans the poster frame, storyboard sprite sheet (+ WebVTT index) and optional
+  animated WebP preview for a clip.
+- attach_previews() adds them as extra outputs to an existing ffmpeg graph, so
+  they come out of the same decode as the clip itself.
+- The WebVTT index maps each time range to a tile of the sprite with a
+  ``#xywh=`` fragment, which players use for scrubbing thumbnails.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import ffmpeg
+from .reframe_service import apply_reframe
+
+SPRITE_COLUMNS = 10
+MAX_SPRITE_TILES = 100
+TILE_LONG_SIDE = 160
+WEBP_SECONDS = 3
+WEBP_FPS = 10
+WEBP_LONG_SIDE = 320
+
+@dataclass(frozen=True)
+class PreviewSpec:
+    """Everything needed to emit and index the previews of one clip."""
+    poster_path: str
+    sprite_path: str
+    vtt_path: str
+    webp_path: str
+    duration: float
+    poster_at: float
+    interval: float
+    tile_width: int
+    tile_height: int
+    columns: int
+    rows: int
+    webp: bool
+
+    @property
+    def tiles(self) -> int:
+        return math.ceil(self.duration / self.interval)
+
+    def files(self) -> Dict[str, str]:
+        """Generated files by kind ("poster", "sprite", "sprite_vtt", "webp")."""
+        files = {"poster": self.poster_path, "sprite": self.sprite_path, "sprite_vtt": self.vtt_path}
+        if self.webp:
+            files["webp"] = self.webp_path
+        return files
+
+def _fit(width: int, height: int, long_side: int) -> Tuple[int, int]:
+    """Scale (width, height) so the longer side is ``long_side``; both results even."""
+    scale = long_side / max(width, height, 1)
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+def plan_previews(output_dir: str, name: str, duration: float, width: int, height: int,
+                  webp: bool = False) -> PreviewSpec:
+    """
+    Plan preview outputs for a clip.
+
+    Args:
+        output_dir (str): Directory for the generated files.
+        name (str): File name prefix (usually the job ID).
+        duration (float): Clip duration in seconds.
+        width (int): Width of the frames fed to the previews.
+        height (int): Height of the frames fed to the previews.
+        webp (bool): Also produce an animated WebP preview.
+
+    Returns:
+        PreviewSpec: Planned outputs; at most MAX_SPRITE_TILES tiles, one per ``interval`` seconds.
+    """
+    interval = max(1.0, math.ceil(duration / MAX_SPRITE_TILES))
+    tiles = max(1, math.ceil(duration / interval))
+    columns = min(SPRITE_COLUMNS, tiles)
+    tile_width, tile_height = _fit(width, height, TILE_LONG_SIDE)
+    return PreviewSpec(
+        poster_path=os.path.join(output_dir, f"{name}_poster.jpg"),
+        sprite_path=os.path.join(output_dir, f"{name}_sprite.jpg"),
+        vtt_path=os.path.join(output_dir, f"{name}_sprite.vtt"),
+        webp_path=os.path.join(output_dir, f"{name}_preview.webp"),
+        duration=duration,
+        poster_at=min(1.0, duration / 3),
+        interval=interval,
+        tile_width=tile_width,
+        tile_height=tile_height,
+        columns=columns,
+        rows=math.ceil(tiles / columns),
+        webp=webp,
+    )
+
+def preview_branch_count(spec: PreviewSpec) -> int:
+    """Number of video branches attach_previews() consumes."""
+    return 3 if spec.webp else 2
+
+def attach_previews(branches: List[Any], spec: PreviewSpec) -> List[Any]:
+    """
+    Build preview outputs from split branches of the clip's decoded video.
+
+    Args:
+        branches (list): preview_branch_count(spec) video streams from a ``split`` filter.
+        spec (PreviewSpec): Planned outputs.
+
+    Returns:
+        list: ffmpeg-python output nodes to merge with the clip's own outputs.
+    """
+    poster_w, poster_h = _fit(spec.tile_width, spec.tile_height, 720)
+    poster = (
+        branches[0]
+        .filter('trim', start=spec.poster_at)
+        .filter('scale', poster_w, poster_h)
+        .output(spec.poster_path, vframes=1, **{'q:v': 3})
+    )
+    sprite = (
+        branches[1]
+        .filter('fps', f"1/{spec.interval:g}")
+        .filter('scale', spec.tile_width, spec.tile_height)
+        .filter('tile', f"{spec.columns}x{spec.rows}")
+        .output(spec.sprite_path, vframes=1, **{'q:v': 5})
+    )
+    outputs = [poster, sprite]
+    if spec.webp:
+        webp_w, webp_h = _fit(spec.tile_width, spec.tile_height, WEBP_LONG_SIDE)
+        outputs.append(
+            branches[2]
+            .filter('trim', duration=min(WEBP_SECONDS, spec.duration))
+            .filter('fps', WEBP_FPS)
+            .filter('scale', webp_w, webp_h)
+            .output(spec.webp_path, vcodec='libwebp', loop=0, quality=60, an=None)
+        )
+    return outputs
+
+def _timestamp(seconds: float) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+def build_sprite_vtt(spec: PreviewSpec, sprite_url: str) -> str:
+    """
+    Build the WebVTT storyboard index for a sprite sheet.
+
+    Args:
+        spec (PreviewSpec): Planned outputs.
+        sprite_url (str): URL (or relative name) of the sprite image.
+
+    Returns:
+        str: WebVTT document with one cue per tile.
+    """
+    lines = ["WEBVTT", ""]
+    for i in range(spec.tiles):
+        start = i * spec.interval
+        end = min(start + spec.interval, spec.duration)
+        x = (i % spec.columns) * spec.tile_width
+        y = (i // spec.columns) * spec.tile_height
+        lines += [f"{_timestamp(start)} --> {_timestamp(end)}",
+                  f"{sprite_url}#xywh={x},{y},{spec.tile_width},{spec.tile_height}", ""]
+    return "\n".join(lines)
+
+def write_sprite_vtt(spec: PreviewSpec) -> str:
+    """Write the storyboard index next to the sprite (relative reference) and return its path."""
+    with open(spec.vtt_path, "w") as f:
+        f.write(build_sprite_vtt(spec, os.path.basename(spec.sprite_path)))
+    return spec.vtt_path
+
+def run_previews(input_path: str, spec: PreviewSpec, start: float,
+                 reframe: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    Generate previews in their own (decode-only) pass, for encodes that have no
+    single decode to attach to (segment-parallel clips). ``reframe`` is the
+    clip's ReframePlan.to_dict(), so the previews match the reframed clip.
+
+    Raises:
+        ffmpeg.Error: If FFmpeg fails.
+    """
+    video = ffmpeg.input(input_path, ss=start, t=spec.duration).video
+    if reframe:
+        video = apply_reframe(video, reframe)
+    branches = video.filter_multi_output('split', preview_branch_count(spec))
+    ffmpeg.merge_outputs(*attach_previews(branches, spec)).overwrite_output().run(quiet=True)
+    write_sprite_vtt(spec)
+    return spec.files()
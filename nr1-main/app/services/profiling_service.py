@@ -0,0 +1,320 @@
+"""
+Profiling Service Layer (Production, Sampling, Async-Aware)
+
+- A single daemon thread samples the stacks of the requests being profiled
+  every PROFILING_INTERVAL_MS; it only runs while at least one profile is open.
+- Samples are wall-clock and attributed to the request's own asyncio task:
+  the running stack while the task executes, the suspended await chain while
+  it waits ("[await]" leaf), and the worker thread's stack while a sync
+  endpoint or run_in_threadpool call runs for it.
+- Reports are folded stacks ("frame;frame;frame count" per line), ready for
+  flamegraph.pl, speedscope or inferno, written to PROFILING_DIR with a JSON
+  metadata sidecar and pruned to PROFILING_MAX_REPORTS.
+- Triggers: a signed X-Profile header (HMAC of its expiry with PROFILING_SECRET)
+  or random sampling at PROFILING_SAMPLE_RATE.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from ..config import settings
+
+logger = logging.getLogger("profiling_service")
+
+_REPORT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+class ProfilingServiceError(Exception):
+    """Custom exception for profiling service errors."""
+    pass
+
+def _worker_run_code():
+    """Code object of anyio's worker loop; its ``future`` local ties a thread to the awaiting task."""
+    try:
+        from anyio._backends._asyncio import WorkerThread
+        return WorkerThread.run.__code__
+    except (ImportError, AttributeError):  # pragma: no cover - depends on the anyio version
+        return None
+
+_WORKER_RUN_CODE = _worker_run_code()
+
+def sign_profile_token(ttl: int, secret: Optional[str] = None, now: Optional[float] = None) -> str:
+    """
+    Create an X-Profile header value valid for ``ttl`` seconds.
+
+    Args:
+        ttl (int): Seconds the token is accepted.
+        secret (str, optional): Signing key; PROFILING_SECRET by default.
+        now (float, optional): Current time (for tests).
+
+    Returns:
+        str: ``"<expires>.<hex hmac-sha256>"``.
+
+    Raises:
+        ProfilingServiceError: If no secret is configured.
+    """
+    secret = secret if secret is not None else settings.PROFILING_SECRET
+    if not secret:
+        raise ProfilingServiceError("PROFILING_SECRET is not set")
+    expires = str(int((now if now is not None else time.time()) + ttl))
+    return f"{expires}.{hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()}"
+
+def verify_profile_token(token: str, secret: Optional[str] = None, now: Optional[float] = None) -> bool:
+    """Return True if ``token`` was made by sign_profile_token() with ``secret`` and has not expired."""
+    secret = secret if secret is not None else settings.PROFILING_SECRET
+    expires, _, signature = token.partition(".")
+    if not secret or not expires.isdigit() or int(expires) < (now if now is not None else time.time()):
+        return False
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature.encode(), expected.encode())
+
+def _label(code, cache: Dict[Any, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        filename = code.co_filename
+        site = filename.rfind("site-packages" + os.sep)
+        app = filename.rfind(os.sep + "app" + os.sep)
+        if site >= 0:
+            filename = filename[site + len("site-packages") + 1:]
+        elif app >= 0:
+            filename = filename[app + 1:]
+        else:
+            filename = os.path.basename(filename)
+        name = getattr(code, "co_qualname", code.co_name)
+        label = cache[code] = f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+    return label
+
+class RequestProfile:
+    """Samples collected for one request's task."""
+
+    def __init__(self, task: "asyncio.Task", root_code, trigger: str, method: str, path: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.root_code = root_code
+        self.trigger = trigger
+        self.method = method
+        self.path = path
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.created_at = time.time()
+        self.duration_ms = 0.0
+        self.status: Optional[int] = None
+        self.samples: Counter = Counter()
+        self._workers: Dict[int, int] = {}
+
+    def sample(self, frames: Dict[int, Any], labels: Dict[Any, str]) -> None:
+        """Record one sample from ``sys._current_frames()``; called from the sampler thread."""
+        coro = self.task.get_coro()
+        root = getattr(coro, "cr_frame", None)
+        if root is None:
+            return
+        running = self._running_stack(frames.get(self.thread_id), root)
+        if running is not None:
+            stack = running
+        else:
+            stack = self._await_chain(coro)
+            # The future the suspended task is blocked on (asyncio.Task keeps it in _fut_waiter)
+            worker = self._worker_stack(getattr(self.task, "_fut_waiter", None), frames)
+            stack = stack + (worker or ["[await]"])
+        folded = ";".join(entry if isinstance(entry, str) else _label(entry.f_code, labels) for entry in self._trim(stack))
+        if folded:
+            self.samples[folded] += 1
+
+    @staticmethod
+    def _running_stack(top, root) -> Optional[List[Any]]:
+        stack = []
+        frame = top
+        while frame is not None:
+            stack.append(frame)
+            if frame is root:
+                return stack[::-1]
+            frame = frame.f_back
+        return None
+
+    @staticmethod
+    def _await_chain(coro) -> List[Any]:
+        stack = []
+        awaitable = coro
+        while awaitable is not None:
+            frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) or getattr(awaitable, "ag_frame", None)
+            if frame is None:
+                break
+            stack.append(frame)
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) or getattr(awaitable, "ag_await", None)
+        return stack
+
+    def _worker_stack(self, future, frames: Dict[int, Any]) -> Optional[List[Any]]:
+        if _WORKER_RUN_CODE is None or not isinstance(future, asyncio.Future):
+            return None
+        candidates = [self._workers[id(future)]] if id(future) in self._workers else frames
+        for thread_id in candidates:
+            frame = frames.get(thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not _WORKER_RUN_CODE:
+                stack.append(frame)
+                frame = frame.f_back
+            if frame is not None and frame.f_locals.get("future") is future:
+                self._workers = {id(future): thread_id}
+                return ["[thread]"] + stack[::-1]
+        return None
+
+    def _trim(self, stack: List[Any]) -> List[Any]:
+        """Drop the server and middleware frames below the profiling middleware."""
+        for index, entry in enumerate(stack):
+            if not isinstance(entry, str) and entry.f_code is self.root_code:
+                return stack[index + 1:]
+        return stack
+
+    def folded(self) -> str:
+        """Report in folded-stack format, heaviest stacks first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "trigger": self.trigger,
+            "duration_ms": round(self.duration_ms, 2),
+            "samples": sum(self.samples.values()),
+            "created_at": self.created_at,
+        }
+
+class Sampler:
+    """Shared sampling thread; runs only while profiles are open."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._profiles: Dict[str, RequestProfile] = {}
+        self._labels: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+
+    def stop(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.pop(profile.id, None)
+        profile.duration_ms = (time.perf_counter() - profile.started) * 1000
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._profiles and not self._wakeup.wait(timeout=30) and not self._profiles:
+                    self._thread = None
+                    return
+                profiles = list(self._profiles.values())
+            if profiles:
+                frames = sys._current_frames()
+                frames.pop(me, None)
+                for profile in profiles:
+                    try:
+                        profile.sample(frames, self._labels)
+                    except Exception as e:  # pragma: no cover - never let a sample break the thread
+                        logger.debug(f"Profile sample failed: {e}")
+                del frames
+            time.sleep(self.interval)
+
+class ProfileStore:
+    """Folded-stack reports on local disk, newest kept."""
+
+    def __init__(self, directory: str, max_reports: int) -> None:
+        self.directory = directory
+        self.max_reports = max_reports
+
+    def save(self, profile: RequestProfile) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile.id)
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            f.write(profile.folded())
+        # Metadata last: a report is listed only once both files exist
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(profile.metadata(), f)
+        self._prune()
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        reports = []
+        for meta_path in self._metadata_files()[:limit]:
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    reports.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return reports
+
+    def read(self, report_id: str) -> str:
+        if not _REPORT_ID_RE.match(report_id):
+            raise ProfilingServiceError(f"Profile not found: {report_id}")
+        try:
+            with open(os.path.join(self.directory, report_id + ".folded"), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ProfilingServiceError(f"Profile not found: {report_id}")
+
+    def _metadata_files(self) -> List[str]:
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        except FileNotFoundError:
+            return []
+        paths = [os.path.join(self.directory, n) for n in names]
+        return sorted(paths, key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0, reverse=True)
+
+    def _prune(self) -> None:
+        for meta_path in self._metadata_files()[self.max_reports:]:
+            for path in (meta_path, meta_path[:-len(".json")] + ".folded"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+def profiles_dir() -> str:
+    return settings.PROFILING_DIR or os.path.join(tempfile.gettempdir(), "nr1-profiles")
+
+sampler = Sampler(settings.PROFILING_INTERVAL_MS / 1000)
+profile_store = ProfileStore(profiles_dir(), settings.PROFILING_MAX_REPORTS)
+
+def list_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Metadata of stored reports, newest first.
+
+    Args:
+        limit (int): Maximum number of reports.
+
+    Returns:
+        list[dict]: id, method, path, status, trigger, duration_ms, samples, created_at.
+    """
+    return profile_store.list(limit)
+
+def get_profile_report(report_id: str) -> str:
+    """
+    Folded stacks of a stored report.
+
+    Raises:
+        ProfilingServiceError: If the report does not exist.
+    """
+    return profile_store.read(report_id)
+
+# Test block for service sanity (not for production)
+if __name__ == "__main__":
+    token = sign_profile_token(60, secret="s")
+    assert verify_profile_token(token, secret="s") and not verify_profile_token(token, secret="t")
+    print("profiling_service OK")
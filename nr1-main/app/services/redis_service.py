@@ -12,6 +12,7 @@ from typing import Optional, Any
 import redis
 from redis import Redis
 from app.config import settings
+from app.resources import registry
 
 logger = logging.getLogger("redis_service")
 
@@ -19,7 +20,14 @@ class RedisServiceError(Exception):
     """Custom exception for RedisService errors."""
     pass
 
-_redis_conn: Optional[Redis] = None
+def _create_redis_conn() -> Redis:
+    """Build and verify the shared Redis connection (registry factory)."""
+    conn = redis.Redis.from_url(settings.REDIS_URL)
+    conn.ping()
+    logger.info("Connected to Redis successfully.")
+    return conn
+
+registry.register("redis", _create_redis_conn, closer=lambda conn: conn.close(), eager=bool(settings.REDIS_URL))
 
 def get_redis_conn() -> Redis:
     """
@@ -31,16 +39,29 @@ def get_redis_conn() -> Redis:
     Raises:
         RedisServiceError: If Redis connection fails.
     """
-    global _redis_conn
-    if _redis_conn is None:
-        try:
-            _redis_conn = redis.Redis.from_url(settings.REDIS_URL)
-            _redis_conn.ping()
-            logger.info("Connected to Redis successfully.")
-        except Exception as e:
-            logger.error(f"Failed to connect to Redis: {e}")
-            raise RedisServiceError(f"Failed to connect to Redis: {e}")
-    return _redis_conn
+    try:
+        return registry.get("redis")
+    except Exception as e:
+        logger.error(f"Failed to connect to Redis: {e}")
+        raise RedisServiceError(f"Failed to connect to Redis: {e}")
+
+def _create_async_redis_conn() -> Any:
+    """Build the asyncio Redis client used by middleware (registry factory)."""
+    import redis.asyncio as aioredis
+    return aioredis.Redis.from_url(settings.REDIS_URL)
+
+registry.register("redis_async", _create_async_redis_conn, closer=lambda conn: conn.aclose())
+
+def get_async_redis_conn() -> Any:
+    """
+    Get the shared asyncio Redis client for use inside the event loop.
+
+    Raises:
+        RedisServiceError: If REDIS_URL is not configured.
+    """
+    if not settings.REDIS_URL:
+        raise RedisServiceError("REDIS_URL is not configured")
+    return registry.get("redis_async")
 
 def set_value(key: str, value: str, ex: int = 3600) -> bool:
     """
@@ -0,0 +1,269 @@
+"""
+Reframe Service Layer
+
+- Converts a clip to the requested ``aspect_ratio`` (e.g. 16:9 source to 9:16)
+  by cropping at source resolution, following the action instead of always
+  taking the centre.
+- The region of interest is tracked on a low-resolution grayscale proxy of the
+  clip window (PROXY_WIDTH px wide, ANALYSIS_FPS), streamed in fixed-size
+  chunks so memory does not grow with clip length: per frame, motion plus edge
+  energy is collapsed to a 1-D profile along the cropped axis and the crop
+  window with the most energy is found with a cumulative sum, for a whole
+  chunk of frames at once.
+- The raw path is cleaned up (hold through quiet frames, median filter,
+  Gaussian smoothing, pan speed limit) and written as a ``sendcmd`` script
+  that moves a named ``crop`` filter inside the clip's own encode.
+"""
+
+import hashlib
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Tuple
+import ffmpeg
+import numpy as np
+from ..utils.storage_paths import cache_dir
+
+logger = logging.getLogger("reframe_service")
+
+ANALYSIS_FPS = 5
+PROXY_WIDTH = 160
+EDGE_WEIGHT = 0.3
+QUIET_ENERGY = 0.002
+MEDIAN_SECONDS = 1.0
+SMOOTH_SECONDS = 0.8
+MAX_PAN_PER_SECOND = 0.5  # Fraction of the crop size
+COMMAND_RATE = 25
+CHUNK_FRAMES = 128
+CROP_FILTER = "crop@reframe"
+
+class ReframeServiceError(Exception):
+    """Custom exception for ReframeService errors."""
+    pass
+
+@dataclass(frozen=True)
+class ReframePlan:
+    """Crop geometry and path; x/y are the starting offsets, ``commands`` moves them over time."""
+    width: int
+    height: int
+    x: int
+    y: int
+    axis: str
+    commands: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-safe form, for segment sub-job payloads."""
+        return {"width": self.width, "height": self.height, "x": self.x, "y": self.y,
+                "axis": self.axis, "commands": self.commands}
+
+def parse_aspect_ratio(value: str) -> Fraction:
+    """
+    Parse "W:H" into a ratio.
+
+    Raises:
+        ReframeServiceError: If the value is malformed.
+    """
+    try:
+        width, height = (int(part) for part in value.split(":"))
+        return Fraction(width, height)
+    except (ValueError, ZeroDivisionError):
+        raise ReframeServiceError(f"Invalid aspect ratio: {value}")
+
+def crop_size(width: int, height: int, ratio: Fraction) -> Tuple[int, int, str]:
+    """
+    Largest even-sized crop of ``ratio`` inside a width x height frame.
+
+    Returns:
+        tuple[int, int, str]: (crop width, crop height, axis the crop moves along: "x", "y" or "").
+    """
+    if Fraction(width, height) > ratio:
+        crop_w = min(width, int(height * ratio) // 2 * 2)
+        return crop_w, height // 2 * 2, "x" if crop_w < width else ""
+    crop_h = min(height, int(width / ratio) // 2 * 2)
+    return width // 2 * 2, crop_h, "y" if crop_h < height else ""
+
+def _proxy_profiles(input_path: str, start: float, duration: float, proxy_w: int, proxy_h: int,
+                    axis: str) -> np.ndarray:
+    """Decode the clip window as a small grayscale proxy and return interest_profiles() for it, chunk by chunk."""
+    frame_bytes = proxy_w * proxy_h
+    process = (
+        ffmpeg.input(input_path, ss=start, t=duration)
+        .output('pipe:', format='rawvideo', pix_fmt='gray', an=None, sn=None,
+                vf=f"fps={ANALYSIS_FPS},scale={proxy_w}:{proxy_h}:flags=fast_bilinear")
+        .global_args('-loglevel', 'error', '-nostdin')
+        .run_async(pipe_stdout=True)
+    )
+    profiles: List[np.ndarray] = []
+    previous: Optional[np.ndarray] = None
+    try:
+        while True:
+            data = process.stdout.read(CHUNK_FRAMES * frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            frames = np.frombuffer(data[:len(data) // frame_bytes * frame_bytes], dtype=np.uint8)
+            frames = frames.reshape(-1, proxy_h, proxy_w)
+            # Carry the last frame over so motion is continuous across chunks
+            if previous is not None:
+                profiles.append(interest_profiles(np.concatenate([previous, frames]), axis)[1:])
+            else:
+                profiles.append(interest_profiles(frames, axis))
+            previous = frames[-1:]
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise ReframeServiceError(f"Proxy decode of {input_path} failed with code {process.returncode}")
+    return np.concatenate(profiles) if profiles else np.zeros((0, proxy_w if axis == "x" else proxy_h))
+
+def interest_profiles(frames: np.ndarray, axis: str) -> np.ndarray:
+    """
+    Per-frame energy along the crop axis: motion (frame difference) plus edges.
+
+    Returns:
+        np.ndarray: (frames, positions) float32, each row normalised to sum to 1
+        (all zeros for frames with less than QUIET_ENERGY mean energy).
+    """
+    data = frames.astype(np.float32) / 255
+    motion = np.abs(np.diff(data, axis=0, prepend=data[:1]))
+    edges = (np.abs(np.diff(data, axis=2, append=data[:, :, -1:]))
+             + np.abs(np.diff(data, axis=1, append=data[:, -1:, :])))
+    energy = motion + EDGE_WEIGHT * edges
+    profiles = energy.sum(axis=1 if axis == "x" else 2)
+    mean_energy = energy.mean(axis=(1, 2))
+    totals = profiles.sum(axis=1, keepdims=True)
+    profiles = np.where(totals > 0, profiles / np.maximum(totals, 1e-9), 0)
+    profiles[mean_energy < QUIET_ENERGY] = 0
+    return profiles.astype(np.float32)
+
+def best_offsets(profiles: np.ndarray, window: int) -> np.ndarray:
+    """
+    Offset of the ``window``-wide span with the most energy, per frame (NaN for quiet frames).
+    """
+    cumsum = np.concatenate([np.zeros((len(profiles), 1), dtype=np.float32), np.cumsum(profiles, axis=1)], axis=1)
+    sums = cumsum[:, window:] - cumsum[:, :-window]
+    # A subject narrower than the window is covered by a run of equally good
+    # offsets; take the middle of the run so it ends up centred, not at an edge
+    best = sums >= sums.max(axis=1, keepdims=True) - 1e-6
+    first = best.argmax(axis=1)
+    last = best.shape[1] - 1 - best[:, ::-1].argmax(axis=1)
+    offsets = (first + last) / 2
+    offsets[profiles.sum(axis=1) == 0] = np.nan
+    return offsets
+
+def smooth_path(offsets: np.ndarray, limit: float, max_step: float) -> np.ndarray:
+    """
+    Turn raw per-frame offsets into a steady camera path.
+
+    Quiet frames hold the previous position, a running median removes one-off
+    jumps, Gaussian smoothing removes jitter and each step is capped at
+    ``max_step`` so pans never whip.
+
+    Args:
+        offsets (np.ndarray): Raw offsets (NaN = no information).
+        limit (float): Largest valid offset.
+        max_step (float): Largest move between consecutive samples.
+    """
+    path = offsets.copy()
+    if np.isnan(path).all():
+        return np.full_like(path, limit / 2)
+    valid = np.flatnonzero(~np.isnan(path))
+    fill_index = np.maximum.accumulate(np.where(~np.isnan(path), np.arange(len(path)), -1))
+    path = np.where(fill_index >= 0, path[np.maximum(fill_index, 0)], path[valid[0]])
+    radius = max(1, int(MEDIAN_SECONDS * ANALYSIS_FPS / 2))
+    padded = np.pad(path, radius, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1)
+    path = np.median(windows, axis=1)
+    sigma = SMOOTH_SECONDS * ANALYSIS_FPS
+    taps = np.arange(-int(3 * sigma), int(3 * sigma) + 1)
+    kernel = np.exp(-0.5 * (taps / sigma) ** 2)
+    kernel /= kernel.sum()
+    path = np.convolve(np.pad(path, len(taps) // 2, mode="edge"), kernel, mode="valid")
+    for i in range(1, len(path)):
+        path[i] = path[i - 1] + np.clip(path[i] - path[i - 1], -max_step, max_step)
+    return np.clip(path, 0, limit)
+
+def build_commands(times: np.ndarray, positions: np.ndarray, axis: str) -> List[str]:
+    """
+    sendcmd lines moving the crop along ``axis``, at COMMAND_RATE, only when the position changes.
+    """
+    sample_times = np.arange(0, times[-1] + 1 / COMMAND_RATE, 1 / COMMAND_RATE)
+    values = np.interp(sample_times, times, positions).round().astype(int)
+    changed = np.concatenate([[True], values[1:] != values[:-1]])
+    return [f"{t:.3f} {CROP_FILTER} {axis} {v};" for t, v in zip(sample_times[changed], values[changed])]
+
+def plan_reframe(input_path: str, start: float, duration: float, width: int, height: int,
+                 aspect_ratio: Optional[str]) -> Optional[ReframePlan]:
+    """
+    Plan the crop that converts a clip to ``aspect_ratio``.
+
+    Args:
+        input_path (str): Source video.
+        start (float): Clip start in the source, in seconds.
+        duration (float): Clip duration in seconds.
+        width (int): Source width.
+        height (int): Source height.
+        aspect_ratio (str, optional): Target "W:H"; None keeps the source framing.
+
+    Returns:
+        Optional[ReframePlan]: None if no crop is needed.
+
+    Raises:
+        ReframeServiceError: If the ratio is invalid or the proxy cannot be decoded.
+    """
+    if not aspect_ratio:
+        return None
+    crop_w, crop_h, axis = crop_size(width, height, parse_aspect_ratio(aspect_ratio))
+    if not axis:
+        return None
+    proxy_w = PROXY_WIDTH
+    proxy_h = max(2, int(round(height * proxy_w / width / 2)) * 2)
+    profiles = _proxy_profiles(input_path, start, duration, proxy_w, proxy_h, axis)
+    full, crop, scale = (width, crop_w, width / proxy_w) if axis == "x" else (height, crop_h, height / proxy_h)
+    limit = full - crop
+    commands = None
+    initial = limit // 2 // 2 * 2
+    if len(profiles) >= 2:
+        window = max(1, min(profiles.shape[1] - 1, int(round(crop / scale))))
+        offsets = best_offsets(profiles, window) * scale
+        path = smooth_path(offsets, limit, MAX_PAN_PER_SECOND * crop / ANALYSIS_FPS)
+        commands = _write_commands(build_commands(np.arange(len(path)) / ANALYSIS_FPS, path, axis))
+        initial = int(round(path[0]))
+    x, y = (initial, 0) if axis == "x" else (0, initial)
+    logger.info(f"Reframe {width}x{height} -> {crop_w}x{crop_h} along {axis} from {len(profiles)} proxy frames")
+    return ReframePlan(crop_w, crop_h, x, y, axis, commands)
+
+def _write_commands(lines: List[str]) -> str:
+    text = "\n".join(lines) + "\n"
+    path = cache_dir("reframe", f"{hashlib.sha256(text.encode()).hexdigest()}.cmd")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return path
+
+def apply_reframe(stream, plan: Dict[str, Any]):
+    """
+    Add the (moving) crop to an ffmpeg-python video stream whose timestamps start at the clip start.
+
+    Args:
+        stream: Video stream.
+        plan (dict): ReframePlan.to_dict().
+    """
+    if plan.get("commands"):
+        stream = stream.filter('sendcmd', f=plan["commands"])
+    return stream.filter(CROP_FILTER, plan["width"], plan["height"], plan["x"], plan["y"])
+
+# Test block for service sanity (not for production)
+if __name__ == "__main__":
+    import sys
+    import time
+    try:
+        probe = ffmpeg.probe(sys.argv[1], select_streams='v:0')["streams"][0]
+        started = time.monotonic()
+        print(plan_reframe(sys.argv[1], 0, 30, probe["width"], probe["height"], "9:16"),
+              f"{time.monotonic() - started:.2f}s")
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
@@ -9,10 +9,11 @@ S3 Service Layer (Refactored)
 """
 
 import logging
-from typing import Dict, Any
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
+import os
+from typing import Dict, Any, Optional
 from ..config import settings
+from ..resources import registry
+from ..utils.tracing import span
 
 logger = logging.getLogger("s3_service")
 
@@ -20,20 +21,32 @@ class S3ServiceError(Exception):
     """Custom exception for S3Service errors."""
     pass
 
-s3 = boto3.client(
-    's3',
-    region_name=settings.AWS_REGION,
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-)
+def _create_s3_client() -> Any:
+    """Build the boto3 S3 client (registry factory); boto3 is imported on first use."""
+    import boto3
+    return boto3.client(
+        's3',
+        region_name=settings.AWS_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+    )
 
-def upload_file_to_s3(file_path: str, key: str) -> Dict[str, Any]:
+registry.register("s3", _create_s3_client, closer=lambda client: client.close())
+
+def get_s3_client() -> Any:
+    """Return the shared S3 client, creating it on first use."""
+    return registry.get("s3")
+
+def upload_file_to_s3(file_path: str, key: str, content_type: Optional[str] = None,
+                      cache_control: Optional[str] = None) -> Dict[str, Any]:
     """
     Upload a file to AWS S3.
 
     Args:
         file_path (str): Local path to the file.
         key (str): S3 object key.
+        content_type (str, optional): Content-Type to store with the object.
+        cache_control (str, optional): Cache-Control to store with the object.
 
     Returns:
         dict[str, Any]: On success: {"success": True, "key": str}.
@@ -43,13 +56,33 @@ def upload_file_to_s3(file_path: str, key: str) -> Dict[str, Any]:
     """
     try:
         logger.info(f"Uploading file to S3: {file_path} -> {key}")
-        s3.upload_file(file_path, settings.AWS_S3_BUCKET, key, ExtraArgs={"ACL": "public-read"})
+        extra_args = {"ACL": "public-read"}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        if cache_control:
+            extra_args["CacheControl"] = cache_control
+        with span("upload", {"s3.bucket": settings.AWS_S3_BUCKET, "s3.key": key,
+                             "upload.bytes": os.path.getsize(file_path) if os.path.exists(file_path) else None}):
+            get_s3_client().upload_file(file_path, settings.AWS_S3_BUCKET, key, ExtraArgs=extra_args)
         logger.info(f"File uploaded to S3: {key}")
         return {"success": True, "key": key}
-    except (BotoCoreError, ClientError, Exception) as e:
+    except Exception as e:
         logger.error(f"S3 upload error: {e}")
         raise S3ServiceError(f"S3 upload error: {e}")
 
+def get_public_url(key: str) -> str:
+    """
+    Build the public URL of an object uploaded with the public-read ACL.
+
+    Args:
+        key (str): S3 object key.
+
+    Returns:
+        str: HTTPS URL of the object.
+    """
+    region = f".{settings.AWS_REGION}" if settings.AWS_REGION else ""
+    return f"https://{settings.AWS_S3_BUCKET}.s3{region}.amazonaws.com/{key}"
+
 # Test block for service sanity (not for production)
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,191 @@
+"""
+Segment Service Layer
+
+- Split/encode/concat mode for long clips: the window is cut at source keyframes
+  into chunks, chunks are encoded (video only) in parallel, and the results are
+  joined losslessly with the concat demuxer while the audio is encoded once.
+- Executors:
+  - "local": a process pool on this machine, sized from the slot's thread budget.
+  - "rq": chunks are also offered to other workers as sub-jobs on the segment
+    queue. Each chunk is claimed with SET NX, so whichever of the parent or a
+    sub-job gets there first encodes it; the parent never idles waiting for a
+    free worker. Requires VIDEO_STORAGE_PATH to be shared between workers.
+"""
+
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from ..config import settings
+from .encoding_profiles import EncodingProfile, get_profile
+from .ffmpeg_service import (
+    FFmpegServiceError, concat_segments, encode_video_segment, ffmpeg_thread_budget, list_keyframes,
+)
+from ..utils.tracing import inject_context
+
+logger = logging.getLogger("segment_service")
+
+Segment = Tuple[float, float]
+
+class SegmentServiceError(Exception):
+    """Custom exception for SegmentService errors."""
+    pass
+
+def plan_segments(start: float, end: float, keyframes: List[float], target_seconds: float) -> List[Segment]:
+    """
+    Split [start, end) into chunks of about ``target_seconds``, cutting only at keyframes.
+
+    Args:
+        start (float): Window start in seconds.
+        end (float): Window end in seconds.
+        keyframes (list[float]): Sorted source keyframe times.
+        target_seconds (float): Preferred chunk length.
+
+    Returns:
+        list[tuple[float, float]]: (segment start, segment end) pairs covering the window.
+    """
+    cuts = [start]
+    for keyframe in keyframes:
+        if keyframe - cuts[-1] >= target_seconds and end - keyframe >= target_seconds / 2:
+            cuts.append(keyframe)
+    cuts.append(end)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def segment_dir_for(output_path: str) -> str:
+    """Working directory holding the chunks of an output file."""
+    return f"{output_path}.segments"
+
+def segment_path(workdir: str, index: int) -> str:
+    """Path of chunk ``index`` in a working directory."""
+    return os.path.join(workdir, f"{index:04d}.mp4")
+
+def encode_segment(input_path: str, output_path: str, start: float, end: float,
+                   profile_name: str, threads: Optional[int], captions: Optional[str] = None,
+                   window_start: float = 0, reframe: Optional[Dict[str, Any]] = None) -> str:
+    """Encode one chunk (module-level so process pools and RQ can call it)."""
+    encode_video_segment(input_path, output_path, start, end - start, threads=threads, profile=get_profile(profile_name),
+                         captions=captions, clip_offset=start - window_start, reframe=reframe)
+    return output_path
+
+def _claim_key(workdir: str, index: int) -> str:
+    return f"segment:claim:{workdir}:{index}"
+
+def claim_segment(connection: Any, workdir: str, index: int, ttl: int) -> bool:
+    """Atomically claim a chunk so it is encoded exactly once across parent and sub-jobs."""
+    return bool(connection.set(_claim_key(workdir, index), os.getpid(), nx=True, ex=ttl))
+
+def _encode_local(input_path: str, workdir: str, segments: List[Segment], profile: EncodingProfile,
+                  total_threads: int, captions: Optional[str] = None,
+                  reframe: Optional[Dict[str, Any]] = None) -> None:
+    workers = max(1, min(len(segments), total_threads // max(settings.FFMPEG_THREADS_PER_JOB, 1)))
+    threads = max(1, total_threads // workers)
+    logger.info(f"Encoding {len(segments)} segments on {workers} local processes x {threads} threads")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(encode_segment, input_path, segment_path(workdir, i), seg_start, seg_end, profile.name, threads,
+                        captions, segments[0][0], reframe)
+            for i, (seg_start, seg_end) in enumerate(segments)
+        ]
+        for future in futures:
+            future.result()
+
+def _encode_distributed(input_path: str, workdir: str, segments: List[Segment], profile: EncodingProfile,
+                        threads: Optional[int], captions: Optional[str] = None,
+                        reframe: Optional[Dict[str, Any]] = None) -> None:
+    from rq.job import Job
+    from ..queue.video_queue import get_segment_queue
+    from .redis_service import get_redis_conn
+
+    connection = get_redis_conn()
+    queue = get_segment_queue()
+    ttl = settings.VIDEO_JOB_TIMEOUT
+    window_start = segments[0][0]
+    sub_jobs: Dict[int, str] = {}
+    for i, (seg_start, seg_end) in enumerate(segments):
+        job = queue.enqueue(
+            "app.worker.video_jobs.encode_segment_job",
+            kwargs={"payload": {"input": input_path, "workdir": workdir, "index": i, "start": seg_start,
+                                "end": seg_end, "profile": profile.name, "captions": captions,
+                                "window_start": window_start, "reframe": reframe}},
+            job_timeout=ttl, result_ttl=600, failure_ttl=600, meta={"trace": inject_context()},
+        )
+        sub_jobs[i] = job.id
+    all_jobs = list(sub_jobs.values())
+    try:
+        # Work through the chunks ourselves too; sub-jobs skip any chunk we claimed first
+        for i, (seg_start, seg_end) in enumerate(segments):
+            if claim_segment(connection, workdir, i, ttl):
+                encode_segment(input_path, segment_path(workdir, i), seg_start, seg_end, profile.name, threads,
+                               captions, window_start, reframe)
+                sub_jobs.pop(i)
+        deadline = time.monotonic() + ttl
+        while sub_jobs:
+            if time.monotonic() > deadline:
+                raise SegmentServiceError(f"Timed out waiting for segments {sorted(sub_jobs)}")
+            for i, job in zip(list(sub_jobs), Job.fetch_many(list(sub_jobs.values()), connection=connection)):
+                status = job.get_status(refresh=False) if job else "failed"
+                if status == "finished":
+                    sub_jobs.pop(i)
+                elif status in ("failed", "stopped", "canceled"):
+                    logger.warning(f"Segment {i} sub-job {status}; encoding it locally")
+                    encode_segment(input_path, segment_path(workdir, i), *segments[i], profile.name, threads,
+                                   captions, window_start, reframe)
+                    sub_jobs.pop(i)
+            if sub_jobs:
+                time.sleep(0.5)
+    finally:
+        # Sub-jobs of chunks we encoded ourselves are still queued: drop them before the
+        # workdir goes away (one that starts anyway finds no workdir and exits)
+        for job in Job.fetch_many(all_jobs, connection=connection):
+            if job is not None and job.get_status(refresh=False) in ("queued", "deferred", "scheduled"):
+                job.delete()
+        connection.delete(*[_claim_key(workdir, i) for i in range(len(segments))])
+
+def process_video_segmented(input_path: str, output_path: str, start: float, duration: float,
+                            profile: EncodingProfile, executor: Optional[str] = None,
+                            captions: Optional[str] = None,
+                            reframe: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Encode a clip window by splitting it at keyframes and encoding chunks in parallel.
+
+    Args:
+        input_path (str): Path to the input video file.
+        output_path (str): Path to the output video file.
+        start (float): Window start in seconds.
+        duration (float): Window duration in seconds.
+        profile (EncodingProfile): Encoding profile for every chunk.
+        executor (str, optional): "local" or "rq"; defaults to SEGMENT_EXECUTOR.
+        captions (str, optional): Compiled ASS file burned into every chunk (clip-relative times).
+        reframe (dict, optional): ReframePlan.to_dict(); each chunk follows its part of the crop path.
+
+    Returns:
+        dict[str, Any]: {"success": True, "output": str, "profile": str, "segments": int}.
+
+    Raises:
+        SegmentServiceError: If any chunk or the final concat fails.
+    """
+    executor = executor or settings.SEGMENT_EXECUTOR
+    end = start + duration
+    workdir = segment_dir_for(output_path)
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        segments = plan_segments(start, end, list_keyframes(input_path, start, end), settings.SEGMENT_TARGET_SECONDS)
+        logger.info(f"Segmented encode of {input_path}: {len(segments)} segments via {executor}")
+        total_threads = ffmpeg_thread_budget() or os.cpu_count() or 1
+        if executor == "rq":
+            _encode_distributed(input_path, workdir, segments, profile, ffmpeg_thread_budget(), captions, reframe)
+        else:
+            _encode_local(input_path, workdir, segments, profile, total_threads, captions, reframe)
+        concat_segments([segment_path(workdir, i) for i in range(len(segments))],
+                        input_path, output_path, start, duration, profile=profile)
+        return {"success": True, "output": output_path, "profile": profile.name, "segments": len(segments)}
+    except FFmpegServiceError as e:
+        raise SegmentServiceError(f"Segmented encode failed: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# Test block for service sanity (not for production)
+if __name__ == "__main__":
+    print(plan_segments(0, 100, [float(t) for t in range(0, 100, 2)], 30))
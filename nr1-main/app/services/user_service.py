@@ -11,7 +11,9 @@ User Service Layer (Refactored)
 
 import logging
 from typing import Optional, Dict, Any
+from app.config import settings
 from app.schemas import UserCreate, UserLogin, UserOut
+from app.services.cache_service import cached
 from passlib.context import CryptContext
 
 logger = logging.getLogger("user_service")
@@ -51,24 +53,44 @@ def create_user(email: str, full_name: Optional[str], hashed_password: str) -> U
         UserOut: The created user object.
     """
     user_id = str(len(_fake_users_db) + 1)
-    user = {"id": user_id, "email": email, "full_name": full_name or "", "hashed_password": hashed_password}
+    user = {"id": user_id, "email": email, "full_name": full_name or "", "hashed_password": hashed_password, "plan": "free"}
     _fake_users_db[user_id] = user
+    get_user_by_id.invalidate(user_id)
     logger.info(f"AUDIT: create_user: {email} id={user_id}")
     return UserOut(id=user_id, email=email, full_name=full_name or "")
 
+@cached("user", settings.USER_CACHE_TTL)
 def get_user_by_id(user_id: str) -> Optional[dict[str, Any]]:
     """
-    Retrieve a user by user ID.
+    Retrieve a user's profile by user ID (cached for USER_CACHE_TTL; treat the result as read-only).
+
+    The cache is shared through Redis, so credentials are left out; use
+    get_user_by_email to check a password.
 
     Args:
         user_id (str): The user's ID.
 
     Returns:
-        dict[str, Any] | None: User dict if found, None otherwise.
+        dict[str, Any] | None: User dict without ``hashed_password`` if found, None otherwise.
     """
     user = _fake_users_db.get(user_id)
     logger.info(f"AUDIT: get_user_by_id: {user_id} found={user is not None}")
-    return user
+    if user is None:
+        return None
+    return {key: value for key, value in user.items() if key != "hashed_password"}
+
+def get_user_plan(user_id: str) -> str:
+    """
+    Return the subscription plan of a user ("free" for unknown users).
+
+    Args:
+        user_id (str): The user's ID.
+
+    Returns:
+        str: Plan name, e.g. "free" or "pro".
+    """
+    user = _fake_users_db.get(user_id)
+    return user.get("plan", "free") if user else "free"
 
 def signup_service(user: UserCreate) -> UserOut:
     """
@@ -9,13 +9,20 @@ Video Service Layer (Refactored)
 """
 
 import logging
+import re
+from typing import Optional
+from app.config import settings
 from app.schemas import (
-    VideoValidateOut, VideoInfoOut, VideoProcessIn, VideoProcessOut, VideoJobStatusOut, VideoServeOut
+    VideoValidateOut, VideoInfoOut, VideoProcessIn, VideoProcessOut, VideoJobStatusOut, VideoServeOut,
+    VideoHighlightsOut
 )
 from app.utils.extract_video_id import extract_video_id
+from app.queue.scheduler import estimate_cost, choose_lane
 
 logger = logging.getLogger("video_service")
 
+VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
 class VideoServiceError(Exception):
     """Custom exception for VideoService errors."""
     pass
@@ -44,35 +51,101 @@ def get_video_info_service(video_id: str) -> VideoInfoOut:
     """
     Retrieve video information by video ID.
 
+    Metadata comes from ffprobe on the ingested source (cached, see
+    metadata_service). Until the source is on disk only the ID is known.
+    Not cached here: the metadata is, and the HTTP response cache fronts
+    the info route.
+
     Args:
         video_id (str): YouTube video ID.
 
     Returns:
-        VideoInfoOut: Video information (stubbed for now).
+        VideoInfoOut: Video information.
 
     Raises:
-        VideoServiceError: If video info cannot be retrieved.
+        VideoServiceError: If the ID is invalid or the source cannot be probed.
     """
-    # TODO: Implement real info fetch (duration, title, etc.)
-    logger.info(f"Fetching info for video_id: {video_id}")
-    return VideoInfoOut(video_id=video_id, duration=60, title="Sample Video")
+    from app.services.metadata_service import MetadataServiceError, get_video_metadata
+
+    if not VIDEO_ID_RE.match(video_id):
+        raise VideoServiceError("Invalid video ID")
+    try:
+        metadata = get_video_metadata(video_id)
+    except MetadataServiceError as e:
+        logger.error(f"Metadata probe failed for video_id {video_id}: {e}")
+        raise VideoServiceError(f"Could not read video metadata: {e}")
+    thumbnail_url = get_thumbnail_url(video_id)
+    if metadata is None:
+        logger.info(f"No source on disk for video_id: {video_id}; returning basic info")
+        return VideoInfoOut(video_id=video_id, title=video_id, duration=0, thumbnail_url=thumbnail_url)
+    logger.info(f"Fetched info for video_id: {video_id}")
+    # The metadata dict is shared with the metadata cache: copy, never pop
+    details = {k: v for k, v in metadata.items() if k not in ("title", "duration")}
+    return VideoInfoOut(
+        video_id=video_id,
+        title=metadata["title"] or video_id,
+        duration=round(metadata["duration"]),
+        duration_seconds=metadata["duration"],
+        thumbnail_url=thumbnail_url,
+        **details,
+    )
 
-def process_video_job_service(data: VideoProcessIn) -> VideoProcessOut:
+def get_thumbnail_url(video_id: str) -> Optional[str]:
+    """Return the poster of the latest clip made from a video, if any (best effort)."""
+    if not settings.REDIS_URL:
+        return None
+    try:
+        from app.services.redis_service import get_redis_conn
+        value = get_redis_conn().get(f"video:thumbnail:{video_id}")
+    except Exception as e:
+        logger.warning(f"Could not read thumbnail for {video_id}: {e}")
+        return None
+    return value.decode() if value else None
+
+def process_video_job_service(data: VideoProcessIn, user_key: str = "anonymous", plan: str = "free") -> VideoProcessOut:
     """
-    Queue a video processing job.
+    Queue a video processing job through the fair, priority-aware scheduler.
 
     Args:
         data (VideoProcessIn): Video processing parameters.
+        user_key (str): Fairness key for the submitter (JWT user or client IP).
+        plan (str): Submitter's plan; paid plans use the priority lane.
 
     Returns:
-        VideoProcessOut: Job ID and status (stubbed for now).
+        VideoProcessOut: Job ID and status.
 
     Raises:
         VideoServiceError: If job cannot be queued.
     """
-    # TODO: Enqueue job in Celery/RQ
-    logger.info(f"Queued video processing job for video_id: {data.video_id}")
-    return VideoProcessOut(job_id="sample-job-id", status="queued")
+    from app.queue.video_queue import submit_clip_job
+
+    duration = data.end_time - data.start_time
+    if data.renditions:
+        # One decode feeds every rendition; the encodes dominate, so cost is their sum
+        cost = sum(estimate_cost(duration, r.width, r.height) for r in data.renditions)
+    else:
+        cost = estimate_cost(duration)
+    lane = choose_lane(duration, cost, plan, settings.QUEUE_SHORT_CLIP_SECONDS, settings.QUEUE_BULK_COST)
+    try:
+        job_id = submit_clip_job(data.model_dump(), user_key, lane, cost)
+    except Exception as e:
+        logger.error(f"Failed to queue job for video_id {data.video_id}: {e}")
+        raise VideoServiceError(f"Could not queue video processing job: {e}")
+    logger.info(f"Queued video processing job {job_id} for video_id: {data.video_id} lane={lane} cost={cost:.1f}")
+    return VideoProcessOut(job_id=job_id, status="queued", message=f"Queued in {lane} lane")
+
+_JOB_STATUS_MAP = {
+    "deferred": "queued",
+    "scheduled": "queued",
+    "queued": "queued",
+    "started": "processing",
+    "finished": "completed",
+    "failed": "failed",
+    "stopped": "failed",
+    "canceled": "failed",
+}
+
+TERMINAL_JOB_STATUSES = ("completed", "failed")
 
 def check_job_status_service(job_id: str) -> VideoJobStatusOut:
     """
@@ -82,14 +155,91 @@ def check_job_status_service(job_id: str) -> VideoJobStatusOut:
         job_id (str): Job ID.
 
     Returns:
-        VideoJobStatusOut: Job status (stubbed for now).
+        VideoJobStatusOut: Job status, progress and result URL when finished.
+
+    Raises:
+        VideoServiceError: If the job does not exist or status cannot be checked.
+    """
+    from rq.job import Job
+    from rq.exceptions import NoSuchJobError
+    from app.services.redis_service import get_redis_conn
+
+    try:
+        job = Job.fetch(job_id, connection=get_redis_conn())
+    except NoSuchJobError:
+        raise VideoServiceError(f"Job {job_id} not found")
+    except Exception as e:
+        logger.error(f"Failed to check job {job_id}: {e}")
+        raise VideoServiceError(f"Could not check job status: {e}")
+    result = job_status_from(job)
+    logger.info(f"Checked status for job_id: {job_id} status={result.status}")
+    return result
+
+def job_status_from(job) -> VideoJobStatusOut:
+    """
+    Build the public status of an RQ job from its status and meta.
+
+    Shared by the status endpoint and the worker, which publishes the same
+    payload as a job event (see job_events_service).
+    """
+    return VideoJobStatusOut(
+        job_id=job.id,
+        status=_JOB_STATUS_MAP.get(job.get_status(refresh=False) or "", "queued"),
+        progress=job.meta.get("progress"),
+        result_url=job.meta.get("result_url"),
+        encoding_profile=job.meta.get("encoding_profile"),
+        renditions=job.meta.get("renditions"),
+        thumbnail_url=job.meta.get("thumbnail_url"),
+        previews=job.meta.get("previews"),
+        attempts=job.meta.get("attempts"),
+        error=job.meta.get("error"),
+    )
+
+def get_highlights_service(video_id: str, clip_seconds: float = 30, count: int = 5) -> VideoHighlightsOut:
+    """
+    Return ranked highlight windows for a video, queueing its analysis if needed.
+
+    Args:
+        video_id (str): Video ID.
+        clip_seconds (float): Length of the suggested clips.
+        count (int): Number of suggestions.
+
+    Returns:
+        VideoHighlightsOut: "completed" with highlights, "failed" with the error of a
+            recently failed analysis, or the analysis job's status.
 
     Raises:
-        VideoServiceError: If job status cannot be checked.
+        VideoServiceError: If the ID is invalid or Redis is unavailable.
     """
-    # TODO: Check job status in queue
-    logger.info(f"Checked status for job_id: {job_id}")
-    return VideoJobStatusOut(job_id=job_id, status="processing")
+    from app.queue.video_queue import highlights_failure, submit_highlights_job
+    from app.services.highlight_service import load_signals, rank_windows
+    from app.services.redis_service import get_redis_conn
+
+    if not VIDEO_ID_RE.match(video_id):
+        raise VideoServiceError("Invalid video ID")
+    try:
+        conn = get_redis_conn()
+        signals = load_signals(conn, video_id)
+        if signals is not None:
+            highlights = rank_windows(signals, clip_seconds, count)
+            return VideoHighlightsOut(video_id=video_id, status="completed", clip_seconds=clip_seconds,
+                                      highlights=highlights)
+        error = highlights_failure(video_id, conn)
+        if error is not None:
+            # Failed for good a moment ago (e.g. unknown source): report it instead of queueing again
+            return VideoHighlightsOut(video_id=video_id, status="failed", clip_seconds=clip_seconds, error=error)
+        status = "queued"
+        if submit_highlights_job(video_id) is None:
+            try:
+                status = check_job_status_service(f"highlights-{video_id}").status
+            except VideoServiceError:
+                pass  # Another request set the pending marker and is saving the job
+        else:
+            logger.info(f"Queued highlight analysis for video_id: {video_id}")
+    except Exception as e:
+        logger.error(f"Failed to get highlights for video_id {video_id}: {e}")
+        raise VideoServiceError(f"Could not get highlights: {e}")
+    return VideoHighlightsOut(video_id=video_id, status=status, clip_seconds=clip_seconds)
 
 def serve_processed_video_service(video_id: str) -> VideoServeOut:
     """
@@ -125,7 +275,6 @@ if __name__ == "__main__":
         print(validate_youtube_url_service("https://www.youtube.com/watch?v=dQw4w9WgXcQ"))
         print(get_video_info_service("dQw4w9WgXcQ"))
         print(process_video_job_service(VideoProcessIn(video_id="dQw4w9WgXcQ", start_time=0, end_time=10)))
-        print(check_job_status_service("sample-job-id"))
         print(serve_processed_video_service("dQw4w9WgXcQ"))
         print(serve_sample_video_service())
     except Exception as e:
@@ -0,0 +1,19 @@
+import os
+import pytest
+from app.config import settings
+
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+@pytest.fixture
+def redis_conn(monkeypatch):
+    """Empty Redis database at TEST_REDIS_URL, installed as the app's shared connection."""
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL not set")
+    from redis import Redis
+    from app.resources import registry
+    conn = Redis.from_url(TEST_REDIS_URL)
+    conn.flushdb()
+    monkeypatch.setattr(settings, "REDIS_URL", TEST_REDIS_URL)
+    monkeypatch.setitem(registry._instances, "redis", conn)
+    yield conn
+    conn.flushdb()
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+import msgpack
+import pytest
+from app.config import settings
+from app.resources import registry
+from app.services.cache_service import INVALIDATION_CHANNEL, MISSING, cache_stats, cached
+
+@pytest.fixture
+def local_only(monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_URL", "")
+
+def test_sync_function_is_cached_until_invalidated(local_only):
+    calls = []
+
+    @cached("test_sync", ttl=60)
+    def lookup(user_id, full=False):
+        calls.append(user_id)
+        return {"id": user_id, "full": full} if user_id != "missing" else None
+
+    assert lookup("1") == lookup("1") == {"id": "1", "full": False}
+    assert lookup("1", full=True)["full"] is True
+    assert lookup("missing") is None and lookup("missing") is None
+    assert calls == ["1", "1", "missing", "missing"]
+    lookup.invalidate("1")
+    lookup("1")
+    assert calls[-1] == "1" and len(calls) == 5
+    stats = cache_stats()["test_sync"]
+    assert stats["local_hits"] == 1 and stats["misses"] == 5 and stats["loads"] == 5
+
+def test_concurrent_misses_share_one_call_and_its_error(local_only):
+    calls = []
+
+    @cached("test_flight", ttl=60)
+    def slow(key):
+        calls.append(key)
+        time.sleep(0.2)
+        if key == "bad":
+            raise ValueError("boom")
+        return key.upper()
+
+    results, errors = [], []
+
+    def call(key):
+        try:
+            results.append(slow(key))
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(key,)) for key in ["ok"] * 5 + ["bad"] * 5]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(calls) == ["bad", "ok"]
+    assert results == ["OK"] * 5 and len(errors) == 5
+    assert cache_stats()["test_flight"]["coalesced"] == 8
+
+def test_async_function_single_flight(local_only):
+    calls = []
+
+    @cached("test_async", ttl=60)
+    async def fetch(video_id):
+        calls.append(video_id)
+        await asyncio.sleep(0.05)
+        return {"video_id": video_id}
+
+    async def burst():
+        return await asyncio.gather(*(fetch("v") for _ in range(10)))
+
+    assert asyncio.run(burst()) == [{"video_id": "v"}] * 10
+    assert asyncio.run(fetch("v")) == {"video_id": "v"} and calls == ["v"]
+
+def test_cached_user_profile_has_no_credentials(local_only):
+    from app.services.user_service import create_user, get_user_by_id
+    user = create_user("cache@example.com", "Cache Test", "$2b$12$hash")
+    cached_user = get_user_by_id(user.id)
+    assert cached_user["email"] == "cache@example.com" and "hashed_password" not in cached_user
+    assert get_user_by_id.cache.local.get(user.id) == cached_user
+
+@pytest.fixture
+def redis_conn(redis_conn):
+    yield redis_conn
+    asyncio.run(registry.close("cache_invalidation"))
+
+def test_redis_tier_and_pubsub_invalidation(redis_conn):
+    from app.schemas import VideoInfoOut
+    calls = []
+
+    @cached("test_shared", ttl=60, dump=lambda info: info.model_dump(), load=VideoInfoOut.model_validate)
+    def info(video_id):
+        calls.append(video_id)
+        return VideoInfoOut(video_id=video_id, title="t", duration=3)
+
+    assert info("a").duration == 3
+    assert redis_conn.ttl("cache:test_shared:a") > 0
+    # A fresh process (empty local tier) is served from Redis without calling the function
+    info.cache.local.clear()
+    assert info("a") == VideoInfoOut(video_id="a", title="t", duration=3) and calls == ["a"]
+    assert cache_stats()["test_shared"]["redis_hits"] == 1
+
+    # Another process invalidating the key drops our local copy through pub/sub
+    redis_conn.delete("cache:test_shared:a")
+    deadline = time.monotonic() + 3
+    # Publish until received: the listener thread may still be subscribing
+    while info.cache.local.get("a", MISSING) is not MISSING and time.monotonic() < deadline:
+        redis_conn.publish(INVALIDATION_CHANNEL, msgpack.packb(["test_shared", "a"]))
+        time.sleep(0.05)
+    info("a")
+    assert calls == ["a", "a"]
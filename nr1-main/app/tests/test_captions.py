@@ -0,0 +1,72 @@
+import shutil
+import subprocess
+import numpy as np
+import pytest
+from app.config import settings
+from app.services import caption_service
+from app.services.caption_service import Cue, parse_captions
+from app.services.ffmpeg_service import encode_video_segment, process_video
+
+SRT = """1
+00:00:01,000 --> 00:00:02,500
+<b>Hello</b> there
+
+2
+00:00:03,000 --> 00:00:09,000
+General {Kenobi}
+"""
+
+VTT = """WEBVTT
+
+NOTE ignored
+
+intro
+00:00.500 --> 00:01.000 align:start
+First
+"""
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VIDEO_STORAGE_PATH", str(tmp_path))
+    return tmp_path
+
+def test_parse_srt_and_vtt():
+    assert parse_captions(SRT, 5) == [Cue(1.0, 2.5, "Hello there"), Cue(3.0, 5, "General {Kenobi}")]
+    assert parse_captions(VTT, 5) == [Cue(0.5, 1.0, "First")]
+
+def test_plain_text_is_spread_over_clip():
+    cues = parse_captions("one two three four five six seven eight nine ten eleven twelve", 6)
+    assert len(cues) == 2 and cues[0].start == 0 and cues[-1].end == pytest.approx(6)
+    assert cues[0].end == pytest.approx(cues[1].start)
+
+def test_ass_escapes_override_braces():
+    ass = caption_service.build_ass([Cue(0, 1, "a {b}\nc")], 1080, 1920, "DejaVu Sans")
+    assert "PlayResY: 1920" in ass
+    assert ass.rstrip().endswith("Dialogue: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,a \\{b\\}\\Nc")
+
+def test_compiled_captions_are_cached(storage, monkeypatch):
+    first = caption_service.compile_captions(SRT, 10, 640, 360)
+    calls = []
+    monkeypatch.setattr(caption_service, "build_ass", lambda *args: calls.append(args) or "")
+    assert caption_service.compile_captions(SRT, 10, 640, 360) == first and calls == []
+    assert caption_service.compile_captions(SRT, 10, 360, 640) != first
+
+def _frame(path, at):
+    raw = subprocess.run(["ffmpeg", "-loglevel", "error", "-ss", str(at), "-i", path, "-frames:v", "1",
+                          "-f", "rawvideo", "-pix_fmt", "gray", "-"], capture_output=True, check=True).stdout
+    return np.frombuffer(raw, dtype=np.uint8)
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_captions_are_burned_in_single_pass_and_segments(storage):
+    source = str(storage / "black.mp4")
+    subprocess.run(["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "color=black:size=320x240:rate=25",
+                    "-t", "8", source], check=True)
+    ass = caption_service.compile_captions(SRT, 6, 320, 240)
+    output = str(storage / "clip.mp4")
+    process_video(source, output, start=2, duration=6, captions=ass)
+    assert _frame(output, 0.2).max() < 40  # before the first cue
+    assert _frame(output, 1.5).max() > 200
+    # A segment starting 3 s into the clip must show the cue at clip time 3-6 s
+    segment = str(storage / "segment.mp4")
+    encode_video_segment(source, segment, start=5, duration=2, captions=ass, clip_offset=3)
+    assert _frame(segment, 0.5).max() > 200
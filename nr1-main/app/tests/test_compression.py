@@ -0,0 +1,56 @@
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.middleware.compression import CompressionMiddleware, negotiate_encoding
+from app.utils.static_files import PrecompressedStaticFiles
+from app.utils.precompress import precompress_directory
+
+def make_client(static_dir) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    def big():
+        return {"items": ["clip"] * 500}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    app.mount("/public", PrecompressedStaticFiles(directory=str(static_dir)), name="public")
+    return TestClient(app)
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    assert negotiate_encoding("") is None
+
+def test_large_json_is_gzipped_and_small_json_is_not(tmp_path):
+    client = make_client(tmp_path)
+    resp = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["vary"]
+    assert len(resp.json()["items"]) == 500
+
+    resp = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+
+def test_static_assets_served_precompressed_with_cache_headers(tmp_path):
+    (tmp_path / "app.3f2a9c1b.js").write_text("console.log('viral');\n" * 100)
+    (tmp_path / "styles.css").write_text("body { margin: 0; }\n" * 100)
+    assert precompress_directory(str(tmp_path)) >= 2
+    client = make_client(tmp_path)
+
+    resp = client.get("/public/app.3f2a9c1b.js", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "javascript" in resp.headers["content-type"]
+    assert "immutable" in resp.headers["cache-control"]
+    assert resp.text.startswith("console.log")
+
+    resp = client.get("/public/styles.css", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+    assert resp.headers["cache-control"] == "no-cache"
+    raw = (tmp_path / "styles.css.gz").read_bytes()
+    assert gzip.decompress(raw) == (tmp_path / "styles.css").read_bytes()
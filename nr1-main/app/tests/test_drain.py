@@ -0,0 +1,32 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.drain import DrainState, drain_state
+
+client = TestClient(app)
+
+def test_draining_rejects_new_jobs_and_fails_health():
+    drain_state.draining = True
+    try:
+        resp = client.post("/api/v1/videos/process", json={"video_id": "abc", "start_time": 0, "end_time": 10})
+        assert resp.status_code == 503
+        assert resp.headers["retry-after"]
+        assert client.get("/health").json()["status"] == "draining"
+        # Reads are still served while draining
+        assert client.get("/api/v1/i18n/translations").status_code == 200
+    finally:
+        drain_state.draining = False
+    assert client.get("/health").status_code == 200
+
+def test_drain_runs_sync_and_async_flushers():
+    state = DrainState()
+    flushed = []
+
+    async def flush_async():
+        flushed.append("async")
+
+    state.register_flush("sync", lambda: flushed.append("sync"))
+    state.register_flush("async", flush_async)
+    result = asyncio.run(state.drain(timeout=1))
+    assert result["idle"] is True
+    assert flushed == ["sync", "async"]
@@ -0,0 +1,14 @@
+import pytest
+from app.services.encoding_profiles import EncodingProfileError, get_profile, select_profile
+
+def test_auto_speeds_up_with_backlog_and_wait():
+    assert select_profile("auto", pending=0, oldest_wait=0).name == "balanced"
+    assert select_profile("auto", pending=25, oldest_wait=0).preset == "veryfast"
+    assert select_profile(None, pending=0, oldest_wait=400).name == "fast"
+    assert select_profile("auto", pending=150, oldest_wait=0).name == "turbo"
+
+def test_explicit_profile_is_honoured():
+    assert select_profile("quality", pending=500, oldest_wait=5000).name == "quality"
+    assert get_profile("turbo").output_args()["preset"] == "ultrafast"
+    with pytest.raises(EncodingProfileError):
+        get_profile("lossless")
@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from app.config import settings
+from app.main import app
+from app.services import feedback_service
+
+client = TestClient(app)
+ADMIN = {"X-Admin-Token": "secret"}
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_URL", "")
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(feedback_service, "_memory_store", feedback_service.InMemoryFeedbackStore())
+    for message in [
+        "Export crashes when the video is longer than an hour",
+        "Love the captions, but export is slow. Export takes ages on long videos",
+        "Captions are misaligned after trimming",
+        "Audio drifts out of sync in exported clips",
+        "Please add dark mode",
+    ]:
+        assert client.post("/api/v1/feedback/", json={"message": message}).status_code == 200
+
+def search(**params):
+    return client.get("/api/v1/feedback/search", params=params, headers=ADMIN)
+
+def test_search_ranks_and_highlights(store):
+    resp = search(q="export")
+    assert resp.status_code == 200
+    hits = resp.json()["results"]
+    # Two mentions outrank one; the in-memory fallback only folds plurals, so "exported" is not a hit
+    assert [h["message"][:12] for h in hits] == ["Love the cap", "Export crash"]
+    assert hits[0]["rank"] > hits[1]["rank"]
+    assert "<mark>export</mark>" in hits[0]["snippet"] and "<mark>Export</mark>" in hits[0]["snippet"]
+    assert resp.json()["next_cursor"] is None
+
+def test_websearch_syntax(store):
+    assert [h["id"] for h in search(q='"long videos"').json()["results"]] == ["2"]
+    assert {h["id"] for h in search(q="captions -trimming").json()["results"]} == {"2"}
+    assert {h["id"] for h in search(q="dark or audio").json()["results"]} == {"4", "5"}
+    assert search(q="the").json()["results"] == []
+
+def test_keyset_pagination_walks_every_hit_once(store):
+    client.post("/api/v1/feedback/", json={"message": "Export button is hidden"})
+    seen, cursor = [], None
+    while True:
+        page = search(q="export or captions", limit=2, **({"cursor": cursor} if cursor else {})).json()
+        seen += [(h["rank"], int(h["id"])) for h in page["results"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 4
+    assert seen == sorted(seen, reverse=True)
+
+def test_search_validation_and_admin_guard(store):
+    assert search(q="export", cursor="not-a-cursor").status_code == 400
+    assert search(q="").status_code == 422
+    assert search(q="export", limit=500).status_code == 422
+    assert client.get("/api/v1/feedback/search", params={"q": "export"}).status_code == 403
+
+def test_postgres_statement_uses_index_and_keyset():
+    stmt = feedback_service.build_search_statement("export -crash", 21, after=(0.2, 7))
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "feedback.search_vector @@ websearch_to_tsquery" in sql
+    assert "(ts_rank_cd(feedback.search_vector, websearch_to_tsquery(" in sql and ") < (" in sql
+    assert "ts_headline(" in sql and "LIMIT" in sql
+
+def test_snippets_escape_the_message(store):
+    client.post("/api/v1/feedback/", json={"message": "Export <img src=x onerror=alert(1)> & more"})
+    hit = next(h for h in search(q="export").json()["results"] if "<img" in h["message"])
+    snippet = hit["snippet"]
+    assert snippet == "<mark>Export</mark> &lt;img src=x onerror=alert(1)&gt; &amp; more"
+    # ts_headline output from PostgreSQL, matches between the control-character selectors
+    headline = f"{feedback_service.HEADLINE_START}Export{feedback_service.HEADLINE_STOP} <script>x</script>"
+    assert feedback_service.mark_snippet(headline) == "<mark>Export</mark> &lt;script&gt;x&lt;/script&gt;"
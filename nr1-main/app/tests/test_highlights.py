@@ -0,0 +1,83 @@
+import shutil
+import subprocess
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.queue import video_queue
+from app.services import highlight_service, redis_service
+from app.services.highlight_service import ANALYSIS_STEP, SIGNALS
+
+client = TestClient(app)
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+def _signals(seconds, loud_from, loud_to):
+    steps = int(seconds / ANALYSIS_STEP)
+    rng = np.random.default_rng(0)
+    signals = np.zeros((len(SIGNALS), steps), dtype=np.float32)
+    signals[SIGNALS.index("loudness")] = -40 + rng.normal(0, 1, steps)
+    signals[SIGNALS.index("loudness"), int(loud_from / ANALYSIS_STEP):int(loud_to / ANALYSIS_STEP)] = -10
+    signals[SIGNALS.index("motion")] = rng.uniform(0, 0.02, steps)
+    return signals
+
+def test_rank_windows_finds_loud_section_without_overlap():
+    windows = highlight_service.rank_windows(_signals(300, 120, 150), clip_seconds=30, count=4)
+    assert windows[0]["start_time"] == 120 and windows[0]["end_time"] == 150
+    assert windows[0]["loudness_db"] == -10
+    starts = sorted(w["start_time"] for w in windows)
+    assert all(b - a >= 30 * 0.75 for a, b in zip(starts, starts[1:]))
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_analyze_signals_streams_audio_and_video(tmp_path):
+    path = str(tmp_path / "clip.mp4")
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=25",
+         "-f", "lavfi", "-i", "aevalsrc=if(gt(t\\,12)\\,sin(440*2*PI*t)\\,0):s=44100",
+         "-t", "20", path],
+        check=True,
+    )
+    signals = highlight_service.analyze_signals(path)
+    assert abs(signals.shape[1] * ANALYSIS_STEP - 20) <= 0.5
+    loudness = signals[SIGNALS.index("loudness")]
+    assert loudness[:40].max() < -60 and loudness[52:76].min() > -10
+    assert signals[SIGNALS.index("motion")].mean() > 0
+    assert highlight_service.rank_windows(signals, 5, 1)[0]["start_time"] >= 12
+
+def test_highlights_endpoint_queues_then_ranks(monkeypatch):
+    conn = FakeRedis()
+    submitted = []
+    monkeypatch.setattr(redis_service, "get_redis_conn", lambda: conn)
+    monkeypatch.setattr(video_queue, "submit_highlights_job", lambda video_id: submitted.append(video_id) or "job")
+    response = client.get("/api/v1/videos/highlights/vid1")
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued" and submitted == ["vid1"]
+
+    highlight_service.store_signals(conn, "vid1", _signals(120, 60, 80))
+    data = client.get("/api/v1/videos/highlights/vid1", params={"clip_seconds": 20, "count": 2}).json()
+    assert data["status"] == "completed" and len(data["highlights"]) == 2
+    assert data["highlights"][0]["start_time"] == 60
+
+def test_highlights_endpoint_rejects_bad_ids_and_reports_recent_failures(monkeypatch):
+    conn = FakeRedis()
+    submitted = []
+    monkeypatch.setattr(redis_service, "get_redis_conn", lambda: conn)
+    monkeypatch.setattr(video_queue, "submit_highlights_job", lambda video_id: submitted.append(video_id) or "job")
+    assert client.get("/api/v1/videos/highlights/bad.id").status_code == 400
+
+    conn.set("highlights-vid2:failed", b"IngestServiceError: Source not found: vid2")
+    for _ in range(2):
+        data = client.get("/api/v1/videos/highlights/vid2").json()
+        assert data["status"] == "failed" and data["error"].startswith("IngestServiceError")
+    assert submitted == []
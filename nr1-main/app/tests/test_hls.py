@@ -0,0 +1,77 @@
+import os
+import shutil
+import subprocess
+import pytest
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app
+from app.services import hls_service
+from app.services.encoding_profiles import get_profile
+from app.services.ffmpeg_service import process_video_hls
+
+client = TestClient(app)
+
+@pytest.fixture
+def hls_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VIDEO_STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "AWS_S3_BUCKET", "")
+    directory = tmp_path / "hls" / "job123"
+    os.makedirs(directory)
+    (directory / "index.m3u8").write_text("#EXTM3U\n#EXT-X-PLAYLIST-TYPE:EVENT\n")
+    (directory / "seg_00000.m4s").write_bytes(b"\x00" * 16)
+    return directory
+
+def test_playlist_and_segment_headers(hls_dir):
+    resp = client.get("/api/v1/videos/hls/job123/index.m3u8")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/vnd.apple.mpegurl")
+    assert resp.headers["cache-control"] == "no-cache"
+    resp = client.get("/api/v1/videos/hls/job123/seg_00000.m4s")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "video/iso.segment"
+    assert "immutable" in resp.headers["cache-control"]
+
+def test_unknown_or_missing_files_are_404(hls_dir):
+    assert client.get("/api/v1/videos/hls/job123/seg_00001.m4s").status_code == 404
+    assert client.get("/api/v1/videos/hls/job123/secrets.txt").status_code == 404
+    assert client.get("/api/v1/videos/hls/..%2F..%2Fetc/index.m3u8").status_code == 404
+
+def test_trimmed_playlist_lists_only_given_segments():
+    playlist = ("#EXTM3U\n#EXT-X-MAP:URI=\"init.mp4\"\n#EXTINF:1.000000,\nseg_00000.m4s\n"
+                "#EXTINF:1.000000,\nseg_00001.m4s\n#EXT-X-ENDLIST\n")
+    trimmed = hls_service.trim_playlist(playlist, ["seg_00000.m4s"])
+    assert trimmed == "#EXTM3U\n#EXT-X-MAP:URI=\"init.mp4\"\n#EXTINF:1.000000,\nseg_00000.m4s\n"
+    assert hls_service.trim_playlist(playlist, ["seg_00000.m4s", "seg_00001.m4s"]) == playlist
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_uploaded_playlists_list_only_uploaded_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VIDEO_STORAGE_PATH", str(tmp_path))
+    source = str(tmp_path / "source.mp4")
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=320x180:rate=25",
+         "-f", "lavfi", "-i", "sine=frequency=440", "-t", "6", "-pix_fmt", "yuv420p", source],
+        check=True,
+    )
+    uploads = []
+
+    def upload(path, key, content_type=None, cache_control=None):
+        with open(path, "rb") as f:
+            uploads.append((os.path.basename(key), f.read().decode() if key.endswith(".m3u8") else None))
+
+    monkeypatch.setattr(hls_service, "upload_file_to_s3", upload)
+    publisher = hls_service.HLSPublisher("live", upload=True)
+    result = process_video_hls(source, publisher.directory, duration=6, segment_seconds=1,
+                               profile=get_profile("turbo"), on_segment=publisher.on_segment)
+    publisher.finish()
+    assert len(result["segments"]) >= 5
+    uploaded = set()
+    playlists = []
+    for name, text in uploads:
+        if text is None:
+            uploaded.add(name)
+            continue
+        listed = [line for line in text.splitlines() if line and not line.startswith("#")]
+        assert set(listed) <= uploaded
+        playlists.append(listed)
+    assert uploads[0][0] == "init.mp4"
+    assert playlists[-1] == result["segments"] and "#EXT-X-ENDLIST" in uploads[-1][1]
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+import uuid
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from app.middleware.idempotency import IdempotencyMiddleware, is_storable
+from app.middleware.rate_limit import RateLimitMiddleware, RateLimitRule
+
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+def make_client(redis_getter=None):
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware, routes=[("POST", "/process")], redis_getter=redis_getter)
+    app.state.calls = 0
+    app.state.release = threading.Event()
+    app.state.release.set()
+
+    @app.post("/process")
+    def process(data: dict):
+        app.state.calls += 1
+        app.state.release.wait(5)
+        if data.get("fail"):
+            return JSONResponse(status_code=503, content={"detail": "busy"})
+        return {"job_id": f"job-{app.state.calls}"}
+
+    return TestClient(app), app.state
+
+def test_retry_replays_first_response_without_rerunning():
+    client, state = make_client()
+    headers = {"Idempotency-Key": "k1"}
+    first = client.post("/process", json={"video_id": "a"}, headers=headers)
+    again = client.post("/process", json={"video_id": "a"}, headers=headers)
+    assert again.json() == first.json() == {"job_id": "job-1"} and state.calls == 1
+    assert again.headers["idempotent-replayed"] == "true" and "idempotent-replayed" not in first.headers
+    # Without a key, or with another key, the request runs normally
+    assert client.post("/process", json={"video_id": "a"}).json() == {"job_id": "job-2"}
+    assert client.post("/process", json={"video_id": "a"}, headers={"Idempotency-Key": "k2"}).json() == {"job_id": "job-3"}
+
+def test_key_reuse_with_other_body_or_client_is_isolated():
+    client, state = make_client()
+    client.post("/process", json={"video_id": "a"}, headers={"Idempotency-Key": "k"})
+    assert client.post("/process", json={"video_id": "b"}, headers={"Idempotency-Key": "k"}).status_code == 422
+    other = client.post("/process", json={"video_id": "a"}, headers={"Idempotency-Key": "k", "X-Forwarded-For": "10.9.9.9"})
+    assert other.json() == {"job_id": "job-2"}
+
+def test_concurrent_duplicate_gets_409_and_errors_are_not_stored():
+    client, state = make_client()
+    state.release.clear()
+    results = {}
+    first = threading.Thread(target=lambda: results.update(first=client.post(
+        "/process", json={"video_id": "a"}, headers={"Idempotency-Key": "k"})))
+    first.start()
+    while state.calls == 0:
+        pass
+    duplicate = client.post("/process", json={"video_id": "a"}, headers={"Idempotency-Key": "k"})
+    assert duplicate.status_code == 409 and duplicate.headers["retry-after"] == "1"
+    state.release.set()
+    first.join()
+    assert results["first"].status_code == 200
+
+    assert client.post("/process", json={"fail": True}, headers={"Idempotency-Key": "f"}).status_code == 503
+    assert client.post("/process", json={"fail": True}, headers={"Idempotency-Key": "f"}).status_code == 503
+    assert state.calls == 3
+
+def test_rate_limited_answers_are_not_replayed():
+    app = FastAPI()
+    # Same order as app/main.py: the rate limiter runs inside the idempotency layer
+    app.add_middleware(RateLimitMiddleware, rules=[RateLimitRule("process", "POST", "/process", 1, 600)])
+    app.add_middleware(IdempotencyMiddleware, routes=[("POST", "/process")])
+    calls = []
+
+    @app.post("/process")
+    def process(data: dict):
+        calls.append(data)
+        return {"job_id": f"job-{len(calls)}"}
+
+    client = TestClient(app)
+    assert client.post("/process", json={"n": 1}, headers={"Idempotency-Key": "a"}).status_code == 200
+    headers = {"Idempotency-Key": "b"}
+    for _ in range(2):
+        limited = client.post("/process", json={"n": 2}, headers=headers)
+        assert limited.status_code == 429 and "idempotent-replayed" not in limited.headers
+    time.sleep(float(limited.headers["retry-after"]))
+    # The retry after Retry-After runs; from then on its answer is the one replayed
+    assert client.post("/process", json={"n": 2}, headers=headers).json() == {"job_id": "job-2"}
+    replay = client.post("/process", json={"n": 2}, headers=headers)
+    assert replay.json() == {"job_id": "job-2"} and replay.headers["idempotent-replayed"] == "true"
+    assert len(calls) == 2
+
+def test_only_final_statuses_are_stored():
+    assert all(is_storable(status) for status in (200, 201, 400, 404, 422))
+    assert not any(is_storable(status) for status in (302, 408, 409, 425, 429, 500, 503))
+
+def test_responses_are_shared_through_redis():
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL not set")
+    import redis
+    import redis.asyncio as aioredis
+    redis.Redis.from_url(TEST_REDIS_URL).flushdb()
+    conns = []
+
+    def getter():
+        if not conns:
+            conns.append(aioredis.Redis.from_url(TEST_REDIS_URL))
+        return conns[0]
+
+    first_client, _ = make_client(getter)
+    second_client, second_state = make_client(getter)
+    headers = {"Idempotency-Key": "shared"}
+    with first_client, second_client:
+        assert first_client.post("/process", json={}, headers=headers).json() == {"job_id": "job-1"}
+        first_client.portal.call(conns.pop().aclose)
+        # The second app gets its own connection, as another API process would
+        replay = second_client.post("/process", json={}, headers=headers)
+        assert replay.json() == {"job_id": "job-1"} and second_state.calls == 0
+        second_client.portal.call(conns.pop().aclose)
+    redis.Redis.from_url(TEST_REDIS_URL).flushdb()
+
+@pytest.fixture
+def app_client(monkeypatch):
+    from app.config import settings
+    from app.main import app
+    from app.services import analytics_service, feedback_service
+    monkeypatch.setattr(settings, "DATABASE_URL", "")
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setattr(settings, "MONGODB_URI", "")
+    monkeypatch.setattr(feedback_service, "_memory_store", feedback_service.InMemoryFeedbackStore())
+    monkeypatch.setattr(analytics_service, "_fake_analytics_db", [])
+    return TestClient(app), analytics_service, feedback_service
+
+@pytest.mark.parametrize("path, body, message", [
+    ("/api/v1/analytics/", {"event": "page_view", "user_id": "u1"}, "Analytics submitted"),
+    ("/api/v1/feedback/", {"message": "Export is slow"}, "Feedback submitted"),
+])
+def test_keyed_retries_of_row_creating_routes_create_one_row(app_client, path, body, message):
+    client, analytics_service, feedback_service = app_client
+    headers = {"Idempotency-Key": f"retry-{uuid.uuid4()}"}
+    first = client.post(path, json=body, headers=headers)
+    again = client.post(path, json=body, headers=headers)
+    assert first.status_code == again.status_code == 200
+    assert first.json() == again.json() == {"message": message}
+    assert again.headers["idempotent-replayed"] == "true"
+    rows = analytics_service._fake_analytics_db if "analytics" in path else feedback_service._memory_store.all()
+    assert len(rows) == 1
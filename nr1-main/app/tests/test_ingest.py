@@ -0,0 +1,124 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.config import settings
+from app.queue.retry_policy import classify_failure
+from app.services import ingest_service
+from app.utils.storage_paths import source_path_for
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves /{name} from the server's ``files`` dict, honouring single byte ranges."""
+
+    def do_GET(self):
+        body = self.server.files.get(self.path.lstrip("/"))
+        if body is None:
+            self.send_error(404)
+            return
+        self.server.requests.append((self.path, self.headers.get("Range")))
+        header = self.headers.get("Range")
+        if header and self.server.ranges:
+            first, last = (int(x) for x in header.split("=")[1].split("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {first}-{last}/{len(body)}")
+            body = body[first:last + 1]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    httpd.files, httpd.requests, httpd.ranges = {}, [], True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch, server):
+    monkeypatch.setattr(settings, "VIDEO_STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "SOURCE_URL_TEMPLATE", f"http://127.0.0.1:{server.server_port}/{{video_id}}")
+    monkeypatch.setattr(ingest_service, "MIN_PART_SIZE", 1024)
+    return tmp_path
+
+def test_plan_ranges_covers_file():
+    ranges = ingest_service.plan_ranges(10_000, 4, min_part_size=1000)
+    assert len(ranges) == 4 and ranges[0][0] == 0 and ranges[-1][1] == 9_999
+    assert all(b[0] == a[1] + 1 for a, b in zip(ranges, ranges[1:]))
+    assert ingest_service.plan_ranges(500, 8, min_part_size=1000) == [(0, 499)]
+
+def test_parallel_download_is_byte_exact(storage, server):
+    server.files["vid1"] = os.urandom(100_000)
+    with ingest_service.acquire_source("vid1", holder="job1") as path:
+        with open(path, "rb") as f:
+            assert f.read() == server.files["vid1"]
+        assert source_path_for("vid1") == path
+    ranged = [r for _, r in server.requests if r != "bytes=0-0"]
+    assert len(ranged) == settings.INGEST_PARALLEL_PARTS
+
+def test_server_without_ranges_falls_back(storage, server):
+    server.ranges = False
+    server.files["vid2"] = os.urandom(5000)
+    with ingest_service.acquire_source("vid2") as path:
+        with open(path, "rb") as f:
+            assert f.read() == server.files["vid2"]
+    # The probe's full-body answer is the download; the file is not fetched twice
+    assert server.requests == [("/vid2", "bytes=0-0")]
+
+def test_concurrent_jobs_share_one_download(storage, server):
+    server.files["vid3"] = os.urandom(50_000)
+    paths = []
+
+    def job(n):
+        with ingest_service.acquire_source("vid3", holder=f"job{n}") as path:
+            paths.append(path)
+
+    threads = [threading.Thread(target=job, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(paths)) == 1 and len(paths) == 6
+    assert sum(1 for _, r in server.requests if r == "bytes=0-0") == 1
+
+def test_eviction_skips_referenced_sources(storage, server, monkeypatch):
+    server.files.update(a=os.urandom(4000), b=os.urandom(4000))
+    monkeypatch.setattr(settings, "INGEST_CACHE_MAX_BYTES", 5000)
+    with ingest_service.acquire_source("a", holder="job-a") as path_a:
+        with ingest_service.acquire_source("b", holder="job-b") as path_b:
+            pass
+        # "b" was released and over budget, "a" is still referenced
+        assert os.path.exists(path_a) and not os.path.exists(path_b)
+    assert ingest_service.cache_stats()["objects"] == 1
+
+def test_eviction_waits_for_the_cache_lock(storage, server):
+    server.files["c"] = os.urandom(4000)
+    with ingest_service.acquire_source("c") as path:
+        pass
+    evictor = threading.Thread(target=ingest_service.evict, args=(0,))
+    with ingest_service._cache_lock():
+        evictor.start()
+        evictor.join(0.3)
+        # A reference taken now would still find the object
+        assert evictor.is_alive() and os.path.exists(path)
+    evictor.join(5)
+    assert not os.path.exists(path)
+
+def test_refused_or_unconfigured_sources_are_not_retried(storage, server, monkeypatch):
+    # 404: retrying cannot make the source appear
+    with pytest.raises(ingest_service.SourceUnavailableError) as missing:
+        with ingest_service.acquire_source("nope"):
+            pass
+    assert classify_failure(missing.value) == "invalid"
+    monkeypatch.setattr(settings, "SOURCE_URL_TEMPLATE", "")
+    with pytest.raises(ingest_service.SourceUnavailableError) as unconfigured:
+        with ingest_service.acquire_source("vid9"):
+            pass
+    assert classify_failure(unconfigured.value) == "invalid"
+    assert classify_failure(ingest_service.IngestServiceError("Downloaded 10 bytes, expected 20")) == "transient"
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from fastapi.testclient import TestClient
+from app.controllers import video_controller
+from app.main import app
+from app.schemas import VideoJobStatusOut
+from app.services import job_events_service, video_service
+from app.services.job_events_service import CLOSED, JobEventBroker, channel_for
+
+client = TestClient(app)
+
+class FakePubSub:
+    def __init__(self):
+        self.channels = set()
+        self.inbox = deque()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+
+    async def unsubscribe(self, channel):
+        self.channels.discard(channel)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        if self.inbox:
+            return self.inbox.popleft()
+        await asyncio.sleep(0.01)
+        return None
+
+    async def aclose(self):
+        pass
+
+class FakeAsyncRedis:
+    def __init__(self):
+        self.pubsubs = []
+
+    def pubsub(self):
+        self.pubsubs.append(FakePubSub())
+        return self.pubsubs[-1]
+
+    def publish(self, channel, data):
+        for pubsub in self.pubsubs:
+            if channel in pubsub.channels:
+                pubsub.inbox.append({"type": "message", "channel": channel.encode(), "data": data.encode()})
+
+def _event(job_id, status, **fields):
+    return json.dumps(VideoJobStatusOut(job_id=job_id, status=status, **fields).model_dump())
+
+def test_broker_shares_one_subscription_between_clients():
+    conn = FakeAsyncRedis()
+
+    async def scenario():
+        broker = JobEventBroker(conn)
+        async with broker.listen("a") as first, broker.listen("a") as second, broker.listen("b") as other:
+            assert len(conn.pubsubs) == 1 and conn.pubsubs[0].channels == {channel_for("a"), channel_for("b")}
+            conn.publish(channel_for("a"), _event("a", "processing", progress=40))
+            assert (await asyncio.wait_for(first.get(), 1))["progress"] == 40
+            assert (await asyncio.wait_for(second.get(), 1))["progress"] == 40
+            assert other.empty()
+            broker.end_streams()
+            assert other.get_nowait() is CLOSED
+        assert conn.pubsubs[0].channels == set() and broker.watched_jobs == 0
+        await broker.close()
+
+    asyncio.run(scenario())
+
+def _fake_jobs(monkeypatch, conn, statuses):
+    monkeypatch.setattr(job_events_service, "get_job_event_broker", lambda: JobEventBroker(conn))
+
+    def status(job_id):
+        if job_id not in statuses:
+            raise video_service.VideoServiceError(f"Job {job_id} not found")
+        return VideoJobStatusOut(job_id=job_id, **statuses[job_id])
+
+    monkeypatch.setattr(video_service, "check_job_status_service", status)
+    monkeypatch.setattr(video_controller, "check_job_status_service", status)
+
+def test_sse_pushes_progress_until_completed(monkeypatch):
+    conn = FakeAsyncRedis()
+    _fake_jobs(monkeypatch, conn, {"job1": {"status": "queued"}})
+
+    def worker():
+        # Published after the stream has subscribed and sent its snapshot
+        conn.publish(channel_for("job1"), _event("job1", "processing", progress=50))
+        conn.publish(channel_for("job1"), _event("job1", "completed", progress=100, result_url="/v/job1.mp4"))
+
+    threading.Timer(0.3, worker).start()
+    response = client.get("/api/v1/videos/job/job1/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [e["status"] for e in events] == ["queued", "processing", "completed"]
+    assert events[-1]["result_url"] == "/v/job1.mp4"
+    assert client.get("/api/v1/videos/job/missing/events").status_code == 404
+
+def test_websocket_ends_with_terminal_status(monkeypatch):
+    conn = FakeAsyncRedis()
+    _fake_jobs(monkeypatch, conn, {"job2": {"status": "processing", "progress": 10}})
+    with client.websocket_connect("/api/v1/videos/job/job2/ws") as ws:
+        assert ws.receive_json() == {"event": "status", "data": VideoJobStatusOut(
+            job_id="job2", status="processing", progress=10).model_dump()}
+        conn.publish(channel_for("job2"), _event("job2", "failed", progress=10))
+        assert ws.receive_json()["data"]["status"] == "failed"
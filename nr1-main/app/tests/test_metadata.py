@@ -0,0 +1,67 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app
+from app.services import metadata_service
+
+client = TestClient(app)
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VIDEO_STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "REDIS_URL", "")
+    metadata_service._cached_metadata.cache.clear()
+    os.makedirs(tmp_path / "sources")
+    return tmp_path
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_info_reports_probed_metadata(storage):
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=25",
+         "-f", "lavfi", "-i", "sine", "-t", "3", "-g", "25", "-shortest", str(storage / "sources" / "vid1.mp4")],
+        check=True,
+    )
+    data = client.get("/api/v1/videos/info/vid1").json()
+    assert (data["width"], data["height"], data["fps"]) == (320, 240, 25)
+    assert data["duration"] == 3 and data["video_codec"] == "h264" and data["audio_codec"] == "aac"
+    assert data["keyframe_interval"] == 1.0
+
+def test_concurrent_requests_share_one_probe(storage, monkeypatch):
+    (storage / "sources" / "vid2.mp4").write_bytes(b"x")
+    calls = []
+
+    def fake_probe(path):
+        calls.append(path)
+        time.sleep(0.2)
+        return {"duration": 10.0, "title": None}
+
+    monkeypatch.setattr(metadata_service, "probe_metadata", fake_probe)
+    threads = [threading.Thread(target=metadata_service.get_video_metadata, args=("vid2",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert metadata_service.get_video_metadata("vid2")["duration"] == 10.0
+    assert len(calls) == 1
+
+def test_unknown_source_returns_basic_info(storage):
+    resp = client.get("/api/v1/videos/info/not-ingested")
+    assert resp.status_code == 200
+    assert resp.json()["duration"] == 0
+
+def test_repeated_info_calls_do_not_corrupt_cached_metadata(storage, monkeypatch):
+    from app.services.video_service import get_video_info_service
+    (storage / "sources" / "vid3.mp4").write_bytes(b"x")
+    monkeypatch.setattr(metadata_service, "probe_metadata",
+                        lambda path: {"title": "Talk", "duration": 12.4, "width": 640, "height": 360})
+    first = get_video_info_service("vid3")
+    second = get_video_info_service("vid3")
+    assert first == second and second.title == "Talk" and second.duration == 12
+    metadata_service.get_video_metadata("vid3").pop("title")
+    assert metadata_service.get_video_metadata("vid3")["title"] == "Talk"
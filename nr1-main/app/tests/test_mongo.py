@@ -0,0 +1,152 @@
+import asyncio
+from bson import ObjectId
+import pytest
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.services import analytics_service, mongo_service
+from app.services.mongo_service import MongoIndex, MongoServiceError
+
+class FakeResult:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+class FakeCursor:
+    def __init__(self, docs, limit, round_trips):
+        self.docs = docs
+        self.limit = limit
+        self.round_trips = round_trips
+        self.size = 0
+        self.closed = False
+
+    def sort(self, spec):
+        field, direction = spec[0]
+        self.docs = sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        self.size = size
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for index, doc in enumerate(self.docs[:self.limit] if self.limit else self.docs):
+            if index % self.size == 0:
+                self.round_trips.append(self.size)
+            yield doc
+
+    async def close(self):
+        self.closed = True
+
+class FakeCollection:
+    """In-memory stand-in for a Motor collection (no MongoDB server in the test environment)."""
+
+    def __init__(self):
+        self.docs = {}
+        self.calls = []
+        self.round_trips = []
+        self.cursors = []
+        self.fail_next = None
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls.append(("insert_many", len(docs)))
+        if self.fail_next:
+            error, self.fail_next = self.fail_next, None
+            raise error
+        inserted, errors = [], []
+        for index, doc in enumerate(docs):
+            doc.setdefault("_id", ObjectId())
+            if doc["_id"] in self.docs:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+                if ordered:
+                    break
+                continue
+            self.docs[doc["_id"]] = dict(doc)
+            inserted.append(doc["_id"])
+        if errors:
+            raise BulkWriteError({"nInserted": len(inserted), "writeErrors": errors})
+        return FakeResult(inserted_ids=inserted)
+
+    async def bulk_write(self, requests, ordered=True):
+        self.calls.append(("bulk_write", len(requests)))
+        matched = upserted = 0
+        for request in requests:
+            key = request._filter["_id"]
+            if key in self.docs:
+                matched += 1
+                self.docs[key].update(request._doc["$set"])
+            else:
+                upserted += 1
+                self.docs[key] = {"_id": key, **request._doc["$set"]}
+        return FakeResult(matched_count=matched, modified_count=matched, upserted_count=upserted)
+
+    def find(self, query, projection=None, limit=0):
+        docs = [doc for doc in self.docs.values() if all(doc.get(k) == v for k, v in query.items())]
+        if projection:
+            docs = [{k: v for k, v in doc.items() if projection.get(k)} for doc in docs]
+        cursor = FakeCursor(docs, limit, self.round_trips)
+        self.cursors.append(cursor)
+        return cursor
+
+    async def create_indexes(self, models):
+        self.calls.append(("create_indexes", [model.document for model in models]))
+        return [model.document["name"] for model in models]
+
+@pytest.fixture
+def collection(monkeypatch):
+    fake = FakeCollection()
+    monkeypatch.setattr(mongo_service, "get_collection", lambda name: fake)
+    monkeypatch.setattr(settings, "MONGO_WRITE_BATCH_SIZE", 4)
+    return fake
+
+def test_bulk_writes_are_batched_and_counted(collection):
+    docs = [{"n": n, "kind": "even" if n % 2 == 0 else "odd"} for n in range(10)]
+    assert asyncio.run(mongo_service.insert_many("events", docs)) == 10
+    assert collection.calls == [("insert_many", 4), ("insert_many", 4), ("insert_many", 2)]
+
+    # Retrying the same documents (they kept their _id) stores nothing twice
+    assert asyncio.run(mongo_service.insert_many("events", docs[:3], ignore_duplicates=True)) == 3
+    with pytest.raises(MongoServiceError, match="0 of 3 documents inserted, 3 failed"):
+        asyncio.run(mongo_service.insert_many("events", docs[:3]))
+    assert len(collection.docs) == 10
+
+    totals = asyncio.run(mongo_service.bulk_upsert("events", [{"_id": docs[0]["_id"], "n": 100}, {"_id": "new", "n": 1}]))
+    assert totals == {"matched": 1, "modified": 1, "upserted": 1}
+    assert collection.docs[docs[0]["_id"]]["n"] == 100 and collection.docs["new"]["n"] == 1
+    with pytest.raises(MongoServiceError, match="key field"):
+        asyncio.run(mongo_service.bulk_upsert("events", [{"n": 1}]))
+
+    stats = mongo_service.mongo_stats()
+    assert stats["events.insert_many"]["count"] == 3 and stats["events.insert_many"]["errors"] == 1
+    assert stats["events.bulk_upsert"]["docs"] == 2
+
+def test_find_many_streams_with_projection_and_batch_size(collection):
+    asyncio.run(mongo_service.insert_many("events", [{"n": n, "kind": "clip"} for n in range(7)]))
+
+    async def read():
+        return [doc async for doc in mongo_service.find_many(
+            "events", {"kind": "clip"}, projection={"n": 1}, sort=[("n", -1)], limit=5, batch_size=2)]
+
+    assert asyncio.run(read()) == [{"n": n} for n in (6, 5, 4, 3, 2)]
+    assert collection.round_trips == [2, 2, 2] and collection.cursors[-1].closed
+
+def test_declared_indexes_are_created(collection, monkeypatch):
+    monkeypatch.setattr(mongo_service, "INDEX_SPECS", {})
+    mongo_service.declare_indexes("events", MongoIndex((("job_id", 1),), "job_id", unique=True),
+                                  MongoIndex((("created_at", 1),), "ttl", expire_after_seconds=3600))
+    assert asyncio.run(mongo_service.ensure_indexes()) == {"events": ["job_id", "ttl"]}
+    specs = collection.calls[-1][1]
+    assert specs[0]["unique"] is True and specs[1]["expireAfterSeconds"] == 3600
+
+def test_analytics_buffer_flushes_in_bulk_and_keeps_failed_batches(collection):
+    buffer = analytics_service.AnalyticsBuffer(max_events=5, interval=60)
+    for n in range(7):
+        buffer.add({"event": "view", "n": n})
+    assert len(buffer) == 5 and buffer.dropped == 2
+
+    collection.fail_next = ConnectionError("server selection timeout")
+    assert asyncio.run(buffer.flush()) == 0 and len(buffer) == 5
+    asyncio.run(buffer.close())
+    assert len(buffer) == 0
+    assert sorted(doc["n"] for doc in collection.docs.values()) == [2, 3, 4, 5, 6]
@@ -0,0 +1,126 @@
+import json
+import re
+import shutil
+import struct
+import subprocess
+import numpy as np
+import pytest
+from app.services.encoding_profiles import get_profile
+from app.services.ffmpeg_service import process_video
+from app.services.preview_service import build_sprite_vtt, plan_previews, run_previews
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+# Luma steps up by LUMA_STEP every second, changing at the half second, so the
+# frame sampled for each whole second sits in the middle of a flat stretch
+LUMA_STEP = 15
+CLIP_START, CLIP_SECONDS = 2, 12.5
+
+def _expected_gray(second):
+    """Full-range gray level of the source at ``second`` (geq writes limited-range luma)."""
+    return (LUMA_STEP * second - 16) * 255 / 219
+
+def test_plan_limits_tiles_and_keeps_aspect():
+    spec = plan_previews("/tmp", "job", 450, 1080, 1920)
+    assert spec.tiles <= 100
+    assert (spec.tile_width, spec.tile_height) == (90, 160)
+    assert spec.columns * spec.rows >= spec.tiles
+    assert "webp" not in spec.files()
+
+def test_vtt_cues_map_to_sprite_tiles():
+    spec = plan_previews("/tmp", "job", 12.5, 640, 360)
+    vtt = build_sprite_vtt(spec, "job_sprite.jpg")
+    assert vtt.startswith("WEBVTT")
+    assert "00:00:00.000 --> 00:00:01.000\njob_sprite.jpg#xywh=0,0,160,90" in vtt
+    assert "00:00:12.000 --> 00:00:12.500\njob_sprite.jpg#xywh=320,90,160,90" in vtt
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("previews") / "source.mp4")
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i",
+         f"testsrc=size=64x36:rate=25,geq=lum='{LUMA_STEP}*floor(T+0.5)':cb=128:cr=128,scale=640:360",
+         "-t", "15", "-pix_fmt", "yuv420p", path],
+        check=True,
+    )
+    return path
+
+def _probe(path):
+    out = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries",
+                          "stream=codec_name,width,height", "-of", "json", path],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out)["streams"][0]
+
+def _luma(path):
+    stream = _probe(path)
+    raw = subprocess.run(["ffmpeg", "-loglevel", "error", "-i", path, "-f", "rawvideo", "-pix_fmt", "gray", "-"],
+                         check=True, capture_output=True).stdout
+    return np.frombuffer(raw, dtype=np.uint8).reshape(stream["height"], stream["width"])
+
+def _cues(vtt):
+    pattern = r"(\d\d):(\d\d):(\d\d\.\d{3}) --> (\d\d):(\d\d):(\d\d\.\d{3})\n(\S+)#xywh=(\d+),(\d+),(\d+),(\d+)"
+    cues = []
+    for match in re.finditer(pattern, vtt):
+        h1, m1, s1, h2, m2, s2, url = match.groups()[:7]
+        start = int(h1) * 3600 + int(m1) * 60 + float(s1)
+        end = int(h2) * 3600 + int(m2) * 60 + float(s2)
+        cues.append((start, end, url, tuple(int(v) for v in match.groups()[7:])))
+    return cues
+
+def _webp_info(path):
+    """(canvas width, canvas height, frame count) of an animated WebP, read from its RIFF chunks."""
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:4] == b"RIFF" and data[8:12] == b"WEBP"
+    width = height = None
+    frames, offset = 0, 12
+    while offset + 8 <= len(data):
+        chunk, size = data[offset:offset + 4], struct.unpack("<I", data[offset + 4:offset + 8])[0]
+        body = data[offset + 8:offset + 8 + size]
+        if chunk == b"VP8X":
+            width = int.from_bytes(body[4:7], "little") + 1
+            height = int.from_bytes(body[7:10], "little") + 1
+        elif chunk == b"ANMF":
+            frames += 1
+        offset += 8 + size + (size & 1)
+    return width, height, frames
+
+def _render(path, source, spec):
+    if path == "own_pass":
+        run_previews(source, spec, start=CLIP_START)
+    else:
+        process_video(source, spec.poster_path.replace("_poster.jpg", ".mp4"), start=CLIP_START,
+                      duration=CLIP_SECONDS, profile=get_profile("turbo"), previews=spec)
+
+@needs_ffmpeg
+@pytest.mark.parametrize("path", ["own_pass", "with_encode"])
+def test_previews_of_a_generated_clip(tmp_path, source, path):
+    spec = plan_previews(str(tmp_path), "job", CLIP_SECONDS, 640, 360, webp=True)
+    _render(path, source, spec)
+
+    # Poster: one frame from poster_at (1s into the clip), upscaled from the tile aspect
+    assert _probe(spec.poster_path)["codec_name"] == "mjpeg"
+    poster = _luma(spec.poster_path)
+    assert poster.shape == (404, 720)
+    assert abs(float(np.median(poster)) - _expected_gray(CLIP_START + 1)) <= 8
+
+    # Sprite: 13 tiles of 160x90 in a 10x2 grid
+    sprite = _luma(spec.sprite_path)
+    assert sprite.shape == (2 * 90, 10 * 160)
+
+    # VTT: one cue per second (the last one cut at the clip's end), each pointing at
+    # the tile holding that second's frame
+    with open(spec.vtt_path) as f:
+        cues = _cues(f.read())
+    assert len(cues) == spec.tiles == 13
+    for i, (start, end, url, (x, y, w, h)) in enumerate(cues):
+        assert (start, end) == (i, min(i + 1, CLIP_SECONDS))
+        assert url == "job_sprite.jpg"
+        assert (x, y, w, h) == ((i % 10) * 160, (i // 10) * 90, 160, 90)
+        tile = sprite[y + 10:y + h - 10, x + 10:x + w - 10]
+        assert abs(float(np.median(tile)) - _expected_gray(CLIP_START + i)) <= 8, f"tile {i}"
+    # Cells after the last tile are left black
+    assert float(sprite[90 + 45, 3 * 160 + 80]) < 20
+
+    # WebP: the first 3 seconds at 10 fps, 320x180, looping
+    assert _webp_info(spec.webp_path) == (320, 180, 30)
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app as main_app
+from app.middleware.profiling import ProfilingMiddleware
+from app.services import profiling_service
+from app.services.profiling_service import ProfileStore, Sampler, sign_profile_token, verify_profile_token
+
+SECRET = "profiling-secret"
+
+def burn_cpu(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def make_client(tmp_path, sample_rate=0.0, slow_ms=0.0):
+    app = FastAPI()
+
+    @app.get("/async")
+    async def async_route():
+        burn_cpu(0.1)
+        await asyncio.sleep(0.1)
+        return {"ok": True}
+
+    @app.get("/sync")
+    def sync_route():
+        burn_cpu(0.1)
+        return {"ok": True}
+
+    store = ProfileStore(str(tmp_path), max_reports=3)
+    app.add_middleware(ProfilingMiddleware, sampler=Sampler(0.002), store=store, secret=SECRET,
+                       sample_rate=sample_rate, slow_ms=slow_ms)
+    return TestClient(app), store
+
+def test_tokens_are_signed_and_expire():
+    token = sign_profile_token(60, secret=SECRET, now=1000)
+    assert verify_profile_token(token, secret=SECRET, now=1059)
+    assert not verify_profile_token(token, secret=SECRET, now=1061)
+    assert not verify_profile_token(token, secret="other", now=1000)
+    assert not verify_profile_token("1060." + "0" * 64, secret=SECRET, now=1000)
+
+def test_signed_request_is_profiled(tmp_path):
+    client, store = make_client(tmp_path)
+    resp = client.get("/async", headers={"X-Profile": sign_profile_token(60, secret=SECRET)})
+    report_id = resp.headers["X-Profile-Id"]
+    meta = store.list()[0]
+    assert meta["id"] == report_id and meta["trigger"] == "signed" and meta["status"] == 200
+    assert meta["duration_ms"] >= 200 and meta["samples"] > 20
+    stacks = dict(line.rsplit(" ", 1) for line in store.read(report_id).splitlines())
+    # CPU time in the route and the await after it are both attributed to the request
+    assert any("async_route" in s and s.endswith("burn_cpu (app/tests/test_profiling.py:13)") for s in stacks)
+    assert any("async_route" in s and s.endswith("[await]") for s in stacks)
+    # Frames below the middleware (server, test client) are trimmed
+    assert all("testclient" not in s for s in stacks)
+
+def test_sync_route_is_followed_into_its_worker_thread(tmp_path):
+    client, store = make_client(tmp_path)
+    resp = client.get("/sync", headers={"X-Profile": sign_profile_token(60, secret=SECRET)})
+    folded = store.read(resp.headers["X-Profile-Id"])
+    assert "[thread];" in folded and "sync_route" in folded and "burn_cpu" in folded
+
+def test_unsigned_requests_are_not_profiled_and_sampling_keeps_slow_ones(tmp_path):
+    client, store = make_client(tmp_path)
+    assert "X-Profile-Id" not in client.get("/async", headers={"X-Profile": "123.bad"}).headers
+    assert "X-Profile-Id" not in client.get("/async").headers
+    assert store.list() == []
+
+    client, store = make_client(tmp_path, sample_rate=1.0, slow_ms=150)
+    assert "X-Profile-Id" not in client.get("/async").headers
+    client.get("/sync")
+    assert [meta["path"] for meta in store.list()] == ["/async"]
+    assert store.list()[0]["trigger"] == "sampled"
+
+def test_reports_are_pruned(tmp_path):
+    client, store = make_client(tmp_path, sample_rate=1.0)
+    for _ in range(5):
+        client.get("/sync")
+    assert len(store.list()) == 3 and len(list(tmp_path.iterdir())) == 6
+
+def test_admin_endpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(settings, "PROFILING_SECRET", "")
+    client, store = make_client(tmp_path)
+    report_id = client.get("/sync", headers={"X-Profile": sign_profile_token(60, secret=SECRET)}).headers["X-Profile-Id"]
+    monkeypatch.setattr(profiling_service, "profile_store", store)
+
+    admin = TestClient(main_app)
+    headers = {"X-Admin-Token": "secret"}
+    assert admin.get("/api/v1/admin/profiles").status_code == 403
+    assert admin.get("/api/v1/admin/profiles", headers=headers).json()["profiles"][0]["id"] == report_id
+    resp = admin.get(f"/api/v1/admin/profiles/{report_id}", headers=headers)
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain")
+    assert "sync_route" in resp.text
+    assert admin.get("/api/v1/admin/profiles/../../etc/passwd", headers=headers).status_code == 404
+    assert admin.get("/api/v1/admin/profiles/" + "0" * 32, headers=headers).status_code == 404
+
+    assert admin.post("/api/v1/admin/profiles/token", headers=headers).status_code == 409
+    monkeypatch.setattr(settings, "PROFILING_SECRET", SECRET)
+    body = admin.post("/api/v1/admin/profiles/token?ttl=60", headers=headers).json()
+    assert body["header"] == "X-Profile" and verify_profile_token(body["token"], secret=SECRET)
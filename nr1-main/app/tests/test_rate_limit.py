@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.middleware.rate_limit import LocalTokenBucket, RateLimitMiddleware, RateLimitRule
+from app.utils.request_identity import get_client_ip
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, rules=[RateLimitRule("process", "POST", "/process", 2, 60)])
+
+    @app.post("/process")
+    def process():
+        return {"status": "queued"}
+
+    @app.get("/info")
+    def info():
+        return {"ok": True}
+
+    return TestClient(app)
+
+def test_bucket_rejects_after_capacity_with_headers():
+    client = make_client()
+    for remaining in ("1", "0"):
+        resp = client.post("/process")
+        assert resp.status_code == 200
+        assert resp.headers["ratelimit-limit"] == "2"
+        assert resp.headers["ratelimit-remaining"] == remaining
+    resp = client.post("/process")
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) >= 1
+    assert "detail" in resp.json()
+
+def test_limits_are_per_client_and_per_route():
+    client = make_client()
+    for _ in range(3):
+        client.post("/process", headers={"X-Forwarded-For": "10.0.0.1"})
+    assert client.post("/process", headers={"X-Forwarded-For": "10.0.0.1"}).status_code == 429
+    assert client.post("/process", headers={"X-Forwarded-For": "10.0.0.2"}).status_code == 200
+    resp = client.get("/info", headers={"X-Forwarded-For": "10.0.0.1"})
+    assert resp.status_code == 200
+    assert "ratelimit-limit" not in resp.headers
+
+def test_spoofed_forwarded_hops_do_not_reset_the_bucket():
+    client = make_client()
+    # The client controls everything left of the hop our proxy appended
+    for n in range(3):
+        client.post("/process", headers={"X-Forwarded-For": f"203.0.113.{n}, 10.0.0.1"})
+    assert client.post("/process", headers={"X-Forwarded-For": "198.51.100.7, 10.0.0.1"}).status_code == 429
+
+def test_client_ip_counts_trusted_proxies_from_the_right():
+    scope = {"type": "http", "headers": [(b"x-forwarded-for", b"1.1.1.1, 2.2.2.2, 3.3.3.3")], "client": ("9.9.9.9", 1)}
+    assert get_client_ip(scope, 1) == "3.3.3.3"
+    assert get_client_ip(scope, 2) == "2.2.2.2"
+    assert get_client_ip(scope, 5) == "1.1.1.1"
+    assert get_client_ip(scope, 0) == "9.9.9.9"
+    assert get_client_ip({"type": "http", "headers": [], "client": ("9.9.9.9", 1)}, 1) == "9.9.9.9"
+
+def test_local_bucket_leases_only_when_clearly_under_limit():
+    bucket = LocalTokenBucket(capacity=10, rate=1)
+    assert bucket.take(3).granted == 3
+    assert bucket.take(3).granted == 1
+
+def test_redis_outage_backs_off_instead_of_retrying_every_request(caplog):
+    calls = []
+
+    class DownRedis:
+        def register_script(self, script):
+            async def run(keys, args):
+                calls.append(keys[0])
+                raise ConnectionError("Connection refused")
+            return run
+
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, rules=[RateLimitRule("process", "POST", "/process", 100, 6000)],
+                       redis_getter=DownRedis, redis_backoff=0.2)
+
+    @app.post("/process")
+    def process():
+        return {"status": "queued"}
+
+    client = TestClient(app)
+    with caplog.at_level(logging.WARNING, logger="rate_limit"):
+        for _ in range(20):
+            assert client.post("/process").status_code == 200
+        assert len(calls) == 1
+        time.sleep(0.25)
+        client.post("/process")
+        client.post("/process")
+    # One probe after the backoff; one warning for the whole outage
+    assert len(calls) == 2
+    assert len([r for r in caplog.records if r.name == "rate_limit"]) == 1
+
+def test_full_local_table_keeps_recently_limited_clients():
+    limiter = RateLimitMiddleware(None, rules=[], max_local_keys=8)
+    rule = RateLimitRule("process", "POST", "/process", 2, 1)
+    take = lambda key: asyncio.run(limiter._take(key, rule)).granted
+
+    assert take("busy") and take("busy") and not take("busy")
+    for n in range(5):
+        take(f"idle-{n}")
+    limiter._local["idle-0"].ts -= 3600  # refilled long ago
+    assert not take("busy")
+    take("new")
+    # The refilled bucket goes first, then the least recently used; the limited client stays limited
+    assert list(limiter._local) == ["idle-4", "busy", "new"]
+    assert not take("busy")
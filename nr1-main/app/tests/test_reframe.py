@@ -0,0 +1,54 @@
+import shutil
+import subprocess
+from fractions import Fraction
+import numpy as np
+import pytest
+from app.config import settings
+from app.services import reframe_service
+from app.services.ffmpeg_service import process_video
+from app.services.reframe_service import crop_size, plan_reframe, smooth_path
+
+def test_crop_size_picks_axis():
+    assert crop_size(1920, 1080, Fraction(9, 16)) == (606, 1080, "x")
+    assert crop_size(1080, 1920, Fraction(16, 9)) == (1080, 606, "y")
+    assert crop_size(1920, 1080, Fraction(16, 9))[2] == ""
+
+def test_smooth_path_holds_quiet_frames_and_limits_speed():
+    raw = np.array([np.nan, np.nan, 10, 10, 500, 10, 10, 10, 300, 300, 300, 300, 300, 300, 300, np.nan])
+    path = smooth_path(raw, limit=400, max_step=50)
+    assert np.all(np.abs(np.diff(path)) <= 50 + 1e-9)
+    assert path.max() < 300  # The one-frame spike to 500 is filtered out
+    assert path[0] < 50  # Leading quiet frames hold the first known position
+    assert path[-1] > path[7]
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_crop_follows_subject_within_single_encode(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VIDEO_STORAGE_PATH", str(tmp_path))
+    source = str(tmp_path / "box.mp4")
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "color=black:size=640x360:rate=25",
+         "-f", "lavfi", "-i", "color=white:size=120x120:rate=25", "-filter_complex",
+         "[0][1]overlay=x='if(lt(t,3),40,480)':y=120:shortest=1", "-t", "8", source],
+        check=True,
+    )
+    plan = plan_reframe(source, 0, 8, 640, 360, "9:16")
+    assert (plan.width, plan.height, plan.axis) == (202, 360, "x")
+    assert plan.x < 20
+    with open(plan.commands) as f:
+        at, _, _, x = f.read().strip().splitlines()[-1].rstrip(";").split()
+    assert float(at) > 3 and int(x) > 400
+    output = str(tmp_path / "vertical.mp4")
+    process_video(source, output, start=0, duration=8, reframe=plan.to_dict())
+    probe = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "stream=width,height", "-of", "csv=p=0",
+                            output], capture_output=True, text=True, check=True).stdout.split()[0]
+    assert probe == "202,360"
+    # Late frames show the box, which sits at the right edge of the source
+    raw = subprocess.run(["ffmpeg", "-loglevel", "error", "-ss", "7", "-i", output, "-frames:v", "1",
+                          "-f", "rawvideo", "-pix_fmt", "gray", "-"], capture_output=True, check=True).stdout
+    assert np.frombuffer(raw, dtype=np.uint8).max() > 200
+
+def test_no_reframe_needed(tmp_path):
+    assert plan_reframe("unused.mp4", 0, 5, 1080, 1920, "9:16") is None
+    assert plan_reframe("unused.mp4", 0, 5, 1080, 1920, None) is None
+    with pytest.raises(reframe_service.ReframeServiceError):
+        reframe_service.parse_aspect_ratio("wide")
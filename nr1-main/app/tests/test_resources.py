@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+from app.resources import ResourceRegistry, ResourceError
+
+def test_resources_are_created_lazily_once():
+    registry = ResourceRegistry()
+    calls = []
+    registry.register("client", lambda: calls.append(1) or object())
+    assert not registry.is_created("client")
+    first = registry.get("client")
+    assert registry.get("client") is first
+    assert calls == [1]
+
+def test_unknown_resource_raises():
+    with pytest.raises(ResourceError):
+        ResourceRegistry().get("missing")
+
+def test_startup_creates_eager_and_shutdown_closes_in_reverse_order():
+    registry = ResourceRegistry()
+    closed = []
+
+    async def aclose(name):
+        closed.append(name)
+
+    registry.register("a", lambda: "a", closer=lambda r: closed.append(r), eager=True)
+    registry.register("b", lambda: "b", closer=aclose, eager=True)
+    registry.register("broken", lambda: 1 / 0, eager=True)
+    registry.register("lazy", lambda: "lazy")
+
+    asyncio.run(registry.startup())
+    assert registry.is_created("a") and registry.is_created("b")
+    assert not registry.is_created("broken") and not registry.is_created("lazy")
+
+    asyncio.run(registry.shutdown())
+    assert sorted(closed) == ["a", "b"]
+    assert not registry.is_created("a")
+
+def test_app_import_does_not_require_database_url(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    from app.main import app
+    from app.resources import registry
+    assert app.title == "Viral Clip Generator"
+    assert not registry.is_created("db_engine")
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from app.middleware.response_cache import CacheRule, ResponseCacheMiddleware, invalidate_path
+
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+def make_app(redis_getter=None, ttl=60.0, stale_ttl=0.0, local_ttl=5.0):
+    app = FastAPI()
+    app.add_middleware(
+        ResponseCacheMiddleware,
+        rules=[
+            CacheRule("info", "/info/{video_id}", ttl, stale_ttl),
+            CacheRule("translations", "/translations", ttl, vary_headers=("accept-language",),
+                      invalidate_on=(("POST", "/language"),)),
+        ],
+        redis_getter=redis_getter,
+        local_ttl=local_ttl,
+    )
+    app.state.calls = 0
+    app.state.language = "en"
+
+    @app.get("/info/{video_id}")
+    async def info(video_id: str):
+        app.state.calls += 1
+        await asyncio.sleep(0.05)
+        if video_id == "missing":
+            raise HTTPException(status_code=404, detail="Video not found")
+        return {"video_id": video_id, "render": app.state.calls}
+
+    @app.get("/translations")
+    def translations():
+        app.state.calls += 1
+        return {"language": app.state.language}
+
+    @app.post("/language")
+    def language(data: dict):
+        app.state.language = data["language"]
+        return {"language": app.state.language}
+
+    return app
+
+def test_hit_after_miss_and_errors_are_not_cached():
+    app = make_app()
+    client = TestClient(app)
+    first = client.get("/info/a")
+    second = client.get("/info/a")
+    assert first.headers["x-cache"] == "MISS" and second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json() == {"video_id": "a", "render": 1}
+    assert client.get("/info/b").json()["render"] == 2
+    assert client.get("/info/missing").status_code == 404
+    assert client.get("/info/missing").status_code == 404 and app.state.calls == 4
+    assert client.get("/info/a", headers={"Cache-Control": "no-cache"}).json()["render"] == 5
+
+def test_concurrent_misses_share_one_render():
+    app = make_app()
+
+    async def burst():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*(client.get("/info/hot") for _ in range(20)))
+
+    responses = asyncio.run(burst())
+    assert app.state.calls == 1
+    assert {r.json()["render"] for r in responses} == {1}
+
+def test_stale_response_is_served_while_refreshed():
+    app = make_app(ttl=0.1, stale_ttl=60)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/info/a")
+            await asyncio.sleep(0.15)
+            stale = await client.get("/info/a")
+            await asyncio.sleep(0.1)
+            return stale, await client.get("/info/a")
+
+    stale, refreshed = asyncio.run(scenario())
+    assert stale.headers["x-cache"] == "STALE" and stale.json()["render"] == 1
+    assert refreshed.headers["x-cache"] == "HIT" and refreshed.json()["render"] == 2
+
+def test_vary_headers_and_invalidation():
+    app = make_app()
+    client = TestClient(app)
+    assert client.get("/translations").json() == {"language": "en"}
+    client.get("/translations", headers={"Accept-Language": "fr"})
+    assert app.state.calls == 2
+    assert client.post("/language", json={"language": "de"}).status_code == 200
+    assert client.get("/translations").json() == {"language": "de"}
+
+def test_responses_are_shared_through_redis():
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL not set")
+    import redis
+    import redis.asyncio as aioredis
+    redis.Redis.from_url(TEST_REDIS_URL).flushdb()
+    conns = []
+
+    def getter():
+        if not conns:
+            conns.append(aioredis.Redis.from_url(TEST_REDIS_URL))
+        return conns[0]
+
+    # No local tier, so every request goes through Redis as on a fresh instance
+    first_app, second_app = make_app(getter, local_ttl=0), make_app(getter, local_ttl=0)
+    with TestClient(first_app) as first, TestClient(second_app) as second:
+        assert first.get("/info/a").headers["x-cache"] == "MISS"
+        assert first.get("/translations").json() == {"language": "en"}
+        first.portal.call(conns.pop().aclose)
+        # Another API process: served from Redis without rendering
+        shared = second.get("/info/a")
+        assert shared.headers["x-cache"] == "HIT" and shared.json()["render"] == 1 and second_app.state.calls == 0
+        assert second.get("/translations").json() == {"language": "en"}
+        # An invalidation in one process drops the entry for the others
+        second.post("/language", json={"language": "fr"})
+        second.portal.call(conns.pop().aclose)
+        first_app.state.language = "fr"
+        assert first.get("/translations").json() == {"language": "fr"}
+        first.portal.call(conns.pop().aclose)
+    redis.Redis.from_url(TEST_REDIS_URL).flushdb()
+
+def test_worker_invalidates_one_path_through_redis():
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL not set")
+    import redis
+    import redis.asyncio as aioredis
+    sync_conn = redis.Redis.from_url(TEST_REDIS_URL)
+    sync_conn.flushdb()
+    conns = []
+
+    def getter():
+        if not conns:
+            conns.append(aioredis.Redis.from_url(TEST_REDIS_URL))
+        return conns[0]
+
+    app = make_app(getter, local_ttl=0)
+    with TestClient(app) as client:
+        client.get("/info/a")
+        client.get("/info/b")
+        # e.g. a clip job published a new thumbnail for video "a"
+        invalidate_path(sync_conn, "info", "/info/a")
+        assert client.get("/info/a").headers["x-cache"] == "MISS"
+        assert client.get("/info/b").headers["x-cache"] == "HIT"
+        client.portal.call(conns.pop().aclose)
+    sync_conn.flushdb()
@@ -0,0 +1,158 @@
+import errno
+import os
+import pickle
+import random
+import pytest
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app
+from app.queue.retry_policy import POLICIES, classify_failure, describe_failure, retry_delay
+from app.services.ffmpeg_service import FFmpegServiceError
+from app.services.s3_service import S3ServiceError
+from app.services.segment_service import SegmentServiceError
+
+STDERR = "ffmpeg version 7\nframe=  10 fps=0.0 q=0.0 size=0kB\n[out#0/mp4] Error writing trailer: No space left on device\n"
+
+client = TestClient(app)
+
+def _raised(exc, cause=None):
+    try:
+        try:
+            raise cause or exc
+        except Exception:
+            if cause is not None:
+                raise exc
+            raise
+    except Exception as e:
+        return e
+
+def test_failures_are_classified_through_the_cause_chain():
+    assert classify_failure(_raised(S3ServiceError("S3 upload error: read timeout"))) == "transient"
+    assert classify_failure(_raised(OSError(errno.ENOSPC, "No space left on device"))) == "disk"
+    assert classify_failure(_raised(FFmpegServiceError("FFmpeg error", STDERR))) == "disk"
+    encode_error = FFmpegServiceError("FFmpeg segment error", "Invalid data found when processing input")
+    assert classify_failure(_raised(SegmentServiceError("Segmented encode failed"), encode_error)) == "ffmpeg"
+    assert classify_failure(_raised(ValueError("bad aspect ratio"))) == "invalid"
+    assert classify_failure(None) == "crashed"
+
+def test_backoff_grows_with_jitter_until_budget_is_spent():
+    rng = random.Random(1)
+    policy = POLICIES["transient"]
+    delays = [retry_delay("transient", attempt, rng) for attempt in range(policy.max_retries)]
+    for attempt, delay in enumerate(delays):
+        full = min(settings.JOB_RETRY_MAX_DELAY, policy.base_delay * 2 ** attempt)
+        assert full / 2 <= delay <= full
+    assert retry_delay("transient", policy.max_retries) is None
+    assert retry_delay("invalid", 0) is None
+
+def test_stderr_survives_process_pool_and_is_excerpted():
+    error = pickle.loads(pickle.dumps(FFmpegServiceError("FFmpeg error", STDERR)))
+    failure = describe_failure(_raised(SegmentServiceError("Segmented encode failed"), error))
+    assert failure["error"].startswith("SegmentServiceError: Segmented encode failed")
+    assert failure["stderr"].splitlines() == ["ffmpeg version 7", STDERR.splitlines()[-1]]
+
+def test_admin_routes_require_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert client.get("/api/v1/admin/dead-letters").status_code == 404
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/v1/admin/dead-letters", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+def flaky_upload(payload):
+    raise S3ServiceError("S3 upload error: Read timeout on endpoint URL")
+
+def bad_request(payload):
+    raise ValueError(f"Unsupported value: {payload['value']}")
+
+def _run(conn, func, payload):
+    from rq.job import Job
+    from app.queue.video_queue import FairQueue, VIDEO_QUEUE_NAME, submit_job
+    from app.worker.video_worker import DrainingWorker
+    job_id = submit_job(f"{__name__}.{func.__name__}", payload, "user:1", "standard", 1.0)
+    DrainingWorker([FairQueue(VIDEO_QUEUE_NAME, connection=conn)], connection=conn).work(burst=True)
+    return Job.fetch(job_id, connection=conn)
+
+def test_transient_failure_is_scheduled_for_retry(redis_conn):
+    job = _run(redis_conn, flaky_upload, {})
+    assert job.get_status() == "scheduled"
+    assert job.meta["attempts"] == 1 and job.meta["error"].startswith("transient: S3ServiceError")
+    assert client.get(f"/api/v1/videos/job/{job.id}").json()["status"] == "queued"
+
+def test_invalid_job_is_dead_lettered_and_replayed(redis_conn, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    job = _run(redis_conn, bad_request, {"value": 42})
+    assert job.get_status() == "failed"
+    dead = client.get("/api/v1/admin/dead-letters", headers=headers).json()["dead_letters"]
+    assert [(d["job_id"], d["error_class"], d["payload"]) for d in dead] == [(job.id, "invalid", {"value": 42})]
+    assert "Unsupported value: 42" in dead[0]["error"]
+
+    response = client.post(f"/api/v1/admin/dead-letters/{job.id}/replay", headers=headers)
+    assert response.status_code == 200 and response.json()["job_id"] == job.id
+    assert client.get("/api/v1/admin/dead-letters", headers=headers).json()["dead_letters"] == []
+    replayed = client.get(f"/api/v1/videos/job/{job.id}").json()
+    assert replayed["status"] == "queued" and replayed["attempts"] is None
+    assert client.post(f"/api/v1/admin/dead-letters/{job.id}/replay", headers=headers).status_code == 404
+
+def test_cold_shutdown_requeues_the_running_job(redis_conn):
+    import subprocess
+    import sys
+    from datetime import timedelta
+    from rq.utils import utcnow
+    from app.queue.video_queue import FairQueue, VIDEO_QUEUE_NAME
+    from app.worker.video_worker import DrainingWorker
+    queue = FairQueue(VIDEO_QUEUE_NAME, connection=redis_conn)
+    job = queue.enqueue(f"{__name__}.flaky_upload", {})
+    queue.remove(job)
+    worker = DrainingWorker([queue], connection=redis_conn)
+    worker.register_birth()
+    worker.set_current_job_id(job.id)
+    # Stand-in for the work horse, in its own process group like RQ's
+    horse = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"], start_new_session=True)
+    worker._horse_pid = horse.pid
+    worker._shutdown_requested_date = utcnow() - timedelta(seconds=5)
+    with pytest.raises(SystemExit):
+        worker.request_force_stop(None, None)
+    assert horse.poll() is not None
+    job.refresh()
+    assert job.get_status() == "queued" and queue.job_ids[0] == job.id
+    assert job.meta["checkpoints"] == 1 and "attempts" not in job.meta
+
+def test_highlights_stay_pending_through_retries_and_failures_are_remembered(redis_conn, monkeypatch):
+    from rq.job import Job
+    from app.queue.video_queue import FairQueue, VIDEO_QUEUE_NAME, submit_highlights_job
+    from app.worker import video_jobs
+    from app.worker.video_worker import DrainingWorker
+
+    def run(video_id):
+        job_id = submit_highlights_job(video_id)
+        DrainingWorker([FairQueue(VIDEO_QUEUE_NAME, connection=redis_conn)], connection=redis_conn).work(burst=True)
+        return Job.fetch(job_id, connection=redis_conn)
+
+    # The work horse is forked from this process, so it sees the patched download
+    monkeypatch.setattr(video_jobs, "acquire_source", lambda *args, **kwargs: flaky_upload({}))
+    job = run("vid1")
+    assert job.get_status() == "scheduled"
+    assert redis_conn.ttl("highlights-vid1:pending") > settings.VIDEO_JOB_TIMEOUT
+    assert submit_highlights_job("vid1") is None
+
+    monkeypatch.setattr(video_jobs, "acquire_source", lambda *args, **kwargs: bad_request({"value": "codec"}))
+    job = run("vid2")
+    assert job.get_status() == "failed" and not redis_conn.exists("highlights-vid2:pending")
+    data = client.get("/api/v1/videos/highlights/vid2").json()
+    assert data["status"] == "failed" and "Unsupported value: codec" in data["error"]
+    assert Job.fetch(job.id, connection=redis_conn).get_status() == "failed"
+
+def report_threads(payload):
+    return os.environ.get("FFMPEG_THREADS")
+
+def test_each_job_starts_with_the_current_thread_budget(redis_conn, monkeypatch):
+    import multiprocessing
+    from rq.job import Job
+    from app.queue.video_queue import FairQueue, VIDEO_QUEUE_NAME, submit_job
+    from app.worker.video_worker import DrainingWorker
+    monkeypatch.delenv("FFMPEG_THREADS", raising=False)
+    budget = multiprocessing.Value("i", 3)
+    job_id = submit_job(f"{__name__}.report_threads", {}, "user:1", "standard", 1.0)
+    DrainingWorker([FairQueue(VIDEO_QUEUE_NAME, connection=redis_conn)], connection=redis_conn,
+                   thread_budget=budget).work(burst=True)
+    assert Job.fetch(job_id, connection=redis_conn).result == "3"
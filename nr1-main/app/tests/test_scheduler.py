@@ -0,0 +1,80 @@
+import os
+import pytest
+from app.queue.scheduler import FairScheduler, choose_lane, estimate_cost
+
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+def test_cost_scales_with_duration_and_resolution():
+    assert estimate_cost(60) == 60
+    assert estimate_cost(60, 540, 960) == 15
+    assert estimate_cost(-5) == 0
+
+def test_choose_lane():
+    assert choose_lane(15, estimate_cost(15)) == "priority"
+    assert choose_lane(120, estimate_cost(120), plan="pro") == "priority"
+    assert choose_lane(120, estimate_cost(120)) == "standard"
+    assert choose_lane(900, estimate_cost(900)) == "bulk"
+
+@pytest.fixture
+def scheduler():
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL not set")
+    from redis import Redis
+    conn = Redis.from_url(TEST_REDIS_URL)
+    scheduler = FairScheduler(conn, "test-fair", lane_max_wait={"bulk": 3600})
+    conn.delete(f"rq:queue:{scheduler.queue_name}", *conn.keys(f"{scheduler.prefix}*"))
+    yield scheduler
+    conn.delete(f"rq:queue:{scheduler.queue_name}", *conn.keys(f"{scheduler.prefix}*"))
+
+def drain_all(scheduler):
+    order = []
+    while True:
+        picked = scheduler.dispatch()
+        if not picked:
+            break
+        order.append(picked[0][1])
+        scheduler.connection.delete(f"rq:queue:{scheduler.queue_name}")
+    return order
+
+def test_users_are_interleaved_and_cheapest_first(scheduler):
+    for i, cost in enumerate([30, 10, 20]):
+        scheduler.submit(f"a{i}", "user:a", "standard", cost)
+    scheduler.submit("b0", "user:b", "standard", 50)
+    order = drain_all(scheduler)
+    assert order[0] == "a1"
+    assert order.index("b0") < order.index("a0")
+    assert scheduler.backlog()["pending"] == 0
+
+def test_priority_lane_wins_and_dispatch_fills_idle_slots(scheduler):
+    scheduler.submit("bulk", "user:a", "bulk", 900)
+    scheduler.submit("short", "user:b", "priority", 10)
+    assert [job_id for _, job_id, _ in scheduler.dispatch()] == ["short"]
+    # One idle worker: the list already holds its job
+    assert scheduler.dispatch() == []
+    assert scheduler.position("bulk") == {"lane": "bulk", "user": "user:a"}
+    # A second idle worker blocked on the list gets the next job right away
+    assert [job_id for _, job_id, _ in scheduler.dispatch(2)] == ["bulk"]
+    assert scheduler.connection.lrange(f"rq:queue:{scheduler.queue_name}", 0, -1) == [b"short", b"bulk"]
+
+def test_dispatched_job_is_marked_queued_unless_already_started(scheduler):
+    for job_id, status in (("waiting", "deferred"), ("running", "started")):
+        scheduler.connection.hset(f"rq:job:{job_id}", "status", status)
+        scheduler.submit(job_id, "user:a", "standard", 10)
+    scheduler.dispatch(2)
+    statuses = [scheduler.connection.hget(f"rq:job:{job_id}", "status") for job_id in ("waiting", "running")]
+    scheduler.connection.delete("rq:job:waiting", "rq:job:running")
+    assert statuses == [b"queued", b"started"]
+
+def test_idle_workers_counts_only_waiting_workers(scheduler):
+    from rq import Worker
+    from app.queue.video_queue import FairQueue, VIDEO_QUEUE_NAME, idle_workers
+    conn = scheduler.connection
+    workers = [Worker([FairQueue(VIDEO_QUEUE_NAME, connection=conn)], connection=conn) for _ in range(3)]
+    try:
+        for worker, state in zip(workers, ("idle", "idle", "busy")):
+            worker.register_birth()
+            worker.set_state(state)
+        assert idle_workers(conn) == 2
+    finally:
+        for worker in workers:
+            worker.register_death()
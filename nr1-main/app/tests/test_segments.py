@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+import subprocess
+import pytest
+from app.config import settings
+from app.services import segment_service
+from app.services.encoding_profiles import get_profile
+from app.services.ffmpeg_service import list_keyframes
+from app.services.segment_service import plan_segments, process_video_segmented
+
+def test_segments_cut_at_keyframes_and_cover_window():
+    keyframes = [float(t) for t in range(0, 200, 4)]
+    segments = plan_segments(10, 130, keyframes, 30)
+    assert segments[0][0] == 10 and segments[-1][1] == 130
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+    assert all(start in keyframes for start, _ in segments[1:])
+    assert all(end - start >= 15 for start, end in segments)
+
+def test_no_keyframes_means_single_segment():
+    assert plan_segments(0, 90, [], 30) == [(0, 90)]
+
+def test_short_tail_is_merged():
+    assert plan_segments(0, 70, [0.0, 30.0, 60.0], 30) == [(0, 30.0), (30.0, 70)]
+
+def test_parent_encoded_chunks_leave_no_sub_jobs_behind(redis_conn, tmp_path, monkeypatch):
+    from app.queue.video_queue import get_segment_queue
+    from app.worker.video_jobs import encode_segment_job
+    encoded = []
+    monkeypatch.setattr(segment_service, "encode_segment", lambda _input, output, *args: encoded.append(output))
+    workdir = str(tmp_path / "clip.mp4.segments")
+    os.makedirs(workdir)
+    # No segment worker is running, so the parent encodes every chunk itself
+    segment_service._encode_distributed("in.mp4", workdir, [(0, 30), (30, 60)], get_profile("fast"), 1)
+    assert len(encoded) == 2
+    assert get_segment_queue().count == 0
+    assert redis_conn.keys("segment:claim:*") == []
+    # A sub-job picked up after the parent cleaned up does nothing
+    os.rmdir(workdir)
+    assert encode_segment_job({"workdir": workdir, "index": 0}) == {"index": 0, "encoded": False}
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_segmented_encode_concats_to_one_clip(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SEGMENT_TARGET_SECONDS", 4)
+    source, output = str(tmp_path / "source.mp4"), str(tmp_path / "clip.mp4")
+    # Keyframes every 2 s, so a 12 s window splits into three chunks
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=320x180:rate=25",
+         "-f", "lavfi", "-i", "sine=frequency=440", "-t", "20", "-g", "50", "-pix_fmt", "yuv420p", source],
+        check=True,
+    )
+    segments = plan_segments(3, 15, list_keyframes(source, 3, 15), 4)
+    result = process_video_segmented(source, output, 3, 12, get_profile("turbo"), executor="local")
+    assert result["segments"] == len(segments) >= 3
+    assert not os.path.exists(segment_service.segment_dir_for(output))
+    probe = json.loads(subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration:stream=codec_type,codec_name,width,height",
+         "-of", "json", output], check=True, capture_output=True, text=True).stdout)
+    assert abs(float(probe["format"]["duration"]) - sum(end - start for start, end in segments)) < 0.25
+    assert [s["codec_type"] for s in probe["streams"]] == ["video", "audio"]
+    assert (probe["streams"][0]["codec_name"], probe["streams"][0]["width"], probe["streams"][0]["height"]) == ("h264", 320, 180)
@@ -0,0 +1,60 @@
+from app.worker.supervisor import ThroughputController, WorkerSupervisor, detect_cpu_count, plan_slots, thread_budget
+
+def test_cgroup_quota_caps_cpu_count(tmp_path):
+    cpu_max = tmp_path / "cpu.max"
+    cpu_max.write_text("150000 100000\n")
+    assert detect_cpu_count(str(cpu_max)) <= 2
+    cpu_max.write_text("max 100000\n")
+    assert detect_cpu_count(str(cpu_max)) >= 1
+
+def test_plan_slots_and_thread_budget():
+    assert plan_slots(8, 2) == (4, 2)
+    assert plan_slots(8, 2, max_slots=2) == (2, 4)
+    assert plan_slots(1, 4) == (1, 1)
+    assert thread_budget(8, 3) == 2
+
+def test_controller_climbs_then_reverses():
+    controller = ThroughputController(1, 8)
+    assert controller.update(4, 10.0) == 5
+    assert controller.update(5, 12.0) == 6
+    assert controller.update(6, 9.0) == 5
+    assert controller.update(5, 9.1) == 5
+
+def test_controller_respects_bounds():
+    controller = ThroughputController(1, 2)
+    assert controller.update(2, 10.0) == 2
+    assert controller.update(2, 11.0) == 1
+
+def test_thread_budget_follows_the_slot_count(monkeypatch):
+    supervisor = WorkerSupervisor(cpus=8, threads_per_job=2, max_slots=0)
+    assert (supervisor.target, supervisor.threads.value) == (4, 2)
+    monkeypatch.setattr(supervisor, "has_backlog", lambda: True)
+    supervisor.completed.value = 10
+    supervisor.adapt(60)
+    # Slots see the shared value, so jobs started after the change get the new budget
+    assert (supervisor.target, supervisor.threads.value) == (5, 1)
+    supervisor.set_target(2)
+    assert supervisor.threads.value == 4
+
+def test_draining_slots_count_toward_the_budget(monkeypatch):
+    class FakeProcess:
+        pid = None
+        exitcode = 0
+
+        def __init__(self):
+            self.alive = True
+
+        def is_alive(self):
+            return self.alive
+
+    supervisor = WorkerSupervisor(cpus=8, threads_per_job=2, max_slots=0)
+    monkeypatch.setattr(supervisor, "_spawn", lambda: supervisor.slots.update({len(supervisor.slots): FakeProcess()}))
+    supervisor.reconcile()
+    supervisor.set_target(2)
+    supervisor.reconcile()
+    # Two slots retired but still finishing their jobs: four encodes share the CPUs
+    assert (len(supervisor.slots), len(supervisor.retiring), supervisor.threads.value) == (2, 2, 2)
+    for process in supervisor.retiring.values():
+        process.alive = False
+    supervisor.reconcile()
+    assert (len(supervisor.slots), len(supervisor.retiring), supervisor.threads.value) == (2, 0, 4)
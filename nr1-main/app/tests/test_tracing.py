@@ -0,0 +1,78 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from rq import get_current_job
+from app.config import settings
+from app.main import app
+from app.utils import tracing
+from app.utils.tracing import inject_context, job_trace, span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+client = TestClient(app)
+
+def traced_job(payload):
+    with job_trace("clip.process", get_current_job(), {"video.id": payload["video_id"]}):
+        with span("encode"):
+            return {"ok": True}
+
+@pytest.fixture
+def exporter(monkeypatch):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    memory = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    monkeypatch.setattr(tracing, "_tracer", provider.get_tracer("test"))
+    return memory
+
+def test_tracing_is_a_noop_when_disabled(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", None)
+    with span("anything", carrier={"traceparent": TRACEPARENT}) as current:
+        assert current is None and inject_context() == {}
+    with job_trace("clip.process", None) as current:
+        assert current is None
+
+def test_request_trace_is_resumed_by_the_worker(exporter, redis_conn):
+    from rq import SimpleWorker
+    from rq.job import Job
+    from app.queue.video_queue import FairQueue, VIDEO_QUEUE_NAME, submit_job
+
+    resp = client.post("/api/v1/videos/process", json={"video_id": "abc", "start_time": 0, "end_time": 10},
+                       headers={"traceparent": TRACEPARENT})
+    meta = Job.fetch(resp.json()["job_id"], connection=redis_conn).meta
+    assert meta["trace"]["traceparent"].split("-")[1] == TRACE_ID
+    redis_conn.flushdb()
+    exporter.clear()
+
+    with span("clip.request", carrier={"traceparent": TRACEPARENT}):
+        job_id = submit_job(f"{__name__}.traced_job", {"video_id": "abc"}, "user:1", "standard", 1.0)
+    SimpleWorker([FairQueue(VIDEO_QUEUE_NAME, connection=redis_conn)], connection=redis_conn).work(burst=True)
+    assert Job.fetch(job_id, connection=redis_conn).get_status() == "finished"
+
+    spans = {s.name: s for s in exporter.get_finished_spans()}
+    assert set(spans) == {"clip.request", "queue.submit", "queue.wait", "clip.process", "encode"}
+    assert {format(s.context.trace_id, "032x") for s in spans.values()} == {TRACE_ID}
+    submit = spans["queue.submit"].context.span_id
+    assert spans["queue.wait"].parent.span_id == submit and spans["clip.process"].parent.span_id == submit
+    assert spans["encode"].parent.span_id == spans["clip.process"].context.span_id
+    assert spans["queue.wait"].end_time <= spans["clip.process"].start_time
+    assert spans["clip.process"].attributes["job.id"] == job_id
+    assert spans["clip.process"].attributes["job.lane"] == "standard"
+
+def test_setup_tracing_exports_json_lines(monkeypatch, tmp_path):
+    pytest.importorskip("opentelemetry.sdk")
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "_tracer", None)
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(settings, "TRACING_EXPORTER", "file")
+    monkeypatch.setattr(settings, "TRACING_FILE", str(path))
+    assert tracing.setup_tracing("nr1-test", simple=True)
+    with span("probe", {"probe.file": "a.mp4", "unset": None}):
+        pass
+    record = json.loads(path.read_text().splitlines()[-1])
+    assert record["name"] == "probe" and record["attributes"] == {"probe.file": "a.mp4"}
+    assert record["resource"]["attributes"]["service.name"] == "nr1-test"
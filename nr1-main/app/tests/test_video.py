@@ -1,6 +1,15 @@
+import json
+import os
+import shutil
+import struct
+import subprocess
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.encoding_profiles import get_profile
+from app.services.ffmpeg_service import FFmpegServiceError, partial_output_path, process_video, process_video_renditions
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
 
 client = TestClient(app)
 
@@ -14,3 +23,78 @@ def test_video_info():
     resp = client.get("/api/v1/videos/info/sampleid")
     assert resp.status_code == 200
     assert "title" in resp.json()
+
+def test_video_process_rejects_invalid_renditions():
+    base = {"video_id": "sampleid", "start_time": 0, "end_time": 10}
+    odd = {**base, "renditions": [{"name": "hd", "width": 721, "height": 1280}]}
+    assert client.post("/api/v1/videos/process", json=odd).status_code == 422
+    duplicate = {**base, "renditions": [{"name": "hd", "width": 720, "height": 1280}] * 2}
+    assert client.post("/api/v1/videos/process", json=duplicate).status_code == 422
+    hls = {**base, "output_format": "hls", "renditions": [{"name": "hd", "width": 720, "height": 1280}]}
+    assert client.post("/api/v1/videos/process", json=hls).status_code == 422
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("renditions") / "source.mp4")
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=640x360:rate=25",
+         "-f", "lavfi", "-i", "sine=frequency=440", "-t", "5", "-pix_fmt", "yuv420p", path],
+        check=True,
+    )
+    return path
+
+def _top_level_boxes(path):
+    boxes = []
+    with open(path, "rb") as f:
+        while header := f.read(8):
+            size, kind = struct.unpack(">I4s", header)
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0] - 8
+            boxes.append(kind.decode())
+            f.seek(size - 8, os.SEEK_CUR)
+    return boxes
+
+@needs_ffmpeg
+def test_rendition_ladder_from_a_generated_clip(tmp_path, source):
+    ladder = [("landscape", 320, 180), ("square", 240, 240), ("vertical", 180, 320)]
+    renditions = [{"name": name, "width": w, "height": h, "output": str(tmp_path / f"{name}.mp4")}
+                  for name, w, h in ladder]
+    result = process_video_renditions(source, renditions, start=1, duration=3, profile=get_profile("turbo"))
+    assert sorted(result["outputs"]) == sorted(name for name, _, _ in ladder)
+    for rendition in renditions:
+        probe = json.loads(subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries",
+             "format=duration:stream=codec_type,width,height,sample_aspect_ratio", "-of", "json", rendition["output"]],
+            check=True, capture_output=True, text=True).stdout)
+        video = probe["streams"][0]
+        assert (video["width"], video["height"]) == (rendition["width"], rendition["height"])
+        assert video.get("sample_aspect_ratio", "1:1") == "1:1"
+        assert [s["codec_type"] for s in probe["streams"]] == ["video", "audio"]
+        assert abs(float(probe["format"]["duration"]) - 3) < 0.2
+        # Decodes end to end without errors, and starts playing before the whole file is fetched
+        decode = subprocess.run(["ffmpeg", "-v", "error", "-i", rendition["output"], "-f", "null", "-"],
+                                capture_output=True, text=True)
+        assert decode.returncode == 0 and decode.stderr == ""
+        boxes = _top_level_boxes(rendition["output"])
+        assert boxes.index("moov") < boxes.index("mdat")
+        assert not os.path.exists(partial_output_path(rendition["output"]))
+
+@needs_ffmpeg
+def test_single_encode_is_faststart(tmp_path, source):
+    output = str(tmp_path / "clip.mp4")
+    process_video(source, output, start=1, duration=2, profile=get_profile("turbo"))
+    boxes = _top_level_boxes(output)
+    assert boxes.index("moov") < boxes.index("mdat")
+
+@needs_ffmpeg
+def test_failed_encodes_leave_no_partial_files(tmp_path):
+    outputs = [str(tmp_path / "clip.mp4"), str(tmp_path / "a.mp4"), str(tmp_path / "b.mp4")]
+    for output in outputs:
+        open(partial_output_path(output), "wb").close()
+    missing = str(tmp_path / "missing.mp4")
+    with pytest.raises(FFmpegServiceError):
+        process_video(missing, outputs[0], duration=1)
+    with pytest.raises(FFmpegServiceError):
+        process_video_renditions(missing, [{"name": n, "width": 64, "height": 64, "output": o}
+                                           for n, o in zip("ab", outputs[1:])], duration=1)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,24 @@
+"""
+Admin authentication for operational endpoints (dead-letter queue, profiling).
+
+- Admin routes require the shared secret ADMIN_TOKEN in the X-Admin-Token header,
+  compared in constant time.
+- With ADMIN_TOKEN unset the admin API is disabled and every admin route answers 404.
+"""
+
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException, status
+from ..config import settings
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    FastAPI dependency guarding admin routes.
+
+    Raises:
+        HTTPException: 404 if the admin API is disabled, 403 if the token is missing or wrong.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
@@ -0,0 +1,97 @@
+"""
+Drain state for graceful, zero-downtime shutdown of the API process.
+
+- Tracks in-flight HTTP requests (see app/middleware/drain.py).
+- Once draining starts, new jobs are rejected, health checks report
+  "draining", start hooks end long-lived streams, and registered buffer
+  flushers run before clients close.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Union
+
+logger = logging.getLogger("drain")
+
+FlushCallback = Callable[[], Union[None, Awaitable[None]]]
+
+class DrainState:
+    """Process-wide drain flag, in-flight counter and buffer flush hooks."""
+
+    def __init__(self) -> None:
+        self.draining = False
+        self.in_flight = 0
+        self.started_at: float = 0.0
+        self._flushers: Dict[str, FlushCallback] = {}
+        self._start_hooks: Dict[str, Callable[[], None]] = {}
+
+    def register_flush(self, name: str, callback: FlushCallback) -> None:
+        """Register a callback (sync or async) that flushes buffered work on drain."""
+        self._flushers[name] = callback
+
+    def register_start_hook(self, name: str, callback: Callable[[], None]) -> None:
+        """Register a sync callback run when draining starts (e.g. to end open event streams)."""
+        self._start_hooks[name] = callback
+
+    def request_started(self) -> None:
+        self.in_flight += 1
+
+    def request_finished(self) -> None:
+        self.in_flight -= 1
+
+    def start(self) -> None:
+        """Enter drain mode; idempotent."""
+        if not self.draining:
+            self.draining = True
+            self.started_at = time.monotonic()
+            logger.warning(f"Drain started: in_flight={self.in_flight}")
+            for name, callback in self._start_hooks.items():
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Drain start hook failed for {name}: {e}")
+
+    async def wait_idle(self, timeout: float, poll_interval: float = 0.05) -> bool:
+        """Wait until no requests are in flight. Returns False if the timeout expired."""
+        deadline = time.monotonic() + timeout
+        while self.in_flight > 0:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll_interval)
+        return True
+
+    async def flush(self, timeout: float) -> None:
+        """Run every registered flusher, each bounded by the remaining timeout."""
+        deadline = time.monotonic() + timeout
+        for name, callback in self._flushers.items():
+            remaining = max(deadline - time.monotonic(), 0.0)
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await asyncio.wait_for(result, timeout=remaining)
+                logger.info(f"Drain flushed buffer: {name}")
+            except Exception as e:
+                logger.error(f"Drain flush failed for {name}: {e}")
+
+    async def drain(self, timeout: float) -> Dict[str, Any]:
+        """
+        Stop accepting new jobs, wait for in-flight requests and flush buffers.
+
+        Args:
+            timeout (float): Overall deadline in seconds.
+
+        Returns:
+            dict[str, Any]: {"idle": bool, "in_flight": int, "elapsed": float}.
+        """
+        self.start()
+        idle = await self.wait_idle(timeout)
+        if not idle:
+            logger.warning(f"Drain deadline reached with {self.in_flight} requests still in flight")
+        await self.flush(max(timeout - (time.monotonic() - self.started_at), 1.0))
+        elapsed = time.monotonic() - self.started_at
+        logger.info(f"Drain complete: idle={idle} elapsed={elapsed:.2f}s")
+        return {"idle": idle, "in_flight": self.in_flight, "elapsed": elapsed}
+
+drain_state = DrainState()
@@ -0,0 +1,97 @@
+"""
+Build-time precompression of static assets.
+
+Writes ``.gz`` (and ``.br`` when the brotli package is installed) siblings next to
+every compressible file in a directory, at maximum compression levels. The static
+file server picks these up at request time, so no CPU is spent compressing assets
+per request.
+
+Usage:
+    python -m app.utils.precompress public [--min-size 256]
+"""
+
+import argparse
+import gzip
+import logging
+import mimetypes
+import os
+from typing import Optional
+from ..middleware.compression import brotli, is_compressible_content_type
+
+logger = logging.getLogger("precompress")
+
+def _write_variant(path: str, data: bytes, source_size: int) -> bool:
+    """Write a compressed variant only if it is actually smaller than the source."""
+    if len(data) >= source_size:
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+def _is_fresh(variant: str, source_mtime: float) -> bool:
+    return os.path.exists(variant) and os.path.getmtime(variant) >= source_mtime
+
+def precompress_file(path: str, gzip_level: int = 9, brotli_quality: int = 11) -> int:
+    """
+    Write compressed siblings for a single file.
+
+    Args:
+        path (str): File to compress.
+        gzip_level (int): gzip compression level.
+        brotli_quality (int): brotli quality (ignored if brotli is unavailable).
+
+    Returns:
+        int: Number of variants written.
+    """
+    stat = os.stat(path)
+    data: Optional[bytes] = None
+    written = 0
+    variants = [(path + ".gz", lambda raw: gzip.compress(raw, compresslevel=gzip_level, mtime=0))]
+    if brotli is not None:
+        variants.append((path + ".br", lambda raw: brotli.compress(raw, quality=brotli_quality)))
+    for variant, compress in variants:
+        if _is_fresh(variant, stat.st_mtime):
+            continue
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        if _write_variant(variant, compress(data), stat.st_size):
+            written += 1
+    return written
+
+def precompress_directory(directory: str, min_size: int = 256) -> int:
+    """
+    Precompress every compressible file under ``directory``.
+
+    Args:
+        directory (str): Root directory of the static assets.
+        min_size (int): Files smaller than this many bytes are skipped.
+
+    Returns:
+        int: Total number of variants written.
+    """
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith((".gz", ".br", ".tmp")):
+                continue
+            path = os.path.join(root, name)
+            if os.path.getsize(path) < min_size:
+                continue
+            if not is_compressible_content_type(mimetypes.guess_type(name)[0]):
+                continue
+            total += precompress_file(path)
+    logger.info(f"Precompressed {total} static asset variants in {directory}")
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write .gz/.br siblings for static assets.")
+    parser.add_argument("directory")
+    parser.add_argument("--min-size", type=int, default=256)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    precompress_directory(args.directory, min_size=args.min_size)
@@ -0,0 +1,57 @@
+"""
+Request identity helpers shared by middleware (rate limiting, caching, idempotency).
+
+- Authenticated requests are identified by the JWT subject ("user:<id>").
+- Anonymous requests fall back to the client IP ("ip:<addr>"). Behind
+  TRUSTED_PROXY_COUNT proxies (Render terminates TLS at one) that is the
+  X-Forwarded-For hop the outermost trusted proxy appended, counted from the
+  right: hops to its left are sent by the client and can be anything.
+"""
+
+from typing import Optional
+from jose import jwt, JWTError
+from starlette.datastructures import Headers
+from starlette.types import Scope
+from ..config import settings
+
+ALGORITHM = "HS256"
+
+def get_user_id(headers: Headers) -> Optional[str]:
+    """Return the verified JWT subject from an Authorization: Bearer header, if any."""
+    auth = headers.get("authorization", "")
+    scheme, _, token = auth.partition(" ")
+    if scheme.lower() != "bearer" or not token or not settings.JWT_SECRET:
+        return None
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    sub = payload.get("sub")
+    return str(sub) if sub is not None else None
+
+def get_client_ip(scope: Scope, trusted_proxies: Optional[int] = None) -> str:
+    """
+    Return the originating client IP for a request scope.
+
+    Args:
+        scope (Scope): ASGI request scope.
+        trusted_proxies (int, optional): Proxies appending to X-Forwarded-For; defaults to TRUSTED_PROXY_COUNT.
+
+    Returns:
+        str: The address seen by the outermost trusted proxy, or the peer address.
+    """
+    trusted_proxies = settings.TRUSTED_PROXY_COUNT if trusted_proxies is None else trusted_proxies
+    forwarded = Headers(scope=scope).get("x-forwarded-for") if trusted_proxies > 0 else None
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()] if forwarded else []
+    if hops:
+        # Fewer hops than proxies: the leftmost one was still appended by a proxy
+        return hops[-trusted_proxies] if len(hops) >= trusted_proxies else hops[0]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def get_request_identity(scope: Scope) -> str:
+    """Return "user:<id>" for authenticated requests, otherwise "ip:<addr>"."""
+    user_id = get_user_id(Headers(scope=scope))
+    if user_id:
+        return f"user:{user_id}"
+    return f"ip:{get_client_ip(scope)}"
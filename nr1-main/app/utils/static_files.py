@@ -0,0 +1,96 @@
+"""
+Static file serving with precompressed variants and cache headers.
+
+- Serves build-time ``.br``/``.gz`` siblings (see app/utils/precompress.py) when the
+  client accepts them, so static assets are never compressed at request time.
+- Marks content-hashed asset names (e.g. ``app.3f2a9c1b.js``) as immutable with a
+  long max-age; everything else must be revalidated.
+"""
+
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from ..middleware.compression import negotiate_encoding
+
+HASHED_NAME_RE = re.compile(r"[.-][0-9a-fA-F]{8,}\.[A-Za-z0-9]+$")
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+def cache_control_for(path: str, immutable_max_age: int, default_max_age: int) -> str:
+    """
+    Build the Cache-Control header for a static asset.
+
+    Args:
+        path (str): Path or file name of the asset.
+        immutable_max_age (int): Max-age in seconds for content-hashed names.
+        default_max_age (int): Max-age in seconds for everything else (0 = revalidate).
+
+    Returns:
+        str: Cache-Control header value.
+    """
+    if HASHED_NAME_RE.search(os.path.basename(path)):
+        return f"public, max-age={immutable_max_age}, immutable"
+    if default_max_age > 0:
+        return f"public, max-age={default_max_age}"
+    return "no-cache"
+
+def select_precompressed(path: str, accept_encoding: str) -> Tuple[str, Optional[str], Optional[os.stat_result]]:
+    """
+    Find the best precompressed sibling of ``path`` the client accepts.
+
+    Returns:
+        tuple: (path to serve, content coding or None, stat of the sibling or None).
+    """
+    available = tuple(coding for coding, suffix in PRECOMPRESSED_SUFFIXES.items() if os.path.isfile(path + suffix))
+    encoding = negotiate_encoding(accept_encoding, available) if available else None
+    if encoding is None:
+        return path, None, None
+    variant = path + PRECOMPRESSED_SUFFIXES[encoding]
+    return variant, encoding, os.stat(variant)
+
+def precompressed_file_response(
+    path: str,
+    request_headers: Headers,
+    cache_control: str,
+    stat_result: Optional[os.stat_result] = None,
+    status_code: int = 200,
+) -> FileResponse:
+    """
+    Build a FileResponse for ``path``, serving a precompressed sibling when possible.
+
+    The media type is always derived from the original file name, and every response
+    varies on Accept-Encoding so shared caches keep the variants apart.
+    """
+    served_path, encoding, variant_stat = select_precompressed(path, request_headers.get("accept-encoding", ""))
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return FileResponse(
+        served_path,
+        status_code=status_code,
+        headers=headers,
+        media_type=mimetypes.guess_type(path)[0] or "text/plain",
+        stat_result=variant_stat if encoding else stat_result,
+    )
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers precompressed siblings and sets cache headers."""
+
+    def __init__(self, *args, immutable_max_age: int = 31536000, default_max_age: int = 0, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.immutable_max_age = immutable_max_age
+        self.default_max_age = default_max_age
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        cache_control = cache_control_for(str(full_path), self.immutable_max_age, self.default_max_age)
+        response = precompressed_file_response(
+            str(full_path), request_headers, cache_control, stat_result=stat_result, status_code=status_code
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
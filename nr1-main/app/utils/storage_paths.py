@@ -0,0 +1,57 @@
+"""
+Local storage layout under VIDEO_STORAGE_PATH, shared by the API and workers.
+
+- sources/{video_id}.mp4: sources placed on disk directly (legacy/manual).
+- cache/objects/{sha[:2]}/{sha}.mp4: downloaded sources, content-addressed.
+- cache/index/{video_id}.json: maps a video ID to its cached object.
+- cache/refs/{sha}/: one file per job currently using an object.
+- cache/locks/: flock files serialising downloads of the same video.
+"""
+
+import json
+import os
+from ..config import settings
+
+
+def source_path_for(video_id: str) -> str:
+    """Local path of the source video for a video ID (cached object if ingested)."""
+    digest = cached_digest_for(video_id)
+    if digest:
+        path = object_path_for(digest)
+        if os.path.exists(path):
+            return path
+    return local_source_path_for(video_id)
+
+
+def local_source_path_for(video_id: str) -> str:
+    """Path of a source placed directly in VIDEO_STORAGE_PATH/sources."""
+    return os.path.join(settings.VIDEO_STORAGE_PATH, "sources", f"{video_id}.mp4")
+
+
+def processed_path_for(job_id: str) -> str:
+    """Local path of the processed clip for a job ID."""
+    return os.path.join(settings.VIDEO_STORAGE_PATH, "processed", f"{job_id}.mp4")
+
+
+def cache_dir(*parts: str) -> str:
+    """Path inside the source cache."""
+    return os.path.join(settings.VIDEO_STORAGE_PATH, "cache", *parts)
+
+
+def object_path_for(digest: str) -> str:
+    """Content-addressed path of a cached source."""
+    return cache_dir("objects", digest[:2], f"{digest}.mp4")
+
+
+def index_path_for(video_id: str) -> str:
+    """Index entry mapping a video ID to its cached object."""
+    return cache_dir("index", f"{video_id}.json")
+
+
+def cached_digest_for(video_id: str) -> str:
+    """Digest of the cached object for a video ID, or "" if not ingested."""
+    try:
+        with open(index_path_for(video_id)) as f:
+            return json.load(f).get("sha256", "")
+    except (OSError, ValueError):
+        return ""
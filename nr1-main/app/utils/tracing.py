@@ -0,0 +1,140 @@
+"""
+End-to-end tracing of clip jobs with OpenTelemetry (optional).
+
+- opentelemetry-api/-sdk are optional: when they are missing or TRACING_ENABLED
+  is off, span() is a no-op context manager and no context is propagated.
+- setup_tracing() installs a tracer provider that exports finished spans as JSON
+  lines to TRACING_FILE (TRACING_EXPORTER=file) or to stdout (console).
+- The API starts a trace per clip request, continuing an incoming W3C
+  traceparent header. submit_job stores the context in job.meta["trace"] and
+  the worker resumes it (job_trace), so the queue wait and the download, probe,
+  encode and upload spans of one clip share a trace ID with the request.
+"""
+
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Mapping, Optional
+from ..config import settings
+
+try:
+    from opentelemetry import propagate, trace
+except ImportError:  # pragma: no cover - tracing is optional
+    propagate = trace = None
+
+logger = logging.getLogger("tracing")
+
+_tracer = None
+
+def setup_tracing(service_name: str, simple: bool = False) -> bool:
+    """
+    Install the tracer provider for this process (idempotent).
+
+    Args:
+        service_name (str): ``service.name`` resource attribute (e.g. "nr1-api", "nr1-worker").
+        simple (bool): Export every span as it ends instead of in batches; RQ work
+            horses exit with os._exit, which would drop a pending batch.
+
+    Returns:
+        bool: True if spans are being recorded.
+    """
+    global _tracer
+    if _tracer is not None or not settings.TRACING_ENABLED:
+        return _tracer is not None
+    if trace is None:
+        logger.warning("TRACING_ENABLED is set but opentelemetry-sdk is not installed; tracing is off")
+        return False
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+
+    if settings.TRACING_EXPORTER == "file":
+        out = open(settings.TRACING_FILE, "a", buffering=1, encoding="utf-8")
+        exporter = ConsoleSpanExporter(service_name=service_name, out=out,
+                                       formatter=lambda span: span.to_json(indent=None) + "\n")
+    else:
+        exporter = ConsoleSpanExporter(service_name=service_name)
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(SimpleSpanProcessor(exporter) if simple else BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("nr1copilot")
+    logger.info(f"Tracing enabled for {service_name} ({settings.TRACING_EXPORTER} exporter)")
+    return True
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, carrier: Optional[Mapping[str, str]] = None,
+         context: Any = None, start_time: Optional[int] = None) -> Iterator[Any]:
+    """
+    Run the block in a span (child of the current one); a no-op when tracing is off.
+
+    Args:
+        name (str): Span name.
+        attributes (dict, optional): Span attributes; None values are dropped.
+        carrier (Mapping, optional): Incoming headers to continue a remote trace from.
+        context (Context, optional): Explicit parent context (see job_trace).
+        start_time (int, optional): Start in epoch nanoseconds, for work that began earlier.
+
+    Yields:
+        Span or None: The span, to add attributes once they are known.
+    """
+    if _tracer is None:
+        yield None
+        return
+    if carrier is not None:
+        context = propagate.extract(carrier)
+    attributes = {key: value for key, value in (attributes or {}).items() if value is not None}
+    with _tracer.start_as_current_span(name, context=context, attributes=attributes, start_time=start_time) as current:
+        yield current
+
+def inject_context() -> Dict[str, str]:
+    """W3C trace context of the current span, for job.meta["trace"]; empty when tracing is off."""
+    carrier: Dict[str, str] = {}
+    if _tracer is not None:
+        propagate.inject(carrier)
+    return carrier
+
+def _epoch_ns(moment: Optional[datetime]) -> Optional[int]:
+    if moment is None:
+        return None
+    if moment.tzinfo is None:  # RQ stores naive UTC timestamps
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1e9)
+
+@contextmanager
+def job_trace(name: str, job: Any, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """
+    Resume the trace stored in ``job.meta["trace"]`` for the duration of a job.
+
+    Records a ``queue.wait`` span from the moment the job was queued (or re-queued
+    for a retry) until now, then runs the block in a ``name`` span. Jobs without
+    stored context start a new trace.
+
+    Args:
+        name (str): Span name for the job's work.
+        job (rq.job.Job, optional): The current job.
+        attributes (dict, optional): Extra attributes of the job span.
+
+    Yields:
+        Span or None: The job span.
+    """
+    if _tracer is None:
+        yield None
+        return
+    meta = job.meta if job is not None else {}
+    parent = propagate.extract(meta.get("trace") or {})
+    attributes = {"job.id": getattr(job, "id", None), "job.lane": meta.get("lane"),
+                  "job.attempt": meta.get("attempts", 0) + 1, **(attributes or {})}
+    if job is not None:
+        # A retried job is back on the queue at enqueued_at; a first attempt waited
+        # since it was created (deferred jobs sit in the fair scheduler before that)
+        queued = _epoch_ns(job.enqueued_at if meta.get("attempts") else job.created_at)
+        if queued is not None:
+            wait = _tracer.start_span("queue.wait", context=parent, start_time=queued,
+                                      attributes={"job.id": job.id, "job.origin": job.origin})
+            wait.end()
+    with span(name, attributes, context=parent) as current:
+        yield current
+
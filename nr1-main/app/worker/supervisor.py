@@ -0,0 +1,247 @@
+"""
+CPU-aware supervisor for video workers.
+
+- Runs N job slots per machine, each a DrainingWorker in its own process.
+- The core count honours container limits (cgroup cpu.max) and CPU affinity, so
+  a 2-CPU container on a 64-core host does not start 64 encodes.
+- Each slot gets an ffmpeg thread budget (cores // slots), exported as
+  FFMPEG_THREADS, so concurrent encodes share the machine instead of every
+  ffmpeg process spawning one thread per core. The budget is shared with the
+  slots and recomputed whenever the slot count changes, counting retired slots
+  until their last job has drained; each job starts with the budget current
+  at the time.
+- Slot count adapts to measured throughput (jobs finished per minute) with a
+  simple hill climb: keep moving in the direction that helped, reverse when
+  throughput drops, and only adapt while there is a backlog to measure.
+- SIGTERM is forwarded to every slot, which then drains as in video_worker.
+
+Run with: python -m app.worker.supervisor
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import time
+from typing import Dict, Optional, Tuple
+from ..config import settings
+
+logger = logging.getLogger("worker_supervisor")
+
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+def detect_cpu_count(cgroup_path: str = CGROUP_CPU_MAX) -> int:
+    """
+    Return the number of CPUs this process may actually use.
+
+    Args:
+        cgroup_path (str): Path to the cgroup v2 cpu.max file.
+
+    Returns:
+        int: Usable CPUs (at least 1).
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    try:
+        with open(cgroup_path) as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+def plan_slots(cpus: int, threads_per_job: int, max_slots: int = 0) -> Tuple[int, int]:
+    """
+    Work out the initial slot count and the ffmpeg thread budget per slot.
+
+    Args:
+        cpus (int): Usable CPUs.
+        threads_per_job (int): Preferred ffmpeg threads per encode.
+        max_slots (int): Upper bound on slots (0 = one per CPU).
+
+    Returns:
+        tuple[int, int]: (slots, threads per slot).
+    """
+    limit = max_slots or cpus
+    slots = max(1, min(limit, cpus // max(threads_per_job, 1)))
+    return slots, thread_budget(cpus, slots)
+
+def thread_budget(cpus: int, slots: int) -> int:
+    """Return the ffmpeg threads each of ``slots`` concurrent encodes may use."""
+    return max(1, cpus // max(slots, 1))
+
+class ThroughputController:
+    """
+    Hill-climbing controller for the slot count.
+
+    Args:
+        min_slots (int): Lower bound.
+        max_slots (int): Upper bound.
+        tolerance (float): Relative change in throughput treated as noise.
+    """
+
+    def __init__(self, min_slots: int, max_slots: int, tolerance: float = 0.05) -> None:
+        self.min_slots = min_slots
+        self.max_slots = max_slots
+        self.tolerance = tolerance
+        self.direction = 1
+        self.last_throughput: Optional[float] = None
+
+    def update(self, slots: int, throughput: float) -> int:
+        """
+        Record the throughput measured at ``slots`` and return the next slot count.
+
+        Args:
+            slots (int): Slot count during the measurement window.
+            throughput (float): Jobs finished per minute in that window.
+
+        Returns:
+            int: Slot count for the next window.
+        """
+        last = self.last_throughput
+        self.last_throughput = throughput
+        if last is not None:
+            if throughput < last * (1 - self.tolerance):
+                self.direction = -self.direction
+            elif throughput <= last * (1 + self.tolerance):
+                return slots
+        target = slots + self.direction
+        if not self.min_slots <= target <= self.max_slots:
+            self.direction = -self.direction
+            target = slots
+        return target
+
+def _run_slot(slot: int, threads, completed) -> None:
+    """Slot process entry point: one DrainingWorker with the shared ffmpeg thread budget."""
+    from ..logging_config import setup_logging
+    from .video_worker import start_worker
+
+    setup_logging()
+    logger.info(f"Slot {slot} starting with {threads.value} ffmpeg threads")
+    start_worker(completed_counter=completed, thread_budget=threads)
+
+class WorkerSupervisor:
+    """
+    Starts, scales and stops worker slot processes.
+
+    Args:
+        cpus (int, optional): Usable CPUs; detected when omitted.
+        threads_per_job (int): Preferred ffmpeg threads per encode.
+        max_slots (int): Upper bound on slots (0 = one per CPU).
+        adapt_interval (float): Seconds between throughput measurements.
+    """
+
+    def __init__(
+        self,
+        cpus: Optional[int] = None,
+        threads_per_job: int = settings.FFMPEG_THREADS_PER_JOB,
+        max_slots: int = settings.WORKER_MAX_SLOTS,
+        adapt_interval: float = settings.WORKER_ADAPT_INTERVAL,
+    ) -> None:
+        self.cpus = cpus or detect_cpu_count()
+        self.target, _ = plan_slots(self.cpus, threads_per_job, max_slots)
+        self.controller = ThroughputController(1, max_slots or self.cpus)
+        self.adapt_interval = adapt_interval
+        self.completed = multiprocessing.Value("i", 0)
+        self.threads = multiprocessing.Value("i", thread_budget(self.cpus, self.target))
+        self.slots: Dict[int, multiprocessing.Process] = {}
+        self.retiring: Dict[int, multiprocessing.Process] = {}
+        self._next_slot = 0
+        self._stopping = False
+
+    def _spawn(self) -> None:
+        process = multiprocessing.Process(
+            target=_run_slot, args=(self._next_slot, self.threads, self.completed), daemon=False
+        )
+        process.start()
+        self.slots[self._next_slot] = process
+        self._next_slot += 1
+
+    def _retire(self) -> None:
+        """Drain the newest slot; its current job finishes (or is re-queued) first."""
+        slot = max(self.slots)
+        process = self.retiring[slot] = self.slots.pop(slot)
+        if process.pid:
+            os.kill(process.pid, signal.SIGTERM)
+        logger.info(f"Retiring slot {slot}")
+
+    def reconcile(self) -> None:
+        """Reap drained slots, replace dead ones and converge the running slot count to the target."""
+        for slot, process in list(self.retiring.items()):
+            if not process.is_alive():
+                logger.info(f"Slot {slot} retired")
+                del self.retiring[slot]
+        for slot, process in list(self.slots.items()):
+            if not process.is_alive():
+                logger.warning(f"Slot {slot} exited with code {process.exitcode}")
+                del self.slots[slot]
+        while len(self.slots) < self.target:
+            self._spawn()
+        while len(self.slots) > self.target:
+            self._retire()
+        self._update_budget()
+
+    def has_backlog(self) -> bool:
+        """True when jobs are waiting, i.e. throughput is limited by slots and not demand."""
+        try:
+            from ..queue.video_queue import get_scheduler, get_video_queue
+            return get_scheduler().backlog()["pending"] > 0 or get_video_queue().count > 0
+        except Exception as e:
+            logger.warning(f"Could not read backlog: {e}")
+            return False
+
+    def adapt(self, elapsed: float) -> None:
+        """Measure jobs per minute over the last window and adjust the target."""
+        with self.completed.get_lock():
+            finished, self.completed.value = self.completed.value, 0
+        throughput = finished * 60 / elapsed
+        if not self.has_backlog():
+            return
+        target = self.controller.update(self.target, throughput)
+        if target != self.target:
+            logger.info(f"Throughput {throughput:.1f} jobs/min at {self.target} slots; moving to {target}")
+            self.set_target(target)
+
+    def set_target(self, target: int) -> None:
+        """Change the slot count and the ffmpeg thread budget of the jobs that start from now on."""
+        self.target = target
+        self._update_budget()
+
+    def _update_budget(self) -> None:
+        # Retiring slots keep encoding until their current job ends, so they still share the CPUs
+        running = max(self.target, len(self.slots)) + len(self.retiring)
+        self.threads.value = thread_budget(self.cpus, running)
+
+    def stop(self, signum=None, frame=None) -> None:
+        """Forward the stop signal to every slot so they drain."""
+        self._stopping = True
+        for process in self.slots.values():
+            if process.pid and process.is_alive():
+                os.kill(process.pid, signum or signal.SIGTERM)
+
+    def run(self) -> None:
+        """Run until SIGTERM/SIGINT, then wait for slots to drain."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info(f"Supervisor starting {self.target} slots on {self.cpus} CPUs")
+        window_start = time.monotonic()
+        while not self._stopping:
+            self.reconcile()
+            time.sleep(1)
+            elapsed = time.monotonic() - window_start
+            if elapsed >= self.adapt_interval:
+                self.adapt(elapsed)
+                window_start = time.monotonic()
+        for process in [*self.slots.values(), *self.retiring.values()]:
+            process.join()
+        logger.info("All worker slots stopped")
+
+if __name__ == "__main__":
+    from ..logging_config import setup_logging
+
+    setup_logging()
+    WorkerSupervisor().run()
@@ -0,0 +1,289 @@
+"""
+Job functions executed by the video worker.
+
+- process_clip_job cuts one clip from a source video with ffmpeg_service and
+  publishes the result locally or to S3.
+- Progress and the final result URL are recorded on the RQ job so that
+  check_job_status_service can report them, and published as job events for
+  clients streaming the job's status (job_events_service).
+- Clips of SEGMENT_MIN_DURATION or longer are encoded in parallel chunks by
+  segment_service; encode_segment_job runs one chunk as an RQ sub-job.
+- With output_format "hls" the clip is encoded as fMP4 segments; each finished
+  segment is published (to S3 when configured) and the playlist URL is set as
+  result_url right after the first one, so playback starts before the encode ends.
+- With renditions, one decode feeds a split + scale/crop graph that writes every
+  size in the same ffmpeg process; all URLs are recorded under the same job.
+- Every clip also gets a poster, a storyboard sprite with a WebVTT index and,
+  on request, an animated WebP preview, as extra outputs of the clip's own
+  ffmpeg invocation (segment-parallel clips use one extra decode-only pass).
+  The poster becomes the source video's thumbnail_url.
+- The source video is fetched through ingest_service's shared cache (one
+  parallel download per video, however many clips are cut from it) and
+  referenced for the duration of the job.
+- aspect_ratio reframes the clip with a crop that follows the action
+  (reframe_service), applied inside the same encode; captions and previews are
+  laid out for the reframed size.
+- captions (SRT, WebVTT or plain text) are compiled to a cached ASS file per
+  output size and burned in by the clip's own ffmpeg graph.
+- analyze_highlights_job scores a whole source for clip-worthy windows
+  (highlight_service); clip jobs queue it for every source they ingest.
+- The encoding profile is resolved when the job starts, from the backlog at
+  that moment, and recorded in job.meta["encoding_profile"].
+- With TRACING_ENABLED, each job resumes the trace of the request that queued
+  it (job.meta["trace"]) with spans for the queue wait, download, probe,
+  encode and upload (app/utils/tracing.py).
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+from rq import get_current_job
+from ..config import settings
+from ..services.ffmpeg_service import (
+    ffmpeg_thread_budget, probe_dimensions, process_video, process_video_hls, process_video_renditions,
+)
+from ..services.preview_service import PreviewSpec, plan_previews, run_previews
+from ..services.caption_service import compile_captions
+from ..services.reframe_service import plan_reframe
+from ..services.hls_service import HLSPublisher, hls_dir_for, hls_url_for
+from ..services.segment_service import claim_segment, encode_segment, process_video_segmented, segment_path
+from ..services.encoding_profiles import EncodingProfile, select_profile
+from ..services.ingest_service import acquire_source
+from ..services.job_events_service import publish_job_status
+from ..services.highlight_service import ANALYSIS_STEP, analyze_signals, signals_key, store_signals
+from ..services.s3_service import upload_file_to_s3, get_public_url
+from ..utils.storage_paths import processed_path_for
+from ..utils.tracing import job_trace, span
+
+logger = logging.getLogger("video_jobs")
+
+def _set_progress(progress: int, **meta: Any) -> None:
+    job = get_current_job()
+    if job is None:
+        return
+    job.meta["progress"] = progress
+    job.meta.update(meta)
+    job.save_meta()
+    publish_job_status(job)
+
+def current_backlog() -> Dict[str, Any]:
+    """Return {"pending", "oldest_wait_seconds"} for the video queue; zeros if Redis is unavailable."""
+    from ..queue.video_queue import get_scheduler, get_video_queue
+    try:
+        backlog = get_scheduler().backlog()
+        backlog["pending"] += get_video_queue().count
+        return backlog
+    except Exception as e:
+        logger.warning(f"Could not read queue backlog: {e}")
+        return {"pending": 0, "oldest_wait_seconds": 0.0}
+
+def resolve_profile(requested: Any) -> EncodingProfile:
+    """Pick the encoding profile for the current job from the live backlog."""
+    backlog = current_backlog() if requested in (None, "auto") else {"pending": 0, "oldest_wait_seconds": 0.0}
+    profile = select_profile(requested, backlog["pending"], backlog["oldest_wait_seconds"])
+    logger.info(f"Encoding profile {profile.name} (requested={requested}, pending={backlog['pending']})")
+    return profile
+
+PREVIEW_CONTENT_TYPES = {"poster": "image/jpeg", "sprite": "image/jpeg", "sprite_vtt": "text/vtt", "webp": "image/webp"}
+
+def _publish_file(output: str, content_type: str = "video/mp4") -> str:
+    """Upload a finished file to S3 when configured and return its public URL."""
+    name = os.path.basename(output)
+    if settings.AWS_S3_BUCKET:
+        key = f"processed/{name}"
+        upload_file_to_s3(output, key, content_type=content_type)
+        return get_public_url(key)
+    return f"/videos/processed/{name}"
+
+def _plan_previews(job_id: str, payload: Dict[str, Any], width: int, height: int) -> Optional[PreviewSpec]:
+    if not settings.PREVIEWS_ENABLED:
+        return None
+    return plan_previews(os.path.join(settings.VIDEO_STORAGE_PATH, "processed"), job_id,
+                         payload["end_time"] - payload["start_time"], width, height,
+                         webp=bool(payload.get("animated_preview")))
+
+def _captions_for(payload: Dict[str, Any], width: int, height: int) -> Optional[str]:
+    """Compiled ASS file for the request's captions at one output size, if any."""
+    if not payload.get("captions"):
+        return None
+    return compile_captions(payload["captions"], payload["end_time"] - payload["start_time"], width, height)
+
+def _publish_previews(video_id: str, previews: PreviewSpec) -> Dict[str, str]:
+    urls = {kind: _publish_file(path, PREVIEW_CONTENT_TYPES[kind]) for kind, path in previews.files().items()}
+    _set_progress(97, thumbnail_url=urls["poster"], previews=urls)
+    try:
+        from ..middleware.response_cache import invalidate_path
+        from ..services.redis_service import get_redis_conn
+        conn = get_redis_conn()
+        conn.set(f"video:thumbnail:{video_id}", urls["poster"])
+        # The HTTP response cache holds the old thumbnail URL
+        invalidate_path(conn, "video_info", f"/api/v1/videos/info/{video_id}")
+    except Exception as e:
+        logger.warning(f"Could not record thumbnail for {video_id}: {e}")
+    return urls
+
+def _encode_renditions(job_id: str, source: str, payload: Dict[str, Any], profile: EncodingProfile,
+                       previews: Optional[PreviewSpec], reframe: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    renditions = [
+        {**r, "output": os.path.join(settings.VIDEO_STORAGE_PATH, "processed", f"{job_id}_{r['name']}.mp4"),
+         "captions": _captions_for(payload, r["width"], r["height"])}
+        for r in payload["renditions"]
+    ]
+    os.makedirs(os.path.dirname(renditions[0]["output"]), exist_ok=True)
+    with span("encode", {"encode.mode": "renditions", "encode.profile": profile.name,
+                         "encode.renditions": len(renditions)}):
+        process_video_renditions(source, renditions, start=payload["start_time"],
+                                 duration=payload["end_time"] - payload["start_time"], profile=profile,
+                                 previews=previews, reframe=reframe)
+    _set_progress(90)
+    urls = {r["name"]: _publish_file(r["output"]) for r in renditions}
+    _set_progress(95, renditions=urls)
+    first = renditions[0]
+    return {"result_url": urls[first["name"]], "output": first["output"], "renditions": urls}
+
+def _encode_mp4(job_id: str, source: str, payload: Dict[str, Any], profile: EncodingProfile,
+                previews: Optional[PreviewSpec], captions: Optional[str],
+                reframe: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    output = processed_path_for(job_id)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    duration = payload["end_time"] - payload["start_time"]
+    segmented = duration >= settings.SEGMENT_MIN_DURATION
+    with span("encode", {"encode.mode": "segmented" if segmented else "mp4", "encode.profile": profile.name,
+                         "encode.duration": duration}):
+        if segmented:
+            process_video_segmented(source, output, payload["start_time"], duration, profile, captions=captions,
+                                    reframe=reframe)
+            if previews:
+                run_previews(source, previews, payload["start_time"], reframe=reframe)
+        else:
+            process_video(source, output, start=payload["start_time"], duration=duration, profile=profile,
+                          previews=previews, captions=captions, reframe=reframe)
+    _set_progress(90)
+    return {"result_url": _publish_file(output), "output": output}
+
+def _encode_hls(job_id: str, source: str, payload: Dict[str, Any], profile: EncodingProfile,
+                previews: Optional[PreviewSpec], captions: Optional[str],
+                reframe: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    duration = payload["end_time"] - payload["start_time"]
+    publisher = HLSPublisher(job_id)
+    playlist_url = hls_url_for(job_id)
+
+    def on_segment(filename: str) -> None:
+        publisher.on_segment(filename)
+        done = min(publisher.published * settings.HLS_SEGMENT_SECONDS / duration, 1.0)
+        # The playlist is playable as soon as its first segment exists
+        _set_progress(5 + int(85 * done), result_url=playlist_url)
+
+    # Segments are uploaded while ffmpeg runs, so upload spans nest inside this one
+    with span("encode", {"encode.mode": "hls", "encode.profile": profile.name, "encode.duration": duration}):
+        result = process_video_hls(source, hls_dir_for(job_id), start=payload["start_time"], duration=duration,
+                                   segment_seconds=settings.HLS_SEGMENT_SECONDS, profile=profile,
+                                   on_segment=on_segment, previews=previews, captions=captions, reframe=reframe)
+    return {"result_url": publisher.finish(), "output": result["output"]}
+
+def process_clip_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cut and encode one clip.
+
+    Args:
+        payload (dict): {"video_id", "start_time", "end_time", "aspect_ratio", "captions",
+            "encoding_profile", "output_format", "renditions", "animated_preview"}.
+
+    Returns:
+        dict[str, Any]: {"result_url": str, "output": str, "encoding_profile": str}, plus
+            {"renditions": {name: url}} for multi-rendition jobs and {"previews": {kind: url}}.
+    """
+    job = get_current_job()
+    job_id = job.id if job else payload["video_id"]
+    with job_trace("clip.process", job, {"video.id": payload["video_id"]}) as trace_span:
+        profile = resolve_profile(payload.get("encoding_profile"))
+        if trace_span is not None:
+            trace_span.set_attribute("encode.profile", profile.name)
+        # Held until the encode ends so the cached source cannot be evicted underneath us
+        with acquire_source(payload["video_id"], holder=job_id) as source:
+            if settings.HIGHLIGHTS_ON_INGEST:
+                _queue_highlights(payload["video_id"])
+            _set_progress(5, encoding_profile=profile.name)
+            width, height = probe_dimensions(source)
+            plan = plan_reframe(source, payload["start_time"], payload["end_time"] - payload["start_time"],
+                                width, height, payload.get("aspect_ratio"))
+            reframe = plan.to_dict() if plan else None
+            if plan:
+                width, height = plan.width, plan.height
+            previews = _plan_previews(job_id, payload, width, height)
+            if payload.get("output_format") == "hls":
+                result = _encode_hls(job_id, source, payload, profile, previews,
+                                     _captions_for(payload, width, height), reframe)
+            elif payload.get("renditions"):
+                result = _encode_renditions(job_id, source, payload, profile, previews, reframe)
+            else:
+                result = _encode_mp4(job_id, source, payload, profile, previews,
+                                     _captions_for(payload, width, height), reframe)
+        if previews:
+            result["previews"] = _publish_previews(payload["video_id"], previews)
+    _set_progress(100, result_url=result["result_url"])
+    logger.info(f"Clip job {job_id} finished: {result['result_url']}")
+    return {**result, "encoding_profile": profile.name}
+
+def analyze_highlights_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Analyse a source video for highlight windows and store its signals.
+
+    Args:
+        payload (dict): {"video_id"}.
+
+    Returns:
+        dict[str, Any]: {"video_id": str, "seconds": float} (analysed duration).
+    """
+    from ..queue.video_queue import finish_highlights_job
+    from ..services.redis_service import get_redis_conn
+
+    video_id = payload["video_id"]
+    job = get_current_job()
+    conn = get_redis_conn()
+    with job_trace("highlights.analyze", job, {"video.id": video_id}):
+        with acquire_source(video_id, holder=job.id if job else f"highlights-{video_id}") as source:
+            _set_progress(10)
+            signals = analyze_signals(source)
+        store_signals(conn, video_id, signals)
+    # Failures are recorded by the worker once no retry is left (video_worker.handle_job_failure)
+    finish_highlights_job(video_id, connection=conn)
+    seconds = signals.shape[1] * ANALYSIS_STEP
+    _set_progress(100)
+    logger.info(f"Highlight analysis for {video_id} finished: {seconds:.0f}s analysed")
+    return {"video_id": video_id, "seconds": seconds}
+
+def _queue_highlights(video_id: str) -> None:
+    """Queue highlight analysis for a freshly used source if it has none yet (best effort)."""
+    from ..queue.video_queue import submit_highlights_job
+    from ..services.redis_service import get_redis_conn
+    try:
+        if not get_redis_conn().exists(signals_key(video_id)):
+            submit_highlights_job(video_id)
+    except Exception as e:
+        logger.warning(f"Could not queue highlight analysis for {video_id}: {e}")
+
+def encode_segment_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Encode one chunk of a segmented clip, unless the parent (or another sub-job) claimed it.
+
+    Args:
+        payload (dict): {"input", "workdir", "index", "start", "end", "profile", "captions", "window_start",
+            "reframe"}.
+
+    Returns:
+        dict[str, Any]: {"index": int, "encoded": bool}.
+    """
+    from ..services.redis_service import get_redis_conn
+
+    index = payload["index"]
+    if not os.path.isdir(payload["workdir"]):
+        # The parent finished (or gave up) and cleaned up before this sub-job started
+        return {"index": index, "encoded": False}
+    if not claim_segment(get_redis_conn(), payload["workdir"], index, settings.VIDEO_JOB_TIMEOUT):
+        return {"index": index, "encoded": False}
+    with job_trace("segment.encode", get_current_job(), {"segment.index": index}):
+        encode_segment(payload["input"], segment_path(payload["workdir"], index), payload["start"], payload["end"],
+                       payload["profile"], ffmpeg_thread_budget(), payload.get("captions"),
+                       payload.get("window_start", 0), payload.get("reframe"))
+    return {"index": index, "encoded": True}
@@ -1,19 +1,184 @@
 """
 RQ worker for processing video jobs in the background.
-Listens to the 'video-processing' queue and runs jobs using process_video_job_service.
+Listens to the 'video-processing' queue (fed by the fair scheduler) and runs clip jobs
+from app/worker/video_jobs.py.
+
+Graceful drain: on SIGTERM the worker stops taking new jobs and lets the current
+job finish for up to WORKER_DRAIN_TIMEOUT seconds. If the job is still running at
+the deadline (or a second signal arrives), the work horse and its ffmpeg process
+are stopped and the job is checkpointed and re-queued at the front of the queue,
+so the next worker picks it up instead of the job being lost.
+
+Failed clip jobs are retried with a per-error-class backoff (app/queue/retry_policy.py)
+by RQ's scheduler, which every worker runs; jobs that run out of retries are
+recorded in the dead-letter queue with their error and ffmpeg stderr excerpt.
+
+Final statuses (completed, failed, re-queued) are published as job events, so
+clients streaming a job's status see the end without polling.
+
+On multi-core machines run app/worker/supervisor.py instead, which starts one
+worker per job slot and gives each an ffmpeg thread budget.
 """
 
-from rq import Worker, Queue, Connection
-from ..services.video_service import process_video_job_service
-from ..queue.video_queue import redis_conn
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from rq import Worker
+from rq.utils import utcnow
+from ..config import settings
+from ..queue.retry_policy import describe_failure, retry_delay
+from ..queue.video_queue import (
+    HIGHLIGHTS_JOB_FUNC, SEGMENT_QUEUE_NAME, VIDEO_QUEUE_NAME, FairQueue, finish_highlights_job,
+)
+from ..services.dead_letter_service import record_dead_letter
+from ..services.job_events_service import publish_job_status
+from ..services.redis_service import get_redis_conn
+from ..utils.tracing import setup_tracing
+
+logger = logging.getLogger("video_worker")
+
+# Segment sub-jobs first: a parent clip job is already running and waiting on them
+listen = [SEGMENT_QUEUE_NAME, VIDEO_QUEUE_NAME]
+
+class DrainingWorker(Worker):
+    """RQ Worker that checkpoints and re-queues its current job at the drain deadline."""
+
+    drain_timeout: float = settings.WORKER_DRAIN_TIMEOUT
+
+    def __init__(self, *args, completed_counter=None, thread_budget=None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.completed_counter = completed_counter
+        self.thread_budget = thread_budget
+        self._checkpoint_job_id: Optional[str] = None
+        self._drain_timer: Optional[threading.Timer] = None
+
+    def request_stop(self, signum, frame):
+        """Warm shutdown: finish the current job, but only until the drain deadline."""
+        if self.horse_pid and self._drain_timer is None:
+            logger.warning(f"Drain requested; current job has {self.drain_timeout:.0f}s to finish")
+            self._drain_timer = threading.Timer(self.drain_timeout, self._checkpoint_current_job)
+            self._drain_timer.daemon = True
+            self._drain_timer.start()
+        super().request_stop(signum, frame)
+
+    def request_force_stop(self, signum, frame):
+        """Cold shutdown: take the horse down and re-queue its job before exiting."""
+        # RQ ignores a repeated signal within a second; so do we
+        if self.horse_pid and utcnow() - self._shutdown_requested_date >= timedelta(seconds=1):
+            # RQ's cold shutdown raises SystemExit right after killing the horse, so the
+            # monitor never gets to handle_job_failure: fail and re-queue the job here
+            self._mark_checkpoint()
+            job = self.get_current_job()
+            self.kill_horse()
+            self.wait_for_horse()
+            self._horse_pid = 0
+            if job is not None and job.id == self._checkpoint_job_id:
+                self.handle_job_failure(job, FairQueue(job.origin, connection=self.connection),
+                                        exc_string="Worker cold shutdown, work-horse terminated.")
+        super().request_force_stop(signum, frame)
+
+    def execute_job(self, job, queue):
+        if self.thread_budget is not None:
+            # Set by the supervisor as it scales; the work horse forked for this job inherits it
+            os.environ["FFMPEG_THREADS"] = str(self.thread_budget.value)
+        return super().execute_job(job, queue)
+
+    def _mark_checkpoint(self) -> None:
+        if self.horse_pid and self._checkpoint_job_id is None:
+            self._checkpoint_job_id = self.get_current_job_id()
+
+    def _checkpoint_current_job(self) -> None:
+        """Drain deadline reached: stop the horse (and its ffmpeg process group)."""
+        if not self.horse_pid:
+            return
+        self._mark_checkpoint()
+        logger.warning(f"Drain deadline reached; checkpointing job {self._checkpoint_job_id}")
+        self.kill_horse()
+
+    def handle_job_success(self, job, queue, started_job_registry):
+        super().handle_job_success(job, queue, started_job_registry)
+        publish_job_status(job)
+        if self.completed_counter is not None:
+            # Shared with the supervisor, which measures jobs finished per minute
+            with self.completed_counter.get_lock():
+                self.completed_counter.value += 1
+
+    def _plan_retry(self, job, exc: Optional[BaseException], exc_string: str) -> Dict[str, Any]:
+        """Classify a failure and, if its policy allows another attempt, arm RQ's retry with a backoff."""
+        failure = describe_failure(exc, exc_string)
+        attempts = job.meta.get("attempts", 0) + 1
+        delay = retry_delay(failure["error_class"], attempts - 1)
+        job.meta.update(attempts=attempts, error=f"{failure['error_class']}: {failure['error']}")
+        job.save_meta()
+        if delay is not None:
+            job.retries_left = 1
+            job.retry_intervals = [max(1, round(delay))]
+            logger.warning(f"Job {job.id} failed ({failure['error_class']}, attempt {attempts}); "
+                           f"retrying in {delay:.0f}s")
+        failure["retry_in"] = delay
+        return failure
+
+    def _settle_highlights(self, job, failure: Optional[Dict[str, Any]]) -> None:
+        """Keep a highlight analysis marked pending through its retries; record its final failure."""
+        video_id = job.kwargs["payload"]["video_id"]
+        if failure is not None and failure["retry_in"] is not None:
+            self.connection.expire(f"highlights-{video_id}:pending",
+                                   int(settings.VIDEO_JOB_TIMEOUT + failure["retry_in"]))
+        else:
+            finish_highlights_job(video_id, failure["error"] if failure else "Analysis stopped",
+                                  connection=self.connection)
+
+    def handle_job_failure(self, job, queue, started_job_registry=None, exc_string=''):
+        failure = None
+        # Segment sub-jobs are re-encoded by their parent instead of being retried;
+        # stopped and checkpointed jobs are not failures of the job itself
+        if (job.origin == VIDEO_QUEUE_NAME and job.id != self._checkpoint_job_id
+                and job.id != self._stopped_job_id):
+            # Called from perform_job's except block in the work horse, where the
+            # exception is still being handled; None when the horse itself died
+            failure = self._plan_retry(job, sys.exc_info()[1], exc_string)
+        super().handle_job_failure(job, queue, started_job_registry=started_job_registry, exc_string=exc_string)
+        if failure is not None and failure["retry_in"] is None:
+            record_dead_letter(self.connection, job, failure)
+        if job.func_name == HIGHLIGHTS_JOB_FUNC and job.id != self._checkpoint_job_id:
+            self._settle_highlights(job, failure)
+        if job.id != self._checkpoint_job_id:
+            publish_job_status(job)
+            return
+        job.meta["checkpoints"] = job.meta.get("checkpoints", 0) + 1
+        job.meta["checkpointed_at"] = datetime.now(timezone.utc).isoformat()
+        job.save_meta()
+        try:
+            job.requeue(at_front=True)
+            publish_job_status(job)
+            logger.info(f"Job {job.id} checkpointed and re-queued for another worker")
+        except Exception as e:
+            # No longer in the failed registry (deleted or re-queued meanwhile)
+            logger.warning(f"Job {job.id} not re-queued after checkpoint: {e}")
 
-listen = ['video-processing']
+def start_worker(completed_counter=None, thread_budget=None) -> None:
+    """
+    Start the RQ worker for video-processing jobs.
 
-def start_worker() -> None:
-    """Start the RQ worker for video-processing jobs."""
-    with Connection(redis_conn):
-        worker = Worker(list(map(Queue, listen)))
-        worker.work()
+    Args:
+        completed_counter (multiprocessing.Value, optional): Incremented per finished job.
+        thread_budget (multiprocessing.Value, optional): ffmpeg threads for each job this worker starts.
+    """
+    # Before the first fork, so every work horse inherits the tracer provider
+    setup_tracing("nr1-worker", simple=True)
+    redis_conn = get_redis_conn()
+    worker = DrainingWorker(
+        [FairQueue(name, connection=redis_conn) for name in listen],
+        connection=redis_conn,
+        queue_class=FairQueue,
+        completed_counter=completed_counter,
+        thread_budget=thread_budget,
+    )
+    # The scheduler moves jobs whose retry backoff has elapsed back onto their queue
+    worker.work(with_scheduler=True)
 
 if __name__ == '__main__':
     start_worker()